@@ -1,9 +1,11 @@
 """
 Configuration and Master Data Models
 """
+from django.conf import settings
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import uuid
 
 User = get_user_model()
@@ -182,7 +184,8 @@ class AuditLog(models.Model):
     
     # Who and when
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the buffered row is flushed
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     
@@ -201,7 +204,12 @@ class AuditLog(models.Model):
     
     @classmethod
     def log_change(cls, instance, action, user=None, changes=None, request=None):
-        """Create an audit log entry"""
+        """
+        Create an audit log entry
+        
+        With AUDIT_BUFFER_ENABLED the entry is handed to the buffered audit
+        sink and written in batches off the request path.
+        """
         log = cls(
             model_name=instance._meta.label,
             object_id=str(instance.pk),
@@ -215,7 +223,11 @@ class AuditLog(models.Model):
             log.ip_address = cls._get_client_ip(request)
             log.user_agent = request.META.get('HTTP_USER_AGENT', '')
         
-        log.save()
+        if getattr(settings, 'AUDIT_BUFFER_ENABLED', False):
+            from apps.core.audit_sink import audit_sink
+            audit_sink.enqueue(log)
+        else:
+            log.save()
         return log
     
     @staticmethod
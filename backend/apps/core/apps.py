@@ -8,3 +8,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     verbose_name = 'Core'
+
+    def ready(self):
+        from apps.core.metrics import connect_celery_signals
+        connect_celery_signals()
@@ -0,0 +1,250 @@
+"""
+Buffered audit sink.
+
+Audit rows are queued in process and written with ``bulk_create`` by a
+background flusher once ``AUDIT_BUFFER_SIZE`` rows are pending or every
+``AUDIT_FLUSH_INTERVAL_SECONDS``. When the database is unavailable the batch
+is appended to a local JSONL spool file and replayed after the next
+successful flush, so no event is lost while the request path never waits on
+the audit table. Spooled rows the database keeps rejecting are moved to a
+quarantine file next to the spool instead of blocking later replays.
+"""
+import atexit
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import InterfaceError, OperationalError, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class AuditSink:
+    """
+    In-process buffer that persists model instances in batches.
+
+    The sink is generic over the model so it can be exercised in tests with
+    any installed model; production code uses the ``audit_sink`` singleton
+    bound to ``config.AuditLog``.
+    """
+
+    def __init__(
+        self,
+        model_label: str,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        spool_path: Optional[str] = None,
+        start_thread: bool = True,
+    ):
+        """
+        Initialize audit sink.
+
+        Args:
+            model_label: 'app_label.ModelName' of the rows being buffered
+            batch_size: Pending rows that trigger an immediate flush
+            flush_interval: Maximum seconds a row waits in the buffer
+            spool_path: JSONL file used when the database is unavailable
+            start_thread: Start the background flusher on first enqueue
+        """
+        self.model_label = model_label
+        self.batch_size = batch_size or getattr(settings, 'AUDIT_BUFFER_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'AUDIT_FLUSH_INTERVAL_SECONDS', 2.0)
+        self.spool_path = Path(
+            spool_path or getattr(settings, 'AUDIT_SPOOL_PATH', settings.BASE_DIR / 'logs' / 'audit_spool.jsonl')
+        )
+        self.start_thread = start_thread
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        """(Re)create per-process state; called again after a fork"""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._buffer: List = []
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def pending(self) -> int:
+        """Number of rows waiting to be flushed"""
+        return len(self._buffer)
+
+    def enqueue(self, instance):
+        """
+        Queue an unsaved instance for writing.
+
+        Inside a transaction the row is only queued once it commits, so
+        rolled-back requests leave no audit entry, matching ``save()``.
+        """
+        transaction.on_commit(lambda: self._append(instance))
+
+    def _append(self, instance):
+        if self._pid != os.getpid():
+            # Forked worker: drop the parent's lock, thread and buffer copy
+            self._reset()
+
+        with self._lock:
+            self._buffer.append(instance)
+            full = len(self._buffer) >= self.batch_size
+
+        if self.start_thread:
+            self._ensure_thread()
+            if full:
+                self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-sink-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        """Background loop: flush on size signal or interval"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:  # never let the flusher thread die
+                logger.error(f"Audit sink flush failed: {str(e)}")
+
+    def flush(self) -> int:
+        """
+        Write all pending rows.
+
+        Returns:
+            Number of rows written to the database
+        """
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+
+        if not batch:
+            return 0
+
+        try:
+            self.model.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception as e:
+            # Any failure (outage, bad row, serialization bug) keeps the rows;
+            # replay isolates rows that can never be written
+            logger.warning(f"Audit DB write failed, spooling {len(batch)} rows: {str(e)}")
+            self._spool(batch)
+            return 0
+
+        self.replay_spool()
+        return len(batch)
+
+    # ========================================================================
+    # SPOOL FILE
+    # ========================================================================
+
+    def _spool(self, batch):
+        """Append rows to the local spool file (one JSON document per line)"""
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._spool_lock, open(self.spool_path, 'a', encoding='utf-8') as spool:
+                for instance in batch:
+                    spool.write(serializers.serialize('json', [instance]) + '\n')
+        except OSError as e:
+            logger.error(f"Audit spool write failed, {len(batch)} rows lost: {str(e)}")
+
+    def replay_spool(self) -> int:
+        """
+        Write rows spooled while the database was unavailable.
+
+        The spool is renamed to a per-process file first so concurrent
+        workers never replay the same rows; primary keys are UUIDs and
+        conflicts are ignored, so a partial replay can be retried safely.
+
+        Returns:
+            Number of rows replayed
+        """
+        if not self.spool_path.exists():
+            return 0
+
+        replay_path = self.spool_path.with_name(f"{self.spool_path.name}.{os.getpid()}.replay")
+        try:
+            with self._spool_lock:
+                os.replace(self.spool_path, replay_path)
+        except FileNotFoundError:
+            return 0
+
+        rows = []
+        with open(replay_path, encoding='utf-8') as replay:
+            for line in replay:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.extend(obj.object for obj in serializers.deserialize('json', line))
+                except Exception as e:
+                    logger.error(f"Unreadable spooled audit row quarantined: {str(e)}")
+                    self._quarantine_lines([line])
+
+        try:
+            self.model.objects.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+        except (OperationalError, InterfaceError) as e:
+            # Database unreachable: keep everything for the next attempt
+            logger.warning(f"Audit spool replay failed, keeping {len(rows)} rows: {str(e)}")
+            self._spool(rows)
+            replay_path.unlink(missing_ok=True)
+            return 0
+        except Exception as e:
+            logger.warning(f"Audit spool batch rejected, replaying {len(rows)} rows one by one: {str(e)}")
+            replayed = self._replay_rows_individually(rows)
+            replay_path.unlink(missing_ok=True)
+            return replayed
+
+        replay_path.unlink(missing_ok=True)
+        logger.info(f"Replayed {len(rows)} spooled audit rows")
+        return len(rows)
+
+    def _replay_rows_individually(self, rows) -> int:
+        """
+        Write rows one at a time; rows the database rejects are moved to
+        the quarantine file so one bad row cannot block the spool forever.
+        """
+        replayed = 0
+        for index, row in enumerate(rows):
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create([row], ignore_conflicts=True)
+            except (OperationalError, InterfaceError) as e:
+                logger.warning(f"Audit spool replay interrupted, keeping {len(rows) - index} rows: {str(e)}")
+                self._spool(rows[index:])
+                break
+            except Exception as e:
+                logger.error(f"Audit row rejected by the database, quarantined: {str(e)}")
+                self._quarantine_lines([serializers.serialize('json', [row])])
+            else:
+                replayed += 1
+        return replayed
+
+    @property
+    def quarantine_path(self) -> Path:
+        return self.spool_path.with_name(f"{self.spool_path.stem}.quarantine{self.spool_path.suffix}")
+
+    def _quarantine_lines(self, lines: List[str]):
+        """Keep rejected rows aside for manual inspection"""
+        try:
+            with self._spool_lock, open(self.quarantine_path, 'a', encoding='utf-8') as quarantine:
+                for line in lines:
+                    quarantine.write(line + '\n')
+        except OSError as e:
+            logger.error(f"Audit quarantine write failed, {len(lines)} rows lost: {str(e)}")
+
+
+audit_sink = AuditSink('config.AuditLog')
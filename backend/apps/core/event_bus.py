@@ -0,0 +1,214 @@
+"""
+Publish/subscribe bus for server-sent events.
+
+Events go into one ordered log with a bounded replay buffer
+(``EVENT_BUS_BUFFER_SIZE`` events); subscribers read the log from a cursor
+and keep the events of the channels they follow. The cursor is the last
+event ID they saw, so a client that reconnects with ``Last-Event-ID``
+receives what it missed. If those events already left the buffer, the bus
+returns a single ``resync`` event and the client should refetch through
+the REST endpoints.
+
+Backends (``EVENT_BUS_BACKEND``):
+
+- ``memory``: in-process log. Only events published by the same process
+  are seen, so it suits development, tests and single-process deployments.
+  A warning is logged when it is used with ``DEBUG`` off.
+- ``redis``: a Redis stream (``EVENT_BUS_REDIS_URL``), shared by every web
+  and Celery worker. The default whenever a broker URL is configured.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RESYNC_EVENT = 'resync'
+
+
+@dataclass
+class Event:
+    """One event of the log"""
+    id: str
+    channel: str
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+class EventBus:
+    """Ordered event log shared by publishers and subscribers"""
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+        """
+        Append an event to the log.
+
+        Returns:
+            Event ID, or None if publishing failed (it is logged, never raised)
+        """
+        raise NotImplementedError
+
+    def latest_id(self) -> str:
+        """Cursor positioned after the newest event"""
+        raise NotImplementedError
+
+    def read(self, channels: Iterable[str], after: str, timeout: float) -> Tuple[List[Event], str]:
+        """
+        Wait up to ``timeout`` seconds for events after the ``after`` cursor.
+
+        Args:
+            channels: Channels whose events are returned
+            after: Cursor (last event ID seen)
+            timeout: Seconds to wait when there are no new events
+
+        Returns:
+            Tuple of (events, new cursor)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _resync(cursor: str) -> Tuple[List[Event], str]:
+        return [Event(id=cursor, channel='', type=RESYNC_EVENT)], cursor
+
+
+class MemoryEventBus(EventBus):
+    """
+    In-process event log.
+
+    Event IDs are ``<epoch>-<sequence>``; the epoch changes on every start,
+    so cursors from a previous process trigger a resync.
+    """
+
+    def __init__(self, buffer_size: Optional[int] = None):
+        self._events = deque(maxlen=buffer_size or getattr(settings, 'EVENT_BUS_BUFFER_SIZE', 10000))
+        self._epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._changed = threading.Condition()
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+        with self._changed:
+            self._sequence += 1
+            event = Event(id=f"{self._epoch}-{self._sequence}", channel=channel, type=event_type, data=data)
+            self._events.append((self._sequence, event))
+            self._changed.notify_all()
+        return event.id
+
+    def latest_id(self) -> str:
+        return f"{self._epoch}-{self._sequence}"
+
+    def read(self, channels: Iterable[str], after: str, timeout: float) -> Tuple[List[Event], str]:
+        channels = set(channels)
+        epoch, _, sequence = after.partition('-')
+        with self._changed:
+            oldest = self._events[0][0] if self._events else self._sequence + 1
+            if epoch != self._epoch or not sequence.isdigit() or not oldest - 1 <= int(sequence) <= self._sequence:
+                return self._resync(self.latest_id())
+            position = int(sequence)
+            self._changed.wait_for(lambda: self._sequence > position, timeout)
+            events = [event for seq, event in self._events if seq > position and event.channel in channels]
+            return events, self.latest_id()
+
+
+class RedisEventBus(EventBus):
+    """Event log in a Redis stream, trimmed to about ``EVENT_BUS_BUFFER_SIZE`` entries"""
+
+    STREAM_KEY = 'cmms:events'
+
+    def __init__(self, url: Optional[str] = None, buffer_size: Optional[int] = None):
+        self.url = url or getattr(settings, 'EVENT_BUS_REDIS_URL', '')
+        self.buffer_size = buffer_size or getattr(settings, 'EVENT_BUS_BUFFER_SIZE', 10000)
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Connection pools do not survive a fork: one client per process
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    import redis
+                    self._client = redis.Redis.from_url(self.url)
+                    self._pid = os.getpid()
+        return self._client
+
+    @staticmethod
+    def _position(event_id) -> Optional[Tuple[int, int]]:
+        if isinstance(event_id, bytes):
+            event_id = event_id.decode()
+        milliseconds, _, sequence = str(event_id).partition('-')
+        if not milliseconds.isdigit() or not sequence.isdigit():
+            return None
+        return int(milliseconds), int(sequence)
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> Optional[str]:
+        try:
+            event_id = self.client.xadd(
+                self.STREAM_KEY,
+                {'channel': channel, 'type': event_type, 'data': json.dumps(data)},
+                maxlen=self.buffer_size,
+                approximate=True,
+            )
+        except Exception as e:
+            logger.error(f"Failed to publish {event_type} event: {str(e)}")
+            return None
+        return event_id.decode()
+
+    def latest_id(self) -> str:
+        newest = self.client.xrevrange(self.STREAM_KEY, count=1)
+        return newest[0][0].decode() if newest else '0-0'
+
+    def read(self, channels: Iterable[str], after: str, timeout: float) -> Tuple[List[Event], str]:
+        channels = set(channels)
+        position = self._position(after)
+        if position is None:
+            return self._resync(self.latest_id())
+        oldest = self.client.xrange(self.STREAM_KEY, count=1)
+        if oldest and position < self._position(oldest[0][0]) and position != (0, 0):
+            # Events after the cursor may have been trimmed
+            return self._resync(self.latest_id())
+
+        response = self.client.xread({self.STREAM_KEY: after}, count=500, block=max(1, int(timeout * 1000)))
+        events = []
+        cursor = after
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                cursor = entry_id.decode()
+                channel = fields[b'channel'].decode()
+                if channel in channels:
+                    events.append(Event(
+                        id=cursor,
+                        channel=channel,
+                        type=fields[b'type'].decode(),
+                        data=json.loads(fields[b'data']),
+                    ))
+        return events, cursor
+
+
+# Process-wide bus
+_event_bus = None
+_event_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """Get or create the process-wide EventBus (per ``EVENT_BUS_BACKEND``)"""
+    global _event_bus
+    if _event_bus is None:
+        with _event_bus_lock:
+            if _event_bus is None:
+                if getattr(settings, 'EVENT_BUS_BACKEND', 'memory') == 'redis':
+                    _event_bus = RedisEventBus()
+                else:
+                    if not settings.DEBUG:
+                        logger.warning(
+                            "EVENT_BUS_BACKEND is 'memory': event streams only see events published "
+                            "by this process; use 'redis' when several web or Celery workers run"
+                        )
+                    _event_bus = MemoryEventBus()
+    return _event_bus
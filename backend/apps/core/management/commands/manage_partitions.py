@@ -0,0 +1,89 @@
+"""
+Django management command for time-partitioned history tables
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from apps.core.partitioning import (
+    PostgresPartitionManager,
+    get_partition_manager,
+    get_partitioned_models,
+    get_retention_months,
+    maintain_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Manage monthly partitions (PostgreSQL) or archive tables (other backends)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            type=str,
+            choices=['status', 'create', 'retain', 'maintain', 'convert'],
+            help='Action to perform'
+        )
+        parser.add_argument(
+            '--model',
+            type=str,
+            help='Limit to one model label, e.g. machine_status.AssetStatusHistory'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=getattr(settings, 'PARTITION_MONTHS_AHEAD', 3),
+            help='Months of future partitions to create'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database alias'
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        using = options['database']
+        manager = get_partition_manager(using)
+
+        targets = get_partitioned_models()
+        if options.get('model'):
+            targets = [(m, c) for m, c in targets if m._meta.label == options['model']]
+            if not targets:
+                raise CommandError(f"Model {options['model']} is not registered for partitioning")
+
+        if action == 'maintain':
+            for label, result in maintain_partitions(using).items():
+                self.stdout.write(f"{label}: {result}")
+            self.stdout.write(self.style.SUCCESS('✓ Partition maintenance completed'))
+            return
+
+        for model, column in targets:
+            if action == 'status':
+                self.show_status(manager, model)
+            elif action == 'create':
+                created = manager.ensure_partitions(model, column, options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS(f"✓ {model._meta.label}: {len(created)} partitions created"))
+            elif action == 'retain':
+                dropped = manager.drop_expired(model, get_retention_months(model))
+                self.stdout.write(self.style.SUCCESS(f"✓ {model._meta.label}: dropped {dropped or 'nothing'}"))
+            elif action == 'convert':
+                if not isinstance(manager, PostgresPartitionManager):
+                    raise CommandError('convert requires PostgreSQL; other backends use archive tables')
+                try:
+                    created = manager.convert(model, column, options['months_ahead'])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS(
+                    f"✓ {model._meta.label}: partitioned ({len(created)} partitions)"
+                ))
+
+    def show_status(self, manager, model):
+        """Show partitions or archive tables of a model"""
+        self.stdout.write(f"{model._meta.label} ({model._meta.db_table}) "
+                          f"- retention {get_retention_months(model)} months")
+        self.stdout.write('-' * 50)
+        partitions = manager.list_partitions(model)
+        if not partitions:
+            self.stdout.write('  (no partitions)')
+        for partition in partitions:
+            self.stdout.write(f"  {partition['name']}: {partition['rows']} rows")
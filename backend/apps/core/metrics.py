@@ -0,0 +1,347 @@
+"""
+Prometheus metrics for the CMMS backend.
+
+Counters and histograms are plain per-process objects (no cache round trip
+per increment). When ``PROMETHEUS_MULTIPROC_DIR`` is set, every gunicorn
+worker writes its values to memory-mapped files in that directory and the
+``/metrics`` endpoint aggregates all of them, so p95/p99 per view are
+computed over the whole deployment instead of a single worker.
+
+Celery workers are separate processes (usually another container), so
+their task durations cannot reach the web ``/metrics``. A worker started
+with ``PROMETHEUS_WORKER_PORT`` serves its own metrics on that port; with
+``PROMETHEUS_MULTIPROC_DIR`` set for the worker (see
+start-celery-worker.sh) the values of every prefork child are aggregated.
+
+prometheus-client is optional: without it every helper is a no-op and
+``/metrics`` answers 503.
+"""
+import logging
+import hmac
+import ipaddress
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from apps.core.query_profiling import request_profiler
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+        start_http_server,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+METRIC_PREFIX = 'cmms'
+
+# Latency buckets (seconds) tuned for API calls: fine resolution below 1s so
+# p95/p99 are meaningful, coarse tail for slow report/export endpoints.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.35, 0.5,
+    0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+TASK_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0, 1800.0)
+
+
+def is_multiprocess_mode() -> bool:
+    """Whether workers share metrics through PROMETHEUS_MULTIPROC_DIR"""
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir'))
+
+
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUEST_DURATION = Histogram(
+        f'{METRIC_PREFIX}_http_request_duration_seconds',
+        'HTTP request latency by view',
+        ['method', 'view', 'status'],
+        buckets=LATENCY_BUCKETS,
+    )
+    HTTP_DB_QUERIES = Histogram(
+        f'{METRIC_PREFIX}_http_db_queries',
+        'SQL queries executed per HTTP request',
+        ['view'],
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+    HTTP_DB_DURATION = Histogram(
+        f'{METRIC_PREFIX}_http_db_duration_seconds',
+        'Time spent in SQL per HTTP request',
+        ['view'],
+        buckets=LATENCY_BUCKETS,
+    )
+    CELERY_TASK_DURATION = Histogram(
+        f'{METRIC_PREFIX}_celery_task_duration_seconds',
+        'Celery task run time',
+        ['task', 'state'],
+        buckets=TASK_DURATION_BUCKETS,
+    )
+    WORK_ORDERS_CREATED = Counter(
+        f'{METRIC_PREFIX}_work_orders_created_total',
+        'Work orders created through the API',
+        ['has_asset'],
+    )
+
+
+# ============================================================================
+# DYNAMIC METRICS (MetricsCollector backend)
+# ============================================================================
+
+_METRIC_NAME_RE = re.compile(r'[^a-zA-Z0-9_]')
+_dynamic_metrics: Dict[Tuple[str, str], Tuple[object, Tuple[str, ...]]] = {}
+_dynamic_lock = threading.Lock()
+
+
+def _metric_name(name: str) -> str:
+    return f"{METRIC_PREFIX}_{_METRIC_NAME_RE.sub('_', name)}"
+
+
+def _get_dynamic_metric(kind: str, name: str, labelnames: Tuple[str, ...]):
+    """
+    Return (creating on first use) a metric for ``MetricsCollector`` calls.
+
+    The label set of a metric is fixed by its first use; later calls with
+    different tag keys are coerced to it.
+    """
+    key = (kind, name)
+    entry = _dynamic_metrics.get(key)
+    if entry is not None:
+        return entry
+
+    with _dynamic_lock:
+        entry = _dynamic_metrics.get(key)
+        if entry is None:
+            full_name = _metric_name(name)
+            try:
+                if kind == 'counter':
+                    metric = Counter(full_name, f'{name} (counter)', labelnames)
+                elif kind == 'gauge':
+                    metric = Gauge(full_name, f'{name} (gauge)', labelnames, multiprocess_mode='livemax')
+                else:
+                    metric = Histogram(f'{full_name}_seconds', f'{name} (timing)', labelnames,
+                                       buckets=LATENCY_BUCKETS)
+            except ValueError:
+                # Name already taken by a metric of another kind
+                metric = None
+            entry = _dynamic_metrics[key] = (metric, labelnames)
+    return entry
+
+
+def _labelled(entry, tags: Optional[Dict[str, str]]):
+    metric, labelnames = entry
+    if metric is None or not labelnames:
+        return metric
+    tags = tags or {}
+    return metric.labels(**{name: str(tags.get(name, '')) for name in labelnames})
+
+
+def inc_counter(name: str, value: float = 1, tags: Optional[Dict[str, str]] = None):
+    if PROMETHEUS_AVAILABLE:
+        entry = _get_dynamic_metric('counter', name, tuple(sorted(tags or {})))
+        metric = _labelled(entry, tags)
+        if metric is not None:
+            metric.inc(value)
+
+
+def set_gauge(name: str, value: float, tags: Optional[Dict[str, str]] = None):
+    if PROMETHEUS_AVAILABLE:
+        entry = _get_dynamic_metric('gauge', name, tuple(sorted(tags or {})))
+        metric = _labelled(entry, tags)
+        if metric is not None:
+            metric.set(value)
+
+
+def observe_timing(name: str, duration_seconds: float, tags: Optional[Dict[str, str]] = None):
+    if PROMETHEUS_AVAILABLE:
+        entry = _get_dynamic_metric('histogram', name, tuple(sorted(tags or {})))
+        metric = _labelled(entry, tags)
+        if metric is not None:
+            metric.observe(duration_seconds)
+
+
+# ============================================================================
+# HTTP MIDDLEWARE
+# ============================================================================
+
+def get_view_label(request) -> str:
+    """
+    Low-cardinality view label: the URL name when the route has one,
+    otherwise the route pattern, never the raw path.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    if match.view_name:
+        return match.view_name
+    return match.route or 'unnamed'
+
+
+class PrometheusMetricsMiddleware:
+    """
+    Record request latency, SQL query count and SQL time per view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = PROMETHEUS_AVAILABLE and getattr(settings, 'PROMETHEUS_METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled or request.path == '/metrics':
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with request_profiler(request) as queries:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = get_view_label(request)
+        HTTP_REQUEST_DURATION.labels(
+            method=request.method,
+            view=view,
+            status=f'{response.status_code // 100}xx',
+        ).observe(duration)
+        HTTP_DB_QUERIES.labels(view=view).observe(queries.count)
+        HTTP_DB_DURATION.labels(view=view).observe(queries.total_time)
+
+        return response
+
+
+# ============================================================================
+# CELERY TASK DURATIONS
+# ============================================================================
+
+_task_started: Dict[str, float] = {}
+
+
+def _on_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    start = _task_started.pop(task_id, None)
+    if start is None or task is None:
+        return
+    CELERY_TASK_DURATION.labels(task=task.name, state=state or 'UNKNOWN').observe(
+        time.perf_counter() - start
+    )
+
+
+def _metrics_registry():
+    """Registry to expose: every process's values in multiprocess mode"""
+    if is_multiprocess_mode():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def start_worker_exporter(sender=None, **kwargs):
+    """
+    Serve the worker's metrics on ``PROMETHEUS_WORKER_PORT`` (worker_init).
+
+    Runs in the worker's main process before the pool starts. Prefork
+    children record task durations, so the worker needs
+    ``PROMETHEUS_MULTIPROC_DIR`` for them to be exported.
+    """
+    port = getattr(settings, 'PROMETHEUS_WORKER_PORT', 0)
+    if not PROMETHEUS_AVAILABLE or not port:
+        return None
+    if not is_multiprocess_mode():
+        logger.warning(
+            "PROMETHEUS_MULTIPROC_DIR is not set for the Celery worker: "
+            "durations of tasks run in prefork children are not exported"
+        )
+    addr = getattr(settings, 'PROMETHEUS_WORKER_ADDR', '0.0.0.0')
+    try:
+        server = start_http_server(port, addr=addr, registry=_metrics_registry())
+    except OSError as e:
+        logger.error(f"Could not start the worker metrics exporter on {addr}:{port}: {str(e)}")
+        return None
+    logger.info(f"Worker metrics exported on {addr}:{port}")
+    return server
+
+
+def _on_worker_process_shutdown(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
+
+
+def connect_celery_signals():
+    """Hook task durations and the worker exporter to Celery signals"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    try:
+        from celery.signals import task_prerun, task_postrun, worker_init, worker_process_shutdown
+    except ImportError:
+        return
+    task_prerun.connect(_on_task_prerun, weak=False, dispatch_uid='cmms_metrics_task_prerun')
+    task_postrun.connect(_on_task_postrun, weak=False, dispatch_uid='cmms_metrics_task_postrun')
+    worker_init.connect(start_worker_exporter, weak=False, dispatch_uid='cmms_metrics_worker_init')
+    worker_process_shutdown.connect(
+        _on_worker_process_shutdown, weak=False, dispatch_uid='cmms_metrics_worker_process_shutdown'
+    )
+
+
+# ============================================================================
+# /metrics ENDPOINT
+# ============================================================================
+
+def _scrape_allowed(request) -> bool:
+    """
+    Whether the caller may read /metrics.
+
+    With ``METRICS_AUTH_TOKEN`` set the scraper must send it as a bearer
+    token; without it, only clients in ``METRICS_ALLOWED_NETWORKS`` are
+    accepted (none by default, so an unconfigured deployment is closed).
+    """
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        return hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+    try:
+        client = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    for network in getattr(settings, 'METRICS_ALLOWED_NETWORKS', []):
+        try:
+            if client in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def metrics_view(request):
+    """
+    Expose metrics in the Prometheus text format.
+
+    In multiprocess mode the values of all workers are aggregated. Access
+    requires ``METRICS_AUTH_TOKEN`` or a client in ``METRICS_ALLOWED_NETWORKS``.
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return HttpResponse('prometheus-client is not installed', status=503, content_type='text/plain')
+
+    if not _scrape_allowed(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+
+    return HttpResponse(generate_latest(_metrics_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid: int):
+    """Drop live gauges of a dead worker (gunicorn child_exit hook)"""
+    if PROMETHEUS_AVAILABLE and is_multiprocess_mode():
+        multiprocess.mark_process_dead(pid)
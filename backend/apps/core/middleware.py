@@ -1,7 +1,11 @@
 """
 Custom middleware for CMMS system
 """
+import json
+import logging
+import re
 import time
+from django.http.request import RawPostDataException
 from django.utils.deprecation import MiddlewareMixin
 
 
@@ -70,6 +74,56 @@ class RequestLoggingMiddleware(MiddlewareMixin):
 
 
 
+class QueryProfilingMiddleware(MiddlewareMixin):
+    """
+    Middleware to profile SQL per request
+    
+    Adds X-DB-Query-Count, X-DB-Time-Ms and X-DB-Duplicate-Queries headers
+    when DEBUG or QUERY_PROFILING_ENABLED is on. In DEBUG an
+    X-DB-Query-Warning header (and a performance log entry) flags requests
+    over QUERY_PROFILING_MAX_QUERIES or with repeated query fingerprints,
+    which is how N+1 patterns show up.
+    """
+    
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        from django.conf import settings
+        self.debug = settings.DEBUG
+        self.enabled = self.debug or getattr(settings, 'QUERY_PROFILING_ENABLED', False)
+        self.max_queries = getattr(settings, 'QUERY_PROFILING_MAX_QUERIES', 20)
+        self.max_duplicates = getattr(settings, 'QUERY_PROFILING_MAX_DUPLICATES', 2)
+    
+    def __call__(self, request):
+        """Profile the request with the shared per-request profiler"""
+        if not self.enabled:
+            return self.get_response(request)
+        from apps.core.query_profiling import request_profiler
+        with request_profiler(request, record_statements=True):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+    
+    def process_response(self, request, response):
+        """Add profiling headers"""
+        profiler = getattr(request, '_query_profiler', None)
+        if profiler is None:
+            return response
+        
+        duplicates = profiler.duplicate_count()
+        response['X-DB-Query-Count'] = profiler.count
+        response['X-DB-Time-Ms'] = f"{profiler.total_time_ms:.1f}"
+        response['X-DB-Duplicate-Queries'] = duplicates
+        
+        if self.debug and (profiler.count > self.max_queries or duplicates > self.max_duplicates):
+            response['X-DB-Query-Warning'] = (
+                f"{profiler.count} queries, {duplicates} duplicated (possible N+1)"
+            )
+            logging.getLogger('performance').warning(
+                f"Query budget warning: {request.method} {request.path} - {profiler.summary()}"
+            )
+        
+        return response
+
+
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """
     Middleware to add security headers to all responses
@@ -116,85 +170,173 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
         return response
 
 
+_SQL_INPUT_PATTERN = (
+    r"\bunion\b.*\bselect\b"
+    r"|\bdrop\b.*\btable\b"
+    r"|\binsert\b.*\binto\b"
+    r"|\bdelete\b.*\bfrom\b"
+    r"|--"
+)
+_XSS_INPUT_PATTERN = (
+    r"<script[^>]*>.*?</script>"
+    r"|javascript:"
+    r"|onerror\s*="
+    r"|onload\s*="
+)
+
+# Combined SQL injection / XSS detector, matched against lowercased text.
+# The leading lookahead lets the regex engine skip straight to positions that
+# can start a match instead of trying every alternative at every character.
+SUSPICIOUS_INPUT_PATTERN = re.compile(
+    rf"(?=[-<udijo])(?:(?P<sql>{_SQL_INPUT_PATTERN})|(?P<xss>{_XSS_INPUT_PATTERN}))"
+)
+
+# Per-category detectors, used once the combined pattern has reported one
+# category and only the other one is still unknown
+SUSPICIOUS_INPUT_PATTERNS = {
+    'sql': re.compile(rf"(?=[-diu])(?:{_SQL_INPUT_PATTERN})"),
+    'xss': re.compile(rf"(?=[<jo])(?:{_XSS_INPUT_PATTERN})"),
+}
+
+SUSPICIOUS_INPUT_CATEGORIES = ('sql', 'xss')
+
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+
+DEFAULT_SKIP_FIELDS = (
+    'password', 'password_confirm', 'old_password', 'new_password',
+    'token', 'access', 'refresh', 'secret', 'signature',
+)
+
+
+def scan_suspicious_input(values, skip_fields=frozenset()):
+    """
+    Scan strings nested in a decoded JSON document for suspicious patterns.
+    
+    The tree is walked iteratively (no recursion, no intermediate lists) and
+    values stored under a key in ``skip_fields`` are not inspected.
+    
+    Args:
+        values: Decoded JSON value (dict, list, str or scalar)
+        skip_fields: Keys whose values must not be inspected
+        
+    Returns:
+        Set with the detected categories ('sql', 'xss')
+    """
+    found = set()
+    stack = [values]
+    search = SUSPICIOUS_INPUT_PATTERN.search
+    
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            text = value.lower()
+            match = search(text)
+            if match is None:
+                continue
+            found.add(match.lastgroup)
+            # At most one more search per string, for each category not
+            # found yet (rescanning after every match is quadratic on
+            # repetitive input)
+            for category in SUSPICIOUS_INPUT_CATEGORIES:
+                if category not in found and SUSPICIOUS_INPUT_PATTERNS[category].search(text):
+                    found.add(category)
+            if len(found) == len(SUSPICIOUS_INPUT_CATEGORIES):
+                return found
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key not in skip_fields:
+                    stack.append(item)
+        elif isinstance(value, list):
+            stack.extend(value)
+    
+    return found
+
+
 class InputSanitizationMiddleware(MiddlewareMixin):
     """
     Middleware to sanitize and validate input data
+    
+    Only JSON bodies are inspected; multipart and binary uploads are skipped
+    and bodies above ``INPUT_SANITIZATION_MAX_BODY_BYTES`` are not parsed.
+    Detections are logged to the ``security`` logger, requests are never blocked.
     """
     
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        from django.conf import settings
+        self.max_body_bytes = getattr(
+            settings, 'INPUT_SANITIZATION_MAX_BODY_BYTES', DEFAULT_MAX_BODY_BYTES
+        )
+        self.skip_fields = frozenset(
+            getattr(settings, 'INPUT_SANITIZATION_SKIP_FIELDS', DEFAULT_SKIP_FIELDS)
+        )
+    
     def process_request(self, request):
         """Sanitize request data"""
-        import re
-        
-        # Check for common SQL injection patterns
-        sql_patterns = [
-            r"(\bUNION\b.*\bSELECT\b)",
-            r"(\bDROP\b.*\bTABLE\b)",
-            r"(\bINSERT\b.*\bINTO\b)",
-            r"(\bDELETE\b.*\bFROM\b)",
-            r"(--)",
-            r"(;.*--)",
-        ]
+        found = set()
         
-        # Check for XSS patterns
-        xss_patterns = [
-            r"(<script[^>]*>.*?</script>)",
-            r"(javascript:)",
-            r"(onerror\s*=)",
-            r"(onload\s*=)",
+        # Check query parameters
+        query_values = [
+            values for key, values in request.GET.lists()
+            if key not in self.skip_fields
         ]
+        if query_values:
+            found |= scan_suspicious_input(query_values, self.skip_fields)
         
-        # Get request data
-        data_to_check = []
-        if request.method in ['POST', 'PUT', 'PATCH']:
-            if hasattr(request, 'body'):
-                try:
-                    import json
-                    body = json.loads(request.body)
-                    data_to_check.extend(self._extract_strings(body))
-                except:
-                    pass
+        # Check JSON body
+        if request.method in ('POST', 'PUT', 'PATCH') and self._is_json(request):
+            body = self._load_json_body(request)
+            if body is not None:
+                found |= scan_suspicious_input(body, self.skip_fields)
         
-        # Check query parameters
-        for value in request.GET.values():
-            data_to_check.append(value)
-        
-        # Validate data
-        for data in data_to_check:
-            if isinstance(data, str):
-                # Check SQL injection
-                for pattern in sql_patterns:
-                    if re.search(pattern, data, re.IGNORECASE):
-                        import logging
-                        logger = logging.getLogger('security')
-                        logger.warning(
-                            f"Potential SQL injection attempt detected: "
-                            f"{request.method} {request.path} - IP: {self._get_client_ip(request)}"
-                        )
-                
-                # Check XSS
-                for pattern in xss_patterns:
-                    if re.search(pattern, data, re.IGNORECASE):
-                        import logging
-                        logger = logging.getLogger('security')
-                        logger.warning(
-                            f"Potential XSS attempt detected: "
-                            f"{request.method} {request.path} - IP: {self._get_client_ip(request)}"
-                        )
+        if found:
+            security_logger = logging.getLogger('security')
+            if 'sql' in found:
+                security_logger.warning(
+                    f"Potential SQL injection attempt detected: "
+                    f"{request.method} {request.path} - IP: {self._get_client_ip(request)}"
+                )
+            if 'xss' in found:
+                security_logger.warning(
+                    f"Potential XSS attempt detected: "
+                    f"{request.method} {request.path} - IP: {self._get_client_ip(request)}"
+                )
         
         return None
     
-    def _extract_strings(self, obj):
-        """Recursively extract strings from nested objects"""
-        strings = []
-        if isinstance(obj, dict):
-            for value in obj.values():
-                strings.extend(self._extract_strings(value))
-        elif isinstance(obj, list):
-            for item in obj:
-                strings.extend(self._extract_strings(item))
-        elif isinstance(obj, str):
-            strings.append(obj)
-        return strings
+    @staticmethod
+    def _is_json(request):
+        """Check whether the request declares a JSON body"""
+        content_type = (request.content_type or '').lower()
+        return content_type == 'application/json' or content_type.endswith('+json')
+    
+    def _load_json_body(self, request):
+        """Decode the JSON body, or return None if it is too large or invalid"""
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (TypeError, ValueError):
+            content_length = 0
+        
+        # Enforce the size cap before touching the body
+        if content_length > self.max_body_bytes:
+            logging.getLogger('security').info(
+                f"Input sanitization skipped for oversized body ({content_length} bytes): "
+                f"{request.method} {request.path}"
+            )
+            return None
+        
+        try:
+            body = request.body
+        except RawPostDataException:
+            return None
+        
+        if not body or len(body) > self.max_body_bytes:
+            return None
+        
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
     
     def _get_client_ip(self, request):
         """Get client IP address"""
@@ -5,6 +5,7 @@ import time
 from typing import Dict, Any, Optional
 from django.core.mail import send_mail
 from django.conf import settings
+from apps.core import metrics as prometheus_metrics
 from apps.core.logging_utils import StructuredLogger
 
 logger = StructuredLogger('monitoring')
@@ -13,6 +14,10 @@ logger = StructuredLogger('monitoring')
 class MetricsCollector:
     """
     Collects and tracks application metrics
+    
+    Values are exported through the Prometheus registry (aggregated across
+    gunicorn workers by ``/metrics``); ``get_metrics`` only reflects the
+    current process.
     """
     
     def __init__(self):
@@ -31,6 +36,7 @@ class MetricsCollector:
         if key not in self.metrics:
             self.metrics[key] = 0
         self.metrics[key] += value
+        prometheus_metrics.inc_counter(metric_name, value, tags)
         
         logger.debug(
             f"Metric incremented: {metric_name}",
@@ -50,6 +56,7 @@ class MetricsCollector:
         """
         key = self._get_metric_key(metric_name, tags)
         self.metrics[key] = value
+        prometheus_metrics.set_gauge(metric_name, value, tags)
         
         logger.debug(
             f"Metric set: {metric_name}",
@@ -67,6 +74,7 @@ class MetricsCollector:
             duration_ms: Duration in milliseconds
             tags: Optional tags for the metric
         """
+        prometheus_metrics.observe_timing(metric_name, duration_ms / 1000, tags)
         logger.info(
             f"Timing: {metric_name}",
             metric=metric_name,
@@ -82,7 +90,7 @@ class MetricsCollector:
         return f"{metric_name}[{tag_str}]"
     
     def get_metrics(self) -> Dict[str, Any]:
-        """Get all collected metrics"""
+        """Get metrics collected by this process"""
         return self.metrics.copy()
 
 
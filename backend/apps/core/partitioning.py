@@ -0,0 +1,664 @@
+"""
+Monthly time partitioning for append-only history tables.
+
+On PostgreSQL the registered tables are converted once into native
+``PARTITION BY RANGE`` tables with one partition per month. Queries filtered
+on the date column are pruned by the planner, and retention is a
+``DETACH PARTITION`` + ``DROP TABLE`` instead of a large ``DELETE``. A
+``<table>_default`` partition catches rows past the last monthly partition,
+so inserts keep working if maintenance stops running; the next run moves
+those rows into their monthly partitions. The furthest monthly partition is
+exported as the ``cmms_partition_horizon_timestamp`` gauge for alerting.
+
+Other backends (SQLite in development, MySQL on Railway) have no comparable
+declarative partitioning, so rows older than ``PARTITION_HOT_MONTHS`` can be
+moved in small chunks into monthly archive tables (``<table>_archive_YYYYMM``)
+and retention drops whole archive tables. Archived rows are only reachable
+through ``ArchiveTableManager.archived_querysets``, not through the views
+that read the live table, so archiving is opt-in per model
+(``PARTITION_ARCHIVE_MODELS``) and off by default.
+"""
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.apps import apps
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from apps.core import metrics as prometheus_metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Model label -> date column used as the partition key
+PARTITIONED_TABLES = {
+    'config.AuditLog': 'timestamp',
+    'machine_status.AssetStatusHistory': 'changed_at',
+    'core.WebhookDelivery': 'created_at',
+}
+
+DEFAULT_RETENTION_MONTHS = 24
+
+# Partitions must cover at least this far ahead, or maintenance reports it
+HORIZON_WARNING_DAYS = 31
+
+
+# ============================================================================
+# MONTH HELPERS
+# ============================================================================
+
+def month_start(value) -> date:
+    """Return the first day of the month containing ``value``"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = value.astimezone(dt_timezone.utc)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    """Shift a month start by ``count`` months"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return month_start(timezone.now())
+
+
+def month_datetime(month: date) -> datetime:
+    """Aware UTC datetime at the start of ``month``"""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def month_range(start: date, end: date) -> List[date]:
+    """Month starts from ``start`` to ``end`` inclusive"""
+    months = []
+    month = month_start(start)
+    while month <= end:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def get_partitioned_models() -> List[Tuple[Any, str]]:
+    """Registered (model, date column) pairs whose app is installed"""
+    result = []
+    for label, column in PARTITIONED_TABLES.items():
+        try:
+            result.append((apps.get_model(label), column))
+        except LookupError:
+            continue
+    return result
+
+
+def get_retention_months(model) -> int:
+    retention = getattr(settings, 'PARTITION_RETENTION_MONTHS', {})
+    return retention.get(model._meta.label, DEFAULT_RETENTION_MONTHS)
+
+
+# ============================================================================
+# POSTGRESQL NATIVE PARTITIONS
+# ============================================================================
+
+def partitioned_unique_statements(table: str, unique_keys, column: str, quote) -> List[str]:
+    """
+    DDL recreating unique keys on a table partitioned by ``column``.
+
+    Args:
+        table: Partitioned table name
+        unique_keys: (name, is_constraint, columns) of the original table
+        column: Partition key, appended to keys that do not contain it
+        quote: Identifier quoting function
+
+    Returns:
+        SQL statements, constraints as constraints and indexes as indexes
+    """
+    statements = []
+    for name, is_constraint, columns in unique_keys:
+        key = list(columns) + ([column] if column not in columns else [])
+        key_sql = ', '.join(quote(c) for c in key)
+        if is_constraint:
+            statements.append(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} UNIQUE ({key_sql})")
+        else:
+            statements.append(f"CREATE UNIQUE INDEX {quote(name)} ON {quote(table)} ({key_sql})")
+    return statements
+
+
+class PostgresPartitionManager:
+    """
+    Manage native monthly range partitions on PostgreSQL.
+    """
+
+    PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+        self.connection = connections[using]
+
+    def _quote(self, name: str) -> str:
+        return self.connection.ops.quote_name(name)
+
+    def partition_name(self, model, month: date) -> str:
+        return f"{model._meta.db_table}_p{month:%Y%m}"
+
+    def is_partitioned(self, model) -> bool:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = %s",
+                [model._meta.db_table]
+            )
+            return cursor.fetchone() is not None
+
+    def list_partitions(self, model) -> List[Dict[str, Any]]:
+        """
+        List monthly partitions with their approximate row counts.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname, child.reltuples::bigint FROM pg_inherits i "
+                "JOIN pg_class parent ON parent.oid = i.inhparent "
+                "JOIN pg_class child ON child.oid = i.inhrelid "
+                "WHERE parent.relname = %s ORDER BY child.relname",
+                [model._meta.db_table]
+            )
+            rows = cursor.fetchall()
+
+        partitions = []
+        for name, approx_rows in rows:
+            match = self.PARTITION_SUFFIX.search(name)
+            if match:
+                partitions.append({
+                    'name': name,
+                    'month': date(int(match.group(1)), int(match.group(2)), 1),
+                    'rows': max(approx_rows, 0),
+                })
+        return partitions
+
+    def default_partition_name(self, model) -> str:
+        return f"{model._meta.db_table}_default"
+
+    def ensure_default_partition(self, model) -> List[str]:
+        """
+        Create the DEFAULT partition receiving rows outside every monthly
+        partition, if it does not exist.
+        """
+        name = self.default_partition_name(model)
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                return []
+            cursor.execute(
+                f"CREATE TABLE {self._quote(name)} PARTITION OF {self._quote(model._meta.db_table)} DEFAULT"
+            )
+        return [name]
+
+    def _create_partition(self, model, column: str, month: date) -> int:
+        """
+        Create the partition of ``month``, moving its rows out of the
+        default partition.
+
+        PostgreSQL refuses a new partition while the default one holds rows
+        of its range, so the table is filled first and then attached.
+
+        Returns:
+            Number of rows moved from the default partition
+        """
+        name = self._quote(self.partition_name(model, month))
+        parent = self._quote(model._meta.db_table)
+        bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+
+        with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {self._quote(self.default_partition_name(model))} "
+                f"WHERE {self._quote(column)} >= %s AND {self._quote(column)} < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved",
+                bounds
+            )
+            moved = max(cursor.rowcount, 0)
+            cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+        return moved
+
+    def ensure_partitions(self, model, column: str, months_ahead: int,
+                          start: Optional[date] = None) -> List[str]:
+        """
+        Create the default partition and missing monthly partitions from
+        ``start`` (default: current month) up to ``months_ahead`` months in
+        the future.
+        """
+        if not self.is_partitioned(model):
+            return []
+
+        created = self.ensure_default_partition(model)
+        first = start or current_month()
+        last = add_months(current_month(), months_ahead)
+        existing = {p['name'] for p in self.list_partitions(model)}
+
+        for month in month_range(first, last):
+            name = self.partition_name(model, month)
+            if name in existing:
+                continue
+            moved = self._create_partition(model, column, month)
+            if moved:
+                logger.warning(f"Moved {moved} rows of {name} out of the default partition")
+            created.append(name)
+
+        if created:
+            logger.info(f"Created partitions {created}")
+        return created
+
+    def horizon(self, model) -> Optional[date]:
+        """First month not covered by a monthly partition"""
+        months = [p['month'] for p in self.list_partitions(model)]
+        return add_months(max(months), 1) if months else None
+
+    def drop_expired(self, model, retention_months: int) -> List[str]:
+        """
+        Detach and drop partitions that end before the retention cutoff.
+        """
+        if not self.is_partitioned(model):
+            logger.warning(
+                f"{model._meta.db_table} is not partitioned yet, skipping retention "
+                f"(run: manage.py manage_partitions convert)"
+            )
+            return []
+
+        cutoff = add_months(current_month(), -retention_months)
+        dropped = []
+        parent = self._quote(model._meta.db_table)
+
+        for partition in self.list_partitions(model):
+            if add_months(partition['month'], 1) > cutoff:
+                continue
+            child = self._quote(partition['name'])
+            with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {child}")
+                cursor.execute(f"DROP TABLE {child}")
+            dropped.append(partition['name'])
+
+        if dropped:
+            logger.info(f"Dropped expired partitions {dropped}")
+        return dropped
+
+    def _unique_keys(self, cursor, table: str) -> List[Tuple[str, bool, List[str]]]:
+        """
+        Unique constraints and unique indexes of ``table`` (primary key
+        excluded) as (name, is_constraint, columns).
+        """
+        cursor.execute(
+            "SELECT i.relname FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass AND x.indisunique AND NOT x.indisprimary "
+            "AND (x.indpred IS NOT NULL OR x.indexprs IS NOT NULL)",
+            [table]
+        )
+        unsupported = [row[0] for row in cursor.fetchall()]
+        if unsupported:
+            raise ValueError(
+                f"{table} has partial or expression unique indexes {unsupported} and cannot be partitioned"
+            )
+
+        cursor.execute(
+            "SELECT COALESCE(con.conname, i.relname), con.conname IS NOT NULL, "
+            "array_agg(a.attname ORDER BY k.ord) "
+            "FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "LEFT JOIN pg_constraint con ON con.conindid = x.indexrelid AND con.contype = 'u' "
+            "CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord) "
+            "JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum "
+            "WHERE x.indrelid = %s::regclass AND x.indisunique AND NOT x.indisprimary "
+            "GROUP BY 1, 2 ORDER BY 1",
+            [table]
+        )
+        return [(name, is_constraint, list(columns)) for name, is_constraint, columns in cursor.fetchall()]
+
+    def convert(self, model, column: str, months_ahead: int) -> List[str]:
+        """
+        Convert an existing plain table into a partitioned table.
+
+        The primary key becomes (pk, date column) and every unique
+        constraint or index gets the date column appended, as PostgreSQL
+        requires the partition key in every unique key; Django keeps using
+        the pk column alone. A default partition is created along with the
+        monthly ones. Runs in a single transaction and copies every row, so
+        schedule it in a maintenance window.
+        """
+        if self.is_partitioned(model):
+            return []
+
+        table = model._meta.db_table
+        legacy = f"{table}_unpartitioned"
+        pk_column = model._meta.pk.column
+
+        with transaction.atomic(using=self.using):
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT conname FROM pg_constraint "
+                    "WHERE confrelid = %s::regclass AND contype = 'f'",
+                    [table]
+                )
+                referencing = [row[0] for row in cursor.fetchall()]
+                if referencing:
+                    raise ValueError(
+                        f"{table} is referenced by foreign keys {referencing} and cannot be partitioned"
+                    )
+
+                # Plain indexes are recreated as they are; unique ones need
+                # the partition key added
+                cursor.execute(
+                    "SELECT pg_get_indexdef(x.indexrelid) FROM pg_index x "
+                    "WHERE x.indrelid = %s::regclass AND NOT x.indisunique AND NOT x.indisprimary",
+                    [table]
+                )
+                index_definitions = [row[0] for row in cursor.fetchall()]
+                unique_statements = partitioned_unique_statements(
+                    table, self._unique_keys(cursor, table), column, self._quote
+                )
+                cursor.execute(
+                    "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                    "WHERE conrelid = %s::regclass AND contype = 'f'",
+                    [table]
+                )
+                foreign_keys = cursor.fetchall()
+
+                cursor.execute(f"ALTER TABLE {self._quote(table)} RENAME TO {self._quote(legacy)}")
+                cursor.execute(
+                    f"CREATE TABLE {self._quote(table)} (LIKE {self._quote(legacy)} "
+                    f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+                    f"PARTITION BY RANGE ({self._quote(column)})"
+                )
+                cursor.execute(
+                    f"ALTER TABLE {self._quote(table)} ADD CONSTRAINT {self._quote(table + '_part_pkey')} "
+                    f"PRIMARY KEY ({self._quote(pk_column)}, {self._quote(column)})"
+                )
+
+                cursor.execute(f"SELECT MIN({self._quote(column)}) FROM {self._quote(legacy)}")
+                oldest = cursor.fetchone()[0]
+                first = month_start(oldest) if oldest else current_month()
+
+            created = self.ensure_partitions(model, column, months_ahead, start=first)
+
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {self._quote(table)} SELECT * FROM {self._quote(legacy)}")
+                cursor.execute(f"DROP TABLE {self._quote(legacy)}")
+                for definition in index_definitions:
+                    cursor.execute(definition)
+                for statement in unique_statements:
+                    cursor.execute(statement)
+                for name, definition in foreign_keys:
+                    cursor.execute(
+                        f"ALTER TABLE {self._quote(table)} ADD CONSTRAINT {self._quote(name)} {definition}"
+                    )
+
+        logger.info(f"Converted {table} to monthly partitions ({len(created)} created)")
+        return created
+
+
+# ============================================================================
+# ARCHIVE TABLES (SQLite / MySQL)
+# ============================================================================
+
+# Archive models live in their own registry so they never show up in
+# migrations or in the project's app registry.
+_archive_apps = Apps()
+_archive_models: Dict[str, Any] = {}
+
+_AUTO_FIELD_COLUMNS = {
+    models.BigAutoField: models.BigIntegerField,
+    models.SmallAutoField: models.SmallIntegerField,
+    models.AutoField: models.IntegerField,
+}
+
+
+def _plain_column(field):
+    """Copy of a foreign key's column as a plain field (no constraint)"""
+    target = field.target_field
+    if type(target) in _AUTO_FIELD_COLUMNS:
+        return _AUTO_FIELD_COLUMNS[type(target)](null=True, db_column=field.column, db_index=True)
+
+    _, _, args, kwargs = target.deconstruct()
+    for key in ('primary_key', 'unique', 'default', 'editable'):
+        kwargs.pop(key, None)
+    kwargs.update(null=True, blank=True, db_column=field.column, db_index=True)
+    return target.__class__(*args, **kwargs)
+
+
+class ArchiveTableManager:
+    """
+    Move old rows into monthly archive tables on backends without
+    native partitioning.
+    """
+
+    ARCHIVE_SUFFIX = re.compile(r'_archive_(\d{4})(\d{2})$')
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+        self.connection = connections[using]
+
+    def archive_table_name(self, model, month: date) -> str:
+        return f"{model._meta.db_table}_archive_{month:%Y%m}"
+
+    def archive_model(self, model, month: date):
+        """
+        Unmanaged model bound to the archive table of ``month``.
+
+        Foreign keys are stored as plain columns so archived rows never
+        block deletes on the referenced tables.
+        """
+        table = self.archive_table_name(model, month)
+        if table in _archive_models:
+            return _archive_models[table]
+
+        attrs = {
+            '__module__': model.__module__,
+            'Meta': type('Meta', (), {
+                'db_table': table,
+                'app_label': model._meta.app_label,
+                'apps': _archive_apps,
+                'managed': False,
+            }),
+        }
+        for field in model._meta.concrete_fields:
+            if field.is_relation:
+                attrs[field.attname] = _plain_column(field)
+            else:
+                attrs[field.name] = field.clone()
+
+        archive = type(f"{model.__name__}Archive{month:%Y%m}", (models.Model,), attrs)
+        _archive_models[table] = archive
+        return archive
+
+    def list_partitions(self, model) -> List[Dict[str, Any]]:
+        """List archive tables with their row counts"""
+        prefix = f"{model._meta.db_table}_archive_"
+        partitions = []
+        for name in sorted(self.connection.introspection.table_names()):
+            match = self.ARCHIVE_SUFFIX.search(name)
+            if not name.startswith(prefix) or not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append({
+                'name': name,
+                'month': month,
+                'rows': self.archive_model(model, month).objects.using(self.using).count(),
+            })
+        return partitions
+
+    def ensure_partitions(self, model, column: str, months_ahead: int,
+                          start: Optional[date] = None) -> List[str]:
+        """New rows always land in the live table; nothing to pre-create."""
+        return []
+
+    def horizon(self, model) -> Optional[date]:
+        """The live table takes rows of any date"""
+        return None
+
+    def _ensure_archive_table(self, model, month: date):
+        archive = self.archive_model(model, month)
+        if archive._meta.db_table not in self.connection.introspection.table_names():
+            with self.connection.schema_editor() as editor:
+                editor.create_model(archive)
+        return archive
+
+    def archive_rows(self, model, column: str, hot_months: int, chunk_size: int) -> int:
+        """
+        Move rows older than the hot window into their monthly archive table.
+
+        Each chunk is copied and deleted in its own short transaction,
+        ordered by primary key, so locks stay small and an interrupted run
+        resumes where it stopped.
+
+        Returns:
+            Number of rows moved
+        """
+        cutoff = add_months(current_month(), -hot_months)
+        cutoff_dt = month_datetime(cutoff)
+        manager = model._base_manager.using(self.using)
+        columns = [f.column for f in model._meta.concrete_fields]
+        pk_name = model._meta.pk.name
+        quote = self.connection.ops.quote_name
+        column_sql = ', '.join(quote(c) for c in columns)
+        moved = 0
+
+        while True:
+            oldest = manager.filter(**{f'{column}__lt': cutoff_dt}).order_by(column).values_list(column, flat=True).first()
+            if oldest is None:
+                break
+
+            month = month_start(oldest)
+            upper = min(add_months(month, 1), cutoff)
+            upper_dt = month_datetime(upper)
+            archive = self._ensure_archive_table(model, month)
+            month_rows = manager.filter(**{f'{column}__lt': upper_dt}).order_by(pk_name)
+
+            while True:
+                ids = list(month_rows.values_list(pk_name, flat=True)[:chunk_size])
+                if not ids:
+                    break
+                placeholders = ', '.join(['%s'] * len(ids))
+                params = [model._meta.pk.get_db_prep_value(i, self.connection) for i in ids]
+                with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+                    cursor.execute(
+                        f"INSERT INTO {quote(archive._meta.db_table)} ({column_sql}) "
+                        f"SELECT {column_sql} FROM {quote(model._meta.db_table)} "
+                        f"WHERE {quote(model._meta.pk.column)} IN ({placeholders})",
+                        params
+                    )
+                    cursor.execute(
+                        f"DELETE FROM {quote(model._meta.db_table)} "
+                        f"WHERE {quote(model._meta.pk.column)} IN ({placeholders})",
+                        params
+                    )
+                moved += len(ids)
+
+        if moved:
+            logger.info(f"Archived {moved} rows from {model._meta.db_table}")
+        return moved
+
+    def drop_expired(self, model, retention_months: int) -> List[str]:
+        """Drop archive tables whose month is past the retention cutoff"""
+        cutoff = add_months(current_month(), -retention_months)
+        dropped = []
+        for partition in self.list_partitions(model):
+            if add_months(partition['month'], 1) > cutoff:
+                continue
+            with self.connection.schema_editor() as editor:
+                editor.delete_model(self.archive_model(model, partition['month']))
+            _archive_models.pop(partition['name'], None)
+            dropped.append(partition['name'])
+
+        if dropped:
+            logger.info(f"Dropped expired archive tables {dropped}")
+        return dropped
+
+    def archived_querysets(self, model, start: datetime, end: datetime) -> List[models.QuerySet]:
+        """
+        Querysets over the archive tables overlapping ``[start, end)``.
+
+        Only the months in range are touched, which is the archive-table
+        equivalent of partition pruning.
+        """
+        column = PARTITIONED_TABLES[model._meta.label]
+        existing = {p['month'] for p in self.list_partitions(model)}
+        return [
+            self.archive_model(model, month).objects.using(self.using).filter(
+                **{f'{column}__gte': start, f'{column}__lt': end}
+            )
+            for month in month_range(month_start(start), month_start(end))
+            if month in existing
+        ]
+
+
+def get_partition_manager(using: str = 'default'):
+    """Return the partition manager matching the database backend"""
+    if connections[using].vendor == 'postgresql':
+        return PostgresPartitionManager(using)
+    return ArchiveTableManager(using)
+
+
+def check_horizon(model, horizon: Optional[date], now: Optional[datetime] = None) -> Optional[str]:
+    """
+    Export how far ahead ``model`` is partitioned and report a horizon
+    closer than ``HORIZON_WARNING_DAYS``.
+
+    Args:
+        model: Partitioned model
+        horizon: First month without a monthly partition (None: unbounded)
+        now: Current time (default: now)
+
+    Returns:
+        Warning message, or None while the horizon is far enough
+    """
+    if horizon is None:
+        return None
+
+    end = month_datetime(horizon)
+    prometheus_metrics.set_gauge(
+        'partition_horizon_timestamp', end.timestamp(), {'table': model._meta.db_table}
+    )
+    if end - (now or timezone.now()) >= timedelta(days=HORIZON_WARNING_DAYS):
+        return None
+
+    message = (
+        f"{model._meta.db_table} is only partitioned until {horizon.isoformat()}; "
+        f"newer rows go to its default partition"
+    )
+    logger.error(message)
+    return message
+
+
+def maintain_partitions(using: str = 'default') -> Dict[str, Dict[str, Any]]:
+    """
+    Create upcoming partitions, archive old rows (models listed in
+    ``PARTITION_ARCHIVE_MODELS`` only) and apply retention for every
+    registered table.
+
+    Returns:
+        Summary per model label, with a ``warning`` when its partitions do
+        not reach far enough ahead
+    """
+    manager = get_partition_manager(using)
+    months_ahead = getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+    hot_months = getattr(settings, 'PARTITION_HOT_MONTHS', 3)
+    chunk_size = getattr(settings, 'PARTITION_ARCHIVE_CHUNK_SIZE', 5000)
+
+    archive_models = set(getattr(settings, 'PARTITION_ARCHIVE_MODELS', []))
+    summary = {}
+
+    for model, column in get_partitioned_models():
+        result = {'created': manager.ensure_partitions(model, column, months_ahead)}
+        warning = check_horizon(model, manager.horizon(model))
+        if warning:
+            result['warning'] = warning
+        if isinstance(manager, ArchiveTableManager) and model._meta.label in archive_models:
+            result['archived_rows'] = manager.archive_rows(model, column, hot_months, chunk_size)
+        result['dropped'] = manager.drop_expired(model, get_retention_months(model))
+        summary[model._meta.label] = result
+
+    return summary
@@ -0,0 +1,356 @@
+"""
+Non-blocking Pub/Sub publisher.
+
+Messages are handed to the Pub/Sub client, which groups them into batched
+requests (``PUBSUB_BATCH_*``), and completion is reported through future
+callbacks instead of waiting on each publish. At most
+``PUBSUB_MAX_PENDING_MESSAGES`` messages are outstanding per process; beyond
+that, fire-and-forget messages overflow to a local JSONL spool file, as do
+those whose publish failed, and the spool is replayed on later publishes.
+
+The transport is pluggable: ``GooglePublisherBackend`` in production and
+``InMemoryPublisherBackend`` for tests and development without GCP.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with (message_id, exception); exactly one of them is None
+PublishCallback = Callable[[Optional[str], Optional[BaseException]], None]
+
+
+class PublisherBackend:
+    """Transport used by ``Publisher``"""
+
+    def is_available(self) -> bool:
+        return True
+
+    def publish(self, topic_path: str, data: bytes, attributes: Dict[str, str]) -> Future:
+        """Start publishing a message; the future resolves to its message ID"""
+        raise NotImplementedError
+
+
+class GooglePublisherBackend(PublisherBackend):
+    """Cloud Pub/Sub ``PublisherClient`` with batching and flow control"""
+
+    def __init__(self):
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # gRPC channels do not survive a fork: one client per process
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = self._create_client()
+                    self._pid = os.getpid()
+        return self._client
+
+    def _create_client(self):
+        from google.cloud import pubsub_v1
+        from google.cloud.pubsub_v1.types import LimitExceededBehavior
+
+        batch_settings = pubsub_v1.types.BatchSettings(
+            max_messages=getattr(settings, 'PUBSUB_BATCH_MAX_MESSAGES', 100),
+            max_bytes=getattr(settings, 'PUBSUB_BATCH_MAX_BYTES', 1024 * 1024),
+            max_latency=getattr(settings, 'PUBSUB_BATCH_MAX_LATENCY_SECONDS', 0.05),
+        )
+        # Publisher enforces its own (lower) pending limit; ERROR makes an
+        # overflow fail the future instead of blocking the caller
+        flow_control = pubsub_v1.types.PublishFlowControl(
+            message_limit=getattr(settings, 'PUBSUB_FLOW_CONTROL_MAX_MESSAGES', 2000),
+            byte_limit=getattr(settings, 'PUBSUB_FLOW_CONTROL_MAX_BYTES', 20 * 1024 * 1024),
+            limit_exceeded_behavior=LimitExceededBehavior.ERROR,
+        )
+        return pubsub_v1.PublisherClient(
+            batch_settings=batch_settings,
+            publisher_options=pubsub_v1.types.PublisherOptions(flow_control=flow_control),
+        )
+
+    def is_available(self) -> bool:
+        return bool(getattr(settings, 'GCP_PROJECT_ID', ''))
+
+    def publish(self, topic_path: str, data: bytes, attributes: Dict[str, str]) -> Future:
+        return self.client.publish(topic_path, data, **attributes)
+
+
+class InMemoryPublisherBackend(PublisherBackend):
+    """
+    Records messages instead of sending them.
+
+    Futures complete immediately (or fail with ``fail_with``) so tests see
+    the same callback flow as production.
+    """
+
+    def __init__(self, fail_with: Optional[BaseException] = None):
+        self.fail_with = fail_with
+        self.messages: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic_path: str, data: bytes, attributes: Dict[str, str]) -> Future:
+        future = Future()
+        if self.fail_with is not None:
+            future.set_exception(self.fail_with)
+            return future
+        message_id = uuid.uuid4().hex
+        with self._lock:
+            self.messages.append({
+                'message_id': message_id,
+                'topic': topic_path,
+                'data': json.loads(data.decode('utf-8')),
+                'attributes': attributes,
+            })
+        future.set_result(message_id)
+        return future
+
+
+class Publisher:
+    """
+    Bounded, callback-driven publisher shared by the Pub/Sub clients.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[PublisherBackend] = None,
+        max_pending: Optional[int] = None,
+        spool_path: Optional[str] = None,
+        replay_interval: Optional[float] = None,
+    ):
+        """
+        Initialize publisher.
+
+        Args:
+            backend: Transport (default: per ``PUBSUB_PUBLISHER_BACKEND``)
+            max_pending: Maximum unacknowledged messages in this process
+            spool_path: JSONL file receiving overflow and failed messages
+            replay_interval: Minimum seconds between spool replays
+        """
+        self.backend = backend or _default_backend()
+        self.max_pending = max_pending or getattr(settings, 'PUBSUB_MAX_PENDING_MESSAGES', 1000)
+        self.spool_path = Path(
+            spool_path or getattr(settings, 'PUBSUB_SPOOL_PATH', settings.BASE_DIR / 'logs' / 'pubsub_spool.jsonl')
+        )
+        self.replay_interval = replay_interval if replay_interval is not None else getattr(
+            settings, 'PUBSUB_SPOOL_REPLAY_INTERVAL_SECONDS', 30
+        )
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        """(Re)create per-process state; called again after a fork"""
+        self._pid = os.getpid()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._last_replay = 0.0
+
+    def is_available(self) -> bool:
+        return self.backend.is_available()
+
+    def pending(self) -> int:
+        """Number of messages waiting for acknowledgement"""
+        return self._pending
+
+    def publish(
+        self,
+        topic_path: str,
+        message: Dict[str, Any],
+        callback: Optional[PublishCallback] = None,
+        block: bool = False,
+        **attributes
+    ) -> bool:
+        """
+        Start publishing ``message`` (JSON encoded) without waiting for it.
+
+        Without a callback the message is fire-and-forget: if the pending
+        limit is reached or the publish fails it is spooled and retried
+        later. With a callback, the caller owns failures and the callback
+        receives them instead.
+
+        Args:
+            topic_path: Full topic path (projects/<project>/topics/<topic>)
+            message: JSON serializable payload
+            callback: Called with (message_id, exception) on completion
+            block: Wait for capacity instead of spooling when at the limit
+            **attributes: Message attributes
+
+        Returns:
+            True if handed to the client, False if spooled or rejected
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+        record = {'topic': topic_path, 'message': message, 'attributes': {k: str(v) for k, v in attributes.items()}}
+        if not self._reserve(block):
+            if callback is not None:
+                callback(None, OverflowError('Pub/Sub publisher queue is full'))
+            else:
+                self._spool([record])
+            return False
+
+        self._start(record, callback)
+        self._maybe_replay()
+        return True
+
+    def _reserve(self, block: bool) -> bool:
+        with self._idle:
+            while self._pending >= self.max_pending:
+                if not block:
+                    return False
+                self._idle.wait()
+            self._pending += 1
+            return True
+
+    def _release(self):
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+    def _start(self, record: Dict[str, Any], callback: Optional[PublishCallback]):
+        def done(future: Future):
+            self._release()
+            try:
+                message_id, error = future.result(), None
+            except Exception as e:
+                message_id, error = None, e
+            if error is not None:
+                logger.error(f"Failed to publish to {record['topic']}: {str(error)}")
+                if callback is None:
+                    self._spool([record])
+            if callback is not None:
+                try:
+                    callback(message_id, error)
+                except Exception as e:
+                    logger.error(f"Pub/Sub publish callback failed: {str(e)}")
+
+        try:
+            future = self.backend.publish(
+                record['topic'], json.dumps(record['message']).encode('utf-8'), record['attributes']
+            )
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(done)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every pending message is acknowledged.
+
+        Returns:
+            True if nothing is pending anymore
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Wait (bounded) for pending messages and stop tracking this publisher.
+
+        Registered with ``atexit``; messages still unacknowledged after
+        ``timeout`` are reported and left to the client.
+        """
+        atexit.unregister(self.close)
+        timeout = timeout if timeout is not None else getattr(settings, 'PUBSUB_PUBLISH_TIMEOUT_SECONDS', 30)
+        if not self.flush(timeout):
+            logger.warning(f"Closing Pub/Sub publisher with {self._pending} unacknowledged messages")
+
+    # ========================================================================
+    # SPOOL FILE
+    # ========================================================================
+
+    def _spool(self, records: List[Dict[str, Any]]):
+        """Append messages to the local spool file (one JSON document per line)"""
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._spool_lock, open(self.spool_path, 'a', encoding='utf-8') as spool:
+                for record in records:
+                    spool.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.error(f"Pub/Sub spool write failed, {len(records)} messages lost: {str(e)}")
+
+    def _maybe_replay(self):
+        now = time.monotonic()
+        if now - self._last_replay < self.replay_interval:
+            return
+        self._last_replay = now
+        if self.spool_path.exists():
+            self.replay_spool()
+
+    def replay_spool(self) -> int:
+        """
+        Publish messages spooled by earlier overflows or failures.
+
+        The spool is renamed to a per-process file first so concurrent
+        processes never replay the same messages; whatever cannot be handed
+        to the client again goes back to the spool.
+
+        Returns:
+            Number of messages handed to the client
+        """
+        replay_path = self.spool_path.with_name(f"{self.spool_path.name}.{os.getpid()}.replay")
+        try:
+            with self._spool_lock:
+                os.replace(self.spool_path, replay_path)
+        except FileNotFoundError:
+            return 0
+
+        records = []
+        with open(replay_path, encoding='utf-8') as replay:
+            for line in replay:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+
+        replayed = 0
+        for index, record in enumerate(records):
+            if not self._reserve(block=False):
+                self._spool(records[index:])
+                break
+            self._start(record, None)
+            replayed += 1
+
+        replay_path.unlink(missing_ok=True)
+        if replayed:
+            logger.info(f"Replayed {replayed} spooled Pub/Sub messages")
+        return replayed
+
+
+def _default_backend() -> PublisherBackend:
+    if getattr(settings, 'PUBSUB_PUBLISHER_BACKEND', 'google') == 'memory':
+        return InMemoryPublisherBackend()
+    return GooglePublisherBackend()
+
+
+def topic_path(project_id: str, topic_name: str) -> str:
+    """Full path of a topic"""
+    return f"projects/{project_id}/topics/{topic_name}"
+
+
+# Process-wide publisher
+_publisher = None
+
+def get_publisher() -> Publisher:
+    """Get or create the process-wide Publisher"""
+    global _publisher
+    if _publisher is None:
+        _publisher = Publisher()
+    return _publisher
@@ -0,0 +1,137 @@
+"""
+SQL profiling helpers shared by QueryProfilingMiddleware, the Prometheus
+metrics middleware and the query budget test helpers in apps.core.testing.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from django.db import connections
+
+# Literals and parameter placeholders are replaced so queries that only
+# differ by their values share one fingerprint (the N+1 signature).
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    Normalize a SQL statement so repeated queries with different values
+    produce the same fingerprint.
+
+    Args:
+        sql: SQL as sent to the driver (with placeholders)
+
+    Returns:
+        Normalized statement
+    """
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryProfiler:
+    """
+    ``connection.execute_wrapper`` that counts statements and SQL time and,
+    when ``record_statements`` is on, keeps every statement for fingerprinting.
+
+    One profiler is installed per request (see ``request_profiler``) and read
+    by both the metrics and the profiling middleware, so each query goes
+    through a single wrapper.
+    """
+
+    def __init__(self, record_statements: bool = True):
+        self.record_statements = record_statements
+        self.queries: List[Tuple[str, float]] = []
+        self.total_time = 0.0
+        self._count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.total_time += duration
+            self._count += 1
+            if self.record_statements:
+                self.queries.append((sql, duration))
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000
+
+    def fingerprints(self) -> Dict[str, int]:
+        """Execution count per fingerprint"""
+        return dict(Counter(fingerprint_sql(sql) for sql, _ in self.queries))
+
+    def duplicates(self) -> Dict[str, int]:
+        """Fingerprints executed more than once, most repeated first"""
+        repeated = {fp: n for fp, n in self.fingerprints().items() if n > 1}
+        return dict(sorted(repeated.items(), key=lambda item: -item[1]))
+
+    def duplicate_count(self) -> int:
+        """Queries that repeat an earlier fingerprint"""
+        return sum(n - 1 for n in self.duplicates().values())
+
+    def summary(self, limit: int = 5) -> str:
+        """Human readable report used in assertion and log messages"""
+        lines = [f"{self.count} queries in {self.total_time_ms:.1f}ms"]
+        for fingerprint, times in list(self.duplicates().items())[:limit]:
+            lines.append(f"  x{times}: {fingerprint[:200]}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def request_profiler(request, record_statements: bool = False, using: str = 'default'):
+    """
+    Profile the queries of a request with one shared wrapper.
+
+    The outermost caller installs a ``QueryProfiler`` on the connection and
+    stores it on ``request._query_profiler``; nested callers reuse it (turning
+    on statement recording if they need it) instead of stacking another
+    wrapper.
+
+    Args:
+        request: Current HTTP request
+        record_statements: Whether the caller needs the SQL of each query
+        using: Database alias
+
+    Yields:
+        The request's QueryProfiler
+    """
+    profiler = getattr(request, '_query_profiler', None)
+    if profiler is not None:
+        profiler.record_statements = profiler.record_statements or record_statements
+        yield profiler
+        return
+
+    profiler = request._query_profiler = QueryProfiler(record_statements=record_statements)
+    with connections[using].execute_wrapper(profiler):
+        yield profiler
+
+
+@contextmanager
+def profile_queries(using: str = 'default'):
+    """
+    Profile every query run on a connection inside the block.
+
+    Usage:
+        with profile_queries() as profile:
+            ...
+        profile.count, profile.duplicates()
+    """
+    profiler = QueryProfiler()
+    with connections[using].execute_wrapper(profiler):
+        yield profiler
@@ -0,0 +1,88 @@
+"""
+In-process rate limiting primitives.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``;
+    ``acquire`` blocks until enough tokens are available. Limits apply per
+    process, so quotas shared by several workers should be divided by the
+    worker count in settings.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize token bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst (defaults to one second worth of tokens)
+            clock: Monotonic time source (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take ``tokens`` if available.
+
+        Returns:
+            0 when the tokens were taken, otherwise seconds until they will be
+        """
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Block until ``tokens`` are available.
+
+        Requests larger than the capacity wait for a full bucket.
+
+        Args:
+            tokens: Tokens to take
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the tokens were taken, False on timeout
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self._sleep(wait)
@@ -0,0 +1,88 @@
+"""
+Celery tasks for core maintenance jobs.
+"""
+import logging
+from typing import Any, Dict
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    name='apps.core.tasks.maintain_partitions',
+    queue='batch'
+)
+def maintain_partitions() -> Dict[str, Any]:
+    """
+    Create upcoming monthly partitions, archive old rows and drop expired
+    partitions for the time-partitioned history tables.
+    Scheduled to run daily at 1:30 AM.
+    
+    Returns:
+        Dict with maintenance results per table; status is 'warning' when a
+        table is partitioned less than a month ahead
+    """
+    from apps.core.partitioning import maintain_partitions as run_maintenance
+    
+    logger.info("Starting partition maintenance")
+    
+    try:
+        summary = run_maintenance()
+        logger.info(f"Partition maintenance completed: {summary}")
+        status = 'warning' if any('warning' in result for result in summary.values()) else 'success'
+        return {'status': status, 'tables': summary}
+        
+    except Exception as exc:
+        logger.error(f"Error maintaining partitions: {str(exc)}")
+        return {'status': 'error', 'error': str(exc)}
+
+
+@shared_task(
+    name='apps.core.tasks.dispatch_webhook_event',
+    queue='normal'
+)
+def dispatch_webhook_event(event_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deliver an event to every subscribed webhook concurrently.
+    Enqueued by WebhookService.trigger_event.
+    
+    Args:
+        event_type: Type of event (e.g., 'work_order.created')
+        payload: Event data
+        
+    Returns:
+        Dict with the number of deliveries per resulting status
+    """
+    from apps.core.webhook_service import WebhookService
+    
+    try:
+        report = WebhookService.dispatch_event(event_type, payload)
+        return {'status': 'success', **report}
+        
+    except Exception as exc:
+        logger.error(f"Error dispatching webhooks for {event_type}: {str(exc)}")
+        return {'status': 'error', 'error': str(exc)}
+
+
+@shared_task(
+    name='apps.core.tasks.retry_webhook_deliveries',
+    queue='normal'
+)
+def retry_webhook_deliveries() -> Dict[str, Any]:
+    """
+    Retry webhook deliveries whose next_retry_at is due.
+    Scheduled to run every minute.
+    
+    Returns:
+        Dict with the number of deliveries per resulting status
+    """
+    from apps.core.webhook_service import WebhookService
+    
+    try:
+        report = WebhookService.retry_failed_deliveries()
+        return {'status': 'success', **report}
+        
+    except Exception as exc:
+        logger.error(f"Error retrying webhook deliveries: {str(exc)}")
+        return {'status': 'error', 'error': str(exc)}
@@ -0,0 +1,74 @@
+"""
+Test helpers for SQL query budgets.
+
+Declare a budget per endpoint and fail the test when a change makes the
+endpoint run more queries than agreed:
+
+    class AssetQueryBudgetTest(QueryBudgetMixin, TestCase):
+        query_budgets = {'assets-list': 5}
+
+        def test_list(self):
+            with self.assertQueryBudget('assets-list'):
+                view(request)
+"""
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from apps.core.query_profiling import profile_queries
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when an endpoint runs more queries than its budget"""
+
+
+@contextmanager
+def query_budget(name: str, max_queries: int, max_duplicates: Optional[int] = None,
+                 using: str = 'default'):
+    """
+    Fail if the block runs more than ``max_queries`` queries, or more than
+    ``max_duplicates`` queries repeating an earlier fingerprint.
+
+    Args:
+        name: Endpoint name used in the failure message (e.g. 'assets-list')
+        max_queries: Maximum number of SQL statements
+        max_duplicates: Maximum repeated statements (None = not checked)
+        using: Database alias to profile
+
+    Raises:
+        QueryBudgetExceeded: With the duplicated query fingerprints
+    """
+    with profile_queries(using) as profile:
+        yield profile
+
+    if profile.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"Query budget exceeded for {name}: {profile.count} > {max_queries}\n{profile.summary()}"
+        )
+    if max_duplicates is not None and profile.duplicate_count() > max_duplicates:
+        raise QueryBudgetExceeded(
+            f"Duplicate query budget exceeded for {name}: "
+            f"{profile.duplicate_count()} > {max_duplicates}\n{profile.summary()}"
+        )
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin: declare ``query_budgets`` as {endpoint name: max queries}
+    and wrap each request with ``assertQueryBudget(name)``.
+    """
+    
+    query_budgets: Dict[str, int] = {}
+    max_duplicate_queries: Optional[int] = None
+    
+    @contextmanager
+    def assertQueryBudget(self, name: str, max_queries: Optional[int] = None,
+                          max_duplicates: Optional[int] = None):
+        if max_queries is None:
+            if name not in self.query_budgets:
+                self.fail(f"No query budget declared for {name}")
+            max_queries = self.query_budgets[name]
+        if max_duplicates is None:
+            max_duplicates = self.max_duplicate_queries
+        
+        with query_budget(name, max_queries, max_duplicates) as profile:
+            yield profile
@@ -0,0 +1,284 @@
+"""
+Concurrent webhook delivery.
+
+``WebhookDispatcher.send_all`` posts a batch of webhook requests from a
+bounded thread pool so that one slow subscriber does not hold up the
+others:
+
+- one ``requests.Session`` per host keeps keep-alive connections pooled
+- at most ``WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT`` requests are in flight
+  per endpoint (URL), across every batch of the process
+- a circuit breaker stops calling an endpoint after
+  ``WEBHOOK_CIRCUIT_FAILURE_THRESHOLD`` consecutive failures (network
+  errors or 5xx) for ``WEBHOOK_CIRCUIT_RESET_SECONDS``; then one probe
+  request decides whether it closes again
+
+Worker threads only do HTTP: results are returned to the caller, which
+records them in the database. Breakers, sessions and limits are per
+process.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WebhookRequest:
+    """One signed POST to a webhook endpoint"""
+    url: str
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class DeliveryAttempt:
+    """Outcome of a WebhookRequest"""
+    status_code: Optional[int] = None
+    response_body: str = ''
+    error: str = ''
+    duration_ms: int = 0
+    # Seconds the endpoint's circuit stays open when the request was not sent
+    circuit_open_for: float = 0.0
+
+    @property
+    def sent(self) -> bool:
+        return not self.circuit_open_for
+
+    @property
+    def endpoint_failed(self) -> bool:
+        """Network error or server error: counts towards the circuit breaker"""
+        return self.status_code is None or self.status_code >= 500
+
+
+@dataclass
+class _Circuit:
+    failures: int = 0
+    opened_at: Optional[float] = None
+    probing: bool = False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker per endpoint.
+
+    Closed while failures stay under the threshold; open (requests are not
+    sent) for ``reset_seconds`` after that; then half-open, letting a single
+    probe through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        reset_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: Seconds the circuit stays open before a probe
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.failure_threshold = failure_threshold or getattr(settings, 'WEBHOOK_CIRCUIT_FAILURE_THRESHOLD', 5)
+        self.reset_seconds = reset_seconds or getattr(settings, 'WEBHOOK_CIRCUIT_RESET_SECONDS', 300)
+        self.clock = clock
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, endpoint: str) -> Optional[float]:
+        """
+        Check whether a request to ``endpoint`` may be sent now.
+
+        Returns:
+            0 when it may (a half-open circuit is then probing), seconds the
+            circuit stays open otherwise, or None while a probe is in flight
+        """
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.opened_at is None:
+                return 0.0
+            remaining = circuit.opened_at + self.reset_seconds - self.clock()
+            if remaining > 0:
+                return remaining
+            if circuit.probing:
+                return None
+            circuit.probing = True
+            return 0.0
+
+    def record(self, endpoint: str, success: bool):
+        """Record the outcome of a request that was sent"""
+        with self._lock:
+            if success:
+                self._circuits.pop(endpoint, None)
+                return
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            circuit.failures += 1
+            circuit.probing = False
+            if circuit.opened_at is not None or circuit.failures >= self.failure_threshold:
+                if circuit.opened_at is None:
+                    logger.warning(f"Webhook circuit opened for {endpoint} after {circuit.failures} failures")
+                circuit.opened_at = self.clock()
+
+    def is_open(self, endpoint: str) -> bool:
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            return circuit is not None and circuit.opened_at is not None
+
+
+class WebhookDispatcher:
+    """
+    Send webhook requests concurrently with per-endpoint limits.
+    """
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: Optional[int] = None,
+        max_per_endpoint: Optional[int] = None,
+        timeout: Optional[tuple] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize dispatcher.
+
+        Args:
+            breaker: Circuit breaker (default: a new one from settings)
+            max_workers: Concurrent requests per batch
+            max_per_endpoint: Concurrent requests per endpoint (process-wide)
+            timeout: (connect, read) timeout in seconds
+            sleep: Sleep function (injectable for tests)
+        """
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers or getattr(settings, 'WEBHOOK_MAX_WORKERS', 8)
+        self.max_per_endpoint = max_per_endpoint or getattr(settings, 'WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT', 2)
+        self.timeout = timeout or (
+            getattr(settings, 'WEBHOOK_CONNECT_TIMEOUT_SECONDS', 3),
+            getattr(settings, 'WEBHOOK_READ_TIMEOUT_SECONDS', 10),
+        )
+        self.sleep = sleep
+        self._sessions: Dict[str, requests.Session] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        """HTTP session with a keep-alive connection pool for the URL's host"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            # Connection pools do not survive a fork: one set per process
+            if self._pid != os.getpid():
+                self._sessions = {}
+                self._pid = os.getpid()
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_per_endpoint, max_retries=0)
+                session.mount(f"{parts.scheme}://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def _slot(self, endpoint: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(endpoint)
+            if slot is None:
+                slot = self._slots[endpoint] = threading.BoundedSemaphore(self.max_per_endpoint)
+            return slot
+
+    def _post(self, request: WebhookRequest) -> DeliveryAttempt:
+        start = time.monotonic()
+        try:
+            response = self.session_for(request.url).post(
+                request.url, data=request.body, headers=request.headers, timeout=self.timeout
+            )
+            return DeliveryAttempt(
+                status_code=response.status_code,
+                response_body=response.text[:1000],  # Limit response size
+                duration_ms=int((time.monotonic() - start) * 1000),
+            )
+        except Exception as e:
+            return DeliveryAttempt(error=str(e), duration_ms=int((time.monotonic() - start) * 1000))
+
+    def send_all(self, batch: List[WebhookRequest]) -> List[DeliveryAttempt]:
+        """
+        Send every request, honoring endpoint limits and open circuits.
+
+        Requests to an endpoint whose circuit is open are not sent; their
+        attempt has ``circuit_open_for`` set.
+
+        Returns:
+            One DeliveryAttempt per request, in order
+        """
+        results: List[Optional[DeliveryAttempt]] = [None] * len(batch)
+        queues: 'OrderedDict[str, Deque[int]]' = OrderedDict()
+        for index, request in enumerate(batch):
+            queues.setdefault(request.url, deque()).append(index)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(batch))), thread_name_prefix='webhook') as executor:
+            while queues or in_flight:
+                submitted = True
+                while submitted and len(in_flight) < self.max_workers:
+                    submitted = False
+                    for endpoint in list(queues):
+                        if len(in_flight) >= self.max_workers:
+                            break
+                        slot = self._slot(endpoint)
+                        if not slot.acquire(blocking=False):
+                            continue
+                        open_for = self.breaker.allow(endpoint)
+                        if open_for is None or open_for > 0:
+                            slot.release()
+                            if open_for:
+                                for index in queues.pop(endpoint):
+                                    results[index] = DeliveryAttempt(
+                                        error='Circuit open: endpoint is failing', circuit_open_for=open_for
+                                    )
+                            continue
+                        index = queues[endpoint].popleft()
+                        if not queues[endpoint]:
+                            del queues[endpoint]
+                        in_flight[executor.submit(self._post, batch[index])] = (index, endpoint)
+                        submitted = True
+
+                if in_flight:
+                    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, endpoint = in_flight.pop(future)
+                        self._slot(endpoint).release()
+                        attempt = future.result()
+                        self.breaker.record(endpoint, success=not attempt.endpoint_failed)
+                        results[index] = attempt
+                elif queues:
+                    # Other batches of this process hold the endpoints' slots
+                    self.sleep(0.05)
+
+        return results
+
+
+# Process-wide dispatcher: batches share sessions, endpoint limits and circuits
+_webhook_dispatcher = None
+_webhook_dispatcher_lock = threading.Lock()
+
+
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    """Get or create the process-wide WebhookDispatcher"""
+    global _webhook_dispatcher
+    if _webhook_dispatcher is None:
+        with _webhook_dispatcher_lock:
+            if _webhook_dispatcher is None:
+                _webhook_dispatcher = WebhookDispatcher()
+    return _webhook_dispatcher
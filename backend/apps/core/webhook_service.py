@@ -1,17 +1,37 @@
 """
 Webhook delivery service
+
+``trigger_event`` only enqueues a Celery task, so emitting an event costs
+the caller the same whatever the number of subscribers. The task sends
+one delivery per subscribed webhook concurrently through
+``WebhookDispatcher`` (webhook_dispatcher.py), then writes the delivery
+log and the webhook statistics in batches (``save_results``).
 """
-import requests
 import hmac
 import hashlib
 import json
 import logging
-from datetime import datetime, timedelta
+import random
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
+
 from .models import Webhook, WebhookDelivery
+from .webhook_dispatcher import DeliveryAttempt, WebhookRequest, get_webhook_dispatcher
 
 logger = logging.getLogger(__name__)
 
+# Fields written back when a delivery is attempted again
+WEBHOOK_DELIVERY_RESULT_FIELDS = [
+    'status', 'http_status_code', 'response_body', 'error_message',
+    'attempt_count', 'next_retry_at', 'delivered_at', 'duration_ms',
+]
+
 
 class WebhookService:
     """Service for delivering webhooks"""
@@ -28,157 +48,278 @@ class WebhookService:
         return signature
     
     @staticmethod
-    def deliver_webhook(webhook: Webhook, event_type: str, payload: dict) -> WebhookDelivery:
+    def build_request(webhook: Webhook, delivery: WebhookDelivery) -> WebhookRequest:
         """
-        Deliver a webhook to the specified URL
+        Build the signed request for a delivery
         
-        Args:
-            webhook: Webhook instance
-            event_type: Type of event (e.g., 'work_order.created')
-            payload: Event data to send
-        
-        Returns:
-            WebhookDelivery instance
+        The body is sent exactly as signed, so receivers can verify
+        ``X-Webhook-Signature`` against the raw body.
         """
-        # Create delivery record
-        delivery = WebhookDelivery.objects.create(
-            webhook=webhook,
-            event_type=event_type,
-            payload=payload,
-            status='pending'
-        )
-        
         # Prepare payload with metadata
         full_payload = {
-            'event': event_type,
+            'event': delivery.event_type,
             'timestamp': timezone.now().isoformat(),
-            'data': payload
+            'data': delivery.payload
         }
         
-        # Generate signature
-        signature = WebhookService.generate_signature(full_payload, webhook.secret)
-        
         # Prepare headers
         headers = {
             'Content-Type': 'application/json',
-            'X-Webhook-Signature': signature,
-            'X-Webhook-Event': event_type,
+            'X-Webhook-Signature': WebhookService.generate_signature(full_payload, webhook.secret),
+            'X-Webhook-Event': delivery.event_type,
             'X-Webhook-Delivery': str(delivery.id),
             'User-Agent': 'CMMS-Webhook/1.0'
         }
         
-        # Attempt delivery
-        start_time = datetime.now()
-        try:
-            response = requests.post(
-                webhook.url,
-                json=full_payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            duration_ms = int((datetime.now() - start_time).total_seconds() * 1000)
-            
-            # Update delivery record
-            delivery.status = 'success' if response.status_code < 400 else 'failed'
-            delivery.http_status_code = response.status_code
-            delivery.response_body = response.text[:1000]  # Limit response size
-            delivery.delivered_at = timezone.now()
-            delivery.duration_ms = duration_ms
-            delivery.attempt_count += 1
-            delivery.save()
-            
-            # Update webhook statistics
-            webhook.total_deliveries += 1
-            if delivery.status == 'success':
-                webhook.successful_deliveries += 1
-            else:
-                webhook.failed_deliveries += 1
-            webhook.last_delivery_at = timezone.now()
-            webhook.last_delivery_status = delivery.status
-            webhook.save()
+        return WebhookRequest(
+            url=webhook.url,
+            body=json.dumps(full_payload, sort_keys=True).encode('utf-8'),
+            headers=headers
+        )
+    
+    @staticmethod
+    def retry_delay(webhook: Webhook, attempt_count: int) -> float:
+        """
+        Exponential backoff with jitter before the next attempt
+        
+        The base delay doubles per attempt (capped at
+        ``WEBHOOK_RETRY_MAX_DELAY_SECONDS``); a random half of it is added so
+        deliveries that failed together do not all retry at the same moment.
+        """
+        base = min(
+            webhook.retry_delay_seconds * 2 ** max(attempt_count - 1, 0),
+            getattr(settings, 'WEBHOOK_RETRY_MAX_DELAY_SECONDS', 3600)
+        )
+        return base / 2 + random.uniform(0, base / 2)
+    
+    @staticmethod
+    def apply_attempt(webhook: Webhook, delivery: WebhookDelivery, attempt: DeliveryAttempt, now=None) -> bool:
+        """
+        Update a delivery (in memory) with the outcome of an attempt
+        
+        Args:
+            webhook: Webhook instance
+            delivery: WebhookDelivery that was attempted
+            attempt: Result returned by the dispatcher
+            now: Current time (default: now)
+        
+        Returns:
+            True if the attempt counts in the webhook statistics
+        """
+        now = now or timezone.now()
+        if not attempt.sent:
+            # Circuit open: not an attempt, try again once it may close
+            delivery.status = 'retrying'
+            delivery.error_message = attempt.error
+            delivery.next_retry_at = now + timedelta(seconds=attempt.circuit_open_for)
+            return False
+        
+        delivery.duration_ms = attempt.duration_ms
+        delivery.attempt_count += 1
+        delivery.http_status_code = attempt.status_code
+        delivery.error_message = attempt.error
+        delivery.next_retry_at = None
+        
+        if attempt.status_code is not None:
+            delivery.status = 'success' if attempt.status_code < 400 else 'failed'
+            delivery.response_body = attempt.response_body
+            delivery.delivered_at = now
             
             logger.info(
-                f"Webhook delivered: {webhook.name} - {event_type} - "
-                f"Status: {response.status_code} - Duration: {duration_ms}ms"
+                f"Webhook delivered: {webhook.name} - {delivery.event_type} - "
+                f"Status: {attempt.status_code} - Duration: {attempt.duration_ms}ms"
             )
-            
-        except requests.exceptions.RequestException as e:
-            duration_ms = int((datetime.now() - start_time).total_seconds() * 1000)
-            
-            # Update delivery record with error
+        else:
             delivery.status = 'failed'
-            delivery.error_message = str(e)
-            delivery.duration_ms = duration_ms
-            delivery.attempt_count += 1
-            
-            # Schedule retry if within max retries
-            if delivery.attempt_count < webhook.max_retries:
-                delivery.status = 'retrying'
-                delivery.next_retry_at = timezone.now() + timedelta(
-                    seconds=webhook.retry_delay_seconds * delivery.attempt_count
-                )
-            
-            delivery.save()
-            
-            # Update webhook statistics
-            webhook.total_deliveries += 1
-            webhook.failed_deliveries += 1
-            webhook.last_delivery_at = timezone.now()
-            webhook.last_delivery_status = delivery.status
-            webhook.save()
-            
             logger.error(
-                f"Webhook delivery failed: {webhook.name} - {event_type} - "
-                f"Error: {str(e)} - Attempt: {delivery.attempt_count}/{webhook.max_retries}"
+                f"Webhook delivery failed: {webhook.name} - {delivery.event_type} - "
+                f"Error: {attempt.error} - Attempt: {delivery.attempt_count}/{webhook.max_retries}"
             )
         
-        return delivery
+        # Network errors, rate limiting and server errors are retried
+        retryable = attempt.status_code is None or attempt.status_code == 429 or attempt.status_code >= 500
+        if delivery.status == 'failed' and retryable and delivery.attempt_count < webhook.max_retries:
+            delivery.status = 'retrying'
+            delivery.next_retry_at = now + timedelta(
+                seconds=WebhookService.retry_delay(webhook, delivery.attempt_count)
+            )
+        return True
     
     @staticmethod
-    def trigger_event(event_type: str, payload: dict):
+    def save_results(jobs: List[Tuple[Webhook, WebhookDelivery]], counted: List[bool], now=None):
         """
-        Trigger webhooks for a specific event type
+        Write delivery records and webhook statistics in batches
+        
+        New deliveries are inserted and retried ones updated with one query
+        per batch. Webhook counters are incremented with F() expressions,
+        one UPDATE per group of webhooks with the same increments, so
+        concurrent workers never overwrite each other's counts.
         
         Args:
+            jobs: (webhook, delivery) pairs updated by apply_attempt
+            counted: Whether each attempt counts in the statistics
+            now: Current time (default: now)
+        """
+        now = now or timezone.now()
+        batch_size = getattr(settings, 'WEBHOOK_DELIVERY_BATCH_SIZE', 500)
+        new = [delivery for _, delivery in jobs if delivery._state.adding]
+        existing = [delivery for _, delivery in jobs if not delivery._state.adding]
+        
+        stats = defaultdict(lambda: [0, 0, ''])
+        for (webhook, delivery), counts in zip(jobs, counted):
+            if counts:
+                entry = stats[webhook.pk]
+                entry[0 if delivery.status == 'success' else 1] += 1
+                entry[2] = delivery.status
+        groups = defaultdict(list)
+        for webhook_id, (successful, failed, last_status) in stats.items():
+            groups[(successful, failed, last_status)].append(webhook_id)
+        
+        with transaction.atomic():
+            WebhookDelivery.objects.bulk_create(new, batch_size=batch_size)
+            WebhookDelivery.objects.bulk_update(existing, WEBHOOK_DELIVERY_RESULT_FIELDS, batch_size=batch_size)
+            for (successful, failed, last_status), webhook_ids in groups.items():
+                Webhook.objects.filter(pk__in=webhook_ids).update(
+                    total_deliveries=F('total_deliveries') + successful + failed,
+                    successful_deliveries=F('successful_deliveries') + successful,
+                    failed_deliveries=F('failed_deliveries') + failed,
+                    last_delivery_at=now,
+                    last_delivery_status=last_status
+                )
+    
+    @staticmethod
+    def deliver(jobs: Iterable[Tuple[Webhook, WebhookDelivery]]) -> Dict[str, int]:
+        """
+        Send deliveries concurrently and record their outcome
+        
+        Deliveries may be unsaved (they are inserted with their result) or
+        existing rows being retried.
+        
+        Args:
+            jobs: (webhook, delivery) pairs
+        
+        Returns:
+            Dict with the number of deliveries per resulting status
+        """
+        jobs = list(jobs)
+        report = {'success': 0, 'failed': 0, 'retrying': 0}
+        if not jobs:
+            return report
+        
+        attempts = get_webhook_dispatcher().send_all([
+            WebhookService.build_request(webhook, delivery) for webhook, delivery in jobs
+        ])
+        now = timezone.now()
+        counted = [
+            WebhookService.apply_attempt(webhook, delivery, attempt, now)
+            for (webhook, delivery), attempt in zip(jobs, attempts)
+        ]
+        WebhookService.save_results(jobs, counted, now)
+        for _, delivery in jobs:
+            report[delivery.status] += 1
+        return report
+    
+    @staticmethod
+    def deliver_webhook(webhook: Webhook, event_type: str, payload: dict) -> WebhookDelivery:
+        """
+        Deliver a webhook to the specified URL and wait for the result
+        
+        Args:
+            webhook: Webhook instance
             event_type: Type of event (e.g., 'work_order.created')
             payload: Event data to send
+        
+        Returns:
+            WebhookDelivery instance
         """
-        # Find all active webhooks subscribed to this event
-        webhooks = Webhook.objects.filter(
-            is_active=True,
-            events__contains=[event_type]
+        delivery = WebhookDelivery(
+            webhook=webhook,
+            event_type=event_type,
+            payload=payload,
+            status='pending'
         )
+        WebhookService.deliver([(webhook, delivery)])
+        return delivery
+    
+    @staticmethod
+    def subscribed_webhooks(event_type: str) -> List[Webhook]:
+        """Active webhooks subscribed to an event type"""
+        # events is a JSON list: filtered here, as JSON containment lookups
+        # are not available on every database backend
+        return [
+            webhook for webhook in Webhook.objects.filter(is_active=True)
+            if event_type in (webhook.events or [])
+        ]
+    
+    @staticmethod
+    def trigger_event(event_type: str, payload: dict):
+        """
+        Trigger webhooks for a specific event type
+        
+        Only enqueues the delivery task (once the current transaction
+        commits); subscribers are looked up and called by the worker.
         
-        logger.info(f"Triggering {webhooks.count()} webhooks for event: {event_type}")
+        Args:
+            event_type: Type of event (e.g., 'work_order.created')
+            payload: Event data to send (JSON serializable)
+        """
+        from .tasks import dispatch_webhook_event
         
-        # Deliver to each webhook
-        for webhook in webhooks:
+        def enqueue():
             try:
-                WebhookService.deliver_webhook(webhook, event_type, payload)
+                dispatch_webhook_event.delay(event_type, payload)
             except Exception as e:
-                logger.error(f"Error delivering webhook {webhook.id}: {str(e)}")
+                logger.error(f"Failed to enqueue webhooks for event {event_type}: {str(e)}")
+        
+        transaction.on_commit(enqueue)
+    
+    @staticmethod
+    def dispatch_event(event_type: str, payload: dict) -> Dict[str, int]:
+        """
+        Send and record one delivery per webhook subscribed to an event
+        
+        Args:
+            event_type: Type of event (e.g., 'work_order.created')
+            payload: Event data to send
+        
+        Returns:
+            Dict with the number of deliveries per resulting status
+        """
+        webhooks = WebhookService.subscribed_webhooks(event_type)
+        logger.info(f"Triggering {len(webhooks)} webhooks for event: {event_type}")
+        
+        # UUID primary keys are assigned client side: the delivery id is
+        # sent in the headers before the row is inserted with its result
+        return WebhookService.deliver(
+            (webhook, WebhookDelivery(webhook=webhook, event_type=event_type, payload=payload, status='pending'))
+            for webhook in webhooks
+        )
     
     @staticmethod
-    def retry_failed_deliveries():
+    def retry_failed_deliveries() -> Dict[str, int]:
         """
         Retry failed webhook deliveries that are due for retry
         This should be called periodically (e.g., via Celery task or cron)
+        
+        Due deliveries are read in ``next_retry_at`` order, at most
+        ``WEBHOOK_RETRY_BATCH_SIZE`` per run, which the (status,
+        next_retry_at) index serves without scanning other deliveries.
+        
+        Returns:
+            Dict with the number of deliveries per resulting status
         """
         now = timezone.now()
-        pending_retries = WebhookDelivery.objects.filter(
-            status='retrying',
-            next_retry_at__lte=now
+        pending_retries = list(
+            WebhookDelivery.objects.filter(
+                status='retrying',
+                next_retry_at__lte=now,
+                webhook__is_active=True
+            ).select_related('webhook').order_by('next_retry_at')[
+                :getattr(settings, 'WEBHOOK_RETRY_BATCH_SIZE', 500)
+            ]
         )
         
-        logger.info(f"Retrying {pending_retries.count()} failed webhook deliveries")
+        logger.info(f"Retrying {len(pending_retries)} failed webhook deliveries")
         
-        for delivery in pending_retries:
-            try:
-                WebhookService.deliver_webhook(
-                    delivery.webhook,
-                    delivery.event_type,
-                    delivery.payload
-                )
-            except Exception as e:
-                logger.error(f"Error retrying delivery {delivery.id}: {str(e)}")
+        # The same delivery record is attempted again
+        return WebhookService.deliver((delivery.webhook, delivery) for delivery in pending_retries)
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='staged_upload_path',
+            field=models.CharField(blank=True, max_length=500, verbose_name='Archivo en Staging'),
+        ),
+        migrations.AlterField(
+            model_name='inspectionphoto',
+            name='original_url',
+            field=models.URLField(blank=True, verbose_name='URL Original'),
+        ),
+    ]
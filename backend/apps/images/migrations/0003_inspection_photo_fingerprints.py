@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0002_inspection_photo_staged_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Hash de Contenido'),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='dhash',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Hash Perceptual'),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='dhash_band_0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='dhash_band_1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='dhash_band_2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inspectionphoto',
+            name='dhash_band_3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('images', '0003_inspection_photo_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBatchJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('RUNNING', 'En Proceso'), ('COMPLETED', 'Completado'), ('FAILED', 'Fallido')], default='PENDING', max_length=20, verbose_name='Estado')),
+                ('total_photos', models.IntegerField(default=0, verbose_name='Total de Fotos')),
+                ('processed_photos', models.IntegerField(default=0, verbose_name='Fotos Procesadas')),
+                ('succeeded_photos', models.IntegerField(default=0, verbose_name='Fotos Exitosas')),
+                ('failed_photos', models.IntegerField(default=0, verbose_name='Fotos Fallidas')),
+                ('cached_photos', models.IntegerField(default=0, verbose_name='Resultados en Caché')),
+                ('total_chunks', models.IntegerField(default=0, verbose_name='Total de Bloques')),
+                ('completed_chunks', models.IntegerField(default=0, verbose_name='Bloques Completados')),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, verbose_name='ID de Tarea')),
+                ('result_summary', models.JSONField(blank=True, default=dict, verbose_name='Resumen')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Término')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='image_batch_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+            ],
+            options={
+                'verbose_name': 'Lote de Imágenes',
+                'verbose_name_plural': 'Lotes de Imágenes',
+                'db_table': 'image_batch_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status'], name='image_batch_status_544e4b_idx'), models.Index(fields=['created_by', '-created_at'], name='image_batch_created_5148da_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_location_city_location_coordinates_location_region_and_more'),
+        ('images', '0004_image_batch_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAnalyticsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('photos_total', models.IntegerField(default=0, verbose_name='Fotos')),
+                ('photos_pending', models.IntegerField(default=0, verbose_name='Fotos Pendientes')),
+                ('photos_processing', models.IntegerField(default=0, verbose_name='Fotos en Proceso')),
+                ('photos_completed', models.IntegerField(default=0, verbose_name='Fotos Completadas')),
+                ('photos_failed', models.IntegerField(default=0, verbose_name='Fotos Fallidas')),
+                ('photos_with_gps', models.IntegerField(default=0, verbose_name='Fotos con GPS')),
+                ('photos_analyzed', models.IntegerField(default=0, verbose_name='Fotos Analizadas')),
+                ('photos_with_anomalies', models.IntegerField(default=0, verbose_name='Fotos con Anomalías')),
+                ('anomalies_low', models.IntegerField(default=0, verbose_name='Anomalías Bajas')),
+                ('anomalies_medium', models.IntegerField(default=0, verbose_name='Anomalías Medias')),
+                ('anomalies_high', models.IntegerField(default=0, verbose_name='Anomalías Altas')),
+                ('anomalies_critical', models.IntegerField(default=0, verbose_name='Anomalías Críticas')),
+                ('damage_reports', models.IntegerField(default=0, verbose_name='Reportes de Daño')),
+                ('anomaly_confidence_sum', models.FloatField(default=0, verbose_name='Suma de Confianza')),
+                ('anomaly_confidence_count', models.IntegerField(default=0, verbose_name='Resultados con Confianza')),
+                ('vision_ai_calls', models.IntegerField(default=0, verbose_name='Llamadas Vision AI')),
+                ('cached_results', models.IntegerField(default=0, verbose_name='Resultados en Caché')),
+                ('api_cost_usd', models.DecimalField(decimal_places=4, default=0, max_digits=10, verbose_name='Costo API (USD)')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado')),
+            ],
+            options={
+                'verbose_name': 'Analítica Diaria de Imágenes',
+                'verbose_name_plural': 'Analíticas Diarias de Imágenes',
+                'db_table': 'image_analytics_daily',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inspectionphoto',
+            index=models.Index(fields=['updated_at'], name='inspection__updated_832771_idx'),
+        ),
+        migrations.AddField(
+            model_name='imageanalyticsdaily',
+            name='asset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_analytics', to='assets.asset', verbose_name='Activo'),
+        ),
+        migrations.AddIndex(
+            model_name='imageanalyticsdaily',
+            index=models.Index(fields=['asset', '-date'], name='image_analy_asset_i_364f21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageanalyticsdaily',
+            index=models.Index(fields=['computed_at'], name='image_analy_compute_1c74dc_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='imageanalyticsdaily',
+            unique_together={('date', 'asset')},
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0005_image_analytics_daily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('format', models.CharField(choices=[('JPEG', 'JPEG'), ('WEBP', 'WebP'), ('AVIF', 'AVIF')], max_length=10, verbose_name='Formato')),
+                ('width', models.IntegerField(verbose_name='Ancho')),
+                ('height', models.IntegerField(verbose_name='Alto')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('file_size', models.IntegerField(verbose_name='Tamaño (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='images.inspectionphoto', verbose_name='Foto')),
+            ],
+            options={
+                'verbose_name': 'Variante de Imagen',
+                'verbose_name_plural': 'Variantes de Imagen',
+                'db_table': 'image_variants',
+                'unique_together': {('photo', 'format', 'width')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAnalyticsDirtyDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='Fecha')),
+                ('marked_at', models.DateTimeField(verbose_name='Marcado')),
+            ],
+            options={
+                'verbose_name': 'Día de Analítica Pendiente',
+                'verbose_name_plural': 'Días de Analítica Pendientes',
+                'db_table': 'image_analytics_dirty_days',
+            },
+        ),
+    ]
@@ -55,8 +55,8 @@ class InspectionPhoto(models.Model):
         verbose_name='Orden de Trabajo'
     )
     
-    # Image data
-    original_url = models.URLField(verbose_name='URL Original')
+    # Image data (URLs are empty until the staged upload is processed)
+    original_url = models.URLField(blank=True, verbose_name='URL Original')
     thumbnail_url = models.URLField(blank=True, verbose_name='URL Miniatura')
     file_size = models.IntegerField(verbose_name='Tamaño (bytes)')
     width = models.IntegerField(verbose_name='Ancho')
@@ -100,6 +100,23 @@ class InspectionPhoto(models.Model):
     )
     # Structure: {"make": "Apple", "model": "iPhone 12", "os": "iOS 15"}
     
+    # Fingerprints for Vision AI result reuse (see services/image_hashing.py)
+    content_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name='Hash de Contenido'
+    )
+    dhash = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Hash Perceptual'
+    )
+    dhash_band_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    dhash_band_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    dhash_band_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    dhash_band_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    
     # Processing status
     processing_status = models.CharField(
         max_length=20,
@@ -116,6 +133,13 @@ class InspectionPhoto(models.Model):
         blank=True,
         verbose_name='Error de Procesamiento'
     )
+    staged_upload_path = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name='Archivo en Staging'
+    )
+    # Raw upload waiting for process_inspection_photo; cleared once stored and
+    # deleted (kept if the delete fails, for the cleanup sweep)
     
     # User info
     uploaded_by = models.ForeignKey(
@@ -138,6 +162,8 @@ class InspectionPhoto(models.Model):
             models.Index(fields=['checklist_response']),
             models.Index(fields=['processing_status']),
             models.Index(fields=['uploaded_by']),
+            # Photos changed since the last analytics rollup
+            models.Index(fields=['updated_at']),
         ]
     
     def __str__(self):
@@ -169,6 +195,18 @@ class InspectionPhoto(models.Model):
         if self.has_gps_data():
             return (float(self.gps_latitude), float(self.gps_longitude))
         return None
+    
+    def set_fingerprint(self, content_sha256, dhash_value):
+        """Set content hash and perceptual hash (unsigned 64-bit) with its bands"""
+        from apps.images.services.image_hashing import dhash_bands, to_signed64
+        
+        self.content_sha256 = content_sha256 or ''
+        if dhash_value is None:
+            self.dhash = None
+            self.dhash_band_0 = self.dhash_band_1 = self.dhash_band_2 = self.dhash_band_3 = None
+            return
+        self.dhash = to_signed64(dhash_value)
+        self.dhash_band_0, self.dhash_band_1, self.dhash_band_2, self.dhash_band_3 = dhash_bands(dhash_value)
 
 
 class ImageAnalysisResult(models.Model):
@@ -742,3 +780,212 @@ class DamageReport(models.Model):
     def needs_immediate_action(self):
         """Check if damage needs immediate action"""
         return self.is_critical() and self.status == self.STATUS_OPEN
+
+
+class ImageBatchJob(models.Model):
+    """
+    Batch of photos processed by a Celery chord.
+    
+    Chunks update the counters with F() expressions as they finish, so
+    progress is visible while the batch runs; the chord callback stores the
+    aggregated summary.
+    """
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+    
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En Proceso'),
+        (STATUS_COMPLETED, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Estado'
+    )
+    
+    # Counters (updated atomically by each chunk)
+    total_photos = models.IntegerField(default=0, verbose_name='Total de Fotos')
+    processed_photos = models.IntegerField(default=0, verbose_name='Fotos Procesadas')
+    succeeded_photos = models.IntegerField(default=0, verbose_name='Fotos Exitosas')
+    failed_photos = models.IntegerField(default=0, verbose_name='Fotos Fallidas')
+    cached_photos = models.IntegerField(default=0, verbose_name='Resultados en Caché')
+    total_chunks = models.IntegerField(default=0, verbose_name='Total de Bloques')
+    completed_chunks = models.IntegerField(default=0, verbose_name='Bloques Completados')
+    
+    celery_task_id = models.CharField(max_length=255, blank=True, verbose_name='ID de Tarea')
+    result_summary = models.JSONField(default=dict, blank=True, verbose_name='Resumen')
+    # Structure: {"errors": [{"photo_id": "...", "error": "..."}], "duration_seconds": 12.5}
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='image_batch_jobs',
+        verbose_name='Creado por'
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Inicio')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Término')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'image_batch_jobs'
+        verbose_name = 'Lote de Imágenes'
+        verbose_name_plural = 'Lotes de Imágenes'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
+            models.Index(fields=['created_by', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Batch {self.id} ({self.processed_photos}/{self.total_photos})"
+    
+    @property
+    def progress_percent(self):
+        """Processed photos as a percentage (0-100)"""
+        if not self.total_photos:
+            return 100.0 if self.status == self.STATUS_COMPLETED else 0.0
+        return round(self.processed_photos * 100.0 / self.total_photos, 1)
+    
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+
+class ImageAnalyticsDaily(models.Model):
+    """
+    Image analytics rolled up per asset and capture day.
+    
+    Maintained by the analytics tasks (days whose photos changed are
+    recomputed), so statistics read a few rows per asset and day instead of
+    aggregating the whole photo archive.
+    """
+    date = models.DateField(verbose_name='Fecha')
+    asset = models.ForeignKey(
+        Asset,
+        on_delete=models.CASCADE,
+        related_name='image_analytics',
+        verbose_name='Activo'
+    )
+    
+    # Photos
+    photos_total = models.IntegerField(default=0, verbose_name='Fotos')
+    photos_pending = models.IntegerField(default=0, verbose_name='Fotos Pendientes')
+    photos_processing = models.IntegerField(default=0, verbose_name='Fotos en Proceso')
+    photos_completed = models.IntegerField(default=0, verbose_name='Fotos Completadas')
+    photos_failed = models.IntegerField(default=0, verbose_name='Fotos Fallidas')
+    photos_with_gps = models.IntegerField(default=0, verbose_name='Fotos con GPS')
+    photos_analyzed = models.IntegerField(default=0, verbose_name='Fotos Analizadas')
+    photos_with_anomalies = models.IntegerField(default=0, verbose_name='Fotos con Anomalías')
+    
+    # Anomalies by severity
+    anomalies_low = models.IntegerField(default=0, verbose_name='Anomalías Bajas')
+    anomalies_medium = models.IntegerField(default=0, verbose_name='Anomalías Medias')
+    anomalies_high = models.IntegerField(default=0, verbose_name='Anomalías Altas')
+    anomalies_critical = models.IntegerField(default=0, verbose_name='Anomalías Críticas')
+    damage_reports = models.IntegerField(default=0, verbose_name='Reportes de Daño')
+    
+    # Sum and count (not the average) so days and assets can be re-aggregated
+    anomaly_confidence_sum = models.FloatField(default=0, verbose_name='Suma de Confianza')
+    anomaly_confidence_count = models.IntegerField(default=0, verbose_name='Resultados con Confianza')
+    
+    # Vision AI usage
+    vision_ai_calls = models.IntegerField(default=0, verbose_name='Llamadas Vision AI')
+    cached_results = models.IntegerField(default=0, verbose_name='Resultados en Caché')
+    api_cost_usd = models.DecimalField(
+        max_digits=10,
+        decimal_places=4,
+        default=0,
+        verbose_name='Costo API (USD)'
+    )
+    
+    computed_at = models.DateTimeField(verbose_name='Calculado')
+    
+    class Meta:
+        db_table = 'image_analytics_daily'
+        verbose_name = 'Analítica Diaria de Imágenes'
+        verbose_name_plural = 'Analíticas Diarias de Imágenes'
+        ordering = ['-date']
+        unique_together = ['date', 'asset']
+        indexes = [
+            models.Index(fields=['asset', '-date']),
+            models.Index(fields=['computed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.asset_id} {self.date}: {self.photos_total} fotos"
+    
+    @property
+    def average_anomaly_confidence(self):
+        if not self.anomaly_confidence_count:
+            return None
+        return self.anomaly_confidence_sum / self.anomaly_confidence_count
+
+
+class ImageAnalyticsDirtyDay(models.Model):
+    """
+    Capture day whose analytics rollup must be rebuilt.
+    
+    Marked by the signal handlers for changes that do not touch
+    ``InspectionPhoto.updated_at`` (deleted photos, damage reports, anomaly
+    edits) and consumed by the next rollup refresh.
+    """
+    date = models.DateField(primary_key=True, verbose_name='Fecha')
+    marked_at = models.DateTimeField(verbose_name='Marcado')
+    
+    class Meta:
+        db_table = 'image_analytics_dirty_days'
+        verbose_name = 'Día de Analítica Pendiente'
+        verbose_name_plural = 'Días de Analítica Pendientes'
+    
+    def __str__(self):
+        return f"{self.date} (marcado {self.marked_at})"
+
+
+class ImageVariant(models.Model):
+    """
+    Resized/re-encoded rendition of an inspection photo (WebP, AVIF, JPEG).
+    
+    Generated lazily the first time a client asks for a format and width,
+    then reused.
+    """
+    FORMAT_JPEG = 'JPEG'
+    FORMAT_WEBP = 'WEBP'
+    FORMAT_AVIF = 'AVIF'
+    
+    FORMAT_CHOICES = [
+        (FORMAT_JPEG, 'JPEG'),
+        (FORMAT_WEBP, 'WebP'),
+        (FORMAT_AVIF, 'AVIF'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    photo = models.ForeignKey(
+        InspectionPhoto,
+        on_delete=models.CASCADE,
+        related_name='variants',
+        verbose_name='Foto'
+    )
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name='Formato')
+    width = models.IntegerField(verbose_name='Ancho')
+    height = models.IntegerField(verbose_name='Alto')
+    url = models.URLField(max_length=500, verbose_name='URL')
+    file_size = models.IntegerField(verbose_name='Tamaño (bytes)')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'image_variants'
+        verbose_name = 'Variante de Imagen'
+        verbose_name_plural = 'Variantes de Imagen'
+        unique_together = ['photo', 'format', 'width']
+    
+    def __str__(self):
+        return f"{self.photo_id} {self.format} {self.width}px"
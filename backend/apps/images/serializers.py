@@ -7,7 +7,8 @@ from apps.images.models import (
     ImageAnalysisResult,
     VisualAnomaly,
     MeterReading,
-    DamageReport
+    DamageReport,
+    ImageBatchJob
 )
 from apps.assets.models import Asset
 from apps.work_orders.models import WorkOrder
@@ -224,6 +225,25 @@ class DamageReportSerializer(serializers.ModelSerializer):
         return obj.needs_immediate_action()
 
 
+class ImageBatchJobSerializer(serializers.ModelSerializer):
+    """Serializer for ImageBatchJob progress."""
+    
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percent = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = ImageBatchJob
+        fields = [
+            'id', 'status', 'status_display', 'progress_percent',
+            'total_photos', 'processed_photos', 'succeeded_photos',
+            'failed_photos', 'cached_photos',
+            'total_chunks', 'completed_chunks',
+            'result_summary', 'created_by',
+            'started_at', 'completed_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class InspectionPhotoDetailSerializer(InspectionPhotoSerializer):
     """
     Detailed serializer for InspectionPhoto with nested analysis results.
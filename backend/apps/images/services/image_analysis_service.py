@@ -2,8 +2,10 @@
 Image analysis service that integrates Vision AI with the image processing pipeline.
 """
 import logging
+import uuid
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
+from django.db.models import Q
 from django.utils import timezone
 from django.conf import settings
 
@@ -13,6 +15,8 @@ from apps.images.models import (
     VisualAnomaly,
     MeterReading
 )
+from apps.images.services.image_hashing import MAX_INDEXED_DISTANCE, from_signed64, hamming_distance
+from apps.images.services.meter_anomaly_engine import meter_anomaly_engine
 from apps.images.services.vision_ai_client import vision_ai_client
 
 logger = logging.getLogger(__name__)
@@ -24,9 +28,14 @@ class ImageAnalysisService:
     Coordinates between Vision AI client and database models.
     """
     
-    def __init__(self):
-        """Initialize image analysis service."""
-        self.vision_client = vision_ai_client
+    def __init__(self, vision_client=None):
+        """
+        Initialize image analysis service.
+        
+        Args:
+            vision_client: VisionAIClient to use (default: module singleton)
+        """
+        self.vision_client = vision_client or vision_ai_client
     
     def is_available(self) -> bool:
         """Check if Vision AI is available."""
@@ -61,7 +70,7 @@ class ImageAnalysisService:
             photo.save()
             
             # Check if we have cached results
-            cached_result = self._check_cache(photo.original_url)
+            cached_result = self._check_cache(photo)
             if cached_result:
                 logger.info(f"Using cached results for photo {photo.id}")
                 result = self._create_result_from_cache(photo, cached_result)
@@ -77,21 +86,7 @@ class ImageAnalysisService:
             # Calculate processing time
             processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
             
-            # Create analysis result
-            result = self._create_analysis_result(photo, analysis_data, processing_time)
-            
-            # Extract specific data
-            self._extract_anomalies(photo, result, analysis_data)
-            self._extract_meter_readings(photo, result, analysis_data)
-            
-            # Update photo status
-            photo.processing_status = InspectionPhoto.STATUS_COMPLETED
-            photo.processed_at = timezone.now()
-            photo.save()
-            
-            logger.info(f"Analysis completed for photo {photo.id} in {processing_time}ms")
-            
-            return result
+            return self._store_analysis(photo, analysis_data, processing_time)
             
         except Exception as e:
             logger.error(f"Error analyzing photo {photo.id}: {str(e)}", exc_info=True)
@@ -103,6 +98,26 @@ class ImageAnalysisService:
             
             raise
     
+    def _store_analysis(self, photo: InspectionPhoto, analysis_data: Dict[str, Any],
+                        processing_time: int) -> ImageAnalysisResult:
+        """Persist Vision AI output for a photo and mark it completed."""
+        
+        # Create analysis result
+        result = self._create_analysis_result(photo, analysis_data, processing_time)
+        
+        # Extract specific data
+        self._extract_anomalies(photo, result, analysis_data)
+        self._extract_meter_readings(photo, result, analysis_data)
+        
+        # Update photo status
+        photo.processing_status = InspectionPhoto.STATUS_COMPLETED
+        photo.processed_at = timezone.now()
+        photo.save()
+        
+        logger.info(f"Analysis completed for photo {photo.id} in {processing_time}ms")
+        
+        return result
+    
     # ========================================================================
     # RESULT CREATION
     # ========================================================================
@@ -272,6 +287,7 @@ class ImageAnalysisService:
             
             # Try to extract numeric readings
             readings = self._extract_numeric_readings(full_text)
+            created = []
             
             for reading_value, confidence in readings:
                 # Create meter reading
@@ -290,11 +306,13 @@ class ImageAnalysisService:
                     is_valid=True,
                     is_outlier=False
                 )
-                
-                # Check if reading is within expected range
-                self._validate_meter_reading(meter_reading)
+                created.append(meter_reading)
                 
                 logger.info(f"Created meter reading {meter_reading.id}: {reading_value} {meter_reading.unit}")
+            
+            # Check new readings against the asset's history
+            if created:
+                self._validate_meter_readings(created)
     
     def _extract_numeric_readings(self, text: str) -> list:
         """
@@ -322,51 +340,104 @@ class ImageAnalysisService:
         
         return readings
     
-    def _validate_meter_reading(self, reading: MeterReading):
+    def _validate_meter_readings(self, readings: list):
         """
-        Validate meter reading against historical data.
-        Will be enhanced in Task 5.
+        Score new readings against their series' rolling statistics.
+        
+        Args:
+            readings: MeterReadings of one photo (same asset)
         """
-        # Get previous reading for this asset
-        previous_readings = MeterReading.objects.filter(
-            asset=reading.asset,
-            reading_type=reading.reading_type,
-            created_at__lt=reading.created_at
-        ).order_by('-created_at')[:10]
-        
-        if previous_readings.exists():
-            values = [r.value for r in previous_readings]
-            avg = sum(values) / len(values)
-            
-            # Simple outlier detection (more than 50% deviation)
-            if abs(reading.value - avg) > (avg * 0.5):
-                reading.is_outlier = True
-                reading.validation_notes = f"Value deviates significantly from average ({avg:.2f})"
-                reading.save()
-                
-                logger.warning(f"Outlier detected: {reading.value} vs avg {avg:.2f}")
+        series = {(reading.asset_id, reading.reading_type) for reading in readings}
+        ids = [reading.id for reading in readings]
+        for asset_id, reading_type in series:
+            meter_anomaly_engine.score_series(asset_id, reading_type, reading_ids=ids)
     
     # ========================================================================
     # CACHING
     # ========================================================================
     
-    def _check_cache(self, image_url: str) -> Optional[ImageAnalysisResult]:
+    def _check_cache(self, photo: InspectionPhoto) -> Optional[ImageAnalysisResult]:
         """
-        Check if we have cached results for this image URL.
+        Find a still valid analysis that can be reused for this photo.
+        
+        Lookup order:
+        1. Same pixels (content SHA-256), any asset
+        2. Near-identical shot of the same asset (dHash within
+           VISION_AI_CACHE_HAMMING_DISTANCE bits)
+        3. Same storage URL
         """
         try:
-            # Look for recent analysis of the same image
-            cached = ImageAnalysisResult.objects.filter(
-                photo__original_url=image_url,
+            valid = ImageAnalysisResult.objects.filter(
                 cache_expires_at__gt=timezone.now()
-            ).order_by('-created_at').first()
+            ).exclude(photo_id=photo.id)
             
-            return cached
+            if photo.content_sha256:
+                cached = valid.filter(
+                    photo__content_sha256=photo.content_sha256
+                ).order_by('-created_at').first()
+                if cached:
+                    logger.info(f"Cache hit (content hash) for photo {photo.id}")
+                    return cached
+            
+            if photo.dhash is not None:
+                cached = self._find_similar(photo, valid)
+                if cached:
+                    return cached
+            
+            if photo.original_url:
+                # Look for recent analysis of the same image
+                return valid.filter(
+                    photo__original_url=photo.original_url
+                ).order_by('-created_at').first()
+            
+            return None
             
         except Exception as e:
             logger.error(f"Error checking cache: {str(e)}")
             return None
     
+    def _find_similar(self, photo: InspectionPhoto, valid) -> Optional[ImageAnalysisResult]:
+        """
+        Closest perceptual match among the asset's cached results.
+        
+        Candidates share at least one indexed 16-bit dHash band with the
+        photo (guaranteed for distances up to 3); the exact Hamming distance
+        is then computed in Python on that short list.
+        """
+        max_distance = min(
+            getattr(settings, 'VISION_AI_CACHE_HAMMING_DISTANCE', MAX_INDEXED_DISTANCE),
+            MAX_INDEXED_DISTANCE
+        )
+        if max_distance < 0:
+            return None
+        
+        band_match = (
+            Q(photo__dhash_band_0=photo.dhash_band_0) |
+            Q(photo__dhash_band_1=photo.dhash_band_1) |
+            Q(photo__dhash_band_2=photo.dhash_band_2) |
+            Q(photo__dhash_band_3=photo.dhash_band_3)
+        )
+        candidates = valid.filter(
+            band_match,
+            photo__asset_id=photo.asset_id,
+            photo__dhash__isnull=False
+        ).order_by('-created_at').values_list(
+            'id', 'photo__dhash'
+        )[:getattr(settings, 'VISION_AI_CACHE_CANDIDATES', 50)]
+        
+        target = from_signed64(photo.dhash)
+        best_id, best_distance = None, max_distance + 1
+        for result_id, candidate in candidates:
+            distance = hamming_distance(target, from_signed64(candidate))
+            if distance < best_distance:
+                best_id, best_distance = result_id, distance
+        
+        if best_id is None:
+            return None
+        
+        logger.info(f"Cache hit (dHash distance {best_distance}) for photo {photo.id}")
+        return valid.get(id=best_id)
+    
     def _create_result_from_cache(self, photo: InspectionPhoto,
                                   cached: ImageAnalysisResult) -> ImageAnalysisResult:
         """Create new result from cached data."""
@@ -400,6 +471,10 @@ class ImageAnalysisService:
         """
         Analyze multiple photos in batch.
         
+        Cached photos are resolved from the database; the rest are sent to
+        Vision AI with batched ``batch_annotate_images`` requests instead of
+        one call per photo.
+        
         Args:
             photo_ids: List of InspectionPhoto IDs
             
@@ -414,36 +489,87 @@ class ImageAnalysisService:
             'results': []
         }
         
+        def record_success(photo_id, result):
+            results['success'] += 1
+            if result.cached_result:
+                results['cached'] += 1
+            results['results'].append({
+                'photo_id': str(photo_id),
+                'status': 'success',
+                'result_id': str(result.id)
+            })
+        
+        def record_failure(photo_id, error):
+            results['failed'] += 1
+            results['results'].append({
+                'photo_id': str(photo_id),
+                'status': 'failed',
+                'error': error
+            })
+        
+        if not self.is_available():
+            for photo_id in photo_ids:
+                record_failure(photo_id, 'Vision AI is not available')
+            return results
+        
+        valid_ids = []
         for photo_id in photo_ids:
             try:
-                photo = InspectionPhoto.objects.get(id=photo_id)
-                result = self.analyze_inspection_photo(photo)
-                
-                results['success'] += 1
-                if result.cached_result:
-                    results['cached'] += 1
-                
-                results['results'].append({
-                    'photo_id': str(photo_id),
-                    'status': 'success',
-                    'result_id': str(result.id)
-                })
-                
-            except InspectionPhoto.DoesNotExist:
-                results['failed'] += 1
-                results['results'].append({
-                    'photo_id': str(photo_id),
-                    'status': 'failed',
-                    'error': 'Photo not found'
-                })
-                
+                valid_ids.append(uuid.UUID(str(photo_id)))
+            except ValueError:
+                pass
+        photos = {
+            str(photo.id): photo
+            for photo in InspectionPhoto.objects.select_related('asset').filter(id__in=valid_ids)
+        }
+        
+        pending = []
+        for photo_id in photo_ids:
+            photo = photos.get(str(photo_id).lower())
+            if photo is None:
+                record_failure(photo_id, 'Photo not found')
+                continue
+            if not photo.original_url:
+                record_failure(photo_id, 'Photo not stored yet')
+                continue
+            
+            try:
+                cached = self._check_cache(photo)
+                if cached:
+                    result = self._create_result_from_cache(photo, cached)
+                    photo.processing_status = InspectionPhoto.STATUS_COMPLETED
+                    photo.processed_at = timezone.now()
+                    photo.save(update_fields=['processing_status', 'processed_at', 'updated_at'])
+                    record_success(photo_id, result)
+                else:
+                    pending.append((photo_id, photo))
             except Exception as e:
-                results['failed'] += 1
-                results['results'].append({
-                    'photo_id': str(photo_id),
-                    'status': 'failed',
-                    'error': str(e)
-                })
+                record_failure(photo_id, str(e))
+        
+        if pending:
+            InspectionPhoto.objects.filter(id__in=[photo.id for _, photo in pending]).update(
+                processing_status=InspectionPhoto.STATUS_PROCESSING,
+                updated_at=timezone.now()
+            )
+            
+            start_time = datetime.now()
+            analyses = self.vision_client.analyze_images_comprehensive(
+                [photo.original_url for _, photo in pending]
+            )
+            # Batched calls: report the average time per photo
+            processing_time = int((datetime.now() - start_time).total_seconds() * 1000 / len(pending))
+            
+            for (photo_id, photo), analysis_data in zip(pending, analyses):
+                try:
+                    if isinstance(analysis_data, Exception):
+                        raise analysis_data
+                    record_success(photo_id, self._store_analysis(photo, analysis_data, processing_time))
+                except Exception as e:
+                    logger.error(f"Error analyzing photo {photo.id}: {str(e)}")
+                    photo.processing_status = InspectionPhoto.STATUS_FAILED
+                    photo.processing_error = str(e)
+                    photo.save(update_fields=['processing_status', 'processing_error', 'updated_at'])
+                    record_failure(photo_id, str(e))
         
         logger.info(f"Batch analysis complete: {results['success']}/{results['total']} successful")
         
@@ -0,0 +1,289 @@
+"""
+Per-asset, per-day image analytics rollups.
+
+``refresh`` recomputes the ``ImageAnalyticsDaily`` rows of every capture day
+that has photos changed since the previous run (uploads, status changes and
+analysis all touch ``InspectionPhoto.updated_at``) or that was marked dirty
+by apps.images.signals (deleted photos, damage reports, anomaly edits), with
+three grouped queries restricted to those days. ``summarize`` answers the
+statistics endpoint from the rollup plus a live aggregate of today's photos;
+``summarize_live`` aggregates arbitrary photo filters the rollup cannot
+answer.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.images.models import (
+    DamageReport,
+    ImageAnalyticsDaily,
+    ImageAnalyticsDirtyDay,
+    InspectionPhoto,
+    VisualAnomaly,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_COUNTERS = {
+    InspectionPhoto.STATUS_PENDING: 'photos_pending',
+    InspectionPhoto.STATUS_PROCESSING: 'photos_processing',
+    InspectionPhoto.STATUS_COMPLETED: 'photos_completed',
+    InspectionPhoto.STATUS_FAILED: 'photos_failed',
+}
+SEVERITY_COUNTERS = {
+    VisualAnomaly.SEVERITY_LOW: 'anomalies_low',
+    VisualAnomaly.SEVERITY_MEDIUM: 'anomalies_medium',
+    VisualAnomaly.SEVERITY_HIGH: 'anomalies_high',
+    VisualAnomaly.SEVERITY_CRITICAL: 'anomalies_critical',
+}
+COUNTERS = [
+    'photos_total', *STATUS_COUNTERS.values(), 'photos_with_gps', 'photos_analyzed',
+    'photos_with_anomalies', *SEVERITY_COUNTERS.values(), 'damage_reports',
+    'anomaly_confidence_sum', 'anomaly_confidence_count', 'vision_ai_calls',
+    'cached_results', 'api_cost_usd',
+]
+
+RowKey = Tuple[Any, date]
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _captured_on(days: Iterable[date], field: str = 'captured_at') -> Q:
+    """Range filter (index friendly) matching any of ``days``"""
+    condition = Q()
+    days = sorted(set(days))
+    start = 0
+    for index in range(1, len(days) + 1):
+        # Merge consecutive days into one range
+        if index == len(days) or days[index] != days[index - 1] + timedelta(days=1):
+            condition |= Q(**{
+                f'{field}__gte': _day_start(days[start]),
+                f'{field}__lt': _day_start(days[index - 1] + timedelta(days=1)),
+            })
+            start = index
+    return condition
+
+
+def mark_days_dirty(moments: Iterable[datetime]):
+    """
+    Queue the capture days of ``moments`` for the next rollup refresh.
+
+    Re-marking a day moves its ``marked_at`` forward, so a change made while
+    a refresh is running is picked up by the following one.
+    """
+    days = {timezone.localdate(moment) for moment in moments if moment}
+    if not days:
+        return
+    marked_at = timezone.now()
+    ImageAnalyticsDirtyDay.objects.bulk_create(
+        [ImageAnalyticsDirtyDay(date=day, marked_at=marked_at) for day in days],
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=['marked_at'],
+    )
+
+
+def mark_photo_day_dirty(instance):
+    """Mark the capture day of the photo a finding (anomaly, damage report) belongs to"""
+    if 'photo' in instance._state.fields_cache:
+        captured_at = instance.photo.captured_at
+    else:
+        captured_at = InspectionPhoto.objects.filter(pk=instance.photo_id).values_list(
+            'captured_at', flat=True
+        ).first()
+    mark_days_dirty([captured_at])
+
+
+def compute_rows(photo_filter: Q) -> Dict[RowKey, Dict[str, Any]]:
+    """
+    Aggregate the counters of the photos matching ``photo_filter``.
+
+    Returns:
+        {(asset_id, day): {counter: value}}
+    """
+    cost_per_call = Decimal(str(getattr(settings, 'VISION_AI_COST_PER_IMAGE_USD', 0.0015)))
+    rows: Dict[RowKey, Dict[str, Any]] = {}
+
+    def row(asset_id, day) -> Dict[str, Any]:
+        return rows.setdefault((asset_id, day), {name: 0 for name in COUNTERS})
+
+    photos = InspectionPhoto.objects.filter(photo_filter).values(
+        'asset_id', day=TruncDate('captured_at')
+    ).annotate(
+        photos_total=Count('id'),
+        photos_with_gps=Count('id', filter=Q(gps_latitude__isnull=False, gps_longitude__isnull=False)),
+        photos_analyzed=Count('analysis_result'),
+        photos_with_anomalies=Count('id', filter=Q(analysis_result__anomalies_detected=True)),
+        anomaly_confidence_sum=Sum('analysis_result__anomaly_confidence'),
+        anomaly_confidence_count=Count('analysis_result__anomaly_confidence'),
+        vision_ai_calls=Count('id', filter=Q(
+            analysis_result__vision_ai_used=True, analysis_result__cached_result=False
+        )),
+        cached_results=Count('id', filter=Q(analysis_result__cached_result=True)),
+        **{
+            name: Count('id', filter=Q(processing_status=value))
+            for value, name in STATUS_COUNTERS.items()
+        }
+    ).order_by()
+    for values in photos:
+        target = row(values.pop('asset_id'), values.pop('day'))
+        target.update(values)
+        target['anomaly_confidence_sum'] = target['anomaly_confidence_sum'] or 0.0
+        target['api_cost_usd'] = cost_per_call * target['vision_ai_calls']
+
+    photo_filter_via_photo = Q(photo__in=InspectionPhoto.objects.filter(photo_filter).values('pk'))
+
+    anomalies = VisualAnomaly.objects.filter(photo_filter_via_photo).values(
+        'photo__asset_id', day=TruncDate('photo__captured_at')
+    ).annotate(**{
+        name: Count('id', filter=Q(severity=value))
+        for value, name in SEVERITY_COUNTERS.items()
+    }).order_by()
+    for values in anomalies:
+        row(values.pop('photo__asset_id'), values.pop('day')).update(values)
+
+    damage = DamageReport.objects.filter(photo_filter_via_photo).values(
+        'asset_id', day=TruncDate('photo__captured_at')
+    ).annotate(damage_reports=Count('id')).order_by()
+    for values in damage:
+        row(values['asset_id'], values['day'])['damage_reports'] = values['damage_reports']
+
+    return rows
+
+
+class ImageAnalyticsRollup:
+    """
+    Maintains ``ImageAnalyticsDaily``.
+    """
+
+    def dirty_days(self, since: Optional[datetime]) -> List[date]:
+        """Capture days with photos changed at or after ``since`` (all days if None)"""
+        photos = InspectionPhoto.objects.all()
+        if since is not None:
+            photos = photos.filter(updated_at__gte=since)
+        return list(
+            photos.annotate(day=TruncDate('captured_at')).order_by().values_list('day', flat=True).distinct()
+        )
+
+    def rebuild_days(self, days: Iterable[date], computed_at: Optional[datetime] = None) -> int:
+        """
+        Recompute the rollup rows of ``days``.
+
+        Returns:
+            Number of rows written
+        """
+        days = sorted(set(days))
+        if not days:
+            return 0
+        computed_at = computed_at or timezone.now()
+        rows = compute_rows(_captured_on(days))
+
+        objects = [
+            ImageAnalyticsDaily(asset_id=asset_id, date=day, computed_at=computed_at, **values)
+            for (asset_id, day), values in rows.items()
+        ]
+        with transaction.atomic():
+            self._delete_missing(days, rows)
+            ImageAnalyticsDaily.objects.bulk_create(
+                objects,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['date', 'asset'],
+                update_fields=[*COUNTERS, 'computed_at'],
+            )
+        return len(objects)
+
+    def _delete_missing(self, days: List[date], rows: Dict[RowKey, Dict[str, Any]]):
+        """Delete rows of assets that no longer have photos on these days"""
+        existing = ImageAnalyticsDaily.objects.filter(date__in=days).values_list('pk', 'asset_id', 'date')
+        stale = [pk for pk, asset_id, day in existing if (asset_id, day) not in rows]
+        if stale:
+            ImageAnalyticsDaily.objects.filter(pk__in=stale).delete()
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Recompute the days changed since the previous refresh.
+
+        The watermark is the start time of the previous run (stored in
+        ``computed_at``), so photos updated while a run is in progress are
+        picked up by the next one.
+        """
+        started_at = timezone.now()
+        since = ImageAnalyticsDaily.objects.aggregate(since=Max('computed_at'))['since']
+        marked = list(
+            ImageAnalyticsDirtyDay.objects.filter(marked_at__lt=started_at).values_list('date', flat=True)
+        )
+        days = set(self.dirty_days(since)) | set(marked)
+        rows = self.rebuild_days(days, computed_at=started_at)
+        if marked:
+            # Days re-marked during this run keep their marker
+            ImageAnalyticsDirtyDay.objects.filter(date__in=marked, marked_at__lt=started_at).delete()
+        logger.info(f"Image analytics rollup: {len(days)} days, {rows} rows")
+        return {'days': [day.isoformat() for day in sorted(days)], 'rows': rows}
+
+    def summarize(
+        self,
+        asset_id=None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        """
+        Totals for the statistics endpoint.
+
+        Past days come from the rollup; today is aggregated live because the
+        rollup only runs periodically.
+
+        Args:
+            asset_id: Restrict to one asset
+            date_from: First capture day (inclusive)
+            date_to: Last capture day (inclusive)
+
+        Returns:
+            Dict with the summed counters
+        """
+        today = timezone.localdate()
+        rollups = ImageAnalyticsDaily.objects.filter(date__lt=today)
+        if asset_id:
+            rollups = rollups.filter(asset_id=asset_id)
+        if date_from:
+            rollups = rollups.filter(date__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(date__lte=date_to)
+        totals = rollups.aggregate(**{name: Sum(name) for name in COUNTERS})
+        totals = {name: value or 0 for name, value in totals.items()}
+
+        if (not date_from or date_from <= today) and (not date_to or date_to >= today):
+            live_filter = _captured_on([today])
+            if asset_id:
+                live_filter &= Q(asset_id=asset_id)
+            for name, value in self.summarize_live(live_filter).items():
+                totals[name] += value
+        return totals
+
+    def summarize_live(self, photo_filter: Q) -> Dict[str, Any]:
+        """
+        Totals aggregated directly from the photos matching ``photo_filter``.
+
+        Used for today's photos and for statistics filters the rollup does
+        not have (work order, processing status, sub-day time ranges).
+
+        Returns:
+            Dict with the summed counters
+        """
+        totals = {name: 0 for name in COUNTERS}
+        for values in compute_rows(photo_filter).values():
+            for name in COUNTERS:
+                totals[name] += values[name]
+        return totals
+
+
+image_analytics_rollup = ImageAnalyticsRollup()
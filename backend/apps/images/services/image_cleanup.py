@@ -0,0 +1,236 @@
+"""
+Chunked, resumable cleanup of expired image data.
+
+Three phases, each walking its table (or storage prefix) in key order:
+
+1. ``results``: cached analysis results past ``cache_expires_at``
+2. ``photos``: photos older than ``IMAGE_RETENTION_DAYS`` (disabled by
+   default) that are not evidence for a work order and have no meter
+   readings, together with their storage objects (original, thumbnail and
+   generated variants)
+3. ``staging``: raw uploads under ``IMAGE_STAGING_PREFIX`` older than
+   ``IMAGE_STAGING_MAX_AGE_HOURS`` that no pending photo is waiting for
+   (staged deletes that failed, uploads whose row was never created)
+
+Every batch is deleted in its own short transaction and the position is
+checkpointed in the cache, so a run stopped by its time budget (or a worker
+crash) resumes where it left off. Storage objects of a batch are deleted
+before its rows: a crash in between leaves rows whose objects are already
+gone, and the next run deletes them again (missing objects are ignored)
+instead of leaking orphan blobs.
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.rate_limiting import TokenBucket
+from apps.images.models import ImageAnalysisResult, ImageVariant, InspectionPhoto
+from apps.images.services.storage_backends import StorageBackend, get_storage_backend
+
+logger = logging.getLogger(__name__)
+
+CURSOR_CACHE_KEY = 'images:cleanup:cursor'
+LOCK_CACHE_KEY = 'images:cleanup:lock'
+CURSOR_TIMEOUT = 7 * 24 * 3600
+
+PHASE_RESULTS = 'results'
+PHASE_PHOTOS = 'photos'
+PHASE_STAGING = 'staging'
+PHASE_DONE = 'done'
+
+_URL_FIELDS = ('original_url', 'thumbnail_url', 'staged_upload_path')
+
+
+class ImageCleanup:
+    """
+    Delete expired image data in rate-limited primary-key batches.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[StorageBackend] = None,
+        batch_size: Optional[int] = None,
+        rows_per_second: Optional[float] = None,
+        time_budget: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize cleanup job.
+
+        Args:
+            storage: Backend holding the photo objects (default: configured backend)
+            batch_size: Rows deleted per transaction
+            rows_per_second: Sustained delete rate allowed on the primary DB
+            time_budget: Seconds a run may take before checkpointing
+            clock: Monotonic clock (injectable for tests)
+            sleep: Sleep function used by the rate limiter
+        """
+        self._storage = storage
+        self.batch_size = batch_size or getattr(settings, 'IMAGE_CLEANUP_BATCH_SIZE', 500)
+        self.time_budget = time_budget or getattr(settings, 'IMAGE_CLEANUP_TIME_BUDGET_SECONDS', 240)
+        self.clock = clock
+        self.rate_limiter = TokenBucket(
+            rate=rows_per_second or getattr(settings, 'IMAGE_CLEANUP_ROWS_PER_SECOND', 1000),
+            capacity=self.batch_size,
+            clock=clock,
+            sleep=sleep,
+        )
+
+    @property
+    def storage(self) -> StorageBackend:
+        return self._storage or get_storage_backend()
+
+    # ========================================================================
+    # STATE
+    # ========================================================================
+
+    def _new_state(self) -> Dict[str, Any]:
+        return {
+            'phase': PHASE_RESULTS,
+            'last_pk': None,
+            'started_at': timezone.now().isoformat(),
+            'deleted_results': 0,
+            'deleted_photos': 0,
+            'deleted_objects': 0,
+        }
+
+    def _save(self, state: Dict[str, Any]):
+        cache.set(CURSOR_CACHE_KEY, state, CURSOR_TIMEOUT)
+
+    # ========================================================================
+    # BATCHES
+    # ========================================================================
+
+    def _expired_results(self, state: Dict[str, Any]):
+        # The cutoff is fixed at the start of the job so resumed runs see
+        # the same set of rows
+        return ImageAnalysisResult.objects.filter(
+            cached_result=True,
+            cache_expires_at__lt=parse_datetime(state['started_at'])
+        )
+
+    def _expired_photos(self, state: Dict[str, Any]):
+        retention_days = getattr(settings, 'IMAGE_RETENTION_DAYS', None)
+        if not retention_days:
+            return InspectionPhoto.objects.none()
+        cutoff = parse_datetime(state['started_at']) - timedelta(days=retention_days)
+        return InspectionPhoto.objects.filter(created_at__lt=cutoff).exclude(
+            work_order__isnull=False
+        ).exclude(
+            damage_reports__work_order__isnull=False
+        ).exclude(
+            anomalies__work_order_created__isnull=False
+        ).exclude(
+            # Readings cascade with their photo and feed the meter history
+            meter_readings__isnull=False
+        )
+
+    def _sweep_staging(self, state: Dict[str, Any]) -> Optional[List]:
+        prefix = getattr(settings, 'IMAGE_STAGING_PREFIX', 'staging')
+        objects = self.storage.list_objects(prefix, start_after=state['last_pk'] or '', limit=self.batch_size)
+        if not objects:
+            return None
+
+        cutoff = parse_datetime(state['started_at']) - timedelta(
+            hours=getattr(settings, 'IMAGE_STAGING_MAX_AGE_HOURS', 24)
+        )
+        stale = [url for _, url, modified in objects if modified < cutoff]
+        if stale:
+            waiting = set(
+                InspectionPhoto.objects.filter(staged_upload_path__in=stale, original_url='').exclude(
+                    processing_status=InspectionPhoto.STATUS_FAILED
+                ).values_list('staged_upload_path', flat=True)
+            )
+            orphaned = [url for url in stale if url not in waiting]
+            if orphaned:
+                self.storage.delete_many(orphaned)
+                InspectionPhoto.objects.filter(staged_upload_path__in=orphaned).update(staged_upload_path='')
+                state['deleted_objects'] += len(orphaned)
+        return [name for name, _, _ in objects]
+
+    def _next_batch(self, queryset, last_pk, *fields) -> List:
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        return list(queryset.order_by('pk').values_list('pk', *fields)[:self.batch_size])
+
+    def _delete_results(self, state: Dict[str, Any]) -> Optional[List]:
+        rows = self._next_batch(self._expired_results(state), state['last_pk'])
+        if not rows:
+            return None
+        ids = [row[0] for row in rows]
+        with transaction.atomic():
+            ImageAnalysisResult.objects.filter(pk__in=ids).delete()
+        state['deleted_results'] += len(ids)
+        return ids
+
+    def _delete_photos(self, state: Dict[str, Any]) -> Optional[List]:
+        rows = self._next_batch(self._expired_photos(state).distinct(), state['last_pk'], *_URL_FIELDS)
+        if not rows:
+            return None
+        ids = [row[0] for row in rows]
+        urls = [url for row in rows for url in row[1:] if url]
+        urls += ImageVariant.objects.filter(photo_id__in=ids).values_list('url', flat=True)
+
+        if urls:
+            self.storage.delete_many(urls)
+            state['deleted_objects'] += len(urls)
+        with transaction.atomic():
+            InspectionPhoto.objects.filter(pk__in=ids).delete()
+        state['deleted_photos'] += len(ids)
+        return ids
+
+    # ========================================================================
+    # RUN
+    # ========================================================================
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Delete batches until done or out of time.
+
+        Returns:
+            Dict with 'status' ('success', 'partial' or 'locked') and counters
+        """
+        if not cache.add(LOCK_CACHE_KEY, True, int(self.time_budget) + 60):
+            return {'status': 'locked'}
+
+        try:
+            state = cache.get(CURSOR_CACHE_KEY) or self._new_state()
+            deadline = self.clock() + self.time_budget
+            steps = {
+                PHASE_RESULTS: self._delete_results,
+                PHASE_PHOTOS: self._delete_photos,
+                PHASE_STAGING: self._sweep_staging,
+            }
+            next_phase = {PHASE_RESULTS: PHASE_PHOTOS, PHASE_PHOTOS: PHASE_STAGING, PHASE_STAGING: PHASE_DONE}
+
+            while state['phase'] != PHASE_DONE:
+                if self.clock() >= deadline:
+                    self._save(state)
+                    logger.info(f"Image cleanup checkpoint at {state['phase']}/{state['last_pk']}")
+                    return {'status': 'partial', **state}
+
+                ids = steps[state['phase']](state)
+                if ids is None:
+                    state['phase'] = next_phase[state['phase']]
+                    state['last_pk'] = None
+                else:
+                    state['last_pk'] = str(ids[-1])
+                    self._save(state)
+                    self.rate_limiter.acquire(len(ids))
+
+            cache.delete(CURSOR_CACHE_KEY)
+            logger.info(
+                f"Image cleanup finished: {state['deleted_results']} cached results, "
+                f"{state['deleted_photos']} photos, {state['deleted_objects']} storage objects"
+            )
+            return {'status': 'success', **state}
+        finally:
+            cache.delete(LOCK_CACHE_KEY)
@@ -0,0 +1,70 @@
+"""
+Image fingerprints used to reuse Vision AI results.
+
+- ``content_hash``: SHA-256 of the decoded pixels, so the same photo
+  re-uploaded (different EXIF, re-wrapped file) has the same hash.
+- ``dhash``: 64-bit difference hash; near-identical shots differ in a few
+  bits. The hash is split into 4 bands of 16 bits stored in indexed
+  columns (multi-index hashing): by the pigeonhole principle two hashes
+  within Hamming distance 3 share at least one band exactly, so candidates
+  are found with indexed equality lookups and only those are compared bit
+  by bit.
+"""
+import hashlib
+from typing import List
+
+from PIL import Image
+
+DHASH_BANDS = 4
+DHASH_BAND_BITS = 16
+# Largest distance guaranteed to be found through exact band matches
+MAX_INDEXED_DISTANCE = DHASH_BANDS - 1
+
+
+def content_hash(img: Image.Image) -> str:
+    """SHA-256 (hex) of the image's RGB pixel data and size"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    digest = hashlib.sha256(f'{img.width}x{img.height}:'.encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def dhash(img: Image.Image) -> int:
+    """
+    64-bit difference hash (unsigned).
+
+    The image is reduced to 9x8 grayscale and each bit records whether a
+    pixel is brighter than its right neighbour, which survives recompression,
+    small exposure changes and rescaling.
+    """
+    small = img.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def dhash_bands(value: int) -> List[int]:
+    """Split a 64-bit hash into 16-bit bands (most significant first)"""
+    mask = (1 << DHASH_BAND_BITS) - 1
+    return [
+        (value >> (DHASH_BAND_BITS * (DHASH_BANDS - 1 - i))) & mask
+        for i in range(DHASH_BANDS)
+    ]
+
+
+def to_signed64(value: int) -> int:
+    """Store an unsigned 64-bit hash in a (signed) BigIntegerField"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
@@ -1,15 +1,23 @@
 """
-Image processing service for compression, metadata extraction, and Cloud Storage upload.
+Image processing service for compression, metadata extraction, and storage upload.
 """
 import io
 import logging
+import uuid
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 from PIL import Image
 import piexif
-from google.cloud import storage
 from django.conf import settings
 
+from .image_hashing import content_hash, dhash
+from .storage_backends import (
+    StorageBackend,
+    UploadCoordinator,
+    get_storage_backend,
+    upload_coordinator,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,27 +27,19 @@ class ImageProcessingService:
     Handles compression, metadata extraction, and Cloud Storage upload.
     """
     
-    def __init__(self):
-        """Initialize image processing service."""
-        self.storage_client = None
-        self.bucket = None
-        self._initialize_storage()
-    
-    def _initialize_storage(self):
-        """Initialize Google Cloud Storage client."""
-        try:
-            if settings.GCP_STORAGE_BUCKET_NAME:
-                self.storage_client = storage.Client()
-                self.bucket = self.storage_client.bucket(settings.GCP_STORAGE_BUCKET_NAME)
-                logger.info(f"Cloud Storage initialized: {settings.GCP_STORAGE_BUCKET_NAME}")
-            else:
-                logger.warning("GCP_STORAGE_BUCKET_NAME not configured")
-        except Exception as e:
-            logger.error(f"Failed to initialize Cloud Storage: {str(e)}")
+    def __init__(self, storage_backend: Optional[StorageBackend] = None):
+        """
+        Initialize image processing service.
+        
+        Args:
+            storage_backend: Storage for processed variants (default from IMAGE_STORAGE_BACKEND)
+        """
+        self.storage = storage_backend or get_storage_backend()
+        self.uploader = UploadCoordinator(backend=self.storage) if storage_backend else upload_coordinator
     
     def is_available(self) -> bool:
-        """Check if Cloud Storage is available."""
-        return self.bucket is not None
+        """Check if image storage is available."""
+        return self.storage.is_available()
     
     # ========================================================================
     # IMAGE VALIDATION
@@ -100,7 +100,23 @@ class ImageProcessingService:
         Returns:
             Dict containing extracted metadata
         """
-        metadata = {
+        try:
+            img = Image.open(image_file)
+            metadata = self._metadata_from_image(img)
+            
+            # Reset file pointer
+            image_file.seek(0)
+            
+        except Exception as e:
+            logger.error(f"Error extracting metadata: {str(e)}")
+            metadata = self._empty_metadata()
+            # Set defaults
+            metadata['captured_at'] = datetime.now()
+        
+        return metadata
+    
+    def _empty_metadata(self) -> Dict[str, Any]:
+        return {
             'captured_at': None,
             'gps_latitude': None,
             'gps_longitude': None,
@@ -111,58 +127,59 @@ class ImageProcessingService:
             'height': None,
             'format': None,
         }
+    
+    def _metadata_from_image(self, img: Image.Image) -> Dict[str, Any]:
+        """
+        Read size, format and EXIF from an opened (not yet decoded) image.
+        Only the header is parsed; pixel data is not touched.
+        """
+        metadata = self._empty_metadata()
         
-        try:
-            img = Image.open(image_file)
-            
-            # Basic image info
-            metadata['width'] = img.width
-            metadata['height'] = img.height
-            metadata['format'] = img.format
-            
-            # Extract EXIF data
-            if hasattr(img, '_getexif') and img._getexif():
-                exif_dict = piexif.load(img.info.get('exif', b''))
+        # Basic image info
+        metadata['width'] = img.width
+        metadata['height'] = img.height
+        metadata['format'] = img.format
+        
+        # Extract EXIF data
+        exif_bytes = img.info.get('exif')
+        if exif_bytes:
+            try:
+                exif_dict = piexif.load(exif_bytes)
+            except Exception as e:
+                logger.warning(f"Unreadable EXIF block: {str(e)}")
+                exif_dict = {}
+            
+            # Extract datetime
+            if piexif.ExifIFD.DateTimeOriginal in exif_dict.get('Exif', {}):
+                datetime_str = exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal].decode('utf-8')
+                try:
+                    metadata['captured_at'] = datetime.strptime(datetime_str, '%Y:%m:%d %H:%M:%S')
+                except ValueError:
+                    pass
+            
+            # Extract GPS data
+            gps_info = exif_dict.get('GPS', {})
+            if gps_info:
+                metadata.update(self._extract_gps_data(gps_info))
+            
+            # Extract device info
+            if '0th' in exif_dict:
+                zeroth_ifd = exif_dict['0th']
+                device_info = {}
                 
-                # Extract datetime
-                if piexif.ExifIFD.DateTimeOriginal in exif_dict.get('Exif', {}):
-                    datetime_str = exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal].decode('utf-8')
-                    try:
-                        metadata['captured_at'] = datetime.strptime(datetime_str, '%Y:%m:%d %H:%M:%S')
-                    except ValueError:
-                        pass
+                if piexif.ImageIFD.Make in zeroth_ifd:
+                    device_info['make'] = zeroth_ifd[piexif.ImageIFD.Make].decode('utf-8')
                 
-                # Extract GPS data
-                gps_info = exif_dict.get('GPS', {})
-                if gps_info:
-                    metadata.update(self._extract_gps_data(gps_info))
+                if piexif.ImageIFD.Model in zeroth_ifd:
+                    device_info['model'] = zeroth_ifd[piexif.ImageIFD.Model].decode('utf-8')
                 
-                # Extract device info
-                if '0th' in exif_dict:
-                    zeroth_ifd = exif_dict['0th']
-                    device_info = {}
-                    
-                    if piexif.ImageIFD.Make in zeroth_ifd:
-                        device_info['make'] = zeroth_ifd[piexif.ImageIFD.Make].decode('utf-8')
-                    
-                    if piexif.ImageIFD.Model in zeroth_ifd:
-                        device_info['model'] = zeroth_ifd[piexif.ImageIFD.Model].decode('utf-8')
-                    
-                    if piexif.ImageIFD.Software in zeroth_ifd:
-                        device_info['software'] = zeroth_ifd[piexif.ImageIFD.Software].decode('utf-8')
-                    
-                    metadata['device_info'] = device_info
-            
-            # If no capture date in EXIF, use current time
-            if not metadata['captured_at']:
-                metadata['captured_at'] = datetime.now()
-            
-            # Reset file pointer
-            image_file.seek(0)
-            
-        except Exception as e:
-            logger.error(f"Error extracting metadata: {str(e)}")
-            # Set defaults
+                if piexif.ImageIFD.Software in zeroth_ifd:
+                    device_info['software'] = zeroth_ifd[piexif.ImageIFD.Software].decode('utf-8')
+                
+                metadata['device_info'] = device_info
+        
+        # If no capture date in EXIF, use current time
+        if not metadata['captured_at']:
             metadata['captured_at'] = datetime.now()
         
         return metadata
@@ -227,59 +244,99 @@ class ImageProcessingService:
         Returns:
             Tuple of (compressed_image_buffer, final_size)
         """
-        if max_size_bytes is None:
-            max_size_bytes = settings.COMPRESSED_IMAGE_SIZE_BYTES
-        
         try:
-            img = Image.open(image_file)
-            
-            # Convert RGBA to RGB if necessary
-            if img.mode == 'RGBA':
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Start with high quality
-            quality = 95
-            output = io.BytesIO()
-            
-            # Iteratively reduce quality until size is acceptable
-            while quality > 20:
-                output.seek(0)
-                output.truncate()
-                
-                img.save(output, format='JPEG', quality=quality, optimize=True)
-                size = output.tell()
-                
-                if size <= max_size_bytes:
-                    break
-                
-                quality -= 5
-            
-            # If still too large, resize image
-            if size > max_size_bytes:
-                scale_factor = (max_size_bytes / size) ** 0.5
-                new_width = int(img.width * scale_factor)
-                new_height = int(img.height * scale_factor)
-                
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                output.seek(0)
-                output.truncate()
-                img.save(output, format='JPEG', quality=85, optimize=True)
-                size = output.tell()
-            
-            output.seek(0)
+            img = self._decode(Image.open(image_file))
+            output, size, quality = self._encode_to_target(img, max_size_bytes)
             logger.info(f"Image compressed to {size} bytes (quality: {quality})")
-            
             return output, size
             
         except Exception as e:
             logger.error(f"Error compressing image: {str(e)}")
             raise
     
+    def _decode(self, img: Image.Image, max_dimension: Optional[int] = None) -> Image.Image:
+        """
+        Decode an opened image once into an RGB image bounded by
+        ``max_dimension`` on its longest side.
+        
+        JPEGs use ``Image.draft`` so libjpeg scales down by 1/2, 1/4 or 1/8
+        while decoding: a 12 MP photo never materializes at full size.
+        """
+        if max_dimension is None:
+            max_dimension = getattr(settings, 'IMAGE_MAX_DIMENSION', 1920)
+        
+        longest = max(img.size)
+        if max_dimension and longest > max_dimension:
+            ratio = max_dimension / longest
+            target = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+            if img.format == 'JPEG':
+                # Picks the smallest DCT scale that is still >= target
+                img.draft('RGB', target)
+            img.load()
+            if max(img.size) > max_dimension:
+                img = img.resize(target, Image.Resampling.LANCZOS)
+        else:
+            img.load()
+        
+        # Convert RGBA to RGB if necessary
+        if img.mode == 'RGBA':
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        return img
+    
+    @staticmethod
+    def _jpeg_size(img: Image.Image, quality: int) -> int:
+        """Encoded size at ``quality`` (probe encode, no Huffman optimization)"""
+        probe = io.BytesIO()
+        img.save(probe, format='JPEG', quality=quality)
+        return probe.tell()
+    
+    def _encode_to_target(self, img: Image.Image, max_size_bytes: Optional[int] = None,
+                          min_quality: int = 20, max_quality: int = 95) -> Tuple[io.BytesIO, int, int]:
+        """
+        Encode as JPEG with the highest quality that fits ``max_size_bytes``.
+        
+        JPEG size grows monotonically with quality, so the quality is found
+        with a binary search (at most ~6 probe encodes instead of up to 15
+        with the previous linear scan). Probes skip Huffman optimization,
+        which only makes the final optimized encode smaller.
+        
+        Returns:
+            Tuple of (buffer, size, quality)
+        """
+        if max_size_bytes is None:
+            max_size_bytes = settings.COMPRESSED_IMAGE_SIZE_BYTES
+        
+        if self._jpeg_size(img, max_quality) <= max_size_bytes:
+            quality = max_quality
+        elif self._jpeg_size(img, min_quality) > max_size_bytes:
+            # Even the lowest quality is too large: shrink, then use a fixed quality
+            scale_factor = (max_size_bytes / self._jpeg_size(img, 85)) ** 0.5
+            img = img.resize(
+                (max(1, int(img.width * scale_factor)), max(1, int(img.height * scale_factor))),
+                Image.Resampling.LANCZOS
+            )
+            quality = 85
+        else:
+            low, high = min_quality, max_quality
+            while high - low > 1:
+                mid = (low + high) // 2
+                if self._jpeg_size(img, mid) <= max_size_bytes:
+                    low = mid
+                else:
+                    high = mid
+            quality = low
+        
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+        size = output.tell()
+        output.seek(0)
+        return output, size, quality
+    
     # ========================================================================
     # CLOUD STORAGE UPLOAD
     # ========================================================================
@@ -287,7 +344,7 @@ class ImageProcessingService:
     def upload_to_storage(self, image_buffer: io.BytesIO, filename: str, 
                          content_type: str = 'image/jpeg') -> str:
         """
-        Upload image to Google Cloud Storage.
+        Upload image to the configured storage backend.
         
         Args:
             image_buffer: Image data buffer
@@ -295,42 +352,58 @@ class ImageProcessingService:
             content_type: MIME type
             
         Returns:
-            Public URL of uploaded image
+            URL of uploaded image (gs:// URL for Vision AI on GCS)
         """
         if not self.is_available():
             raise RuntimeError("Cloud Storage is not available")
         
         try:
-            blob = self.bucket.blob(filename)
-            blob.upload_from_file(image_buffer, content_type=content_type)
-            
-            # Make blob publicly readable (optional - adjust based on security requirements)
-            # blob.make_public()
-            
-            # Return gs:// URL for Vision AI
-            url = f"gs://{self.bucket.name}/{filename}"
-            logger.info(f"Image uploaded to {url}")
-            
-            return url
-            
+            return self.storage.upload(image_buffer, filename, content_type)
         except Exception as e:
             logger.error(f"Error uploading to Cloud Storage: {str(e)}")
             raise
     
-    def generate_filename(self, asset_id: str, user_id: str, extension: str = 'jpg') -> str:
+    def upload_variants(self, prepared: Dict[str, Any], filename: str) -> Dict[str, str]:
+        """
+        Upload the compressed image and its thumbnail concurrently.
+        
+        Args:
+            prepared: Result of ``prepare_image``
+            filename: Destination filename of the compressed image
+            
+        Returns:
+            Dict with 'original_url' and 'thumbnail_url'
+        """
+        if not self.is_available():
+            raise RuntimeError("Cloud Storage is not available")
+        
+        return self.uploader.upload_many({
+            'original_url': (prepared['compressed'], filename, 'image/jpeg'),
+            'thumbnail_url': (prepared['thumbnail'], self.generate_thumbnail_filename(filename), 'image/jpeg'),
+        })
+    
+    def generate_filename(
+        self, asset_id: str, user_id: str, extension: str = 'jpg', photo_id: Optional[str] = None
+    ) -> str:
         """
         Generate unique filename for uploaded image.
         
+        The timestamp only has second resolution and background processing
+        stores several photos of the same asset and user within a second,
+        so the name also carries the photo id (or a random id).
+        
         Args:
             asset_id: Asset UUID
             user_id: User UUID
             extension: File extension
+            photo_id: InspectionPhoto id, when already known
             
         Returns:
             Generated filename with path
         """
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"inspections/{asset_id}/{timestamp}_{user_id}.{extension}"
+        unique_id = photo_id or uuid.uuid4().hex
+        filename = f"inspections/{asset_id}/{timestamp}_{user_id}_{unique_id}.{extension}"
         return filename
     
     def generate_thumbnail_filename(self, original_filename: str) -> str:
@@ -355,31 +428,131 @@ class ImageProcessingService:
         """
         try:
             img = Image.open(image_file)
-            
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Create thumbnail maintaining aspect ratio
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            
-            # Save to buffer
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=85, optimize=True)
-            output.seek(0)
-            
-            logger.info(f"Thumbnail created: {img.width}x{img.height}")
-            
-            return output
+            if img.format == 'JPEG':
+                img.draft('RGB', size)
+            return self._thumbnail_from_image(img, size)
             
         except Exception as e:
             logger.error(f"Error creating thumbnail: {str(e)}")
             raise
     
+    def _thumbnail_from_image(self, img: Image.Image, size: Tuple[int, int] = (300, 300)) -> io.BytesIO:
+        """Encode a thumbnail from an (already decoded) image without modifying it"""
+        thumb = img.copy() if img.mode == 'RGB' else img.convert('RGB')
+        
+        # Create thumbnail maintaining aspect ratio
+        thumb.thumbnail(size, Image.Resampling.LANCZOS)
+        
+        # Save to buffer
+        output = io.BytesIO()
+        thumb.save(output, format='JPEG', quality=85, optimize=True)
+        output.seek(0)
+        
+        logger.info(f"Thumbnail created: {thumb.width}x{thumb.height}")
+        
+        return output
+    
     # ========================================================================
     # COMPLETE PROCESSING PIPELINE
     # ========================================================================
     
+    def _check_upload(self, image_file) -> str:
+        """
+        Size and extension checks that need no image data.
+        
+        Returns:
+            Lowercase file extension
+            
+        Raises:
+            ValueError: If the upload is too large or has a disallowed extension
+        """
+        if image_file.size > settings.MAX_IMAGE_SIZE_BYTES:
+            raise ValueError(f"Image size exceeds maximum of {settings.MAX_IMAGE_SIZE_MB}MB")
+        
+        file_ext = image_file.name.split('.')[-1].lower()
+        if f'.{file_ext}' not in settings.ALLOWED_IMAGE_EXTENSIONS:
+            raise ValueError(f"Invalid file format. Allowed: {', '.join(settings.ALLOWED_IMAGE_EXTENSIONS)}")
+        
+        return file_ext
+    
+    def _open_header(self, data: bytes) -> Image.Image:
+        """Open image bytes lazily (header only) and check the format"""
+        try:
+            img = Image.open(io.BytesIO(data))
+        except Exception as e:
+            raise ValueError(f"Invalid or corrupted image file: {str(e)}")
+        
+        if img.format not in settings.ALLOWED_IMAGE_FORMATS:
+            raise ValueError(f"Invalid image format. Allowed: {', '.join(settings.ALLOWED_IMAGE_FORMATS)}")
+        
+        return img
+    
+    def prepare_image(self, image_file) -> Dict[str, Any]:
+        """
+        Validate, read metadata, compress and thumbnail an upload with a
+        single decode.
+        
+        The upload is read into memory once; header, EXIF, the compressed
+        image and the thumbnail are all derived from that buffer and from
+        one (draft-downscaled) decoded image.
+        
+        Args:
+            image_file: Uploaded file object
+            
+        Returns:
+            Dict with 'compressed' and 'thumbnail' buffers, 'compressed_size',
+            'quality' and 'metadata'
+            
+        Raises:
+            ValueError: If the file is not a valid image
+        """
+        # Cheap checks before touching pixel data
+        self._check_upload(image_file)
+        
+        image_file.seek(0)
+        data = image_file.read()
+        image_file.seek(0)
+        
+        return self.prepare_image_bytes(data)
+    
+    def prepare_image_bytes(self, data: bytes) -> Dict[str, Any]:
+        """
+        ``prepare_image`` for raw bytes (e.g. a staged upload).
+        
+        Raises:
+            ValueError: If the data is not a valid image
+        """
+        img = self._open_header(data)
+        metadata = self._metadata_from_image(img)
+        
+        try:
+            # Decoding doubles as integrity check (truncated/corrupted data fails here)
+            decoded = self._decode(img)
+        except Exception as e:
+            raise ValueError(f"Invalid or corrupted image file: {str(e)}")
+        
+        compressed, compressed_size, quality = self._encode_to_target(decoded)
+        thumbnail = self._thumbnail_from_image(decoded)
+        
+        # Fingerprints of the normalized (decoded, bounded) image for analysis caching
+        content_sha256 = content_hash(decoded)
+        perceptual_hash = dhash(decoded)
+        
+        logger.info(
+            f"Image prepared: {metadata['width']}x{metadata['height']} -> "
+            f"{decoded.width}x{decoded.height}, {compressed_size} bytes (quality: {quality})"
+        )
+        
+        return {
+            'compressed': compressed,
+            'compressed_size': compressed_size,
+            'quality': quality,
+            'thumbnail': thumbnail,
+            'metadata': metadata,
+            'content_sha256': content_sha256,
+            'dhash': perceptual_hash,
+        }
+    
     def process_and_upload(self, image_file, asset_id: str, user_id: str) -> Dict[str, Any]:
         """
         Complete image processing pipeline: validate, extract metadata, compress, upload.
@@ -392,34 +565,31 @@ class ImageProcessingService:
         Returns:
             Dict containing URLs, metadata, and file info
         """
-        # Validate image
-        is_valid, error_msg = self.validate_image(image_file)
-        if not is_valid:
-            raise ValueError(error_msg)
-        
-        # Extract metadata
-        metadata = self.extract_metadata(image_file)
-        
-        # Compress image
-        compressed_buffer, compressed_size = self.compress_image(image_file)
+        prepared = self.prepare_image(image_file)
         
         # Generate filename
         filename = self.generate_filename(asset_id, user_id)
         
-        # Upload original (compressed) image
-        original_url = self.upload_to_storage(compressed_buffer, filename)
+        # Upload compressed image and thumbnail in parallel (~one round trip)
+        urls = self.upload_variants(prepared, filename)
         
-        # Create and upload thumbnail
-        image_file.seek(0)
-        thumbnail_buffer = self.create_thumbnail(image_file)
-        thumbnail_filename = self.generate_thumbnail_filename(filename)
-        thumbnail_url = self.upload_to_storage(thumbnail_buffer, thumbnail_filename)
-        
-        # Prepare result
-        result = {
-            'original_url': original_url,
-            'thumbnail_url': thumbnail_url,
-            'file_size': compressed_size,
+        logger.info(f"Image processing complete: {filename}")
+        
+        return self._stored_result(prepared, urls)
+    
+    def _stored_result(self, prepared: Dict[str, Any], urls: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Result of the upload pipelines: stored URLs plus photo metadata.
+        
+        Args:
+            prepared: Output of ``prepare_image``/``prepare_image_bytes``
+            urls: Output of ``upload_variants``
+        """
+        metadata = prepared['metadata']
+        return {
+            'original_url': urls['original_url'],
+            'thumbnail_url': urls['thumbnail_url'],
+            'file_size': prepared['compressed_size'],
             'width': metadata['width'],
             'height': metadata['height'],
             'format': metadata['format'],
@@ -429,11 +599,98 @@ class ImageProcessingService:
             'gps_altitude': metadata.get('gps_altitude'),
             'compass_heading': metadata.get('compass_heading'),
             'device_info': metadata.get('device_info', {}),
+            'content_sha256': prepared['content_sha256'],
+            'dhash': prepared['dhash'],
         }
+    
+    # ========================================================================
+    # STAGED UPLOADS (processed by Celery)
+    # ========================================================================
+    
+    def stage_upload(self, image_file, photo_id: str) -> Dict[str, Any]:
+        """
+        Validate an upload from its header and store the raw bytes for
+        background processing.
         
-        logger.info(f"Image processing complete: {filename}")
+        Only the header and EXIF are parsed here (no pixel decode), so the
+        request returns quickly; ``process_staged_upload`` does the CPU work.
         
-        return result
+        Args:
+            image_file: Uploaded file object
+            photo_id: InspectionPhoto UUID (used as staging object name)
+            
+        Returns:
+            Dict with 'staged_url', 'file_size' and 'metadata'
+            
+        Raises:
+            ValueError: If the file is not a valid image
+        """
+        file_ext = self._check_upload(image_file)
+        
+        image_file.seek(0)
+        data = image_file.read()
+        image_file.seek(0)
+        
+        metadata = self._metadata_from_image(self._open_header(data))
+        
+        if not self.is_available():
+            raise RuntimeError("Cloud Storage is not available")
+        
+        prefix = getattr(settings, 'IMAGE_STAGING_PREFIX', 'staging')
+        staged_url = self.storage.upload(
+            data,
+            f"{prefix}/{photo_id}.{file_ext}",
+            getattr(image_file, 'content_type', None) or 'application/octet-stream'
+        )
+        
+        return {
+            'staged_url': staged_url,
+            'file_size': len(data),
+            'metadata': metadata,
+        }
+    
+    def process_staged_upload(
+        self, staged_url: str, asset_id: str, user_id: str, photo_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Compress, thumbnail and store a staged upload.
+        
+        The staged object is left in place; callers remove it with
+        ``delete_staged_upload`` once the result is recorded.
+        
+        Args:
+            staged_url: URL returned by ``stage_upload``
+            asset_id: Asset UUID
+            user_id: User UUID
+            photo_id: InspectionPhoto id (default: taken from the staged
+                name, ``<prefix>/<photo_id>.<ext>``)
+            
+        Returns:
+            Same dict as ``process_and_upload``
+        """
+        prepared = self.prepare_image_bytes(self.storage.download(staged_url))
+        
+        if not photo_id:
+            photo_id = staged_url.split('?', 1)[0].rsplit('/', 1)[-1].rsplit('.', 1)[0]
+        filename = self.generate_filename(asset_id, user_id, photo_id=photo_id)
+        urls = self.upload_variants(prepared, filename)
+        
+        return self._stored_result(prepared, urls)
+    
+    def delete_staged_upload(self, staged_url: str) -> bool:
+        """
+        Delete a staged object.
+        
+        Returns:
+            True if it is gone; False if the delete failed (callers keep the
+            path so the image cleanup job can sweep it later)
+        """
+        try:
+            self.storage.delete(staged_url)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not delete staged upload {staged_url}: {str(e)}")
+            return False
 
 
 # Create singleton instance
@@ -0,0 +1,243 @@
+"""
+Responsive WebP/AVIF/JPEG variants of inspection photos.
+
+Clients ask for a photo at a display width; the best format is negotiated
+from the ``Accept`` header (AVIF, then WebP, then JPEG) and the width is
+rounded up to one of ``IMAGE_VARIANT_WIDTHS``. Variants are generated on
+first request from the stored JPEG, uploaded next to it and recorded as
+``ImageVariant`` rows; lookups and signed URLs are cached.
+
+AVIF is offered only when Pillow can encode it (Pillow >= 11.2 with
+libavif, or the ``pillow-avif-plugin`` package).
+"""
+import io
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from PIL import Image, features
+
+from apps.images.models import ImageVariant, InspectionPhoto
+from apps.images.services.storage_backends import StorageBackend, get_storage_backend
+
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF codec)
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    ImageVariant.FORMAT_AVIF: 'image/avif',
+    ImageVariant.FORMAT_WEBP: 'image/webp',
+    ImageVariant.FORMAT_JPEG: 'image/jpeg',
+}
+EXTENSIONS = {
+    ImageVariant.FORMAT_AVIF: 'avif',
+    ImageVariant.FORMAT_WEBP: 'webp',
+    ImageVariant.FORMAT_JPEG: 'jpg',
+}
+# Encoder settings with similar perceived quality
+ENCODER_OPTIONS = {
+    ImageVariant.FORMAT_AVIF: {'quality': 60},
+    ImageVariant.FORMAT_WEBP: {'quality': 75, 'method': 4},
+    ImageVariant.FORMAT_JPEG: {'quality': 82, 'optimize': True, 'progressive': True},
+}
+# Preference order when the client accepts several formats
+FORMAT_PREFERENCE = [ImageVariant.FORMAT_AVIF, ImageVariant.FORMAT_WEBP, ImageVariant.FORMAT_JPEG]
+
+CACHE_PREFIX = 'images:variant'
+
+
+def encodable_formats() -> List[str]:
+    """Variant formats the installed Pillow can encode, in preference order"""
+    Image.init()
+    available = []
+    for fmt in FORMAT_PREFERENCE:
+        if fmt == ImageVariant.FORMAT_WEBP and not features.check('webp'):
+            continue
+        if fmt not in Image.SAVE:
+            continue
+        available.append(fmt)
+    return available
+
+
+def parse_accept(header: str) -> Dict[str, float]:
+    """Media types of an ``Accept`` header with their q-values"""
+    accepted = {}
+    for part in (header or '').split(','):
+        pieces = [piece.strip() for piece in part.split(';')]
+        media_type = pieces[0].lower()
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[media_type] = quality
+    return accepted
+
+
+def negotiate_format(accept_header: str, available: Optional[List[str]] = None) -> str:
+    """
+    Pick the variant format for a request.
+
+    AVIF and WebP are only chosen when listed explicitly: browsers send
+    ``*/*`` without supporting them. JPEG is the universal fallback.
+    """
+    available = available if available is not None else encodable_formats()
+    accepted = parse_accept(accept_header)
+    best, best_quality = ImageVariant.FORMAT_JPEG, 0.0
+    for fmt in available:
+        if fmt == ImageVariant.FORMAT_JPEG:
+            continue
+        quality = accepted.get(CONTENT_TYPES[fmt], 0.0)
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+
+class ImageVariantService:
+    """
+    Lazily generated, cached photo variants.
+    """
+
+    def __init__(self, storage: Optional[StorageBackend] = None):
+        """
+        Initialize variant service.
+
+        Args:
+            storage: Backend holding the photos (default: configured backend)
+        """
+        self._storage = storage
+
+    @property
+    def storage(self) -> StorageBackend:
+        return self._storage or get_storage_backend()
+
+    @staticmethod
+    def _widths() -> List[int]:
+        return sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', [320, 640, 1280]))
+
+    def pick_width(self, photo: InspectionPhoto, requested: Optional[int]) -> int:
+        """
+        Smallest configured width covering ``requested`` (largest if none),
+        never wider than the stored image.
+        """
+        widths = self._widths()
+        width = widths[-1]
+        if requested:
+            width = next((candidate for candidate in widths if candidate >= requested), widths[-1])
+        return min(width, photo.width) if photo.width else width
+
+    def variant_name(self, photo: InspectionPhoto, fmt: str, width: int) -> str:
+        return f"variants/{photo.asset_id}/{photo.id}_w{width}.{EXTENSIONS[fmt]}"
+
+    def encode(self, data: bytes, fmt: str, width: int) -> Tuple[bytes, int, int]:
+        """
+        Resize stored JPEG bytes to ``width`` and encode as ``fmt``.
+
+        Returns:
+            Tuple of (encoded bytes, width, height)
+        """
+        img = Image.open(io.BytesIO(data))
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            if img.format == 'JPEG':
+                img.draft('RGB', (width, height))
+            img = img.convert('RGB') if img.mode != 'RGB' else img
+            if img.width != width:
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        output = io.BytesIO()
+        img.save(output, format=fmt, **ENCODER_OPTIONS[fmt])
+        return output.getvalue(), img.width, img.height
+
+    def get_or_create(self, photo: InspectionPhoto, fmt: str, width: int) -> ImageVariant:
+        """
+        Stored variant of ``photo``, generating it on first use.
+
+        Concurrent first requests may both encode; the object name is
+        deterministic and the unique constraint keeps a single row.
+        """
+        variant = ImageVariant.objects.filter(photo=photo, format=fmt, width=width).first()
+        if variant:
+            return variant
+
+        if not photo.original_url:
+            raise ValueError("Photo has not been stored yet")
+
+        payload, actual_width, actual_height = self.encode(self.storage.download(photo.original_url), fmt, width)
+        url = self.storage.upload(payload, self.variant_name(photo, fmt, width), CONTENT_TYPES[fmt])
+        try:
+            with transaction.atomic():
+                variant = ImageVariant.objects.create(
+                    photo=photo,
+                    format=fmt,
+                    width=width,
+                    height=actual_height,
+                    url=url,
+                    file_size=len(payload),
+                )
+        except IntegrityError:
+            variant = ImageVariant.objects.get(photo=photo, format=fmt, width=width)
+
+        logger.info(
+            f"Variant generated for photo {photo.id}: {fmt} {actual_width}x{actual_height}, {len(payload)} bytes"
+        )
+        return variant
+
+    def resolve(self, photo: InspectionPhoto, accept_header: str, requested_width: Optional[int] = None,
+                fmt: Optional[str] = None) -> Dict[str, object]:
+        """
+        Signed URL of the best variant for a client.
+
+        Args:
+            photo: Photo to serve
+            accept_header: Request ``Accept`` header
+            requested_width: Display width in pixels (optional)
+            fmt: Force a format instead of negotiating
+
+        Returns:
+            Dict with 'url', 'format', 'content_type', 'width' and 'expires_in'
+        """
+        available = encodable_formats()
+        if fmt and fmt not in available:
+            raise ValueError(f"Unsupported format: {fmt}. Available: {', '.join(available)}")
+        fmt = fmt or negotiate_format(accept_header, available)
+        width = self.pick_width(photo, requested_width)
+        expiration = getattr(settings, 'IMAGE_SIGNED_URL_EXPIRATION_SECONDS', 3600)
+
+        cache_key = f"{CACHE_PREFIX}:{photo.id}:{fmt}:{width}"
+        cached = cache.get(cache_key)
+        if cached:
+            expires_at = cached.pop('expires_at')
+            return {**cached, 'expires_in': max(0, int(expires_at - time.time()))}
+
+        if fmt == ImageVariant.FORMAT_JPEG and photo.width and width >= photo.width:
+            # The stored image already is this variant
+            url = photo.original_url
+        else:
+            url = self.get_or_create(photo, fmt, width).url
+
+        result = {
+            'url': self.storage.signed_url(url, expiration),
+            'format': fmt,
+            'content_type': CONTENT_TYPES[fmt],
+            'width': width,
+        }
+        # Cached for half the signature lifetime so clients never receive
+        # a URL about to expire
+        cache.set(cache_key, {**result, 'expires_at': time.time() + expiration}, expiration // 2)
+        return {**result, 'expires_in': expiration}
+
+
+image_variant_service = ImageVariantService()
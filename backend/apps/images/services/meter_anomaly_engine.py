@@ -0,0 +1,302 @@
+"""
+Fleet-wide anomaly scoring for meter readings.
+
+Readings are loaded in one query into a DataFrame and scored per
+(asset, reading type) series with vectorized pandas/NumPy operations:
+
+- Level meters (pressure, temperature, fuel...): robust z-score of the value
+  against the rolling median/MAD of the previous ``window`` readings.
+- Cumulative meters (odometer, hour meter): the value always grows, so the
+  rate of change per day is scored the same way, and a decrease (meter
+  rollback or OCR misread) is always an outlier.
+
+Only rows whose flags change are written back, with ``bulk_update``.
+Readings validated by a user are never re-scored.
+"""
+import logging
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.images.models import MeterReading
+
+logger = logging.getLogger(__name__)
+
+CUMULATIVE_TYPES = (MeterReading.TYPE_ODOMETER, MeterReading.TYPE_HOUR_METER)
+
+# Scales MAD to the standard deviation of a normal distribution
+MAD_TO_SIGMA = 1.4826
+
+# Minimum scale as a fraction of the rolling median. A perfectly regular
+# history (MAD 0) would otherwise make any change infinitely anomalous;
+# usage rates vary far more day to day than gauge levels.
+LEVEL_SCALE_FLOOR = 0.01
+RATE_SCALE_FLOOR = 0.10
+
+_FIELDS = [
+    'id', 'asset_id', 'reading_type', 'value', 'created_at', 'validated_by_id',
+    'is_outlier', 'validation_notes', 'previous_reading',
+    'expected_range_min', 'expected_range_max',
+]
+_UPDATE_FIELDS = [
+    'is_outlier', 'validation_notes', 'previous_reading',
+    'expected_range_min', 'expected_range_max', 'updated_at',
+]
+_NOTE_PREFIX = 'Anomalía detectada'
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return Decimal(f'{value:.2f}')
+
+
+class MeterAnomalyEngine:
+    """
+    Vectorized rolling median/MAD scoring of meter readings.
+    """
+
+    def __init__(
+        self,
+        window: Optional[int] = None,
+        min_history: Optional[int] = None,
+        z_threshold: Optional[float] = None,
+    ):
+        """
+        Initialize anomaly engine.
+
+        Args:
+            window: Previous readings used for the rolling statistics
+            min_history: Readings required before a value is scored
+            z_threshold: Robust z-score above which a reading is an outlier
+        """
+        self.window = window or getattr(settings, 'METER_ANOMALY_WINDOW', 10)
+        self.min_history = min_history or getattr(settings, 'METER_ANOMALY_MIN_HISTORY', 3)
+        self.z_threshold = z_threshold or getattr(settings, 'METER_ANOMALY_Z_THRESHOLD', 3.5)
+
+    # ========================================================================
+    # LOADING
+    # ========================================================================
+
+    def load_frame(self, queryset=None) -> pd.DataFrame:
+        """One query for every reading of the given series, oldest first"""
+        queryset = MeterReading.objects.all() if queryset is None else queryset
+        rows = list(queryset.order_by('asset_id', 'reading_type', 'created_at', 'id').values_list(*_FIELDS))
+        frame = pd.DataFrame.from_records(rows, columns=_FIELDS)
+        if frame.empty:
+            return frame
+        frame['value'] = frame['value'].astype(float)
+        for column in ('previous_reading', 'expected_range_min', 'expected_range_max'):
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(float)
+        return frame
+
+    # ========================================================================
+    # SCORING
+    # ========================================================================
+
+    def _rolling_median_mad(self, groups, column: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Median, MAD and count of the previous ``window`` values per row.
+
+        The history matrix is built with grouped shifts (one column per
+        lag), so medians for the whole fleet are a single nanmedian call.
+        """
+        history = np.column_stack([
+            groups[column].shift(lag).to_numpy(dtype=float)
+            for lag in range(1, self.window + 1)
+        ])
+        count = np.sum(~np.isnan(history), axis=1)
+        median = np.full(len(history), np.nan)
+        mad = np.full(len(history), np.nan)
+        has_history = count > 0
+        if has_history.any():
+            median[has_history] = np.nanmedian(history[has_history], axis=1)
+            mad[has_history] = np.nanmedian(
+                np.abs(history[has_history] - median[has_history, None]), axis=1
+            )
+        return median, mad, count
+
+    @staticmethod
+    def _scale(median: np.ndarray, mad: np.ndarray, floor: float) -> np.ndarray:
+        return np.maximum(mad * MAD_TO_SIGMA, np.maximum(np.abs(median) * floor, 1e-6))
+
+    def score(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add scoring columns to a frame from ``load_frame``.
+
+        Adds: prev_value, days, rate, z, rate_z, scored, outlier,
+        range_min, range_max.
+        """
+        frame = frame.copy()
+        if frame.empty:
+            for column in ('prev_value', 'days', 'rate', 'z', 'rate_z', 'range_min', 'range_max'):
+                frame[column] = pd.Series(dtype=float)
+            frame['scored'] = pd.Series(dtype=bool)
+            frame['outlier'] = pd.Series(dtype=bool)
+            return frame
+
+        groups = frame.groupby(['asset_id', 'reading_type'], sort=False)
+        frame['prev_value'] = groups['value'].shift(1)
+        elapsed = frame['created_at'] - groups['created_at'].shift(1)
+        # At least one hour between readings to avoid division blow-ups
+        frame['days'] = np.maximum(elapsed.dt.total_seconds().to_numpy(dtype=float) / 86400.0, 1.0 / 24)
+        frame['rate'] = (frame['value'] - frame['prev_value']) / frame['days']
+
+        values = frame['value'].to_numpy(dtype=float)
+        median, mad, count = self._rolling_median_mad(groups, 'value')
+        level_z = (values - median) / self._scale(median, mad, LEVEL_SCALE_FLOOR)
+
+        rate_groups = frame.groupby(['asset_id', 'reading_type'], sort=False)
+        rate_median, rate_mad, rate_count = self._rolling_median_mad(rate_groups, 'rate')
+        rate_z = (frame['rate'].to_numpy(dtype=float) - rate_median) / self._scale(
+            rate_median, rate_mad, RATE_SCALE_FLOOR
+        )
+
+        cumulative = frame['reading_type'].isin(CUMULATIVE_TYPES).to_numpy()
+        level_outlier = np.abs(np.nan_to_num(level_z)) > self.z_threshold
+        rate_outlier = (np.abs(np.nan_to_num(rate_z)) > self.z_threshold) & (rate_count >= self.min_history)
+
+        # A cumulative meter going backwards is always wrong, unless the
+        # previous reading was itself a spike and this one is the return
+        frame['rate_outlier'] = rate_outlier
+        after_spike = frame.groupby(['asset_id', 'reading_type'], sort=False)['rate_outlier'].shift(
+            1, fill_value=False
+        ).to_numpy(dtype=bool)
+        decreased = cumulative & (frame['value'] < frame['prev_value']).to_numpy() & ~after_spike
+
+        frame['z'] = level_z
+        frame['rate_z'] = rate_z
+        frame['scored'] = np.where(cumulative, rate_count >= self.min_history, count >= self.min_history) | decreased
+        frame['scored'] &= frame['validated_by_id'].isna()
+        frame['outlier'] = frame['scored'] & np.where(cumulative, (rate_outlier & ~after_spike) | decreased, level_outlier)
+
+        band = self.z_threshold * self._scale(median, mad, LEVEL_SCALE_FLOOR)
+        frame['range_min'] = np.where(cumulative, frame['prev_value'], median - band)
+        frame['range_max'] = np.where(cumulative, np.nan, median + band)
+        return frame
+
+    # ========================================================================
+    # PERSISTENCE
+    # ========================================================================
+
+    def _note(self, row) -> str:
+        if row.reading_type in CUMULATIVE_TYPES:
+            if row.value < row.prev_value:
+                return f"{_NOTE_PREFIX}: el valor retrocede respecto a la lectura anterior ({row.prev_value:.2f})"
+            return f"{_NOTE_PREFIX}: tasa de cambio atípica ({row.rate:.1f}/día, z={row.rate_z:.1f})"
+        return f"{_NOTE_PREFIX}: valor fuera de rango (z={row.z:.1f})"
+
+    def apply(self, scored: pd.DataFrame, only_ids: Optional[Iterable] = None) -> int:
+        """
+        Write changed flags back with ``bulk_update``.
+
+        Args:
+            scored: Frame returned by ``score``
+            only_ids: Restrict writes to these reading ids (incremental mode)
+
+        Returns:
+            Number of readings updated
+        """
+        if scored.empty:
+            return 0
+        candidates = scored[scored['scored']]
+        if only_ids is not None:
+            candidates = candidates[candidates['id'].isin(set(only_ids))]
+
+        def differs(new, old):
+            return ~(np.isclose(new, old, atol=0.005) | (np.isnan(new) & np.isnan(old)))
+
+        changed = candidates[
+            (candidates['outlier'] != candidates['is_outlier'])
+            | differs(candidates['prev_value'].to_numpy(float), candidates['previous_reading'].to_numpy(float))
+            | differs(candidates['range_min'].to_numpy(float), candidates['expected_range_min'].to_numpy(float))
+            | differs(candidates['range_max'].to_numpy(float), candidates['expected_range_max'].to_numpy(float))
+        ]
+        if changed.empty:
+            return 0
+
+        now = timezone.now()
+        updates = []
+        for row in changed.itertuples(index=False):
+            notes = row.validation_notes or ''
+            if row.outlier:
+                notes = self._note(row)
+            elif notes.startswith(_NOTE_PREFIX):
+                notes = ''
+            updates.append(MeterReading(
+                id=row.id,
+                is_outlier=bool(row.outlier),
+                validation_notes=notes,
+                previous_reading=_to_decimal(row.prev_value),
+                expected_range_min=_to_decimal(row.range_min),
+                expected_range_max=_to_decimal(row.range_max),
+                updated_at=now,
+            ))
+        MeterReading.objects.bulk_update(updates, _UPDATE_FIELDS, batch_size=500)
+        return len(updates)
+
+    # ========================================================================
+    # ENTRY POINTS
+    # ========================================================================
+
+    def score_fleet(self) -> Dict[str, Any]:
+        """Score every reading of every asset"""
+        start = time.perf_counter()
+        scored = self.score(self.load_frame())
+        updated = self.apply(scored)
+        return self._stats(scored, updated, start)
+
+    def score_incremental(self, since: datetime) -> Dict[str, Any]:
+        """
+        Score readings created since ``since``.
+
+        The full series of each affected (asset, reading type) is loaded so
+        the rolling window has its history, but only new readings are written.
+        """
+        start = time.perf_counter()
+        if timezone.is_naive(since):
+            # created_at is aware: comparing the frame to a naive value raises
+            since = timezone.make_aware(since)
+        new = MeterReading.objects.filter(created_at__gte=since)
+        series = set(new.values_list('asset_id', 'reading_type').distinct())
+        if not series:
+            return self._stats(pd.DataFrame(), 0, start)
+
+        condition = Q()
+        for asset_id, reading_type in series:
+            condition |= Q(asset_id=asset_id, reading_type=reading_type)
+        scored = self.score(self.load_frame(MeterReading.objects.filter(condition)))
+        new_ids = scored.loc[scored['created_at'] >= since, 'id']
+        updated = self.apply(scored, only_ids=new_ids)
+        return self._stats(scored[scored['id'].isin(set(new_ids))], updated, start)
+
+    def score_series(self, asset_id, reading_type: str, reading_ids: Optional[Iterable] = None) -> int:
+        """Score one asset's series (used when a reading arrives)"""
+        scored = self.score(self.load_frame(
+            MeterReading.objects.filter(asset_id=asset_id, reading_type=reading_type)
+        ))
+        return self.apply(scored, only_ids=reading_ids)
+
+    def _stats(self, scored: pd.DataFrame, updated: int, start: float) -> Dict[str, Any]:
+        stats = {
+            'readings': int(len(scored)),
+            'scored': int(scored['scored'].sum()) if not scored.empty else 0,
+            'outliers': int(scored['outlier'].sum()) if not scored.empty else 0,
+            'updated': updated,
+            'duration_seconds': round(time.perf_counter() - start, 3),
+        }
+        logger.info(
+            f"Meter anomaly scoring: {stats['readings']} readings, {stats['outliers']} outliers, "
+            f"{stats['updated']} updated in {stats['duration_seconds']}s"
+        )
+        return stats
+
+
+meter_anomaly_engine = MeterAnomalyEngine()
@@ -0,0 +1,353 @@
+"""
+Storage backends for inspection photo variants and a coordinator that
+uploads the variants of one photo concurrently.
+
+``IMAGE_STORAGE_BACKEND`` selects the backend:
+    - 'gcs': Google Cloud Storage (default when a bucket is configured)
+    - 'local': files under ``IMAGE_LOCAL_STORAGE_ROOT`` (development/tests)
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Objects larger than this use a resumable (chunked) upload session, so a
+# dropped connection retries one chunk instead of the whole file.
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+# Must be a multiple of 256 KB (GCS requirement)
+RESUMABLE_CHUNK_SIZE = 1024 * 1024
+
+UploadData = Union[bytes, io.BytesIO]
+
+
+def _as_bytes(data: UploadData) -> bytes:
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    data.seek(0)
+    return data.read()
+
+
+class StorageBackend:
+    """Minimal interface shared by the storage backends"""
+
+    def upload(self, data: UploadData, name: str, content_type: str = 'image/jpeg') -> str:
+        """
+        Store an object.
+
+        Args:
+            data: Object content
+            name: Object name (path inside the bucket/root)
+            content_type: MIME type
+
+        Returns:
+            URL of the stored object
+        """
+        raise NotImplementedError
+
+    def download(self, url: str) -> bytes:
+        """Read an object by the URL returned from ``upload``"""
+        raise NotImplementedError
+
+    def delete(self, url: str):
+        """Delete an object by the URL returned from ``upload``"""
+        raise NotImplementedError
+
+    def delete_many(self, urls: Iterable[str]) -> int:
+        """
+        Delete several objects; missing objects are ignored.
+
+        Returns:
+            Number of URLs processed
+        """
+        count = 0
+        for url in urls:
+            self.delete(url)
+            count += 1
+        return count
+
+    def list_objects(self, prefix: str, start_after: str = '', limit: int = 1000) -> List[Tuple[str, str, datetime]]:
+        """
+        List objects under a prefix in name order.
+
+        Args:
+            prefix: Object name prefix (e.g. ``IMAGE_STAGING_PREFIX``)
+            start_after: Only names greater than this (resume cursor)
+            limit: Maximum objects returned
+
+        Returns:
+            List of (name, url, last modified) tuples
+        """
+        raise NotImplementedError
+
+    def signed_url(self, url: str, expiration: int = 3600) -> str:
+        """
+        Time-limited URL clients can download the object from.
+
+        Backends without signing return the URL unchanged.
+        """
+        return url
+
+    def is_available(self) -> bool:
+        return True
+
+
+class GCSStorageBackend(StorageBackend):
+    """
+    Google Cloud Storage backend.
+
+    The ``storage.Client`` (and its authorized HTTP session with pooled
+    keep-alive connections) is created once per process and shared by all
+    upload threads instead of one client per upload.
+    """
+
+    _client_lock = threading.Lock()
+
+    def __init__(self, bucket_name: Optional[str] = None, client=None):
+        self.bucket_name = bucket_name or settings.GCP_STORAGE_BUCKET_NAME
+        self._client = client
+        self._bucket = None
+        self._pid = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None or self._pid != os.getpid():
+            with self._client_lock:
+                if self._bucket is None or self._pid != os.getpid():
+                    if self._client is None or self._pid is not None:
+                        # First use, or a forked worker: HTTP sessions are not fork safe
+                        from google.cloud import storage
+                        self._client = storage.Client(project=settings.GCP_PROJECT_ID or None)
+                    self._bucket = self._client.bucket(self.bucket_name)
+                    self._pid = os.getpid()
+        return self._bucket
+
+    def is_available(self) -> bool:
+        if not self.bucket_name:
+            return False
+        try:
+            return self.bucket is not None
+        except Exception as e:
+            logger.error(f"Failed to initialize Cloud Storage: {str(e)}")
+            return False
+
+    def upload(self, data: UploadData, name: str, content_type: str = 'image/jpeg') -> str:
+        payload = _as_bytes(data)
+        if len(payload) > RESUMABLE_UPLOAD_THRESHOLD:
+            blob = self.bucket.blob(name, chunk_size=RESUMABLE_CHUNK_SIZE)
+        else:
+            # Single-request multipart upload
+            blob = self.bucket.blob(name)
+        blob.upload_from_string(payload, content_type=content_type)
+
+        url = f"gs://{self.bucket_name}/{name}"
+        logger.info(f"Image uploaded to {url}")
+        return url
+
+    def _name_from_url(self, url: str) -> str:
+        return url.replace(f"gs://{self.bucket_name}/", '', 1)
+
+    def download(self, url: str) -> bytes:
+        return self.bucket.blob(self._name_from_url(url)).download_as_bytes()
+
+    def delete(self, url: str):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(self._name_from_url(url)).delete()
+        except NotFound:
+            pass
+
+    def signed_url(self, url: str, expiration: int = 3600) -> str:
+        """V4 signed HTTPS URL for a GET of the object"""
+        return self.bucket.blob(self._name_from_url(url)).generate_signed_url(
+            version='v4',
+            expiration=timedelta(seconds=expiration),
+            method='GET',
+        )
+
+    def list_objects(self, prefix: str, start_after: str = '', limit: int = 1000) -> List[Tuple[str, str, datetime]]:
+        objects = []
+        # start_offset is inclusive: skip the cursor itself
+        for blob in self.bucket.list_blobs(
+            prefix=f"{prefix}/", start_offset=start_after or None, max_results=limit + 1
+        ):
+            if blob.name == start_after:
+                continue
+            objects.append((blob.name, f"gs://{self.bucket_name}/{blob.name}", blob.updated))
+            if len(objects) == limit:
+                break
+        return objects
+
+    def delete_many(self, urls: Iterable[str]) -> int:
+        """Delete with batch requests (up to 100 deletes per HTTP call)"""
+        urls = list(urls)
+        bucket = self.bucket
+        for start in range(0, len(urls), 100):
+            # raise_exception=False: objects already gone (404) are not an error
+            with self._client.batch(raise_exception=False):
+                for url in urls[start:start + 100]:
+                    bucket.delete_blob(self._name_from_url(url))
+        return len(urls)
+
+
+class LocalFileSystemStorageBackend(StorageBackend):
+    """Stores objects as files; URLs are ``file://`` absolute paths"""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None):
+        self.root = Path(root or getattr(
+            settings, 'IMAGE_LOCAL_STORAGE_ROOT', settings.BASE_DIR / 'media' / 'inspection_photos'
+        )).resolve()
+
+    def path(self, name: str) -> Path:
+        path = (self.root / name).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid object name: {name}")
+        return path
+
+    def upload(self, data: UploadData, name: str, content_type: str = 'image/jpeg') -> str:
+        path = self.path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(_as_bytes(data))
+        os.replace(tmp_path, path)
+        return path.as_uri()
+
+    def _path_from_url(self, url: str) -> Path:
+        if url.startswith('file://'):
+            return Path(url[len('file://'):])
+        return self.path(url)
+
+    def download(self, url: str) -> bytes:
+        return self._path_from_url(url).read_bytes()
+
+    def delete(self, url: str):
+        self._path_from_url(url).unlink(missing_ok=True)
+
+    def list_objects(self, prefix: str, start_after: str = '', limit: int = 1000) -> List[Tuple[str, str, datetime]]:
+        base = self.root / prefix
+        if not base.is_dir():
+            return []
+        names = sorted(
+            path.relative_to(self.root).as_posix() for path in base.rglob('*')
+            if path.is_file() and not path.name.startswith('.')
+        )
+        objects = []
+        for name in names:
+            if name <= start_after:
+                continue
+            path = self.root / name
+            modified = datetime.fromtimestamp(path.stat().st_mtime, tz=dt_timezone.utc)
+            objects.append((name, path.as_uri(), modified))
+            if len(objects) == limit:
+                break
+        return objects
+
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    """Process-wide backend selected by ``IMAGE_STORAGE_BACKEND``"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'IMAGE_STORAGE_BACKEND', 'gcs')
+                if name == 'local':
+                    _backend = LocalFileSystemStorageBackend()
+                else:
+                    _backend = GCSStorageBackend()
+    return _backend
+
+
+class UploadCoordinator:
+    """
+    Upload the variants of a photo in parallel on a bounded thread pool.
+
+    Uploads are network bound, so threads overlap the round trips and the
+    latency of ``upload_many`` is close to that of the slowest variant. The
+    pool is shared by all requests of the process, which caps concurrent
+    connections to the storage service at ``max_workers``.
+    """
+
+    def __init__(self, backend: Optional[StorageBackend] = None, max_workers: Optional[int] = None):
+        self._backend = backend
+        self.max_workers = max_workers or getattr(settings, 'IMAGE_UPLOAD_MAX_WORKERS', 4)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> StorageBackend:
+        return self._backend or get_storage_backend()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='image-upload'
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def upload_many(self, uploads: Dict[str, Tuple[UploadData, str, str]]) -> Dict[str, str]:
+        """
+        Upload several objects concurrently.
+
+        Args:
+            uploads: {key: (data, name, content_type)}
+
+        Returns:
+            {key: url}
+
+        Raises:
+            Exception: The first upload error; variants that did succeed are
+                deleted so a failed photo leaves no orphan objects
+        """
+        backend = self.backend
+        if len(uploads) == 1:
+            key, (data, name, content_type) = next(iter(uploads.items()))
+            return {key: backend.upload(data, name, content_type)}
+
+        executor = self._get_executor()
+        futures = {
+            key: executor.submit(backend.upload, data, name, content_type)
+            for key, (data, name, content_type) in uploads.items()
+        }
+
+        urls: Dict[str, str] = {}
+        errors: List[Exception] = []
+        for key, future in futures.items():
+            try:
+                urls[key] = future.result()
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            logger.error(f"Upload failed for {len(errors)}/{len(uploads)} variants: {str(errors[0])}")
+            for url in urls.values():
+                try:
+                    backend.delete(url)
+                except Exception as e:
+                    logger.warning(f"Could not remove partial upload {url}: {str(e)}")
+            raise errors[0]
+
+        return urls
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+upload_coordinator = UploadCoordinator()
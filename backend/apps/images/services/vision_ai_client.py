@@ -2,13 +2,28 @@
 Google Cloud Vision AI client for image analysis.
 """
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union
 from google.cloud import vision
 from google.cloud.vision_v1 import types
 from django.conf import settings
 
+from apps.core.rate_limiting import TokenBucket
+
 logger = logging.getLogger(__name__)
 
+# Maximum images per batch_annotate_images call accepted by the API
+VISION_API_MAX_BATCH_IMAGES = 16
+
+LIKELIHOOD_NAMES = ('UNKNOWN', 'VERY_UNLIKELY', 'UNLIKELY', 'POSSIBLE',
+                    'LIKELY', 'VERY_LIKELY')
+
+
+class VisionAIError(Exception):
+    """Per-image error returned inside a successful batch response"""
+
 
 class VisionAIClient:
     """
@@ -16,12 +31,44 @@ class VisionAIClient:
     Provides methods for label detection, OCR, object localization, and more.
     """
     
-    def __init__(self):
-        """Initialize Vision AI client."""
-        self.client = vision.ImageAnnotatorClient()
+    def __init__(self, client=None):
+        """
+        Initialize Vision AI client.
+        
+        Args:
+            client: ImageAnnotatorClient (or a fake for tests). By default the
+                real client is created on first use, so importing this module
+                needs no GCP credentials.
+        """
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._rate_limiter = None
         self.enabled = settings.VISION_AI_ENABLED
         self.max_results = settings.VISION_AI_MAX_RESULTS
     
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = vision.ImageAnnotatorClient()
+        return self._client
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        """Images per second allowed across all batch threads of this process"""
+        if self._rate_limiter is None:
+            per_minute = getattr(settings, 'VISION_AI_IMAGES_PER_MINUTE', 1800)
+            self._rate_limiter = TokenBucket(
+                rate=per_minute / 60.0,
+                capacity=max(VISION_API_MAX_BATCH_IMAGES, per_minute / 60.0)
+            )
+        return self._rate_limiter
+    
     def is_available(self) -> bool:
         """Check if Vision AI is enabled and available."""
         return self.enabled
@@ -315,15 +362,12 @@ class VisionAIClient:
             safe = response.safe_search_annotation
             
             # Convert likelihood enum to string
-            likelihood_name = ('UNKNOWN', 'VERY_UNLIKELY', 'UNLIKELY', 'POSSIBLE',
-                             'LIKELY', 'VERY_LIKELY')
-            
             result = {
-                'adult': likelihood_name[safe.adult],
-                'violence': likelihood_name[safe.violence],
-                'racy': likelihood_name[safe.racy],
-                'spoof': likelihood_name[safe.spoof],
-                'medical': likelihood_name[safe.medical],
+                'adult': LIKELIHOOD_NAMES[safe.adult],
+                'violence': LIKELIHOOD_NAMES[safe.violence],
+                'racy': LIKELIHOOD_NAMES[safe.racy],
+                'spoof': LIKELIHOOD_NAMES[safe.spoof],
+                'medical': LIKELIHOOD_NAMES[safe.medical],
             }
             
             logger.info("Performed safe search detection")
@@ -337,6 +381,75 @@ class VisionAIClient:
     # COMPREHENSIVE ANALYSIS
     # ========================================================================
     
+    def _comprehensive_features(self) -> List[types.Feature]:
+        """Features requested for every inspection photo"""
+        return [
+            types.Feature(type_=types.Feature.Type.LABEL_DETECTION, max_results=self.max_results),
+            types.Feature(type_=types.Feature.Type.TEXT_DETECTION),
+            types.Feature(type_=types.Feature.Type.OBJECT_LOCALIZATION, max_results=self.max_results),
+            types.Feature(type_=types.Feature.Type.IMAGE_PROPERTIES),
+            types.Feature(type_=types.Feature.Type.SAFE_SEARCH_DETECTION),
+        ]
+    
+    def _parse_comprehensive_response(self, response) -> Dict[str, Any]:
+        """Convert an AnnotateImageResponse into the analysis dict"""
+        # Process labels
+        labels = [
+            {
+                'description': label.description,
+                'score': label.score,
+                'topicality': label.topicality,
+            }
+            for label in response.label_annotations
+        ]
+        
+        # Process text
+        texts = [
+            {
+                'description': text.description,
+                'bounding_box': [{'x': v.x, 'y': v.y} for v in text.bounding_poly.vertices],
+            }
+            for text in response.text_annotations
+        ]
+        
+        # Process objects
+        objects = [
+            {
+                'name': obj.name,
+                'score': obj.score,
+                'bounding_box': [{'x': v.x, 'y': v.y} for v in obj.bounding_poly.normalized_vertices],
+            }
+            for obj in response.localized_object_annotations
+        ]
+        
+        # Process colors
+        colors = [
+            {
+                'red': color.color.red,
+                'green': color.color.green,
+                'blue': color.color.blue,
+                'score': color.score,
+                'pixel_fraction': color.pixel_fraction,
+            }
+            for color in response.image_properties_annotation.dominant_colors.colors
+        ]
+        
+        # Process safe search
+        safe = response.safe_search_annotation
+        safe_search = {
+            'adult': LIKELIHOOD_NAMES[safe.adult],
+            'violence': LIKELIHOOD_NAMES[safe.violence],
+            'racy': LIKELIHOOD_NAMES[safe.racy],
+        }
+        
+        return {
+            'labels': labels,
+            'texts': texts,
+            'objects': objects,
+            'dominant_colors': colors,
+            'safe_search': safe_search,
+        }
+    
     def analyze_image_comprehensive(self, image_url: str) -> Dict[str, Any]:
         """
         Perform comprehensive image analysis including labels, text, objects, and properties.
@@ -355,75 +468,10 @@ class VisionAIClient:
             image = self._create_image_from_url(image_url)
             
             # Perform multiple feature detections in one request
-            features = [
-                types.Feature(type_=types.Feature.Type.LABEL_DETECTION, max_results=self.max_results),
-                types.Feature(type_=types.Feature.Type.TEXT_DETECTION),
-                types.Feature(type_=types.Feature.Type.OBJECT_LOCALIZATION, max_results=self.max_results),
-                types.Feature(type_=types.Feature.Type.IMAGE_PROPERTIES),
-                types.Feature(type_=types.Feature.Type.SAFE_SEARCH_DETECTION),
-            ]
-            
-            request = types.AnnotateImageRequest(image=image, features=features)
+            request = types.AnnotateImageRequest(image=image, features=self._comprehensive_features())
             response = self.client.annotate_image(request=request)
             
-            # Process labels
-            labels = [
-                {
-                    'description': label.description,
-                    'score': label.score,
-                    'topicality': label.topicality,
-                }
-                for label in response.label_annotations
-            ]
-            
-            # Process text
-            texts = [
-                {
-                    'description': text.description,
-                    'bounding_box': [{'x': v.x, 'y': v.y} for v in text.bounding_poly.vertices],
-                }
-                for text in response.text_annotations
-            ]
-            
-            # Process objects
-            objects = [
-                {
-                    'name': obj.name,
-                    'score': obj.score,
-                    'bounding_box': [{'x': v.x, 'y': v.y} for v in obj.bounding_poly.normalized_vertices],
-                }
-                for obj in response.localized_object_annotations
-            ]
-            
-            # Process colors
-            colors = [
-                {
-                    'red': color.color.red,
-                    'green': color.color.green,
-                    'blue': color.color.blue,
-                    'score': color.score,
-                    'pixel_fraction': color.pixel_fraction,
-                }
-                for color in response.image_properties_annotation.dominant_colors.colors
-            ]
-            
-            # Process safe search
-            safe = response.safe_search_annotation
-            likelihood_name = ('UNKNOWN', 'VERY_UNLIKELY', 'UNLIKELY', 'POSSIBLE',
-                             'LIKELY', 'VERY_LIKELY')
-            safe_search = {
-                'adult': likelihood_name[safe.adult],
-                'violence': likelihood_name[safe.violence],
-                'racy': likelihood_name[safe.racy],
-            }
-            
-            result = {
-                'labels': labels,
-                'texts': texts,
-                'objects': objects,
-                'dominant_colors': colors,
-                'safe_search': safe_search,
-            }
+            result = self._parse_comprehensive_response(response)
             
             logger.info("Completed comprehensive image analysis")
             return result
@@ -431,6 +479,89 @@ class VisionAIClient:
         except Exception as e:
             logger.error(f"Failed to perform comprehensive analysis: {str(e)}")
             raise
+    
+    # ========================================================================
+    # BATCH ANALYSIS
+    # ========================================================================
+    
+    def analyze_images_comprehensive(self, image_urls: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Comprehensive analysis of many images with ``batch_annotate_images``.
+        
+        Images are grouped into requests of up to BATCH_SIZE_IMAGES (capped
+        at the API maximum of 16); up to VISION_AI_BATCH_CONCURRENCY requests
+        run at once, throttled by a token bucket of VISION_AI_IMAGES_PER_MINUTE.
+        
+        Args:
+            image_urls: URLs of the images to analyze
+            
+        Returns:
+            One entry per URL, in input order: the analysis dict, or the
+            exception for that image (a failed image does not fail the batch)
+        """
+        if not self.is_available():
+            logger.warning("Vision AI is disabled")
+            return [{} for _ in image_urls]
+        
+        batch_size = max(1, min(
+            getattr(settings, 'BATCH_SIZE_IMAGES', VISION_API_MAX_BATCH_IMAGES),
+            VISION_API_MAX_BATCH_IMAGES
+        ))
+        chunks = [
+            list(range(start, min(start + batch_size, len(image_urls))))
+            for start in range(0, len(image_urls), batch_size)
+        ]
+        results: List[Union[Dict[str, Any], Exception]] = [None] * len(image_urls)
+        
+        def run_chunk(indexes: List[int]):
+            chunk_results = self._annotate_batch([image_urls[i] for i in indexes])
+            for index, result in zip(indexes, chunk_results):
+                results[index] = result
+        
+        concurrency = max(1, getattr(settings, 'VISION_AI_BATCH_CONCURRENCY', 4))
+        start_time = time.perf_counter()
+        if len(chunks) <= 1 or concurrency == 1:
+            for indexes in chunks:
+                run_chunk(indexes)
+        else:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks)),
+                                    thread_name_prefix='vision-batch') as executor:
+                list(executor.map(run_chunk, chunks))
+        
+        failed = sum(isinstance(result, Exception) for result in results)
+        logger.info(
+            f"Batch analysis of {len(image_urls)} images in {len(chunks)} requests "
+            f"({failed} failed) took {time.perf_counter() - start_time:.2f}s"
+        )
+        return results
+    
+    def _annotate_batch(self, image_urls: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+        """One batch_annotate_images call; request errors fail every image of the chunk"""
+        self.rate_limiter.acquire(len(image_urls))
+        
+        features = self._comprehensive_features()
+        requests = [
+            types.AnnotateImageRequest(image=self._create_image_from_url(url), features=features)
+            for url in image_urls
+        ]
+        
+        try:
+            response = self.client.batch_annotate_images(requests=requests)
+        except Exception as e:
+            logger.error(f"Batch annotate request for {len(image_urls)} images failed: {str(e)}")
+            return [e] * len(image_urls)
+        
+        results = []
+        for url, image_response in zip(image_urls, response.responses):
+            if image_response.error.message:
+                logger.warning(f"Vision AI error for {url}: {image_response.error.message}")
+                results.append(VisionAIError(image_response.error.message))
+            else:
+                results.append(self._parse_comprehensive_response(image_response))
+        
+        # Defensive: the API returns one response per request
+        results.extend(VisionAIError('Missing response') for _ in range(len(image_urls) - len(results)))
+        return results
 
 
 # Create singleton instance
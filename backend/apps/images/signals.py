@@ -1,4 +1,36 @@
 """
 Signal handlers for image processing events.
+
+Changes that do not touch ``InspectionPhoto.updated_at`` mark their capture
+day dirty so the analytics rollup rebuilds it (see image_analytics.py).
 """
-# Placeholder - will be implemented later
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.images.models import DamageReport, InspectionPhoto, VisualAnomaly
+from apps.images.services.image_analytics import mark_days_dirty, mark_photo_day_dirty
+
+
+def _deleted_with_photo(origin) -> bool:
+    """Whether a delete cascaded from a photo (whose handler marks the day)"""
+    return isinstance(origin, InspectionPhoto) or getattr(origin, 'model', None) is InspectionPhoto
+
+
+@receiver(post_delete, sender=InspectionPhoto)
+def mark_deleted_photo_day(sender, instance, **kwargs):
+    """A deleted photo leaves its day's rollup counting it"""
+    mark_days_dirty([instance.captured_at])
+
+
+@receiver(post_save, sender=DamageReport)
+@receiver(post_save, sender=VisualAnomaly)
+def mark_finding_day_on_save(sender, instance, **kwargs):
+    """Damage reports and anomaly edits change the counters of their photo's day"""
+    mark_photo_day_dirty(instance)
+
+
+@receiver(post_delete, sender=DamageReport)
+@receiver(post_delete, sender=VisualAnomaly)
+def mark_finding_day_on_delete(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_photo(origin):
+        mark_photo_day_dirty(instance)
@@ -3,19 +3,72 @@ Celery tasks for image processing.
 Handles asynchronous image analysis, anomaly detection, and batch operations.
 """
 import logging
+import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from celery import shared_task, group, chord
 from celery.exceptions import MaxRetriesExceededError
+from django.db.models import F
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
 
-from apps.images.models import InspectionPhoto, ImageAnalysisResult
+from apps.images.models import InspectionPhoto, ImageAnalysisResult, ImageBatchJob
 from apps.images.services.image_analysis_service import image_analysis_service
+from apps.images.services.image_processing_service import image_processing_service
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================================================
+# STAGED UPLOAD HELPERS
+# ============================================================================
+
+def _store_staged_upload(photo: InspectionPhoto):
+    """
+    Run the image pipeline on a staged upload and record the stored variants.
+    
+    The photo is PROCESSING while this runs; it goes back to PENDING for
+    the analysis step (which sets COMPLETED/FAILED). If the staged object
+    cannot be deleted its path is kept, so the image cleanup job sweeps it.
+    """
+    InspectionPhoto.objects.filter(pk=photo.pk).update(
+        processing_status=InspectionPhoto.STATUS_PROCESSING,
+        processing_error='',
+        updated_at=timezone.now()
+    )
+    
+    result = image_processing_service.process_staged_upload(
+        photo.staged_upload_path,
+        str(photo.asset_id),
+        str(photo.uploaded_by_id),
+        photo_id=str(photo.pk)
+    )
+    
+    for field in ('original_url', 'thumbnail_url', 'file_size', 'width', 'height', 'format',
+                  'gps_latitude', 'gps_longitude', 'gps_altitude', 'compass_heading', 'device_info'):
+        setattr(photo, field, result[field])
+    photo.set_fingerprint(result['content_sha256'], result['dhash'])
+    photo.processing_status = InspectionPhoto.STATUS_PENDING
+    photo.processing_error = ''
+    photo.save()
+    
+    if image_processing_service.delete_staged_upload(photo.staged_upload_path):
+        photo.staged_upload_path = ''
+        photo.save(update_fields=['staged_upload_path', 'updated_at'])
+    
+    logger.info(f"Staged upload stored for photo {photo.id}")
+
+
+def _discard_staged_upload(photo: InspectionPhoto, error: str):
+    """Mark a photo whose staged upload cannot be processed as failed"""
+    if image_processing_service.delete_staged_upload(photo.staged_upload_path):
+        photo.staged_upload_path = ''
+    photo.processing_status = InspectionPhoto.STATUS_FAILED
+    photo.processing_error = error
+    photo.save(update_fields=['staged_upload_path', 'processing_status', 'processing_error', 'updated_at'])
+
+
 # ============================================================================
 # HIGH PRIORITY TASKS - Critical image analysis
 # ============================================================================
@@ -33,10 +86,10 @@ logger = logging.getLogger(__name__)
 )
 def process_inspection_photo(self, photo_id: str) -> Dict[str, Any]:
     """
-    Process an inspection photo with Vision AI analysis.
+    Process an inspection photo: store the staged upload, then run Vision AI analysis.
     
-    This is the main task for analyzing uploaded photos.
-    Runs in high_priority queue for fast processing.
+    This is the main task for uploaded photos; the upload endpoint only
+    stages the raw bytes. Runs in high_priority queue for fast processing.
     
     Args:
         photo_id: UUID of the InspectionPhoto
@@ -53,11 +106,26 @@ def process_inspection_photo(self, photo_id: str) -> Dict[str, Any]:
         # Get photo
         photo = InspectionPhoto.objects.get(id=photo_id)
         
+        # Compress, thumbnail and store the raw upload (a kept staged path
+        # on a stored photo only waits for the cleanup sweep)
+        if photo.staged_upload_path and not photo.original_url:
+            try:
+                _store_staged_upload(photo)
+            except ValueError as e:
+                # Corrupted image: retrying cannot help
+                logger.warning(f"Staged upload for photo {photo_id} is not a valid image: {str(e)}")
+                _discard_staged_upload(photo, str(e))
+                return {'status': 'failed', 'photo_id': photo_id, 'error': str(e)}
+        
         # Check if already processed
         if photo.processing_status == InspectionPhoto.STATUS_COMPLETED:
             logger.info(f"Photo {photo_id} already processed, skipping")
             return {'status': 'already_processed', 'photo_id': photo_id}
         
+        if not image_analysis_service.is_available():
+            logger.warning(f"Vision AI not available, photo {photo_id} stored without analysis")
+            return {'status': 'stored', 'photo_id': photo_id}
+        
         # Perform analysis
         result = image_analysis_service.analyze_inspection_photo(photo)
         
@@ -263,33 +331,244 @@ def generate_image_report(photo_id: str) -> Dict[str, Any]:
 # BATCH PROCESSING TASKS - Non-urgent bulk operations
 # ============================================================================
 
+def launch_image_batch(job: ImageBatchJob, photo_ids: List[str]) -> ImageBatchJob:
+    """
+    Split a batch into chunks and start the chord that processes it.
+    
+    Each chunk holds at most IMAGE_BATCH_CHUNK_SIZE photos, so a worker
+    never has more than one chunk of images in memory; the chord callback
+    aggregates the chunk results once all of them finished.
+    
+    Args:
+        job: ImageBatchJob to run
+        photo_ids: InspectionPhoto UUIDs
+        
+    Returns:
+        The updated job
+    """
+    chunk_size = max(1, getattr(settings, 'IMAGE_BATCH_CHUNK_SIZE', 20))
+    photo_ids = [str(photo_id) for photo_id in photo_ids]
+    chunks = [photo_ids[i:i + chunk_size] for i in range(0, len(photo_ids), chunk_size)]
+    
+    job.total_photos = len(photo_ids)
+    job.total_chunks = len(chunks)
+    job.status = ImageBatchJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['total_photos', 'total_chunks', 'status', 'started_at', 'updated_at'])
+    
+    if not chunks:
+        finalize_image_batch([], str(job.id))
+        job.refresh_from_db()
+        return job
+    
+    callback = finalize_image_batch.s(str(job.id)).on_error(fail_image_batch.s(str(job.id)))
+    result = chord(
+        process_image_chunk.s(str(job.id), chunk) for chunk in chunks
+    )(callback)
+    
+    job.celery_task_id = result.id
+    job.save(update_fields=['celery_task_id', 'updated_at'])
+    
+    logger.info(f"Image batch {job.id} started: {len(photo_ids)} photos in {len(chunks)} chunks")
+    return job
+
+
 @shared_task(
     name='apps.images.tasks.batch_process_images',
     queue='batch'
 )
-def batch_process_images(photo_ids: List[str]) -> Dict[str, Any]:
+def batch_process_images(photo_ids: List[str], job_id: str = None) -> Dict[str, Any]:
     """
     Process multiple photos in batch.
     
     Args:
         photo_ids: List of InspectionPhoto UUIDs
+        job_id: Existing ImageBatchJob to run (created when omitted)
         
     Returns:
-        Dict with batch processing results
+        Dict with the batch job id for progress tracking
     """
     logger.info(f"Starting batch processing of {len(photo_ids)} photos")
     
-    # Create a group of tasks
-    job = group(process_inspection_photo.s(photo_id) for photo_id in photo_ids)
-    result = job.apply_async()
+    if job_id:
+        job = ImageBatchJob.objects.get(id=job_id)
+    else:
+        job = ImageBatchJob.objects.create()
+    
+    job = launch_image_batch(job, photo_ids)
     
     return {
         'status': 'batch_started',
-        'total_photos': len(photo_ids),
-        'group_id': result.id
+        'job_id': str(job.id),
+        'total_photos': job.total_photos,
+        'total_chunks': job.total_chunks,
+        'chord_id': job.celery_task_id
     }
 
 
+@shared_task(
+    name='apps.images.tasks.process_image_chunk',
+    queue='batch'
+)
+def process_image_chunk(job_id: str, photo_ids: List[str]) -> Dict[str, Any]:
+    """
+    Process one chunk of a batch: store staged uploads, then analyze the
+    chunk with batched Vision AI requests.
+    
+    Never raises, so one bad chunk cannot prevent the chord callback; its
+    photos are counted as failed instead.
+    
+    Args:
+        job_id: ImageBatchJob UUID
+        photo_ids: Photo UUIDs of this chunk
+        
+    Returns:
+        Dict with success/failed/cached counts and per-photo errors
+    """
+    summary = {'success': 0, 'failed': 0, 'cached': 0, 'errors': []}
+    
+    def fail(photo_id, error):
+        summary['failed'] += 1
+        summary['errors'].append({'photo_id': str(photo_id), 'error': error})
+    
+    try:
+        valid_ids = []
+        for photo_id in photo_ids:
+            try:
+                valid_ids.append(uuid.UUID(str(photo_id)))
+            except ValueError:
+                pass  # reported as not found by analyze_batch
+        
+        excluded = set()
+        staged = InspectionPhoto.objects.filter(id__in=valid_ids, original_url='').exclude(staged_upload_path='')
+        for photo in staged:
+            try:
+                _store_staged_upload(photo)
+            except ValueError as e:
+                _discard_staged_upload(photo, str(e))
+                excluded.add(str(photo.id))
+                fail(photo.id, str(e))
+            except Exception as e:
+                logger.error(f"Error storing staged upload for photo {photo.id}: {str(e)}")
+                excluded.add(str(photo.id))
+                fail(photo.id, str(e))
+        
+        to_analyze = [photo_id for photo_id in photo_ids if str(photo_id).lower() not in excluded]
+        results = image_analysis_service.analyze_batch(to_analyze)
+        summary['success'] += results['success']
+        summary['cached'] += results['cached']
+        for item in results['results']:
+            if item['status'] != 'success':
+                fail(item['photo_id'], item.get('error', ''))
+    
+    except Exception as e:
+        logger.error(f"Image batch {job_id} chunk failed: {str(e)}", exc_info=True)
+        # Nothing succeeded yet when analyze_batch raises
+        reported = {error['photo_id'] for error in summary['errors']}
+        for photo_id in photo_ids:
+            if str(photo_id) not in reported:
+                fail(photo_id, str(e))
+    
+    ImageBatchJob.objects.filter(id=job_id).update(
+        processed_photos=F('processed_photos') + summary['success'] + summary['failed'],
+        succeeded_photos=F('succeeded_photos') + summary['success'],
+        failed_photos=F('failed_photos') + summary['failed'],
+        cached_photos=F('cached_photos') + summary['cached'],
+        completed_chunks=F('completed_chunks') + 1,
+        updated_at=timezone.now()
+    )
+    
+    return summary
+
+
+@shared_task(
+    name='apps.images.tasks.finalize_image_batch',
+    queue='batch'
+)
+def finalize_image_batch(chunk_results: List[Dict[str, Any]], job_id: str) -> Dict[str, Any]:
+    """
+    Chord callback: aggregate chunk results and close the batch job.
+    
+    Args:
+        chunk_results: Return values of process_image_chunk
+        job_id: ImageBatchJob UUID
+        
+    Returns:
+        Aggregated batch summary
+    """
+    job = ImageBatchJob.objects.get(id=job_id)
+    
+    errors = [error for result in chunk_results for error in result.get('errors', [])]
+    summary = {
+        'success': sum(result.get('success', 0) for result in chunk_results),
+        'failed': sum(result.get('failed', 0) for result in chunk_results),
+        'cached': sum(result.get('cached', 0) for result in chunk_results),
+        'chunks': len(chunk_results),
+        # Keep the summary row small for very large batches
+        'errors': errors[:100],
+        'errors_truncated': len(errors) > 100,
+    }
+    if job.started_at:
+        summary['duration_seconds'] = round((timezone.now() - job.started_at).total_seconds(), 2)
+    
+    job.status = ImageBatchJob.STATUS_COMPLETED
+    job.completed_at = timezone.now()
+    job.result_summary = summary
+    job.save(update_fields=['status', 'completed_at', 'result_summary', 'updated_at'])
+    
+    logger.info(
+        f"Image batch {job_id} completed: {summary['success']} ok, "
+        f"{summary['failed']} failed, {summary['cached']} cached"
+    )
+    return summary
+
+
+@shared_task(
+    name='apps.images.tasks.fail_image_batch',
+    queue='batch'
+)
+def fail_image_batch(request, exc, traceback, job_id: str):
+    """Chord error callback: a chunk could not run at all (e.g. worker lost)"""
+    logger.error(f"Image batch {job_id} failed: {exc}")
+    ImageBatchJob.objects.filter(id=job_id).update(
+        status=ImageBatchJob.STATUS_FAILED,
+        completed_at=timezone.now(),
+        result_summary={'error': str(exc)},
+        updated_at=timezone.now()
+    )
+
+
+@shared_task(
+    name='apps.images.tasks.score_meter_readings',
+    queue='batch'
+)
+def score_meter_readings(since: str = None) -> Dict[str, Any]:
+    """
+    Flag anomalous meter readings using rolling median/MAD statistics.
+    Scheduled nightly for the whole fleet.
+    
+    Args:
+        since: Only score readings created after this ISO datetime (naive
+            values are taken in the project time zone)
+        
+    Returns:
+        Dict with scoring statistics
+    """
+    from apps.images.services.meter_anomaly_engine import meter_anomaly_engine
+    
+    if since:
+        since_dt = parse_datetime(since)
+        if since_dt is None:
+            raise ValueError(f"Invalid 'since' datetime: {since}")
+        if timezone.is_naive(since_dt):
+            since_dt = timezone.make_aware(since_dt)
+        stats = meter_anomaly_engine.score_incremental(since_dt)
+    else:
+        stats = meter_anomaly_engine.score_fleet()
+    
+    return {'status': 'success', **stats}
+
+
 @shared_task(
     name='apps.images.tasks.generate_comparison_report',
     queue='batch'
@@ -373,74 +652,87 @@ def archive_old_messages() -> Dict[str, Any]:
 )
 def cleanup_old_images() -> Dict[str, Any]:
     """
-    Cleanup old cached image analysis results.
-    Scheduled to run weekly on Sunday at 3 AM.
+    Delete expired cached analysis results and photos past the retention
+    period, in small batches.
+    Scheduled to run weekly on Sunday at 3 AM; a run that hits its time
+    budget checkpoints its cursor and re-enqueues itself.
     
     Returns:
         Dict with cleanup results
     """
-    logger.info("Starting cleanup of old cached images")
+    from apps.images.services.image_cleanup import ImageCleanup
+    
+    logger.info("Starting cleanup of old images")
     
     try:
-        # Delete expired cached results
-        cutoff_date = timezone.now()
-        expired_results = ImageAnalysisResult.objects.filter(
-            cached_result=True,
-            cache_expires_at__lt=cutoff_date
-        )
+        result = ImageCleanup().run()
         
-        count = expired_results.count()
-        expired_results.delete()
-        
-        logger.info(f"Deleted {count} expired cached results")
+        if result['status'] == 'partial':
+            cleanup_old_images.apply_async(
+                countdown=getattr(settings, 'IMAGE_CLEANUP_REQUEUE_DELAY_SECONDS', 30)
+            )
         
-        return {'status': 'success', 'deleted_count': count}
+        return result
         
     except Exception as exc:
         logger.error(f"Error cleaning up old images: {str(exc)}")
         return {'status': 'error', 'error': str(exc)}
 
 
+@shared_task(
+    name='apps.images.tasks.refresh_image_analytics',
+    queue='batch'
+)
+def refresh_image_analytics() -> Dict[str, Any]:
+    """
+    Recompute the daily image analytics rollup for days with changed photos.
+    Scheduled every 30 minutes.
+    
+    Returns:
+        Dict with the refreshed days
+    """
+    from apps.images.services.image_analytics import image_analytics_rollup
+    
+    try:
+        return {'status': 'success', **image_analytics_rollup.refresh()}
+        
+    except Exception as exc:
+        logger.error(f"Error refreshing image analytics: {str(exc)}")
+        return {'status': 'error', 'error': str(exc)}
+
+
 @shared_task(
     name='apps.images.tasks.generate_daily_analytics',
     queue='batch'
 )
 def generate_daily_analytics() -> Dict[str, Any]:
     """
-    Generate daily analytics report.
+    Generate daily analytics report from the image analytics rollup.
     Scheduled to run daily at 6 AM.
     
     Returns:
         Dict with analytics data
     """
+    from apps.images.services.image_analytics import image_analytics_rollup
+    
     logger.info("Generating daily analytics")
     
     try:
-        yesterday = timezone.now() - timedelta(days=1)
+        image_analytics_rollup.refresh()
         
-        # Count photos processed yesterday
-        photos_processed = InspectionPhoto.objects.filter(
-            processed_at__gte=yesterday,
-            processing_status=InspectionPhoto.STATUS_COMPLETED
-        ).count()
-        
-        # Count anomalies detected
-        from apps.images.models import VisualAnomaly
-        anomalies_detected = VisualAnomaly.objects.filter(
-            created_at__gte=yesterday
-        ).count()
-        
-        # Count critical anomalies
-        critical_anomalies = VisualAnomaly.objects.filter(
-            created_at__gte=yesterday,
-            severity=VisualAnomaly.SEVERITY_CRITICAL
-        ).count()
+        yesterday = timezone.localdate() - timedelta(days=1)
+        totals = image_analytics_rollup.summarize(date_from=yesterday, date_to=yesterday)
         
         analytics = {
-            'date': yesterday.date().isoformat(),
-            'photos_processed': photos_processed,
-            'anomalies_detected': anomalies_detected,
-            'critical_anomalies': critical_anomalies
+            'date': yesterday.isoformat(),
+            'photos_processed': totals['photos_completed'],
+            'anomalies_detected': sum(
+                totals[name] for name in ('anomalies_low', 'anomalies_medium', 'anomalies_high', 'anomalies_critical')
+            ),
+            'critical_anomalies': totals['anomalies_critical'],
+            'damage_reports': totals['damage_reports'],
+            'vision_ai_calls': totals['vision_ai_calls'],
+            'api_cost_usd': float(totals['api_cost_usd']),
         }
         
         logger.info(f"Daily analytics: {analytics}")
@@ -0,0 +1,89 @@
+"""
+Test doubles for the images app.
+
+``FakeImageAnnotatorClient`` stands in for ``vision.ImageAnnotatorClient``:
+it returns real Vision response protos, records every call and can simulate
+latency and per-image errors, so the Vision client's parsing and batching
+code runs unchanged in tests.
+
+Usage:
+    fake = FakeImageAnnotatorClient(labels={'gs://b/a.jpg': ['Truck']})
+    client = VisionAIClient(client=fake)
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from google.cloud.vision_v1 import types
+
+
+class FakeImageAnnotatorClient:
+    """In-memory ImageAnnotatorClient"""
+
+    def __init__(
+        self,
+        labels: Optional[Dict[str, Iterable[str]]] = None,
+        texts: Optional[Dict[str, Iterable[str]]] = None,
+        errors: Optional[Dict[str, str]] = None,
+        latency: float = 0.0,
+        default_labels: Iterable[str] = ('Vehicle',),
+    ):
+        """
+        Args:
+            labels: image URI -> label descriptions
+            texts: image URI -> OCR strings
+            errors: image URI -> per-image error message
+            latency: seconds each API call takes
+            default_labels: labels for URIs without an entry
+        """
+        self.labels = labels or {}
+        self.texts = texts or {}
+        self.errors = errors or {}
+        self.latency = latency
+        self.default_labels = list(default_labels)
+        self.calls: List[tuple] = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _response_for(self, uri: str) -> types.AnnotateImageResponse:
+        if uri in self.errors:
+            return types.AnnotateImageResponse(error={'code': 3, 'message': self.errors[uri]})
+        return types.AnnotateImageResponse(
+            label_annotations=[
+                types.EntityAnnotation(description=label, score=0.9, topicality=0.9)
+                for label in self.labels.get(uri, self.default_labels)
+            ],
+            text_annotations=[
+                types.EntityAnnotation(description=text) for text in self.texts.get(uri, [])
+            ],
+            safe_search_annotation=types.SafeSearchAnnotation(adult=1, violence=1, racy=1),
+        )
+
+    def _call(self, name: str, uris: List[str]):
+        with self._lock:
+            self.calls.append((name, uris))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def annotate_image(self, request=None, **kwargs):
+        uri = request.image.source.image_uri
+        self._call('annotate_image', [uri])
+        return self._response_for(uri)
+
+    def batch_annotate_images(self, requests=None, **kwargs):
+        uris = [request.image.source.image_uri for request in requests]
+        self._call('batch_annotate_images', uris)
+        return types.BatchAnnotateImagesResponse(
+            responses=[self._response_for(uri) for uri in uris]
+        )
+
+    def calls_to(self, name: str) -> List[List[str]]:
+        """URIs sent in each call to ``name``"""
+        return [uris for call_name, uris in self.calls if call_name == name]
@@ -96,7 +96,7 @@ class TestAsyncProcessingProperties(TransactionTestCase):
         response_time = end_time - start_time
         
         # Verify response is successful
-        self.assertEqual(response.status_code, http_status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, http_status.HTTP_202_ACCEPTED)
         
         # Verify response time is under 2 seconds (allowing some margin)
         # In production with async processing, this should be < 1s
@@ -136,7 +136,7 @@ class TestAsyncProcessingProperties(TransactionTestCase):
         )
         
         # Verify response is successful
-        self.assertEqual(response.status_code, http_status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, http_status.HTTP_202_ACCEPTED)
         
         # Verify processing status is PENDING or COMPLETED
         # (COMPLETED if Vision AI processed synchronously, which is OK for now)
@@ -176,7 +176,7 @@ class TestAsyncProcessingProperties(TransactionTestCase):
             upload_times.append(upload_time)
             
             # Verify each upload succeeds
-            self.assertEqual(response.status_code, http_status.HTTP_201_CREATED)
+            self.assertEqual(response.status_code, http_status.HTTP_202_ACCEPTED)
         
         # Verify all uploads completed in reasonable time
         for i, upload_time in enumerate(upload_times):
@@ -226,7 +226,7 @@ class TestAsyncProcessingProperties(TransactionTestCase):
                 response_time = end_time - start_time
                 
                 # Verify response is successful
-                self.assertEqual(response.status_code, http_status.HTTP_201_CREATED)
+                self.assertEqual(response.status_code, http_status.HTTP_202_ACCEPTED)
                 
                 # Verify response time is reasonable
                 self.assertLess(
@@ -254,7 +254,7 @@ class TestAsyncProcessingProperties(TransactionTestCase):
             format='multipart'
         )
         
-        self.assertEqual(upload_response.status_code, http_status.HTTP_201_CREATED)
+        self.assertEqual(upload_response.status_code, http_status.HTTP_202_ACCEPTED)
         photo_id = upload_response.data['id']
         
         # Immediately try to retrieve the photo
@@ -288,7 +288,7 @@ class TestAsyncProcessingProperties(TransactionTestCase):
             format='multipart'
         )
         
-        self.assertEqual(response.status_code, http_status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, http_status.HTTP_202_ACCEPTED)
         photo_id = response.data['id']
         
         # Get photo from database
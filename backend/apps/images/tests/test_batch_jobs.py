@@ -0,0 +1,128 @@
+"""
+Tests for chunked, chord-based batch image processing.
+"""
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images import tasks
+from apps.images.models import ImageBatchJob, InspectionPhoto
+from apps.images.services.image_analysis_service import ImageAnalysisService
+from apps.images.services.vision_ai_client import VisionAIClient
+from apps.images.testing import FakeImageAnnotatorClient
+from apps.images.views import ImageBatchJobViewSet
+from config.celery import app as celery_app
+
+
+@override_settings(IMAGE_BATCH_CHUNK_SIZE=4, BATCH_SIZE_IMAGES=4, VISION_AI_ENABLED=True)
+class ImageBatchJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='batch@test.com',
+            password='SecurePass123!',
+            first_name='Batch',
+            last_name='User',
+            role=role,
+            rut='66666666-6'
+        )
+        location = Location.objects.create(name='Faena Sur')
+        cls.asset = Asset.objects.create(
+            name='Camioneta 2',
+            asset_code='CAM-901',
+            vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+            location=location,
+            serial_number='SN-90001',
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        self._eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.fake = FakeImageAnnotatorClient()
+        self._service = tasks.image_analysis_service
+        tasks.image_analysis_service = ImageAnalysisService(vision_client=VisionAIClient(client=self.fake))
+
+    def tearDown(self):
+        celery_app.conf.task_always_eager = self._eager
+        tasks.image_analysis_service = self._service
+
+    def _photos(self, count):
+        return [
+            InspectionPhoto.objects.create(
+                asset=self.asset,
+                original_url=f'gs://bucket/batch-{i}.jpg',
+                file_size=1000,
+                width=800,
+                height=600,
+                format='JPEG',
+                captured_at=timezone.now(),
+                uploaded_by=self.user,
+            )
+            for i in range(count)
+        ]
+
+    def test_batch_is_chunked_and_aggregated(self):
+        photos = self._photos(10)
+        self.fake.errors[photos[7].original_url] = 'Bad image data'
+        job = ImageBatchJob.objects.create(created_by=self.user)
+
+        tasks.batch_process_images([str(photo.id) for photo in photos], str(job.id))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageBatchJob.STATUS_COMPLETED)
+        self.assertEqual((job.total_chunks, job.completed_chunks), (3, 3))
+        self.assertEqual(job.processed_photos, 10)
+        self.assertEqual(job.succeeded_photos, 9)
+        self.assertEqual(job.failed_photos, 1)
+        self.assertEqual(job.progress_percent, 100.0)
+        self.assertEqual(job.result_summary['errors'][0]['photo_id'], str(photos[7].id))
+        # No chunk sent more than the chunk size to a worker
+        self.assertTrue(all(len(uris) <= 4 for uris in self.fake.calls_to('batch_annotate_images')))
+
+    def test_chunk_counters_are_incremental(self):
+        photos = self._photos(3)
+        job = ImageBatchJob.objects.create(total_photos=6, total_chunks=2)
+
+        tasks.process_image_chunk(str(job.id), [str(photo.id) for photo in photos])
+
+        job.refresh_from_db()
+        self.assertEqual(job.processed_photos, 3)
+        self.assertEqual(job.completed_chunks, 1)
+        self.assertEqual(job.progress_percent, 50.0)
+        self.assertEqual(job.status, ImageBatchJob.STATUS_PENDING)
+
+    def test_chunk_counts_unknown_photos_as_failed(self):
+        job = ImageBatchJob.objects.create(total_photos=2, total_chunks=1)
+
+        summary = tasks.process_image_chunk(str(job.id), ['not-a-uuid', '00000000-0000-0000-0000-000000000000'])
+
+        self.assertEqual(summary['failed'], 2)
+        job.refresh_from_db()
+        self.assertEqual(job.failed_photos, 2)
+
+    def test_empty_batch_completes(self):
+        job = ImageBatchJob.objects.create()
+
+        tasks.batch_process_images([], str(job.id))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageBatchJob.STATUS_COMPLETED)
+
+    def test_progress_endpoint(self):
+        job = ImageBatchJob.objects.create(
+            created_by=self.user, total_photos=8, processed_photos=2,
+            status=ImageBatchJob.STATUS_RUNNING
+        )
+        request = APIRequestFactory().get(f'/api/v1/images/batches/{job.id}/')
+        force_authenticate(request, user=self.user)
+
+        response = ImageBatchJobViewSet.as_view({'get': 'retrieve'})(request, pk=str(job.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['progress_percent'], 25.0)
+        self.assertEqual(response.data['status'], ImageBatchJob.STATUS_RUNNING)
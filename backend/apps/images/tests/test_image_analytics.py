@@ -0,0 +1,235 @@
+"""
+Tests for the daily image analytics rollup and the statistics endpoint.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images import tasks
+from apps.images.models import (
+    ImageAnalysisResult,
+    DamageReport,
+    ImageAnalyticsDaily,
+    ImageAnalyticsDirtyDay,
+    InspectionPhoto,
+    VisualAnomaly,
+)
+from apps.images.services.image_analytics import ImageAnalyticsRollup
+from apps.images.views import InspectionPhotoViewSet
+
+
+@override_settings(VISION_AI_COST_PER_IMAGE_USD=0.0015)
+class ImageAnalyticsRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='analytics@test.com',
+            password='SecurePass123!',
+            first_name='Analytics',
+            last_name='User',
+            role=role,
+            rut='99999999-9'
+        )
+        location = Location.objects.create(name='Faena Este')
+        cls.assets = [
+            Asset.objects.create(
+                name=f'Grúa {i}',
+                asset_code=f'GRU-97{i}',
+                vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+                location=location,
+                serial_number=f'SN-9700{i}',
+                created_by=cls.user,
+            )
+            for i in range(2)
+        ]
+
+    def _photo(self, asset, days_ago, anomalies=(), confidence=None, cached=False, **fields):
+        photo = InspectionPhoto.objects.create(
+            asset=asset,
+            original_url=f'gs://bucket/{asset.asset_code}-{days_ago}.jpg',
+            file_size=1000,
+            width=800,
+            height=600,
+            format='JPEG',
+            captured_at=timezone.now() - timedelta(days=days_ago),
+            uploaded_by=self.user,
+            processing_status=InspectionPhoto.STATUS_COMPLETED,
+            **fields
+        )
+        result = ImageAnalysisResult.objects.create(
+            photo=photo,
+            labels=[],
+            detected_objects=[],
+            text_annotations=[],
+            safe_search={},
+            anomalies_detected=bool(anomalies),
+            anomaly_confidence=confidence,
+            processing_time_ms=1,
+            vision_ai_used=True,
+            cached_result=cached,
+        )
+        for severity in anomalies:
+            VisualAnomaly.objects.create(
+                photo=photo,
+                analysis_result=result,
+                anomaly_type=VisualAnomaly.TYPE_CORROSION,
+                severity=severity,
+                confidence=0.9,
+                bounding_box={},
+            )
+        return photo
+
+    def test_rollup_aggregates_per_asset_and_day(self):
+        self._photo(self.assets[0], 3, anomalies=[VisualAnomaly.SEVERITY_HIGH, VisualAnomaly.SEVERITY_CRITICAL],
+                    confidence=0.8, gps_latitude=-33.4, gps_longitude=-70.6)
+        self._photo(self.assets[0], 3, confidence=0.4)
+        self._photo(self.assets[0], 3, cached=True)
+        self._photo(self.assets[1], 2, anomalies=[VisualAnomaly.SEVERITY_LOW])
+
+        ImageAnalyticsRollup().refresh()
+
+        row = ImageAnalyticsDaily.objects.get(asset=self.assets[0])
+        self.assertEqual(row.photos_total, 3)
+        self.assertEqual(row.photos_completed, 3)
+        self.assertEqual(row.photos_with_gps, 1)
+        self.assertEqual(row.photos_with_anomalies, 1)
+        self.assertEqual((row.anomalies_high, row.anomalies_critical), (1, 1))
+        self.assertAlmostEqual(row.average_anomaly_confidence, 0.6)
+        self.assertEqual(row.vision_ai_calls, 2)
+        self.assertEqual(row.cached_results, 1)
+        self.assertEqual(row.api_cost_usd, Decimal('0.0030'))
+        self.assertEqual(ImageAnalyticsDaily.objects.get(asset=self.assets[1]).anomalies_low, 1)
+
+    def test_refresh_only_recomputes_changed_days(self):
+        old = self._photo(self.assets[0], 5)
+        self._photo(self.assets[0], 4)
+        rollup = ImageAnalyticsRollup()
+        rollup.refresh()
+
+        self.assertEqual(rollup.refresh()['days'], [])
+
+        old.processing_status = InspectionPhoto.STATUS_FAILED
+        old.save()
+        refreshed = rollup.refresh()
+
+        self.assertEqual(refreshed['days'], [timezone.localdate(old.captured_at).isoformat()])
+        row = ImageAnalyticsDaily.objects.get(date=timezone.localdate(old.captured_at))
+        self.assertEqual((row.photos_completed, row.photos_failed), (0, 1))
+
+    def test_rows_without_photos_are_removed(self):
+        photo = self._photo(self.assets[0], 5)
+        rollup = ImageAnalyticsRollup()
+        rollup.refresh()
+
+        photo.captured_at = timezone.now() - timedelta(days=6)
+        photo.save()
+        # The photo moved: both its old and new day are rebuilt
+        rollup.rebuild_days([
+            timezone.localdate() - timedelta(days=5),
+            timezone.localdate() - timedelta(days=6),
+        ])
+
+        self.assertEqual(
+            list(ImageAnalyticsDaily.objects.values_list('date', flat=True)),
+            [timezone.localdate(photo.captured_at)]
+        )
+
+    def test_statistics_reads_rollup_and_today(self):
+        self._photo(self.assets[0], 3, anomalies=[VisualAnomaly.SEVERITY_MEDIUM], confidence=0.5)
+        self._photo(self.assets[1], 2)
+        ImageAnalyticsRollup().refresh()
+        # Not yet in the rollup: counted live
+        self._photo(self.assets[0], 0, gps_latitude=-33.4, gps_longitude=-70.6)
+        view = InspectionPhotoViewSet.as_view({'get': 'statistics'})
+
+        def get(**params):
+            request = APIRequestFactory().get('/api/v1/images/photos/statistics/', params)
+            force_authenticate(request, user=self.user)
+            return view(request)
+
+        with self.assertNumQueries(4):  # rollup sum + live photos, anomalies, damage
+            response = get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_photos'], 3)
+        self.assertEqual(response.data['photos_by_status'][InspectionPhoto.STATUS_COMPLETED], 3)
+        self.assertEqual(response.data['photos_with_gps'], 1)
+        self.assertEqual(response.data['anomalies_by_severity'][VisualAnomaly.SEVERITY_MEDIUM], 1)
+        self.assertEqual(response.data['average_anomaly_confidence'], 0.5)
+
+        filtered = get(asset_id=str(self.assets[0].id), date_to=(timezone.localdate() - timedelta(days=1)).isoformat())
+        self.assertEqual(filtered.data['total_photos'], 1)
+
+        self.assertEqual(get(date_from='yesterday').status_code, 400)
+
+    def test_changes_outside_photo_rows_mark_days_dirty(self):
+        deleted = self._photo(self.assets[0], 5)
+        kept = self._photo(self.assets[1], 4, anomalies=[VisualAnomaly.SEVERITY_LOW])
+        rollup = ImageAnalyticsRollup()
+        rollup.refresh()
+        deleted_day = timezone.localdate(deleted.captured_at)
+        kept_day = timezone.localdate(kept.captured_at)
+
+        deleted.delete()
+        anomaly = kept.anomalies.get()
+        anomaly.severity = VisualAnomaly.SEVERITY_CRITICAL
+        anomaly.save()
+        DamageReport.objects.create(
+            photo=kept,
+            asset=self.assets[1],
+            damage_type=DamageReport.DAMAGE_TYPE_CHOICES[0][0],
+            severity=DamageReport.SEVERITY_CHOICES[0][0],
+            confidence=0.8,
+            auto_generated_description='Abolladura en puerta',
+        )
+
+        refreshed = rollup.refresh()
+
+        self.assertEqual(refreshed['days'], sorted([deleted_day.isoformat(), kept_day.isoformat()]))
+        self.assertFalse(ImageAnalyticsDaily.objects.filter(date=deleted_day).exists())
+        row = ImageAnalyticsDaily.objects.get(date=kept_day)
+        self.assertEqual((row.anomalies_low, row.anomalies_critical, row.damage_reports), (0, 1, 1))
+        self.assertFalse(ImageAnalyticsDirtyDay.objects.exists())
+        self.assertEqual(rollup.refresh()['days'], [])
+
+    def test_statistics_falls_back_to_live_aggregate_for_unsupported_filters(self):
+        noon = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=3), time(12)))
+        failed = self._photo(self.assets[0], 3)
+        InspectionPhoto.objects.filter(pk=failed.pk).update(
+            processing_status=InspectionPhoto.STATUS_FAILED, captured_at=noon
+        )
+        later = self._photo(self.assets[0], 3)
+        InspectionPhoto.objects.filter(pk=later.pk).update(captured_at=noon + timedelta(hours=1))
+        ImageAnalyticsRollup().refresh()
+        view = InspectionPhotoViewSet.as_view({'get': 'statistics'})
+
+        def get(**params):
+            request = APIRequestFactory().get('/api/v1/images/photos/statistics/', params)
+            force_authenticate(request, user=self.user)
+            return view(request)
+
+        by_status = get(processing_status=InspectionPhoto.STATUS_FAILED)
+        self.assertEqual(by_status.data['total_photos'], 1)
+
+        # A time of day narrows the range instead of being truncated to the day
+        after = timezone.localtime(noon + timedelta(minutes=30)).replace(tzinfo=None)
+        self.assertEqual(get(date_from=after.isoformat()).data['total_photos'], 1)
+        self.assertEqual(get(date_from=noon.date().isoformat()).data['total_photos'], 2)
+
+        self.assertEqual(get(processing_status='FAILED', date_to='not-a-date').status_code, 400)
+
+    def test_daily_task_reports_yesterday(self):
+        self._photo(self.assets[0], 1, anomalies=[VisualAnomaly.SEVERITY_CRITICAL])
+        self._photo(self.assets[0], 3)
+
+        result = tasks.generate_daily_analytics()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['analytics']['photos_processed'], 1)
+        self.assertEqual(result['analytics']['critical_anomalies'], 1)
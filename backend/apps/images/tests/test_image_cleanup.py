@@ -0,0 +1,211 @@
+"""
+Tests for the chunked, resumable image cleanup job.
+"""
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images.models import ImageAnalysisResult, InspectionPhoto, MeterReading
+from apps.images.services.image_cleanup import CURSOR_CACHE_KEY, LOCK_CACHE_KEY, ImageCleanup
+from apps.images.services.storage_backends import LocalFileSystemStorageBackend
+from apps.work_orders.models import WorkOrder
+
+
+class FakeClock:
+    def __init__(self, step=0.0):
+        self.now = 0.0
+        self.step = step
+        self.sleeps = []
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@override_settings(IMAGE_RETENTION_DAYS=365)
+class ImageCleanupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='cleanup@test.com',
+            password='SecurePass123!',
+            first_name='Cleanup',
+            last_name='User',
+            role=role,
+            rut='88888888-8'
+        )
+        location = Location.objects.create(name='Faena Oeste')
+        cls.asset = Asset.objects.create(
+            name='Camioneta 3',
+            asset_code='CAM-960',
+            vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+            location=location,
+            serial_number='SN-96000',
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        cache.delete(CURSOR_CACHE_KEY)
+        cache.delete(LOCK_CACHE_KEY)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = LocalFileSystemStorageBackend(self.tmp.name)
+
+    def _photo(self, name, age_days, **fields):
+        original_url = self.storage.upload(b'jpeg', f'{name}.jpg')
+        thumbnail_url = self.storage.upload(b'thumb', f'{name}_thumb.jpg')
+        photo = InspectionPhoto.objects.create(
+            asset=self.asset,
+            original_url=original_url,
+            thumbnail_url=thumbnail_url,
+            file_size=4,
+            width=1,
+            height=1,
+            format='JPEG',
+            captured_at=timezone.now(),
+            uploaded_by=self.user,
+            **fields
+        )
+        InspectionPhoto.objects.filter(pk=photo.pk).update(
+            created_at=timezone.now() - timedelta(days=age_days)
+        )
+        return photo
+
+    def _cached_result(self, photo, expired):
+        delta = timedelta(days=-1 if expired else 1)
+        return ImageAnalysisResult.objects.create(
+            photo=photo,
+            labels=[],
+            detected_objects=[],
+            text_annotations=[],
+            safe_search={},
+            processing_time_ms=1,
+            cached_result=True,
+            cache_expires_at=timezone.now() + delta,
+        )
+
+    def test_deletes_expired_data_in_batches(self):
+        old = [self._photo(f'old-{i}', 400) for i in range(5)]
+        recent = self._photo('recent', 10)
+        work_order = WorkOrder.objects.create(
+            title='Cambio de neumático', description='-', asset=self.asset,
+            work_order_type=WorkOrder.TYPE_CHOICES[0][0], created_by=self.user,
+        )
+        evidence = self._photo('evidence', 400, work_order=work_order)
+        expired = self._cached_result(recent, expired=True)
+        valid = self._cached_result(evidence, expired=False)
+        clock = FakeClock()
+
+        result = ImageCleanup(storage=self.storage, batch_size=2, clock=clock, sleep=clock.sleep).run()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['deleted_results'], 1)
+        self.assertEqual(result['deleted_photos'], 5)
+        self.assertEqual(result['deleted_objects'], 10)
+        self.assertFalse(InspectionPhoto.objects.filter(pk__in=[photo.pk for photo in old]).exists())
+        self.assertFalse(ImageAnalysisResult.objects.filter(pk=expired.pk).exists())
+        self.assertTrue(ImageAnalysisResult.objects.filter(pk=valid.pk).exists())
+        self.assertEqual(set(InspectionPhoto.objects.values_list('pk', flat=True)), {recent.pk, evidence.pk})
+        self.assertFalse(self.storage.path('old-0.jpg').exists())
+        self.assertTrue(self.storage.path('evidence.jpg').exists())
+        self.assertIsNone(cache.get(CURSOR_CACHE_KEY))
+
+    def test_resumes_from_checkpoint_after_time_budget(self):
+        photos = [self._photo(f'old-{i}', 400) for i in range(6)]
+        # Every clock read advances 1s: the 2.5s budget allows two batches
+        clock = FakeClock(step=1.0)
+
+        first = ImageCleanup(
+            storage=self.storage, batch_size=2, time_budget=2.5, clock=clock, sleep=clock.sleep
+        ).run()
+
+        self.assertEqual(first['status'], 'partial')
+        self.assertEqual(first['deleted_photos'], 2)
+        self.assertEqual(cache.get(CURSOR_CACHE_KEY)['phase'], 'photos')
+        self.assertEqual(InspectionPhoto.objects.count(), 4)
+
+        second = ImageCleanup(storage=self.storage, batch_size=2).run()
+
+        self.assertEqual(second['status'], 'success')
+        self.assertEqual(second['deleted_photos'], 6)
+        self.assertFalse(InspectionPhoto.objects.filter(pk__in=[photo.pk for photo in photos]).exists())
+
+    def test_rate_limits_deletes(self):
+        for i in range(6):
+            self._photo(f'old-{i}', 400)
+        clock = FakeClock()
+
+        ImageCleanup(storage=self.storage, batch_size=2, rows_per_second=1, clock=clock, sleep=clock.sleep).run()
+
+        # First batch uses the initial burst, the other two wait 2s each
+        self.assertAlmostEqual(sum(clock.sleeps), 4.0)
+
+    def test_concurrent_run_is_skipped(self):
+        cache.add(LOCK_CACHE_KEY, True, 60)
+
+        self.assertEqual(ImageCleanup(storage=self.storage).run(), {'status': 'locked'})
+
+    @override_settings(IMAGE_RETENTION_DAYS=0)
+    def test_retention_disabled_keeps_photos(self):
+        self._photo('old', 4000)
+
+        ImageCleanup(storage=self.storage).run()
+
+        self.assertEqual(InspectionPhoto.objects.count(), 1)
+
+    def test_photos_with_meter_readings_are_kept(self):
+        expired = self._photo('expired', 400)
+        metered = self._photo('odometer', 400)
+        MeterReading.objects.create(
+            photo=metered,
+            asset=self.asset,
+            reading_type=MeterReading.TYPE_ODOMETER,
+            value=120500,
+            unit='km',
+            confidence=0.9,
+            text_detected='120500',
+            bounding_box={},
+        )
+
+        ImageCleanup(storage=self.storage).run()
+
+        self.assertFalse(InspectionPhoto.objects.filter(pk=expired.pk).exists())
+        self.assertTrue(InspectionPhoto.objects.filter(pk=metered.pk).exists())
+        self.assertEqual(MeterReading.objects.filter(photo=metered).count(), 1)
+
+    def _staged(self, name, age_hours):
+        url = self.storage.upload(b'raw', f'staging/{name}.jpg')
+        mtime = (timezone.now() - timedelta(hours=age_hours)).timestamp()
+        os.utime(self.storage.path(f'staging/{name}.jpg'), (mtime, mtime))
+        return url
+
+    @override_settings(IMAGE_STAGING_MAX_AGE_HOURS=24)
+    def test_sweeps_stale_staged_uploads(self):
+        self._staged('orphan', 48)
+        self._staged('fresh', 1)
+        # Stored photo whose staged delete failed
+        stored = self._photo('stored', 10, staged_upload_path=self._staged('stored', 48))
+        waiting = self._photo('waiting', 10, staged_upload_path=self._staged('waiting', 48))
+        InspectionPhoto.objects.filter(pk=waiting.pk).update(original_url='', thumbnail_url='')
+
+        result = ImageCleanup(storage=self.storage, batch_size=2).run()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(self.storage.path('staging/orphan.jpg').exists())
+        self.assertFalse(self.storage.path('staging/stored.jpg').exists())
+        self.assertTrue(self.storage.path('staging/fresh.jpg').exists())
+        self.assertTrue(self.storage.path('staging/waiting.jpg').exists())
+        stored.refresh_from_db()
+        self.assertEqual(stored.staged_upload_path, '')
@@ -0,0 +1,92 @@
+"""
+Tests for the image fingerprints used by the Vision AI result cache.
+"""
+import io
+import random
+
+import piexif
+from django.test import SimpleTestCase
+from PIL import Image, ImageDraw, ImageFilter
+
+from apps.images.services.image_hashing import (
+    MAX_INDEXED_DISTANCE,
+    content_hash,
+    dhash,
+    dhash_bands,
+    from_signed64,
+    hamming_distance,
+    to_signed64,
+)
+
+
+def _gauge(seed=0, size=(640, 480)):
+    """Synthetic 'gauge' photo: smooth background plus shapes"""
+    rng = random.Random(seed)
+    img = Image.linear_gradient('L').rotate(90).resize(size).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = rng.randrange(size[0] - 100), rng.randrange(size[1] - 100)
+        draw.ellipse((x, y, x + rng.randrange(40, 100), y + rng.randrange(40, 100)),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    return img
+
+
+def _roundtrip_jpeg(img, quality, exif=None):
+    buffer = io.BytesIO()
+    kwargs = {'format': 'JPEG', 'quality': quality}
+    if exif:
+        kwargs['exif'] = exif
+    img.save(buffer, **kwargs)
+    buffer.seek(0)
+    return Image.open(buffer).convert('RGB')
+
+
+class ImageHashingTests(SimpleTestCase):
+
+    def test_content_hash_ignores_container_metadata(self):
+        decoded = _roundtrip_jpeg(_gauge(), 90)
+        buffer = io.BytesIO()
+        decoded.save(buffer, format='PNG')
+        exif = piexif.dump({'0th': {piexif.ImageIFD.Make: b'Other'}, 'Exif': {}, 'GPS': {}})
+        png_with_exif = io.BytesIO()
+        decoded.save(png_with_exif, format='PNG', exif=exif)
+
+        first = content_hash(Image.open(io.BytesIO(buffer.getvalue())))
+        second = content_hash(Image.open(io.BytesIO(png_with_exif.getvalue())))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, content_hash(_gauge(seed=1)))
+
+    def test_near_duplicates_are_close(self):
+        original = _gauge()
+        recompressed = _roundtrip_jpeg(original, 60)
+        rescaled = original.resize((320, 240)).filter(ImageFilter.GaussianBlur(0.5))
+
+        self.assertLessEqual(hamming_distance(dhash(original), dhash(recompressed)), MAX_INDEXED_DISTANCE)
+        self.assertLessEqual(hamming_distance(dhash(original), dhash(rescaled)), MAX_INDEXED_DISTANCE)
+
+    def test_different_scenes_are_far(self):
+        self.assertGreater(hamming_distance(dhash(_gauge(seed=1)), dhash(_gauge(seed=2))), 8)
+
+    def test_close_hashes_share_a_band(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            value = rng.getrandbits(64)
+            flipped = value
+            for bit in rng.sample(range(64), MAX_INDEXED_DISTANCE):
+                flipped ^= 1 << bit
+            shared = [a == b for a, b in zip(dhash_bands(value), dhash_bands(flipped))]
+            self.assertTrue(any(shared))
+
+    def test_bands_recompose_hash(self):
+        value = 0xFEDCBA9876543210
+        bands = dhash_bands(value)
+
+        self.assertEqual(bands, [0xFEDC, 0xBA98, 0x7654, 0x3210])
+
+    def test_signed_storage_roundtrip(self):
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            stored = to_signed64(value)
+            self.assertGreaterEqual(stored, -(1 << 63))
+            self.assertLess(stored, 1 << 63)
+            self.assertEqual(from_signed64(stored), value)
@@ -0,0 +1,324 @@
+"""
+Tests for the single-decode image pipeline (ImageProcessingService.prepare_image).
+"""
+import io
+import time
+from tempfile import TemporaryDirectory
+
+import piexif
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images import tasks, views
+from apps.images.models import InspectionPhoto
+from apps.images.services.image_processing_service import ImageProcessingService
+from apps.images.services.storage_backends import LocalFileSystemStorageBackend
+
+
+def _noisy_jpeg(width, height, exif=None, quality=95):
+    """JPEG with enough detail that compression has work to do"""
+    img = Image.effect_noise((width, height), 64).convert('RGB')
+    buffer = io.BytesIO()
+    kwargs = {'format': 'JPEG', 'quality': quality}
+    if exif:
+        kwargs['exif'] = exif
+    img.save(buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def _upload(data, name='photo.jpg'):
+    return SimpleUploadedFile(name, data, content_type='image/jpeg')
+
+
+def _legacy_compress(data, max_size_bytes):
+    """Previous implementation: full decode + linear quality scan"""
+    img = Image.open(io.BytesIO(data))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    quality = 95
+    while quality >= 20:
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+        if output.tell() <= max_size_bytes:
+            return output.tell()
+        quality -= 5
+    return output.tell()
+
+
+class PrepareImageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.service = ImageProcessingService()
+
+    @override_settings(IMAGE_MAX_DIMENSION=800, COMPRESSED_IMAGE_SIZE_BYTES=120 * 1024)
+    def test_downscales_and_fits_target_size(self):
+        result = self.service.prepare_image(_upload(_noisy_jpeg(2400, 1800)))
+
+        self.assertLessEqual(result['compressed_size'], 120 * 1024)
+        compressed = Image.open(result['compressed'])
+        self.assertEqual(max(compressed.size), 800)
+        self.assertEqual(compressed.size, (800, 600))
+
+        # Metadata describes the original upload, not the stored variant
+        self.assertEqual(result['metadata']['width'], 2400)
+        self.assertEqual(result['metadata']['height'], 1800)
+        self.assertEqual(result['metadata']['format'], 'JPEG')
+
+    @override_settings(IMAGE_MAX_DIMENSION=1920)
+    def test_thumbnail_from_same_decode(self):
+        result = self.service.prepare_image(_upload(_noisy_jpeg(1200, 600)))
+
+        thumbnail = Image.open(result['thumbnail'])
+        self.assertEqual(thumbnail.format, 'JPEG')
+        self.assertEqual(thumbnail.size, (300, 150))
+
+    @override_settings(IMAGE_MAX_DIMENSION=1920, COMPRESSED_IMAGE_SIZE_BYTES=2 * 1024 * 1024)
+    def test_small_image_keeps_max_quality(self):
+        result = self.service.prepare_image(_upload(_noisy_jpeg(640, 480)))
+
+        self.assertEqual(result['quality'], 95)
+        self.assertEqual(Image.open(result['compressed']).size, (640, 480))
+
+    def test_quality_is_highest_that_fits(self):
+        img = Image.open(io.BytesIO(_noisy_jpeg(800, 600))).convert('RGB')
+        target = self.service._jpeg_size(img, 60)
+
+        _, size, quality = self.service._encode_to_target(img, target)
+
+        self.assertLessEqual(size, target)
+        self.assertGreaterEqual(quality, 60)
+        self.assertGreater(self.service._jpeg_size(img, quality + 1), target)
+
+    def test_resizes_when_lowest_quality_too_large(self):
+        img = Image.open(io.BytesIO(_noisy_jpeg(800, 600))).convert('RGB')
+        target = self.service._jpeg_size(img, 20) // 2
+
+        _, size, quality = self.service._encode_to_target(img, target)
+
+        self.assertEqual(quality, 85)
+        self.assertLessEqual(size, target * 1.2)
+
+    def test_exif_read_from_single_open(self):
+        exif = piexif.dump({
+            '0th': {piexif.ImageIFD.Make: b'TestMake', piexif.ImageIFD.Model: b'TestModel'},
+            'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2024:03:01 10:20:30'},
+            'GPS': {},
+        })
+
+        result = self.service.prepare_image(_upload(_noisy_jpeg(400, 300, exif=exif)))
+
+        metadata = result['metadata']
+        self.assertEqual(metadata['device_info'], {'make': 'TestMake', 'model': 'TestModel'})
+        self.assertEqual(metadata['captured_at'].year, 2024)
+
+    def test_rgba_png_is_flattened(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (200, 100), (255, 0, 0, 0)).save(buffer, format='PNG')
+
+        result = self.service.prepare_image(_upload(buffer.getvalue(), name='photo.png'))
+
+        compressed = Image.open(result['compressed'])
+        self.assertEqual(compressed.mode, 'RGB')
+        self.assertEqual(result['metadata']['format'], 'PNG')
+
+    def test_rejects_corrupted_image(self):
+        data = _noisy_jpeg(400, 300)
+        with self.assertRaises(ValueError):
+            self.service.prepare_image(_upload(data[:len(data) // 3]))
+
+    def test_rejects_non_image(self):
+        with self.assertRaises(ValueError):
+            self.service.prepare_image(_upload(b'not an image at all'))
+
+    def test_legacy_entry_points_still_work(self):
+        data = _noisy_jpeg(600, 400)
+
+        buffer, size = self.service.compress_image(io.BytesIO(data), max_size_bytes=50 * 1024)
+        self.assertLessEqual(size, 50 * 1024)
+        self.assertEqual(len(buffer.getvalue()), size)
+
+        thumbnail = Image.open(self.service.create_thumbnail(io.BytesIO(data)))
+        self.assertEqual(thumbnail.size, (300, 200))
+
+
+@pytest.mark.slow
+@override_settings(IMAGE_MAX_DIMENSION=1920, COMPRESSED_IMAGE_SIZE_BYTES=2 * 1024 * 1024)
+def test_pipeline_faster_than_linear_full_size_encode():
+    """12 MP photo: draft decode + binary search beats the old loop"""
+    data = _noisy_jpeg(4000, 3000, quality=92)
+    service = ImageProcessingService()
+
+    start = time.perf_counter()
+    _legacy_compress(data, 2 * 1024 * 1024)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service.prepare_image(_upload(data))
+    pipeline = time.perf_counter() - start
+
+    assert pipeline * 2 < legacy, f"pipeline {pipeline:.2f}s vs legacy {legacy:.2f}s"
+
+
+class StagedUploadTests(SimpleTestCase):
+    """Upload endpoint stages raw bytes; the Celery task processes them"""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.storage = LocalFileSystemStorageBackend(self.tmp.name)
+        self.service = ImageProcessingService(storage_backend=self.storage)
+
+    def tearDown(self):
+        self.service.uploader.shutdown()
+        self.tmp.cleanup()
+
+    def test_stage_reads_header_and_stores_raw_bytes(self):
+        data = _noisy_jpeg(1200, 900)
+
+        staged = self.service.stage_upload(_upload(data), 'photo-1')
+
+        self.assertTrue(staged['staged_url'].endswith('/staging/photo-1.jpg'))
+        self.assertEqual(self.storage.download(staged['staged_url']), data)
+        self.assertEqual(staged['file_size'], len(data))
+        self.assertEqual((staged['metadata']['width'], staged['metadata']['height']), (1200, 900))
+
+    def test_stage_rejects_non_image_without_storing(self):
+        with self.assertRaises(ValueError):
+            self.service.stage_upload(_upload(b'not an image'), 'photo-2')
+
+        self.assertFalse((self.storage.root / 'staging').exists())
+
+    @override_settings(IMAGE_MAX_DIMENSION=800)
+    def test_process_staged_upload_stores_variants(self):
+        staged = self.service.stage_upload(_upload(_noisy_jpeg(1600, 1200)), 'photo-3')
+
+        result = self.service.process_staged_upload(staged['staged_url'], 'asset-1', 'user-1')
+
+        # The caller deletes the staged object once the result is recorded
+        self.assertTrue(self.storage._path_from_url(staged['staged_url']).exists())
+        self.assertTrue(self.service.delete_staged_upload(staged['staged_url']))
+        self.assertFalse(self.storage._path_from_url(staged['staged_url']).exists())
+        original = Image.open(io.BytesIO(self.storage.download(result['original_url'])))
+        self.assertEqual(original.size, (800, 600))
+        self.assertEqual((result['width'], result['height']), (1600, 1200))
+        self.assertTrue(self.storage.download(result['thumbnail_url']))
+
+    def test_staged_and_direct_pipelines_return_the_same_fields(self):
+        data = _noisy_jpeg(640, 480)
+        staged = self.service.stage_upload(_upload(data), 'photo-4')
+
+        direct = self.service.process_and_upload(_upload(data), 'asset-1', 'user-1')
+        background = self.service.process_staged_upload(staged['staged_url'], 'asset-1', 'user-1')
+
+        self.assertEqual(set(direct), set(background))
+        self.assertEqual(direct['content_sha256'], background['content_sha256'])
+
+    def test_photos_stored_within_the_same_second_do_not_share_objects(self):
+        data = _noisy_jpeg(640, 480)
+        staged = [self.service.stage_upload(_upload(data), f'photo-{index}') for index in (5, 6)]
+
+        results = [
+            self.service.process_staged_upload(upload['staged_url'], 'asset-1', 'user-1') for upload in staged
+        ]
+
+        self.assertTrue(results[0]['original_url'].endswith('_user-1_photo-5.jpg'))
+        self.assertEqual(len({result['original_url'] for result in results}), 2)
+        self.assertEqual(len({result['thumbnail_url'] for result in results}), 2)
+
+
+class StagedUploadFlowTests(TestCase):
+    """Upload endpoint -> process_inspection_photo on the local storage backend"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='staged@test.com',
+            password='SecurePass123!',
+            first_name='Staged',
+            last_name='Upload',
+            role=role,
+            rut='13131313-3'
+        )
+        location = Location.objects.create(name='Faena Staging')
+        cls.asset = Asset.objects.create(
+            name='Camioneta 7',
+            asset_code='CAM-970',
+            vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+            location=location,
+            serial_number='SN-97000',
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = LocalFileSystemStorageBackend(self.tmp.name)
+        self.service = ImageProcessingService(storage_backend=self.storage)
+        self.addCleanup(self.service.uploader.shutdown)
+        for module in (views, tasks):
+            patcher = mock.patch.object(module, 'image_processing_service', self.service)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _upload(self):
+        with mock.patch.object(tasks.process_inspection_photo, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/images/photos/upload/', {
+                'image': _upload(_noisy_jpeg(800, 600)),
+                'asset_id': str(self.asset.id),
+            }, format='multipart')
+        return response, delay
+
+    def _process(self, photo):
+        with mock.patch.object(tasks.image_analysis_service, 'is_available', return_value=False):
+            return tasks.process_inspection_photo.apply(args=[str(photo.id)]).get()
+
+    def test_upload_returns_202_and_enqueues_processing(self):
+        response, delay = self._upload()
+
+        self.assertEqual(response.status_code, 202)
+        photo = InspectionPhoto.objects.get(id=response.data['id'])
+        self.assertEqual(photo.processing_status, InspectionPhoto.STATUS_PENDING)
+        self.assertEqual(photo.original_url, '')
+        self.assertTrue(self.storage._path_from_url(photo.staged_upload_path).exists())
+        delay.assert_called_once_with(str(photo.id))
+
+    def test_task_stores_variants_and_removes_staged_object(self):
+        response, _ = self._upload()
+        photo = InspectionPhoto.objects.get(id=response.data['id'])
+        staged_path = self.storage._path_from_url(photo.staged_upload_path)
+
+        self.assertEqual(self._process(photo)['status'], 'stored')
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.staged_upload_path, '')
+        self.assertFalse(staged_path.exists())
+        self.assertTrue(self.storage.download(photo.original_url))
+        self.assertTrue(self.storage.download(photo.thumbnail_url))
+
+    def test_failed_staged_delete_keeps_path_without_reprocessing(self):
+        response, _ = self._upload()
+        photo = InspectionPhoto.objects.get(id=response.data['id'])
+        staged_url = photo.staged_upload_path
+
+        with mock.patch.object(self.storage, 'delete', side_effect=OSError('unavailable')):
+            self._process(photo)
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.staged_upload_path, staged_url)
+        original_url = photo.original_url
+        self.assertTrue(original_url)
+
+        # A redelivered task does not store the variants a second time
+        with mock.patch.object(self.service, 'process_staged_upload') as process:
+            self._process(photo)
+        process.assert_not_called()
@@ -0,0 +1,150 @@
+"""
+Tests for responsive image variants and Accept negotiation.
+"""
+import io
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images import views
+from apps.images.models import ImageVariant, InspectionPhoto
+from apps.images.services.image_variants import ImageVariantService, negotiate_format
+from apps.images.services.storage_backends import LocalFileSystemStorageBackend
+from apps.images.views import InspectionPhotoViewSet
+
+ALL_FORMATS = ['AVIF', 'WEBP', 'JPEG']
+
+
+class NegotiationTests(SimpleTestCase):
+
+    def test_prefers_avif_then_webp(self):
+        self.assertEqual(negotiate_format('image/avif,image/webp,*/*;q=0.8', ALL_FORMATS), 'AVIF')
+        self.assertEqual(negotiate_format('image/webp,*/*', ALL_FORMATS), 'WEBP')
+
+    def test_wildcards_do_not_imply_modern_formats(self):
+        self.assertEqual(negotiate_format('*/*', ALL_FORMATS), 'JPEG')
+        self.assertEqual(negotiate_format('image/*', ALL_FORMATS), 'JPEG')
+        self.assertEqual(negotiate_format('', ALL_FORMATS), 'JPEG')
+
+    def test_q_values_and_unavailable_encoders(self):
+        self.assertEqual(negotiate_format('image/avif;q=0.5,image/webp;q=0.9', ALL_FORMATS), 'WEBP')
+        self.assertEqual(negotiate_format('image/avif;q=0', ALL_FORMATS), 'JPEG')
+        self.assertEqual(negotiate_format('image/avif,image/webp', ['WEBP', 'JPEG']), 'WEBP')
+
+
+class ImageVariantServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='variants@test.com',
+            password='SecurePass123!',
+            first_name='Variant',
+            last_name='User',
+            role=role,
+            rut='12121212-1'
+        )
+        location = Location.objects.create(name='Faena Variantes')
+        cls.asset = Asset.objects.create(
+            name='Camioneta 4',
+            asset_code='CAM-980',
+            vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+            location=location,
+            serial_number='SN-98000',
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = LocalFileSystemStorageBackend(self.tmp.name)
+        self.service = ImageVariantService(storage=self.storage)
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), (90, 120, 150)).save(buffer, format='JPEG', quality=90)
+        self.photo = InspectionPhoto.objects.create(
+            asset=self.asset,
+            original_url=self.storage.upload(buffer.getvalue(), 'photo.jpg'),
+            file_size=buffer.tell(),
+            width=1600,
+            height=1200,
+            format='JPEG',
+            captured_at=timezone.now(),
+            uploaded_by=self.user,
+        )
+
+    def test_generates_webp_variant_once(self):
+        first = self.service.resolve(self.photo, 'image/webp,*/*', requested_width=500)
+        second = self.service.resolve(self.photo, 'image/webp,*/*', requested_width=600)
+
+        self.assertEqual((first['format'], first['width'], first['content_type']), ('WEBP', 640, 'image/webp'))
+        self.assertEqual(second['url'], first['url'])
+        variant = ImageVariant.objects.get(photo=self.photo)
+        self.assertEqual((variant.width, variant.height), (640, 480))
+        with Image.open(self.storage._path_from_url(variant.url)) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (640, 480)))
+
+    def test_full_size_jpeg_reuses_original(self):
+        self.photo.width = 1000
+        result = self.service.resolve(self.photo, '*/*', requested_width=2000)
+
+        self.assertEqual(result['url'], self.photo.original_url)
+        self.assertFalse(ImageVariant.objects.exists())
+
+    def test_cached_result_does_not_leak_expiry_timestamp(self):
+        first = self.service.resolve(self.photo, 'image/webp,*/*', requested_width=320)
+        cached = self.service.resolve(self.photo, 'image/webp,*/*', requested_width=320)
+
+        self.assertEqual(set(cached), set(first))
+        self.assertNotIn('expires_at', cached)
+        self.assertLessEqual(cached['expires_in'], first['expires_in'])
+
+    def test_unknown_photo_width_generates_variant(self):
+        self.photo.width = None
+
+        result = self.service.resolve(self.photo, '*/*', requested_width=640)
+
+        self.assertEqual((result['format'], result['width']), ('JPEG', 640))
+        self.assertNotEqual(result['url'], self.photo.original_url)
+
+    def test_variant_endpoint_negotiates_and_varies_on_accept(self):
+        view = InspectionPhotoViewSet.as_view({'get': 'image'})
+        request = APIRequestFactory().get(
+            f'/api/v1/images/photos/{self.photo.id}/image/', {'width': 320}, HTTP_ACCEPT='image/webp,*/*'
+        )
+        force_authenticate(request, user=self.user)
+
+        with mock.patch.object(views, 'image_variant_service', self.service):
+            response = view(request, pk=str(self.photo.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['format'], 'WEBP')
+        self.assertEqual(response.data['width'], 320)
+        self.assertIn('Accept', response['Vary'])
+
+        redirect_request = APIRequestFactory().get(
+            f'/api/v1/images/photos/{self.photo.id}/image/', {'width': 320, 'redirect': 'true'}
+        )
+        force_authenticate(redirect_request, user=self.user)
+        signed = 'https://storage.googleapis.com/bucket/variant.jpg?X-Goog-Signature=abc'
+        with mock.patch.object(views, 'image_variant_service', self.service), \
+                mock.patch.object(self.storage, 'signed_url', return_value=signed):
+            redirect = view(redirect_request, pk=str(self.photo.id))
+        self.assertEqual(redirect.status_code, 302)
+        self.assertEqual(redirect['Location'], signed)
+
+    def test_unsupported_format_is_rejected(self):
+        view = InspectionPhotoViewSet.as_view({'get': 'image'})
+        request = APIRequestFactory().get(f'/api/v1/images/photos/{self.photo.id}/image/', {'image_format': 'gif'})
+        force_authenticate(request, user=self.user)
+
+        with mock.patch.object(views, 'image_variant_service', self.service):
+            response = view(request, pk=str(self.photo.id))
+
+        self.assertEqual(response.status_code, 400)
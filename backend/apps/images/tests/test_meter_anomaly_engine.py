@@ -0,0 +1,149 @@
+"""
+Tests for vectorized meter reading anomaly scoring.
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images.models import InspectionPhoto, MeterReading
+from apps.images.services.meter_anomaly_engine import MeterAnomalyEngine
+from apps.images.tasks import score_meter_readings
+
+
+class MeterAnomalyEngineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='meter@test.com',
+            password='SecurePass123!',
+            first_name='Meter',
+            last_name='User',
+            role=role,
+            rut='77777777-7'
+        )
+        location = Location.objects.create(name='Faena Centro')
+        cls.assets = [
+            Asset.objects.create(
+                name=f'Camión {i}',
+                asset_code=f'CAM-95{i}',
+                vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+                location=location,
+                serial_number=f'SN-9500{i}',
+                created_by=cls.user,
+            )
+            for i in range(2)
+        ]
+        cls.photos = {
+            asset.id: InspectionPhoto.objects.create(
+                asset=asset,
+                original_url=f'gs://bucket/meter-{asset.asset_code}.jpg',
+                file_size=1000,
+                width=800,
+                height=600,
+                format='JPEG',
+                captured_at=timezone.now(),
+                uploaded_by=cls.user,
+            )
+            for asset in cls.assets
+        }
+        cls.start = timezone.now() - timedelta(days=60)
+
+    def _series(self, asset, values, reading_type=MeterReading.TYPE_ODOMETER, start_day=0):
+        readings = []
+        for day, value in enumerate(values, start=start_day):
+            reading = MeterReading.objects.create(
+                photo=self.photos[asset.id],
+                asset=asset,
+                reading_type=reading_type,
+                value=value,
+                unit='km',
+                confidence=0.9,
+                text_detected=str(value),
+                bounding_box={},
+            )
+            MeterReading.objects.filter(pk=reading.pk).update(created_at=self.start + timedelta(days=day))
+            readings.append(reading)
+        return readings
+
+    def _outliers(self, readings):
+        ids = [reading.id for reading in readings]
+        return [
+            index for index, reading_id in enumerate(ids)
+            if MeterReading.objects.get(pk=reading_id).is_outlier
+        ]
+
+    def test_fleet_scoring_flags_rate_spikes_and_rollbacks(self):
+        # ~100 km/day with a jump of 5000 km on day 8 and a rollback on day 14
+        odometer = [10000 + 100 * day + (day % 3) * 5 for day in range(20)]
+        odometer[8] += 5000
+        odometer[14] = odometer[13] - 300
+        steady = [20000 + 80 * day for day in range(20)]
+        spiky = self._series(self.assets[0], odometer)
+        clean = self._series(self.assets[1], steady)
+
+        with self.assertNumQueries(2):  # one SELECT, one bulk UPDATE
+            stats = MeterAnomalyEngine().score_fleet()
+
+        self.assertEqual(self._outliers(spiky), [8, 14])
+        self.assertEqual(self._outliers(clean), [])
+        self.assertEqual(stats['readings'], 40)
+        self.assertEqual(stats['outliers'], 2)
+        reading = MeterReading.objects.get(pk=spiky[14].pk)
+        self.assertEqual(reading.previous_reading, odometer[13])
+        self.assertIn('retrocede', reading.validation_notes)
+
+    def test_level_meters_use_rolling_median(self):
+        pressure = [32.0, 32.5, 31.8, 32.2, 32.1, 31.9, 45.0, 32.3, 32.0]
+        readings = self._series(self.assets[0], pressure, reading_type=MeterReading.TYPE_PRESSURE)
+
+        MeterAnomalyEngine().score_fleet()
+
+        self.assertEqual(self._outliers(readings), [6])
+        reading = MeterReading.objects.get(pk=readings[7].pk)
+        self.assertLess(reading.expected_range_min, 32.3)
+        self.assertGreater(reading.expected_range_max, 32.3)
+
+    def test_rescoring_is_idempotent(self):
+        self._series(self.assets[0], [100 * day for day in range(10)])
+        engine = MeterAnomalyEngine()
+        engine.score_fleet()
+
+        self.assertEqual(engine.score_fleet()['updated'], 0)
+
+    def test_incremental_scores_only_new_readings_with_history(self):
+        old = self._series(self.assets[0], [1000 + 50 * day for day in range(10)])
+        other = self._series(self.assets[1], [5, 5, 5, 900, 5], reading_type=MeterReading.TYPE_FUEL_LEVEL)
+        since = self.start + timedelta(days=9, hours=12)
+        new = self._series(self.assets[0], [1500, 9000], start_day=10)
+
+        stats = MeterAnomalyEngine().score_incremental(since)
+
+        self.assertEqual(stats['readings'], 2)
+        self.assertEqual(self._outliers(new), [1])
+        # Series without new readings are left alone
+        self.assertEqual(self._outliers(other), [])
+        self.assertIsNone(MeterReading.objects.get(pk=old[5].pk).previous_reading)
+
+    def test_task_accepts_naive_since(self):
+        self._series(self.assets[0], [1000 + 50 * day for day in range(10)])
+        new = self._series(self.assets[0], [1500, 9000], start_day=10)
+        since = timezone.localtime(self.start + timedelta(days=9, hours=12)).replace(tzinfo=None)
+
+        result = score_meter_readings(since.isoformat())
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['readings'], 2)
+        self.assertEqual(self._outliers(new), [1])
+
+    def test_validated_readings_are_not_rescored(self):
+        readings = self._series(self.assets[0], [100, 200, 300, 400, 99999, 600])
+        MeterReading.objects.filter(pk=readings[4].pk).update(validated_by=self.user)
+
+        MeterAnomalyEngine().score_fleet()
+
+        self.assertNotIn(4, self._outliers(readings))
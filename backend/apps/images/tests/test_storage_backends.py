@@ -0,0 +1,207 @@
+"""
+Tests for image storage backends and the concurrent upload coordinator.
+"""
+import io
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+from apps.images.services.image_processing_service import ImageProcessingService
+from apps.images.services.storage_backends import (
+    RESUMABLE_UPLOAD_THRESHOLD,
+    GCSStorageBackend,
+    LocalFileSystemStorageBackend,
+    StorageBackend,
+    UploadCoordinator,
+)
+
+
+class SlowBackend(StorageBackend):
+    """Backend with a fixed per-upload latency that records concurrency"""
+
+    def __init__(self, latency=0.2, fail_names=()):
+        self.latency = latency
+        self.fail_names = set(fail_names)
+        self.stored = {}
+        self.deleted = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def upload(self, data, name, content_type='image/jpeg'):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if name in self.fail_names:
+                raise ConnectionError(f'upload of {name} failed')
+            self.stored[name] = data
+            return f'mem://{name}'
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def delete(self, url):
+        self.deleted.append(url)
+
+
+class FakeBlob:
+    def __init__(self, name, chunk_size=None):
+        self.name = name
+        self.chunk_size = chunk_size
+        self.uploaded = None
+        self.updated = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def upload_from_string(self, data, content_type=None):
+        self.uploaded = data
+
+
+class FakeBucket:
+    def __init__(self):
+        self.blobs = []
+
+    def blob(self, name, chunk_size=None):
+        blob = FakeBlob(name, chunk_size)
+        self.blobs.append(blob)
+        return blob
+
+    def list_blobs(self, prefix=None, start_offset=None, max_results=None):
+        names = sorted(blob.name for blob in self.blobs)
+        matching = [
+            name for name in names
+            if name.startswith(prefix) and (start_offset is None or name >= start_offset)
+        ]
+        return [FakeBlob(name) for name in matching[:max_results]]
+
+
+class FakeClient:
+    def __init__(self):
+        self.bucket_instance = FakeBucket()
+        self.bucket_calls = 0
+
+    def bucket(self, name):
+        self.bucket_calls += 1
+        return self.bucket_instance
+
+
+class LocalFileSystemStorageBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = LocalFileSystemStorageBackend(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_upload_and_delete(self):
+        url = self.backend.upload(io.BytesIO(b'data'), 'inspections/a/photo.jpg')
+
+        path = Path(self.tmp.name).resolve() / 'inspections' / 'a' / 'photo.jpg'
+        self.assertEqual(url, path.as_uri())
+        self.assertEqual(path.read_bytes(), b'data')
+
+        self.backend.delete_many([url, url])
+        self.assertFalse(path.exists())
+
+    def test_rejects_names_outside_root(self):
+        with self.assertRaises(ValueError):
+            self.backend.upload(b'data', '../escape.jpg')
+
+
+class GCSStorageBackendTests(SimpleTestCase):
+
+    def test_client_reused_and_large_files_resumable(self):
+        client = FakeClient()
+        backend = GCSStorageBackend(bucket_name='photos', client=client)
+
+        small = backend.upload(b'x' * 10, 'a.jpg')
+        backend.upload(b'x' * (RESUMABLE_UPLOAD_THRESHOLD + 1), 'b.jpg')
+
+        self.assertEqual(small, 'gs://photos/a.jpg')
+        self.assertEqual(client.bucket_calls, 1)
+        small_blob, large_blob = client.bucket_instance.blobs
+        self.assertIsNone(small_blob.chunk_size)
+        self.assertIsNotNone(large_blob.chunk_size)
+
+    def test_list_objects_resumes_after_cursor(self):
+        backend = GCSStorageBackend(bucket_name='photos', client=FakeClient())
+        for name in ('staging/a.jpg', 'staging/b.jpg', 'staging/c.jpg', 'inspections/d.jpg'):
+            backend.upload(b'x', name)
+
+        first = backend.list_objects('staging', limit=2)
+        rest = backend.list_objects('staging', start_after=first[-1][0], limit=2)
+
+        self.assertEqual([name for name, _, _ in first], ['staging/a.jpg', 'staging/b.jpg'])
+        self.assertEqual(rest[0][:2], ('staging/c.jpg', 'gs://photos/staging/c.jpg'))
+        self.assertEqual(len(rest), 1)
+
+
+class UploadCoordinatorTests(SimpleTestCase):
+
+    def test_variants_upload_concurrently(self):
+        backend = SlowBackend(latency=0.2)
+        coordinator = UploadCoordinator(backend=backend, max_workers=4)
+
+        start = time.perf_counter()
+        urls = coordinator.upload_many({
+            'original': (b'1', 'a.jpg', 'image/jpeg'),
+            'compressed': (b'2', 'b.jpg', 'image/jpeg'),
+            'thumbnail': (b'3', 'c.jpg', 'image/jpeg'),
+        })
+        elapsed = time.perf_counter() - start
+        coordinator.shutdown()
+
+        self.assertEqual(urls, {
+            'original': 'mem://a.jpg', 'compressed': 'mem://b.jpg', 'thumbnail': 'mem://c.jpg'
+        })
+        self.assertEqual(backend.max_active, 3)
+        self.assertLess(elapsed, 0.45)
+
+    def test_pool_is_bounded(self):
+        backend = SlowBackend(latency=0.05)
+        coordinator = UploadCoordinator(backend=backend, max_workers=2)
+
+        coordinator.upload_many({str(i): (b'x', f'{i}.jpg', 'image/jpeg') for i in range(6)})
+        coordinator.shutdown()
+
+        self.assertEqual(backend.max_active, 2)
+
+    def test_failure_removes_uploaded_variants(self):
+        backend = SlowBackend(latency=0.01, fail_names={'c.jpg'})
+        coordinator = UploadCoordinator(backend=backend, max_workers=3)
+
+        with self.assertRaises(ConnectionError):
+            coordinator.upload_many({
+                'original': (b'1', 'a.jpg', 'image/jpeg'),
+                'thumbnail': (b'3', 'c.jpg', 'image/jpeg'),
+            })
+        coordinator.shutdown()
+
+        self.assertEqual(backend.deleted, ['mem://a.jpg'])
+
+
+class ProcessAndUploadTests(SimpleTestCase):
+
+    def test_pipeline_writes_variants_to_local_storage(self):
+        buffer = io.BytesIO()
+        Image.effect_noise((640, 480), 64).convert('RGB').save(buffer, format='JPEG')
+        upload = SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+        with tempfile.TemporaryDirectory() as root:
+            service = ImageProcessingService(storage_backend=LocalFileSystemStorageBackend(root))
+            result = service.process_and_upload(upload, asset_id='asset-1', user_id='user-1')
+            service.uploader.shutdown()
+
+            original = Path(result['original_url'][len('file://'):])
+            thumbnail = Path(result['thumbnail_url'][len('file://'):])
+            self.assertTrue(original.exists())
+            self.assertTrue(thumbnail.name.endswith('_thumb.jpg'))
+            self.assertEqual(Image.open(thumbnail).size, (300, 225))
+            self.assertEqual(result['file_size'], original.stat().st_size)
@@ -0,0 +1,167 @@
+"""
+Tests for batched Vision AI analysis and result reuse.
+"""
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.assets.models import Asset, Location
+from apps.authentication.models import Role, User
+from apps.images.models import ImageAnalysisResult, InspectionPhoto
+from apps.images.services.image_analysis_service import ImageAnalysisService
+from apps.images.services.vision_ai_client import VisionAIClient, VisionAIError
+from apps.images.testing import FakeImageAnnotatorClient
+
+
+def _urls(count, prefix='gs://bucket/photo'):
+    return [f'{prefix}-{i}.jpg' for i in range(count)]
+
+
+class VisionBatchClientTests(SimpleTestCase):
+
+    @override_settings(BATCH_SIZE_IMAGES=10, VISION_AI_BATCH_CONCURRENCY=1)
+    def test_groups_images_by_batch_size(self):
+        fake = FakeImageAnnotatorClient()
+        client = VisionAIClient(client=fake)
+
+        results = client.analyze_images_comprehensive(_urls(25))
+
+        self.assertEqual([len(uris) for uris in fake.calls_to('batch_annotate_images')], [10, 10, 5])
+        self.assertEqual(fake.calls_to('annotate_image'), [])
+        self.assertEqual(len(results), 25)
+
+    @override_settings(BATCH_SIZE_IMAGES=100)
+    def test_batch_size_capped_at_api_maximum(self):
+        fake = FakeImageAnnotatorClient()
+
+        VisionAIClient(client=fake).analyze_images_comprehensive(_urls(20))
+
+        self.assertEqual(sorted(len(uris) for uris in fake.calls_to('batch_annotate_images')), [4, 16])
+
+    @override_settings(BATCH_SIZE_IMAGES=4, VISION_AI_BATCH_CONCURRENCY=4)
+    def test_results_map_back_to_input_order_with_errors(self):
+        urls = _urls(12)
+        fake = FakeImageAnnotatorClient(
+            labels={url: [f'label-{i}'] for i, url in enumerate(urls)},
+            errors={urls[5]: 'Bad image data'},
+            latency=0.05,
+        )
+
+        results = VisionAIClient(client=fake).analyze_images_comprehensive(urls)
+
+        self.assertIsInstance(results[5], VisionAIError)
+        for i, result in enumerate(results):
+            if i != 5:
+                self.assertEqual(result['labels'][0]['description'], f'label-{i}')
+        self.assertGreater(fake.max_active, 1)
+
+    @override_settings(BATCH_SIZE_IMAGES=16, VISION_AI_BATCH_CONCURRENCY=2)
+    def test_concurrency_is_bounded(self):
+        fake = FakeImageAnnotatorClient(latency=0.05)
+
+        VisionAIClient(client=fake).analyze_images_comprehensive(_urls(16 * 6))
+
+        self.assertEqual(len(fake.calls_to('batch_annotate_images')), 6)
+        self.assertLessEqual(fake.max_active, 2)
+
+    def test_single_image_path_shares_parser(self):
+        fake = FakeImageAnnotatorClient(labels={'gs://bucket/a.jpg': ['Gauge']}, texts={'gs://bucket/a.jpg': ['12345']})
+
+        result = VisionAIClient(client=fake).analyze_image_comprehensive('gs://bucket/a.jpg')
+
+        self.assertEqual(result['labels'][0]['description'], 'Gauge')
+        self.assertEqual(result['texts'][0]['description'], '12345')
+        self.assertEqual(result['safe_search']['adult'], 'VERY_UNLIKELY')
+
+
+class ImageAnalysisBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='vision@test.com',
+            password='SecurePass123!',
+            first_name='Vision',
+            last_name='User',
+            role=role,
+            rut='55555555-5'
+        )
+        location = Location.objects.create(name='Faena Norte')
+        cls.asset = Asset.objects.create(
+            name='Camioneta 1',
+            asset_code='CAM-900',
+            vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+            location=location,
+            serial_number='SN-90000',
+            created_by=cls.user,
+        )
+
+    def _photo(self, index, **fields):
+        photo = InspectionPhoto(
+            asset=self.asset,
+            original_url=f'gs://bucket/photo-{index}.jpg',
+            file_size=1000,
+            width=800,
+            height=600,
+            format='JPEG',
+            captured_at=timezone.now(),
+            uploaded_by=self.user,
+        )
+        for name, value in fields.items():
+            setattr(photo, name, value)
+        photo.save()
+        return photo
+
+    @override_settings(BATCH_SIZE_IMAGES=10, VISION_AI_ENABLED=True)
+    def test_analyze_batch_uses_batched_requests(self):
+        photos = [self._photo(i) for i in range(23)]
+        fake = FakeImageAnnotatorClient(errors={photos[3].original_url: 'Bad image data'})
+        service = ImageAnalysisService(vision_client=VisionAIClient(client=fake))
+
+        results = service.analyze_batch([str(photo.id) for photo in photos] + ['not-a-uuid'])
+
+        self.assertEqual(len(fake.calls_to('batch_annotate_images')), 3)
+        self.assertEqual(results['success'], 22)
+        self.assertEqual(results['failed'], 2)
+        self.assertEqual(ImageAnalysisResult.objects.count(), 22)
+        photos[3].refresh_from_db()
+        self.assertEqual(photos[3].processing_status, InspectionPhoto.STATUS_FAILED)
+        photos[0].refresh_from_db()
+        self.assertEqual(photos[0].processing_status, InspectionPhoto.STATUS_COMPLETED)
+
+    @override_settings(VISION_AI_ENABLED=True, VISION_AI_CACHE_HAMMING_DISTANCE=3)
+    def test_near_duplicate_reuses_cached_analysis(self):
+        fake = FakeImageAnnotatorClient()
+        service = ImageAnalysisService(vision_client=VisionAIClient(client=fake))
+        first = self._photo(0)
+        first.set_fingerprint('a' * 64, 0xF0F0F0F0F0F0F0F0)
+        first.save()
+        service.analyze_inspection_photo(first)
+
+        # Two bits differ: same gauge, slightly different shot
+        second = self._photo(1)
+        second.set_fingerprint('b' * 64, 0xF0F0F0F0F0F0F0F0 ^ 0b101)
+        second.save()
+        result = service.analyze_inspection_photo(second)
+
+        # Too far: analyzed again
+        third = self._photo(2)
+        third.set_fingerprint('c' * 64, 0x0F0F0F0F0F0F0F0F)
+        third.save()
+        service.analyze_inspection_photo(third)
+
+        self.assertTrue(result.cached_result)
+        self.assertEqual(len(fake.calls_to('annotate_image')), 2)
+
+    @override_settings(VISION_AI_ENABLED=True)
+    def test_identical_content_reuses_cached_analysis(self):
+        fake = FakeImageAnnotatorClient()
+        service = ImageAnalysisService(vision_client=VisionAIClient(client=fake))
+        first = self._photo(0, content_sha256='d' * 64)
+        service.analyze_inspection_photo(first)
+
+        second = self._photo(1, content_sha256='d' * 64)
+        result = service.analyze_inspection_photo(second)
+
+        self.assertTrue(result.cached_result)
+        self.assertEqual(len(fake.calls_to('annotate_image')), 1)
@@ -11,6 +11,7 @@ router.register(r'analysis', views.ImageAnalysisResultViewSet, basename='image-a
 router.register(r'anomalies', views.VisualAnomalyViewSet, basename='visual-anomaly')
 router.register(r'meter-readings', views.MeterReadingViewSet, basename='meter-reading')
 router.register(r'damage-reports', views.DamageReportViewSet, basename='damage-report')
+router.register(r'batches', views.ImageBatchJobViewSet, basename='image-batch')
 
 urlpatterns = [
     path('', include(router.urls)),
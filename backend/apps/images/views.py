@@ -2,19 +2,28 @@
 Views for image processing API endpoints.
 """
 import logging
+import uuid
+from datetime import datetime, time, timedelta
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from apps.images.models import (
     InspectionPhoto,
     ImageAnalysisResult,
     VisualAnomaly,
     MeterReading,
-    DamageReport
+    DamageReport,
+    ImageBatchJob
 )
 from apps.images.serializers import (
     InspectionPhotoSerializer,
@@ -23,10 +32,13 @@ from apps.images.serializers import (
     ImageAnalysisResultSerializer,
     VisualAnomalySerializer,
     MeterReadingSerializer,
-    DamageReportSerializer
+    DamageReportSerializer,
+    ImageBatchJobSerializer
 )
 from apps.images.services.image_processing_service import image_processing_service
 from apps.images.services.image_analysis_service import image_analysis_service
+from apps.images.services.image_analytics import SEVERITY_COUNTERS, STATUS_COUNTERS, image_analytics_rollup
+from apps.images.services.image_variants import image_variant_service
 from apps.assets.models import Asset
 from apps.work_orders.models import WorkOrder
 from apps.checklists.models import ChecklistResponse
@@ -42,6 +54,62 @@ except ImportError:
     logger.warning("Celery not available, will use synchronous processing")
 
 
+def _parse_day(value: str):
+    """Date part of an ISO date or datetime query parameter"""
+    day = parse_date(value)
+    if day is None:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f"Invalid date: {value}")
+        day = timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+    return day
+
+
+def _needs_live_statistics(params) -> bool:
+    """Whether the statistics filters need more than the per-day rollup"""
+    if params.get('work_order_id') or params.get('processing_status'):
+        return True
+    return any(
+        params.get(name) and parse_date(params[name]) is None
+        for name in ('date_from', 'date_to')
+    )
+
+
+def _parse_moment(value: str):
+    """Aware datetime of an ISO datetime query parameter (naive = local time)"""
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Invalid date: {value}")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _statistics_filter(params) -> Q:
+    """Photo filter equivalent to the statistics query parameters"""
+    condition = Q()
+    if params.get('asset_id'):
+        condition &= Q(asset_id=params['asset_id'])
+    if params.get('work_order_id'):
+        condition &= Q(work_order_id=params['work_order_id'])
+    if params.get('processing_status'):
+        condition &= Q(processing_status=params['processing_status'])
+    
+    date_from = params.get('date_from')
+    if date_from:
+        day = parse_date(date_from)
+        condition &= Q(captured_at__gte=(
+            timezone.make_aware(datetime.combine(day, time.min)) if day else _parse_moment(date_from)
+        ))
+    date_to = params.get('date_to')
+    if date_to:
+        day = parse_date(date_to)
+        if day:
+            # Whole day, as in the rollup
+            condition &= Q(captured_at__lt=timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)))
+        else:
+            condition &= Q(captured_at__lte=_parse_moment(date_to))
+    return condition
+
+
 class InspectionPhotoViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing inspection photos.
@@ -93,10 +161,13 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
         return queryset.order_by('-captured_at')
     
     @action(detail=False, methods=['post'])
-    @transaction.atomic
     def upload(self, request):
         """
-        Upload and process an inspection photo.
+        Upload an inspection photo for background processing.
+        
+        The raw image is validated from its header and staged; compression,
+        thumbnails, storage and analysis run in the process_inspection_photo
+        task. Poll ``GET /photos/{id}/status/`` for progress.
         
         Request body:
         - image: Image file (required)
@@ -105,9 +176,9 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
         - checklist_response_id: UUID of checklist response (optional)
         
         Returns:
-        - 201: Photo uploaded successfully with metadata
+        - 202: Photo accepted (processing_status PENDING)
         - 400: Validation error
-        - 500: Processing error
+        - 500: Staging error
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -117,65 +188,53 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
         work_order_id = serializer.validated_data.get('work_order_id')
         checklist_response_id = serializer.validated_data.get('checklist_response_id')
         
+        staged = None
+        photo = None
         try:
             # Get related objects
             asset = Asset.objects.get(id=asset_id)
             work_order = WorkOrder.objects.get(id=work_order_id) if work_order_id else None
             checklist_response = ChecklistResponse.objects.get(id=checklist_response_id) if checklist_response_id else None
             
-            # Process and upload image
-            result = image_processing_service.process_and_upload(
-                image_file,
-                str(asset_id),
-                str(request.user.id)
-            )
+            # Stage raw bytes (header/EXIF only, no decode) outside any transaction
+            photo_id = uuid.uuid4()
+            staged = image_processing_service.stage_upload(image_file, str(photo_id))
+            metadata = staged['metadata']
             
-            # Create InspectionPhoto record
+            # Create InspectionPhoto record; variant URLs are filled in by the task
             photo = InspectionPhoto.objects.create(
+                id=photo_id,
                 asset=asset,
                 work_order=work_order,
                 checklist_response=checklist_response,
-                original_url=result['original_url'],
-                thumbnail_url=result['thumbnail_url'],
-                file_size=result['file_size'],
-                width=result['width'],
-                height=result['height'],
-                format=result['format'],
-                captured_at=result['captured_at'],
-                gps_latitude=result.get('gps_latitude'),
-                gps_longitude=result.get('gps_longitude'),
-                gps_altitude=result.get('gps_altitude'),
-                compass_heading=result.get('compass_heading'),
-                device_info=result.get('device_info', {}),
+                staged_upload_path=staged['staged_url'],
+                file_size=staged['file_size'],
+                width=metadata['width'],
+                height=metadata['height'],
+                format=metadata['format'],
+                captured_at=metadata['captured_at'],
+                gps_latitude=metadata.get('gps_latitude'),
+                gps_longitude=metadata.get('gps_longitude'),
+                gps_altitude=metadata.get('gps_altitude'),
+                compass_heading=metadata.get('compass_heading'),
+                device_info=metadata.get('device_info', {}),
                 processing_status=InspectionPhoto.STATUS_PENDING,
                 uploaded_by=request.user
             )
             
-            # Trigger async analysis with Celery (or sync if Celery not available)
             if CELERY_AVAILABLE:
-                # Async processing with Celery
-                logger.info(f"Triggering async analysis for photo {photo.id}")
-                process_inspection_photo.delay(str(photo.id))
-                logger.info(f"Photo uploaded successfully: {photo.id}, analysis queued")
+                # Enqueue once the row is visible to workers
+                transaction.on_commit(lambda: process_inspection_photo.delay(str(photo.id)))
+                logger.info(f"Photo staged: {photo.id}, processing queued")
             else:
-                # Fallback to synchronous processing
-                try:
-                    if image_analysis_service.is_available():
-                        logger.info(f"Starting synchronous Vision AI analysis for photo {photo.id}")
-                        image_analysis_service.analyze_inspection_photo(photo)
-                    else:
-                        logger.warning("Vision AI not available, skipping analysis")
-                except Exception as analysis_error:
-                    logger.error(f"Analysis failed but photo uploaded: {str(analysis_error)}")
-                    # Don't fail the upload if analysis fails
-                
-                logger.info(f"Photo uploaded successfully: {photo.id}")
+                logger.warning(f"Celery not available, processing photo {photo.id} synchronously")
+                process_inspection_photo.apply(args=[str(photo.id)])
+                photo.refresh_from_db()
             
-            # Return created photo (analysis may still be pending if async)
             response_serializer = InspectionPhotoSerializer(photo)
             return Response(
                 response_serializer.data,
-                status=status.HTTP_201_CREATED
+                status=status.HTTP_202_ACCEPTED
             )
             
         except Asset.DoesNotExist:
@@ -200,11 +259,101 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
             )
         except Exception as e:
             logger.error(f"Error uploading photo: {str(e)}", exc_info=True)
+            if staged and photo is None:
+                # No row references the staged bytes
+                try:
+                    image_processing_service.storage.delete(staged['staged_url'])
+                except Exception as cleanup_error:
+                    logger.warning(f"Could not delete staged upload: {str(cleanup_error)}")
             return Response(
                 {'error': 'Failed to process image'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=True, methods=['get'], url_path='status')
+    def processing_state(self, request, pk=None):
+        """
+        Lightweight processing status for polling after an upload.
+        
+        Returns:
+        - 200: id, processing_status, processing_error, processed_at and variant URLs
+        """
+        photo = get_object_or_404(
+            InspectionPhoto.objects.only(
+                'id', 'processing_status', 'processing_error', 'processed_at',
+                'original_url', 'thumbnail_url'
+            ),
+            pk=pk
+        )
+        self.check_object_permissions(request, photo)
+        return Response({
+            'id': str(photo.id),
+            'processing_status': photo.processing_status,
+            'processing_error': photo.processing_error,
+            'processed_at': photo.processed_at,
+            'original_url': photo.original_url,
+            'thumbnail_url': photo.thumbnail_url,
+            'is_stored': bool(photo.original_url),
+        })
+    
+    @action(detail=True, methods=['get'], url_path='image')
+    def image(self, request, pk=None):
+        """
+        Signed URL of the best variant of the photo for this client.
+        
+        The format is negotiated from the Accept header (AVIF, WebP, JPEG)
+        and variants are generated on first request.
+        
+        Query params:
+        - width: Display width in pixels (rounded up to IMAGE_VARIANT_WIDTHS)
+        - image_format: Force JPEG, WEBP or AVIF ('format' is taken by DRF)
+        - redirect: 'true' answers with a 302 to the URL (for <img src>)
+        
+        Returns:
+        - 200: url, format, content_type, width, expires_in
+        - 302: Redirect to the variant (redirect=true)
+        - 400: Invalid parameters
+        - 409: Photo not stored yet
+        """
+        photo = get_object_or_404(
+            InspectionPhoto.objects.only('id', 'asset_id', 'original_url', 'width'),
+            pk=pk
+        )
+        self.check_object_permissions(request, photo)
+        
+        try:
+            width = int(request.query_params['width']) if request.query_params.get('width') else None
+            if width is not None and width <= 0:
+                raise ValueError("width must be positive")
+        except ValueError as e:
+            return Response({'error': f'Invalid width: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not photo.original_url:
+            return Response({'error': 'Photo is still being processed'}, status=status.HTTP_409_CONFLICT)
+        
+        fmt = request.query_params.get('image_format', '').upper() or None
+        try:
+            variant = image_variant_service.resolve(
+                photo, request.META.get('HTTP_ACCEPT', ''), requested_width=width, fmt=fmt
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error serving variant of photo {photo.id}: {str(e)}")
+            return Response(
+                {'error': f'Failed to get image: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        if request.query_params.get('redirect', '').lower() == 'true':
+            response = HttpResponseRedirect(variant['url'])
+        else:
+            response = Response(variant)
+        # Responses differ per Accept header; the URL itself expires
+        patch_vary_headers(response, ['Accept'])
+        patch_cache_control(response, private=True, max_age=variant['expires_in'] // 2)
+        return response
+    
     @action(detail=True, methods=['post'])
     def reprocess(self, request, pk=None):
         """
@@ -273,14 +422,21 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
         
         try:
             if CELERY_AVAILABLE:
-                # Use Celery for async batch processing
-                result = batch_process_images.delay(photo_ids)
+                # Chunked chord; progress is tracked on the batch job
+                job = ImageBatchJob.objects.create(
+                    created_by=request.user,
+                    total_photos=len(photo_ids)
+                )
+                transaction.on_commit(
+                    lambda: batch_process_images.delay(photo_ids, str(job.id))
+                )
                 
                 return Response({
                     'status': 'batch_queued',
                     'total_photos': len(photo_ids),
-                    'task_id': result.id,
-                    'message': 'Batch processing queued. Check task status for results.'
+                    'job_id': str(job.id),
+                    'progress_url': f'/api/v1/images/batches/{job.id}/',
+                    'message': 'Batch processing queued. Check batch job progress for results.'
                 }, status=status.HTTP_202_ACCEPTED)
             else:
                 # Fallback to synchronous batch processing
@@ -347,32 +503,56 @@ class InspectionPhotoViewSet(viewsets.ModelViewSet):
         """
         Get statistics about inspection photos.
         
+        Read from the daily image analytics rollup (plus today's photos), so
+        the cost does not grow with the photo archive. The rollup answers the
+        asset_id filter and whole-day date_from/date_to; work_order_id,
+        processing_status or date filters with a time of day are aggregated
+        live from the photos instead.
+        
         Returns:
         - total_photos: Total number of photos
         - photos_by_status: Count by processing status
         - photos_with_anomalies: Count of photos with detected anomalies
         - photos_with_gps: Count of photos with GPS data
+        - photos_analyzed, anomalies_by_severity, damage_reports,
+          average_anomaly_confidence, vision_ai_calls, api_cost_usd
         """
-        queryset = self.get_queryset()
+        params = request.query_params
+        date_from = params.get('date_from')
+        date_to = params.get('date_to')
+        try:
+            if _needs_live_statistics(params):
+                totals = image_analytics_rollup.summarize_live(_statistics_filter(params))
+            else:
+                totals = image_analytics_rollup.summarize(
+                    asset_id=params.get('asset_id') or None,
+                    date_from=_parse_day(date_from) if date_from else None,
+                    date_to=_parse_day(date_to) if date_to else None,
+                )
+        except (ValueError, ValidationError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        confidence_count = totals['anomaly_confidence_count']
         stats = {
-            'total_photos': queryset.count(),
-            'photos_by_status': {},
-            'photos_with_anomalies': queryset.filter(
-                analysis_result__anomalies_detected=True
-            ).count(),
-            'photos_with_gps': queryset.filter(
-                gps_latitude__isnull=False,
-                gps_longitude__isnull=False
-            ).count(),
+            'total_photos': totals['photos_total'],
+            'photos_by_status': {
+                value: totals[name] for value, name in STATUS_COUNTERS.items()
+            },
+            'photos_with_anomalies': totals['photos_with_anomalies'],
+            'photos_with_gps': totals['photos_with_gps'],
+            'photos_analyzed': totals['photos_analyzed'],
+            'anomalies_by_severity': {
+                value: totals[name] for value, name in SEVERITY_COUNTERS.items()
+            },
+            'damage_reports': totals['damage_reports'],
+            'average_anomaly_confidence': (
+                round(totals['anomaly_confidence_sum'] / confidence_count, 4) if confidence_count else None
+            ),
+            'vision_ai_calls': totals['vision_ai_calls'],
+            'cached_results': totals['cached_results'],
+            'api_cost_usd': float(totals['api_cost_usd']),
         }
         
-        # Count by status
-        for status_choice in InspectionPhoto.STATUS_CHOICES:
-            status_value = status_choice[0]
-            count = queryset.filter(processing_status=status_value).count()
-            stats['photos_by_status'][status_value] = count
-        
         return Response(stats)
 
 
@@ -607,3 +787,28 @@ class DamageReportViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(report)
         return Response(serializer.data)
+
+
+class ImageBatchJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for batch image processing jobs.
+    Poll a job to follow the progress of a batch analysis.
+    """
+    queryset = ImageBatchJob.objects.all()
+    serializer_class = ImageBatchJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Filter queryset based on query parameters."""
+        queryset = ImageBatchJob.objects.all()
+        
+        # Filter by status
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        
+        # Only my batches
+        if self.request.query_params.get('mine', '').lower() == 'true':
+            queryset = queryset.filter(created_by=self.request.user)
+        
+        return queryset.order_by('-created_at')
@@ -0,0 +1,14 @@
+"""
+Notifications app configuration.
+"""
+from django.apps import AppConfig
+
+
+class NotificationsConfig(AppConfig):
+    """Configuration for the notifications app."""
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.notifications'
+    
+    def ready(self):
+        """Import signal handlers when app is ready."""
+        import apps.notifications.signals  # noqa
@@ -0,0 +1,212 @@
+"""
+Quiet-hours and rate-cap digests.
+
+Delivery tasks ask ``plan`` which recipients to notify now. Messages that
+fall in the recipient's quiet hours (per ``NotificationPreference``) or
+exceed ``NOTIFICATION_RATE_CAP`` messages per
+``NOTIFICATION_RATE_WINDOW_SECONDS`` for that user and channel are stored
+as ``DeferredNotification`` rows instead, due at the end of the quiet
+hours or of the rate window. ``release`` (a periodic task) loads every due
+row with one query and sends one digest per user and channel.
+
+Priorities in ``NOTIFICATION_DIGEST_BYPASS_PRIORITIES`` are always sent
+immediately.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import DeferredNotification, NotificationPreference
+
+logger = logging.getLogger(__name__)
+
+LOCK_CACHE_KEY = 'notifications:digest:release_lock'
+RATE_CACHE_KEY = 'notifications:rate:{channel}:{user_id}:{window}'
+
+
+class NotificationDigestService:
+    """Defers notifications and releases them as digests"""
+
+    def plan(
+        self,
+        channel: str,
+        recipients: List[Dict[str, Any]],
+        preferences: Dict[Tuple[Any, str], NotificationPreference],
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Keep the recipients to notify now and defer the others.
+
+        Args:
+            channel: Delivery channel (NotificationPreference.CHANNEL_CHOICES)
+            recipients: Dicts with the notification's id, user_id,
+                notification_type and priority, in send order
+            preferences: Preference per (user_id, notification_type)
+            now: Current time (default: now)
+
+        Returns:
+            Recipients to notify immediately
+        """
+        now = now or timezone.now()
+        cap = getattr(settings, 'NOTIFICATION_RATE_CAP', 10)
+        window = getattr(settings, 'NOTIFICATION_RATE_WINDOW_SECONDS', 900)
+        bypass = set(getattr(settings, 'NOTIFICATION_DIGEST_BYPASS_PRIORITIES', ['CRITICAL']))
+
+        # Fixed rate windows, counted in the cache
+        window_start = int(now.timestamp()) // window * window
+        window_end = datetime.fromtimestamp(window_start + window, tz=dt_timezone.utc)
+        keys = {
+            recipient['user_id']: RATE_CACHE_KEY.format(channel=channel, user_id=recipient['user_id'], window=window_start)
+            for recipient in recipients
+        }
+        cached = cache.get_many(list(keys.values())) if cap else {}
+        sent = {user_id: cached.get(key, 0) for user_id, key in keys.items()}
+
+        immediate = []
+        deferred = []
+        for recipient in recipients:
+            user_id = recipient['user_id']
+            preference = preferences.get((user_id, recipient['notification_type']))
+            release_at = reason = None
+            if recipient['priority'] not in bypass:
+                if preference is not None and preference.is_in_quiet_hours(now):
+                    release_at, reason = preference.quiet_hours_end_after(now), DeferredNotification.REASON_QUIET_HOURS
+                elif cap and sent[user_id] >= cap:
+                    release_at, reason = window_end, DeferredNotification.REASON_RATE_CAP
+
+            if release_at is None:
+                immediate.append(recipient)
+                sent[user_id] += 1
+            else:
+                deferred.append(DeferredNotification(
+                    notification_id=recipient['id'],
+                    user_id=user_id,
+                    channel=channel,
+                    reason=reason,
+                    release_at=release_at
+                ))
+
+        if deferred:
+            DeferredNotification.objects.bulk_create(deferred)
+        if cap and immediate:
+            cache.set_many({keys[user_id]: count for user_id, count in sent.items() if count}, window)
+        return immediate
+
+    def release(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Send one digest per user and channel with every due deferral.
+
+        Rows of digests that could not be delivered (bot not configured,
+        delivery failed after retries, channel without digest delivery)
+        are kept and retried after ``NOTIFICATION_DIGEST_RETRY_SECONDS``.
+
+        Returns:
+            Dict with 'status', 'digests' sent, 'notifications' released
+            and 'kept' for a later run
+        """
+        if not cache.add(LOCK_CACHE_KEY, True, 300):
+            return {'status': 'locked', 'digests': 0, 'notifications': 0, 'kept': 0}
+
+        now = now or timezone.now()
+        try:
+            due = list(
+                DeferredNotification.objects.filter(release_at__lte=now).order_by(
+                    'notification__created_at'
+                ).values(
+                    'id', 'user_id', 'channel', 'user__telegram_id', 'notification__title',
+                    'notification__priority', 'notification__created_at'
+                )
+            )
+            if not due:
+                return {'status': 'success', 'digests': 0, 'notifications': 0, 'kept': 0}
+
+            digests = defaultdict(list)
+            for row in due:
+                digests[(row['user_id'], row['channel'])].append(row)
+
+            delivered = self._send_telegram({
+                group: items for group, items in digests.items() if group[1] == 'TELEGRAM'
+            })
+            unsupported = {channel for _, channel in digests if channel != 'TELEGRAM'}
+            if unsupported:
+                logger.warning(f"No digest delivery for channels {sorted(unsupported)}, keeping them")
+
+            # Only delivered digests are removed; the others are retried later
+            batch_size = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+            sent_ids = [row['id'] for group in delivered for row in digests[group]]
+            kept_ids = [row['id'] for group, items in digests.items() if group not in delivered for row in items]
+            retry_at = now + timedelta(seconds=getattr(settings, 'NOTIFICATION_DIGEST_RETRY_SECONDS', 900))
+            for start in range(0, len(sent_ids), batch_size):
+                DeferredNotification.objects.filter(id__in=sent_ids[start:start + batch_size]).delete()
+            for start in range(0, len(kept_ids), batch_size):
+                DeferredNotification.objects.filter(id__in=kept_ids[start:start + batch_size]).update(release_at=retry_at)
+
+            if kept_ids:
+                logger.warning(f"{len(digests) - len(delivered)} digests not delivered, retrying at {retry_at}")
+            logger.info(f"Released {len(sent_ids)} deferred notifications in {len(delivered)} digests")
+            return {
+                'status': 'success' if not kept_ids else 'partial',
+                'digests': len(delivered),
+                'notifications': len(sent_ids),
+                'kept': len(kept_ids),
+            }
+        finally:
+            cache.delete(LOCK_CACHE_KEY)
+
+    def _send_telegram(self, digests: Dict[Tuple[Any, str], List[Dict[str, Any]]]) -> Set[Tuple[Any, str]]:
+        """
+        Send one Telegram digest per (user, channel) group.
+
+        Returns:
+            Groups whose digest was delivered
+        """
+        from .telegram_delivery import OutgoingMessage, TelegramDispatcher
+        from .telegram_service import get_telegram_service
+
+        telegram_service = get_telegram_service()
+        if not digests or not telegram_service.client_initialized:
+            return set()
+
+        chats = {}
+        messages = []
+        for group, items in digests.items():
+            chat_id = items[0]['user__telegram_id']
+            if not chat_id:
+                # Chat unlinked since the deferral: nothing to retry, the
+                # notifications remain in the app
+                chats[group] = None
+                continue
+            chats[group] = str(chat_id)
+            messages.append(OutgoingMessage(
+                chat_id=str(chat_id),
+                text=telegram_service.format_digest([
+                    {
+                        'title': item['notification__title'],
+                        'priority': item['notification__priority'],
+                        'created_at': item['notification__created_at'],
+                    }
+                    for item in items
+                ]),
+                # Silent only if every message would have been (LOW priority)
+                disable_notification=all(item['notification__priority'] == 'LOW' for item in items)
+            ))
+
+        failed_chats = set()
+        TelegramDispatcher(service=telegram_service).deliver(messages, failed_chats=failed_chats)
+        return {group for group, chat_id in chats.items() if chat_id is None or chat_id not in failed_chats}
+
+
+# Singleton instance
+_digest_service = None
+
+def get_digest_service() -> NotificationDigestService:
+    """Get or create NotificationDigestService singleton instance"""
+    global _digest_service
+    if _digest_service is None:
+        _digest_service = NotificationDigestService()
+    return _digest_service
@@ -0,0 +1,176 @@
+"""
+Server-sent event stream of notifications, alerts and asset status changes.
+
+Writers publish to the event bus (apps/core/event_bus.py) once their
+transaction commits; ``NotificationStreamView`` relays the events a user
+may see. Channels:
+
+- ``user:<id>``: the user's new notifications
+- ``alerts``: created and updated ``Alert`` rows
+- ``asset_status``: new ``AssetStatus`` reports (OPERADOR users only get
+  their own, as in the REST endpoint)
+"""
+import json
+import logging
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.core.event_bus import RESYNC_EVENT, Event, get_event_bus
+
+logger = logging.getLogger(__name__)
+
+ALERTS_CHANNEL = 'alerts'
+ASSET_STATUS_CHANNEL = 'asset_status'
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def publish_on_commit(events: List[tuple]):
+    """
+    Publish (channel, type, data) events once the current transaction commits.
+
+    Publishing never fails the write: errors are logged.
+    """
+    def publish():
+        bus = get_event_bus()
+        for channel, event_type, data in events:
+            try:
+                bus.publish(channel, event_type, data)
+            except Exception as e:
+                logger.error(f"Failed to publish {event_type} event: {str(e)}")
+
+    if events:
+        transaction.on_commit(publish)
+
+
+def notification_events(notifications: Iterable) -> List[tuple]:
+    return [
+        (
+            user_channel(notification.user_id),
+            'notification',
+            {
+                'id': str(notification.id),
+                'notification_type': notification.notification_type,
+                'priority': notification.priority,
+                'title': notification.title,
+                'created_at': notification.created_at.isoformat() if notification.created_at else None,
+            }
+        )
+        for notification in notifications
+    ]
+
+
+def alert_event(alert, created: bool) -> tuple:
+    return (
+        ALERTS_CHANNEL,
+        'alert_created' if created else 'alert_updated',
+        {
+            'id': str(alert.id),
+            'alert_type': alert.alert_type,
+            'severity': alert.severity,
+            'title': alert.title,
+            'asset_id': str(alert.asset_id) if alert.asset_id else None,
+            'is_read': alert.is_read,
+            'is_resolved': alert.is_resolved,
+        }
+    )
+
+
+def asset_status_event(asset_status) -> tuple:
+    return (
+        ASSET_STATUS_CHANNEL,
+        'asset_status',
+        {
+            'id': str(asset_status.id),
+            'asset_id': str(asset_status.asset_id),
+            'status_type': asset_status.status_type,
+            'reported_by': str(asset_status.reported_by_id) if asset_status.reported_by_id else None,
+        }
+    )
+
+
+class StreamLimiter:
+    """Open streams of this process; each one holds a worker thread"""
+
+    def __init__(self):
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.open >= getattr(settings, 'SSE_MAX_STREAMS_PER_PROCESS', 4):
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+stream_limiter = StreamLimiter()
+
+
+def format_event(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+
+class EventStream:
+    """
+    SSE frames for a user; releases its ``stream_limiter`` slot when closed.
+
+    Django closes streaming content when the response ends, even if it was
+    never iterated.
+    """
+
+    def __init__(self, user, last_event_id: Optional[str] = None):
+        self._frames = _frames(user, last_event_id)
+        self._released = False
+
+    def __iter__(self):
+        return self._frames
+
+    def close(self):
+        self._frames.close()
+        if not self._released:
+            self._released = True
+            stream_limiter.release()
+
+
+def _frames(user, last_event_id: Optional[str]) -> Iterator[str]:
+    """
+    Yield SSE frames for ``user`` until ``SSE_MAX_STREAM_SECONDS`` elapse.
+
+    The stream then ends and EventSource reconnects with ``Last-Event-ID``,
+    so no thread is held indefinitely. A comment line is sent every
+    ``SSE_HEARTBEAT_SECONDS`` without events to keep proxies from closing
+    the connection.
+    """
+    operador = user.is_operador()
+    channels = [user_channel(user.id), ALERTS_CHANNEL, ASSET_STATUS_CHANNEL]
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+    deadline = time.monotonic() + getattr(settings, 'SSE_MAX_STREAM_SECONDS', 300)
+
+    def visible(event: Event) -> bool:
+        return not (operador and event.channel == ASSET_STATUS_CHANNEL and event.data.get('reported_by') != str(user.id))
+
+    # Nothing below uses the database: give the connection back
+    if not connection.in_atomic_block:
+        connection.close()
+
+    bus = get_event_bus()
+    cursor = last_event_id or bus.latest_id()
+    yield f"retry: {getattr(settings, 'SSE_RETRY_MILLISECONDS', 3000)}\n\n"
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events, cursor = bus.read(channels, cursor, min(heartbeat, remaining))
+        frames = [format_event(event) for event in events if event.type == RESYNC_EVENT or visible(event)]
+        yield ''.join(frames) if frames else ': ping\n\n'
@@ -0,0 +1,93 @@
+"""
+Notification fan-out to many recipients.
+
+The request only inserts the notifications (one ``bulk_create`` plus one
+UPDATE of the recipients' unread counters) and, once the transaction
+commits, enqueues one delivery task per channel. Pub/Sub publishing and
+Telegram sends happen in the workers (see ``tasks.py``).
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .event_stream import notification_events, publish_on_commit
+from .models import Notification
+from .unread_counter import adjust_unread
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationFanoutService:
+    """Creates notifications in bulk and schedules their delivery"""
+
+    def fan_out(
+        self,
+        user_ids: Iterable,
+        notification_type: str,
+        title: str,
+        message: str,
+        priority: str = 'MEDIUM',
+        data: Optional[Dict[str, Any]] = None
+    ) -> List[Notification]:
+        """
+        Create one notification per recipient and enqueue delivery.
+
+        Args:
+            user_ids: Recipient user IDs (duplicates are ignored)
+            notification_type: Type of notification
+            title: Notification title
+            message: Notification message
+            priority: Priority level
+            data: Additional data
+
+        Returns:
+            Created notifications
+        """
+        notifications = [
+            Notification(
+                user_id=user_id,
+                notification_type=notification_type,
+                priority=priority,
+                title=title,
+                message=message,
+                data=data or {}
+            )
+            for user_id in dict.fromkeys(user_ids)
+        ]
+        batch_size = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications, batch_size=batch_size)
+            # bulk_create sends no post_save: one UPDATE for every recipient
+            adjust_unread({notification.user_id: 1 for notification in notifications})
+            # UUID primary keys are assigned client side, so the ids are
+            # known here even on backends that do not return them
+            notification_ids = [str(notification.id) for notification in notifications]
+            transaction.on_commit(lambda: self.enqueue_delivery(notification_ids))
+            publish_on_commit(notification_events(notifications))
+        return notifications
+
+    def enqueue_delivery(self, notification_ids: List[str]):
+        """Enqueue one delivery task per channel"""
+        from .tasks import publish_notifications, send_telegram_notifications
+
+        if not notification_ids:
+            return
+        for task in (publish_notifications, send_telegram_notifications):
+            try:
+                task.delay(notification_ids)
+            except Exception as e:
+                # The notifications exist in-app even if the broker is down
+                logger.error(f"Failed to enqueue {task.name} for {len(notification_ids)} notifications: {str(e)}")
+
+
+# Singleton instance
+_fanout_service = None
+
+def get_fanout_service() -> NotificationFanoutService:
+    """Get or create NotificationFanoutService singleton instance"""
+    global _fanout_service
+    if _fanout_service is None:
+        _fanout_service = NotificationFanoutService()
+    return _fanout_service
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0002_unread_notification_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeferredNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('IN_APP', 'In-App'), ('EMAIL', 'Email'), ('PUSH', 'Push Notification'), ('TELEGRAM', 'Telegram')], max_length=20)),
+                ('reason', models.CharField(choices=[('QUIET_HOURS', 'Quiet Hours'), ('RATE_CAP', 'Rate Cap')], max_length=20)),
+                ('release_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deferrals', to='notifications.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deferred_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['release_at'], name='notificatio_release_117fdc_idx')],
+            },
+        ),
+    ]
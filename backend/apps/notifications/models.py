@@ -83,10 +83,33 @@ class Notification(models.Model):
     def mark_as_read(self):
         """Mark notification as read"""
         from django.utils import timezone
+        from .unread_counter import mark_read
         if not self.is_read:
+            now = timezone.now()
+            mark_read(self.user_id, [self.pk], now=now)
             self.is_read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            self.read_at = now
+
+
+class UnreadNotificationCounter(models.Model):
+    """
+    Number of unread notifications of a user.
+    
+    Maintained in the same transaction as the notifications it counts (see
+    unread_counter.py); created on first read and reconciled periodically.
+    """
+    
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_notification_counter'
+    )
+    unread = models.IntegerField(default=0)
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread}"
 
 
 class NotificationPreference(models.Model):
@@ -124,16 +147,57 @@ class NotificationPreference(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.get_notification_type_display()}"
     
-    def is_in_quiet_hours(self):
-        """Check if current time is in quiet hours"""
+    def is_in_quiet_hours(self, at=None):
+        """Check if current time (or ``at``) is in quiet hours"""
         if not self.quiet_hours_enabled or not self.quiet_hours_start or not self.quiet_hours_end:
             return False
         
         from django.utils import timezone
-        now = timezone.localtime().time()
+        now = timezone.localtime(at).time()
         
         if self.quiet_hours_start < self.quiet_hours_end:
             return self.quiet_hours_start <= now <= self.quiet_hours_end
         else:
             # Quiet hours span midnight
             return now >= self.quiet_hours_start or now <= self.quiet_hours_end
+    
+    def quiet_hours_end_after(self, at):
+        """First end of quiet hours after ``at`` (aware datetime)"""
+        from datetime import datetime, timedelta
+        from django.utils import timezone
+        local = timezone.localtime(at)
+        end = timezone.make_aware(datetime.combine(local.date(), self.quiet_hours_end))
+        if end < local:
+            end = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), self.quiet_hours_end))
+        return end
+
+
+class DeferredNotification(models.Model):
+    """
+    Notification held back from a channel during quiet hours or over the
+    rate cap; released with the others of its user and channel as one
+    digest at ``release_at`` (see digest_service.py).
+    """
+    
+    REASON_QUIET_HOURS = 'QUIET_HOURS'
+    REASON_RATE_CAP = 'RATE_CAP'
+    
+    REASON_CHOICES = [
+        (REASON_QUIET_HOURS, 'Quiet Hours'),
+        (REASON_RATE_CAP, 'Rate Cap'),
+    ]
+    
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='deferrals')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deferred_notifications')
+    channel = models.CharField(max_length=20, choices=NotificationPreference.CHANNEL_CHOICES)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    release_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['release_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.notification_id} -> {self.channel} at {self.release_at}"
@@ -0,0 +1,139 @@
+"""
+Notification preferences for whole recipient sets.
+
+``PreferenceResolver.resolve`` returns every user's preference per
+notification type. It reads the cache first (one entry per user, holding
+the user's stored preferences) and loads the users that are not cached
+with one query per ``NOTIFICATION_FANOUT_BATCH_SIZE`` users, so delivering
+to a large recipient list costs a constant number of queries. Types
+without a stored row resolve to the model defaults; with
+``create_missing`` those defaults are inserted with one
+``bulk_create(ignore_conflicts=True)``.
+
+Saving or deleting a preference drops its user's cache entry once the
+transaction commits (signals.py); bulk updates call ``invalidate``.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification, NotificationPreference
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'notifications:preferences:{}'
+
+NOTIFICATION_TYPES = [notification_type for notification_type, _ in Notification.NOTIFICATION_TYPES]
+
+
+class PreferenceResolver:
+    """Loads, creates and caches notification preferences per user"""
+
+    def resolve(
+        self,
+        user_ids: Iterable[Any],
+        create_missing: bool = False
+    ) -> Dict[Tuple[Any, str], NotificationPreference]:
+        """
+        Get the preferences of several users.
+
+        Args:
+            user_ids: Users to resolve
+            create_missing: Insert default rows for types without one
+
+        Returns:
+            Preference per (user_id, notification_type) for every type;
+            defaults that were not inserted are unsaved instances
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+
+        keys = {user_id: CACHE_KEY.format(user_id) for user_id in user_ids}
+        cached = cache.get_many(list(keys.values()))
+        stored = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+        loaded = [user_id for user_id in user_ids if user_id not in stored]
+        if loaded:
+            stored.update(self._load(loaded))
+
+        if create_missing:
+            incomplete = [
+                user_id for user_id in user_ids
+                if any(notification_type not in stored[user_id] for notification_type in NOTIFICATION_TYPES)
+            ]
+            if incomplete:
+                NotificationPreference.objects.bulk_create(
+                    [
+                        NotificationPreference(user_id=user_id, notification_type=notification_type)
+                        for user_id in incomplete
+                        for notification_type in NOTIFICATION_TYPES
+                        if notification_type not in stored[user_id]
+                    ],
+                    batch_size=getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500),
+                    ignore_conflicts=True
+                )
+                # Rows inserted concurrently by another request win over ours
+                stored.update(self._load(incomplete))
+                loaded = list(dict.fromkeys(loaded + incomplete))
+
+        if loaded:
+            cache.set_many(
+                {keys[user_id]: stored[user_id] for user_id in loaded},
+                getattr(settings, 'NOTIFICATION_PREFERENCE_CACHE_SECONDS', 300)
+            )
+
+        resolved = {}
+        for user_id in user_ids:
+            preferences = stored[user_id]
+            for notification_type in NOTIFICATION_TYPES:
+                resolved[(user_id, notification_type)] = preferences.get(notification_type) or NotificationPreference(
+                    user_id=user_id, notification_type=notification_type
+                )
+            # Rows for types no longer offered are kept as stored
+            for notification_type, preference in preferences.items():
+                resolved.setdefault((user_id, notification_type), preference)
+        return resolved
+
+    def for_user(self, user_id: Any, create_missing: bool = True) -> List[NotificationPreference]:
+        """
+        Get one user's preferences in notification type order.
+
+        Args:
+            user_id: User to resolve
+            create_missing: Insert default rows for types without one
+
+        Returns:
+            List of preferences, one per notification type
+        """
+        resolved = self.resolve([user_id], create_missing=create_missing)
+        return [resolved[(user_id, notification_type)] for notification_type in NOTIFICATION_TYPES]
+
+    def invalidate(self, user_ids: Iterable[Any]):
+        """Drop the users' cache entries once the current transaction commits"""
+        keys = [CACHE_KEY.format(user_id) for user_id in user_ids]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def _load(self, user_ids: List[Any]) -> Dict[Any, Dict[str, NotificationPreference]]:
+        """Stored preferences of the users, keyed as requested"""
+        requested = {str(user_id): user_id for user_id in user_ids}
+        loaded = {user_id: {} for user_id in user_ids}
+        batch_size = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+        for start in range(0, len(user_ids), batch_size):
+            for preference in NotificationPreference.objects.filter(user_id__in=user_ids[start:start + batch_size]):
+                loaded[requested[str(preference.user_id)]][preference.notification_type] = preference
+        return loaded
+
+
+# Singleton instance
+_preference_resolver = None
+
+def get_preference_resolver() -> PreferenceResolver:
+    """Get or create PreferenceResolver singleton instance"""
+    global _preference_resolver
+    if _preference_resolver is None:
+        _preference_resolver = PreferenceResolver()
+    return _preference_resolver
@@ -2,46 +2,53 @@
 Google Cloud Pub/Sub Service for Notifications
 """
 import os
-import json
 import logging
-from typing import Dict, Any, Optional
-from google.cloud import pubsub_v1
-from google.api_core import retry
+import threading
+from typing import Dict, Any, List, Optional
+
+from django.conf import settings
+
+from apps.core.pubsub_publisher import (
+    GooglePublisherBackend,
+    Publisher,
+    PublishCallback,
+    get_publisher,
+    topic_path,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class PubSubService:
     """Service for publishing notifications to Pub/Sub"""
-    
-    def __init__(self):
+
+    def __init__(self, publisher: Optional[Publisher] = None):
         self.project_id = os.getenv('GCP_PROJECT_ID', '')
         self.topic_name = os.getenv('PUBSUB_NOTIFICATIONS_TOPIC', 'cmms-notifications')
-        self.client_initialized = False
-        
-        if self.project_id:
-            try:
-                self.publisher = pubsub_v1.PublisherClient()
-                self.topic_path = self.publisher.topic_path(self.project_id, self.topic_name)
-                self.client_initialized = True
-                logger.info(f"Pub/Sub client initialized for topic: {self.topic_path}")
-            except Exception as e:
-                logger.error(f"Failed to initialize Pub/Sub client: {str(e)}")
+        self.topic_path = topic_path(self.project_id, self.topic_name)
+        self.publisher = publisher or get_publisher()
+        self.client_initialized = self.publisher.is_available()
+
+        if self.client_initialized:
+            logger.info(f"Pub/Sub publisher ready for topic: {self.topic_path}")
         else:
             logger.warning("GCP_PROJECT_ID not set. Pub/Sub notifications disabled.")
-    
+
     def create_topic_if_not_exists(self):
         """Create Pub/Sub topic if it doesn't exist"""
         if not self.client_initialized:
             return False
-        
+        if not isinstance(self.publisher.backend, GooglePublisherBackend):
+            return True
+
+        client = self.publisher.backend.client
         try:
-            self.publisher.get_topic(request={"topic": self.topic_path})
+            client.get_topic(request={"topic": self.topic_path})
             logger.info(f"Topic {self.topic_name} already exists")
             return True
         except Exception:
             try:
-                self.publisher.create_topic(request={"name": self.topic_path})
+                client.create_topic(request={"name": self.topic_path})
                 logger.info(f"Created topic: {self.topic_name}")
                 return True
             except Exception as e:
@@ -55,11 +62,13 @@ class PubSubService:
         title: str,
         message: str,
         priority: str = 'MEDIUM',
-        data: Optional[Dict[str, Any]] = None
-    ) -> Optional[str]:
+        data: Optional[Dict[str, Any]] = None,
+        callback: Optional[PublishCallback] = None,
+        block: bool = False
+    ) -> bool:
         """
-        Publish a notification to Pub/Sub
-        
+        Publish a notification to Pub/Sub without waiting for it
+
         Args:
             user_id: User ID to send notification to
             notification_type: Type of notification
@@ -67,85 +76,114 @@ class PubSubService:
             message: Notification message
             priority: Priority level
             data: Additional data
-            
+            callback: Called with (message_id, exception) once published;
+                without one, failed messages are spooled and retried
+            block: Wait for publisher capacity instead of spooling
+
         Returns:
-            Message ID if successful, None otherwise
+            True if the message was handed to the publisher
         """
         if not self.client_initialized:
             logger.warning("Pub/Sub not initialized. Skipping notification publish.")
-            return None
-        
-        try:
-            notification_data = {
-                'user_id': str(user_id),
-                'notification_type': notification_type,
-                'title': title,
-                'message': message,
-                'priority': priority,
-                'data': data or {}
-            }
-            
-            # Convert to JSON and encode
-            message_json = json.dumps(notification_data)
-            message_bytes = message_json.encode('utf-8')
-            
-            # Publish with retry
-            future = self.publisher.publish(
-                self.topic_path,
-                message_bytes,
-                user_id=str(user_id),
-                notification_type=notification_type,
-                priority=priority
-            )
-            
-            # Wait for publish to complete
-            message_id = future.result(timeout=30)
-            
-            logger.info(f"Published notification {message_id} for user {user_id}")
-            return message_id
-            
-        except Exception as e:
-            logger.error(f"Failed to publish notification: {str(e)}")
-            return None
-    
+            return False
+
+        notification_data = {
+            'user_id': str(user_id),
+            'notification_type': notification_type,
+            'title': title,
+            'message': message,
+            'priority': priority,
+            'data': data or {}
+        }
+        return self.publisher.publish(
+            self.topic_path,
+            notification_data,
+            callback=callback,
+            block=block,
+            user_id=str(user_id),
+            notification_type=notification_type,
+            priority=priority
+        )
+
+    def publish_many(
+        self,
+        notifications: List[Dict[str, Any]],
+        timeout: Optional[float] = None
+    ) -> List[Optional[str]]:
+        """
+        Publish notifications and collect their message IDs.
+
+        All messages are handed to the publisher first (it batches them
+        and bounds how many are outstanding); the call then waits once for
+        the completions.
+
+        Args:
+            notifications: List of notification dicts (publish_notification kwargs)
+            timeout: Seconds to wait for acknowledgements
+
+        Returns:
+            Message ID (or None on failure) for each notification, in order
+        """
+        if not self.client_initialized:
+            logger.warning("Pub/Sub not initialized. Skipping bulk publish.")
+            return [None] * len(notifications)
+        if not notifications:
+            return []
+
+        timeout = timeout or getattr(settings, 'PUBSUB_PUBLISH_TIMEOUT_SECONDS', 30)
+        message_ids: List[Optional[str]] = [None] * len(notifications)
+        remaining = [len(notifications)]
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def completion(index):
+            def callback(message_id, error):
+                message_ids[index] = message_id
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        done.set()
+            return callback
+
+        for index, notification in enumerate(notifications):
+            self.publish_notification(**notification, callback=completion(index), block=True)
+
+        if not done.wait(timeout):
+            logger.error(f"Timed out waiting for {remaining[0]} Pub/Sub acknowledgements")
+
+        return list(message_ids)
+
     def publish_bulk_notifications(self, notifications: list) -> Dict[str, Any]:
         """
         Publish multiple notifications in bulk
-        
+
         Args:
             notifications: List of notification dicts
-            
+
         Returns:
             Dict with success/failure counts
         """
         if not self.client_initialized:
             logger.warning("Pub/Sub not initialized. Skipping bulk publish.")
             return {'success': 0, 'failed': len(notifications)}
-        
-        success_count = 0
-        failed_count = 0
-        message_ids = []
-        
-        for notification in notifications:
-            message_id = self.publish_notification(
-                user_id=notification.get('user_id'),
-                notification_type=notification.get('notification_type'),
-                title=notification.get('title'),
-                message=notification.get('message'),
-                priority=notification.get('priority', 'MEDIUM'),
-                data=notification.get('data')
-            )
-            
-            if message_id:
-                success_count += 1
-                message_ids.append(message_id)
-            else:
-                failed_count += 1
-        
+
+        message_ids = self.publish_many([
+            {
+                'user_id': notification.get('user_id'),
+                'notification_type': notification.get('notification_type'),
+                'title': notification.get('title'),
+                'message': notification.get('message'),
+                'priority': notification.get('priority', 'MEDIUM'),
+                'data': notification.get('data'),
+            }
+            for notification in notifications
+        ])
+        published = [message_id for message_id in message_ids if message_id]
+
         return {
-            'success': success_count,
-            'failed': failed_count,
-            'message_ids': message_ids
+            'success': len(published),
+            'failed': len(message_ids) - len(published),
+            'message_ids': published
         }
 
 
@@ -66,3 +66,13 @@ class BulkNotificationSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255)
     message = serializers.CharField()
     data = serializers.JSONField(required=False, default=dict)
+
+
+class BulkMarkReadSerializer(serializers.Serializer):
+    """Serializer for marking several notifications as read"""
+    
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=1000
+    )
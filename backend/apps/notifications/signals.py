@@ -0,0 +1,51 @@
+"""
+Signal handlers for unread counters, preference caching and the event stream.
+
+Bulk inserts, mark-read updates and deletes through the API adjust the
+counters explicitly (see unread_counter.py and fanout_service.py), and
+fan-outs publish their own events.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.machine_status.models import AssetStatus
+from apps.notifications.event_stream import (
+    alert_event, asset_status_event, notification_events, publish_on_commit
+)
+from apps.notifications.models import Notification, NotificationPreference
+from apps.notifications.preference_resolver import get_preference_resolver
+from apps.notifications.unread_counter import adjust_unread
+from apps.predictions.models import Alert
+
+
+@receiver(post_save, sender=Notification)
+def count_created_notification(sender, instance, created, raw=False, **kwargs):
+    """A notification created unread raises its user's counter"""
+    if created and not raw and not instance.is_read:
+        adjust_unread({instance.user_id: 1})
+
+
+@receiver(post_save, sender=Notification)
+def stream_created_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit(notification_events([instance]))
+
+
+@receiver(post_save, sender=NotificationPreference)
+@receiver(post_delete, sender=NotificationPreference)
+def invalidate_preferences(sender, instance, raw=False, **kwargs):
+    """Drop the user's cached preferences"""
+    if not raw:
+        get_preference_resolver().invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=Alert)
+def stream_alert(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        publish_on_commit([alert_event(instance, created)])
+
+
+@receiver(post_save, sender=AssetStatus)
+def stream_asset_status(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit([asset_status_event(instance)])
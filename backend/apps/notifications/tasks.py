@@ -0,0 +1,216 @@
+"""
+Celery tasks for notification delivery.
+One task per channel delivers a whole fan-out (see fanout_service.py).
+"""
+import logging
+from typing import Any, Dict, List
+
+from celery import shared_task
+from celery.exceptions import MaxRetriesExceededError
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Notification
+from .digest_service import get_digest_service
+from .preference_resolver import get_preference_resolver
+from .pubsub_service import get_pubsub_service
+from .telegram_delivery import OutgoingMessage, TelegramDispatcher
+from .telegram_service import get_telegram_service
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@shared_task(
+    bind=True,
+    name='apps.notifications.tasks.publish_notifications',
+    max_retries=3,
+    default_retry_delay=30,
+    queue='normal'
+)
+def publish_notifications(self, notification_ids: List[str]) -> Dict[str, Any]:
+    """
+    Publish notifications to Pub/Sub and record their message IDs.
+
+    Notifications that already have a message ID are skipped, so retries
+    only publish the failed ones.
+
+    Args:
+        notification_ids: UUIDs of the notifications
+
+    Returns:
+        Dict with published/failed counts
+    """
+    pubsub_service = get_pubsub_service()
+    if not pubsub_service.client_initialized:
+        return {'status': 'skipped', 'published': 0, 'failed': 0}
+
+    batch_size = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+    published = failed = 0
+
+    for chunk in _chunks(notification_ids, batch_size):
+        notifications = list(
+            Notification.objects.filter(id__in=chunk, pubsub_message_id__isnull=True).only(
+                'id', 'user_id', 'notification_type', 'title', 'message', 'priority', 'data'
+            )
+        )
+        message_ids = pubsub_service.publish_many(
+            [
+                {
+                    'user_id': notification.user_id,
+                    'notification_type': notification.notification_type,
+                    'title': notification.title,
+                    'message': notification.message,
+                    'priority': notification.priority,
+                    'data': notification.data,
+                }
+                for notification in notifications
+            ]
+        )
+
+        delivered = []
+        for notification, message_id in zip(notifications, message_ids):
+            if message_id:
+                notification.pubsub_message_id = message_id
+                delivered.append(notification)
+        Notification.objects.bulk_update(delivered, ['pubsub_message_id'], batch_size=batch_size)
+        published += len(delivered)
+        failed += len(notifications) - len(delivered)
+
+    logger.info(f"Published {published} notifications to Pub/Sub ({failed} failed)")
+    if failed:
+        try:
+            raise self.retry()
+        except MaxRetriesExceededError:
+            logger.error(f"Max retries exceeded publishing notifications, {failed} not published")
+
+    return {'status': 'success' if not failed else 'partial', 'published': published, 'failed': failed}
+
+
+@shared_task(
+    name='apps.notifications.tasks.send_telegram_notifications',
+    queue='normal'
+)
+def send_telegram_notifications(notification_ids: List[str]) -> Dict[str, Any]:
+    """
+    Send notifications to the Telegram chats of recipients that enabled it.
+
+    Recipients are loaded with one query per batch, and preferences of the
+    recipients not in the cache with one more (see preference_resolver.py).
+    Messages in the recipient's quiet hours or over the rate cap are
+    deferred to a digest (see digest_service.py); the rest go through the
+    rate-limited dispatcher, which coalesces messages to the same chat and
+    honors Telegram's retry_after.
+
+    Args:
+        notification_ids: UUIDs of the notifications
+
+    Returns:
+        Dict with sent/failed/deferred counts
+    """
+    telegram_service = get_telegram_service()
+    if not telegram_service.client_initialized:
+        return {'status': 'skipped', 'sent': 0, 'failed': 0}
+
+    batch_size = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+    dispatcher = TelegramDispatcher(service=telegram_service)
+    digest_service = get_digest_service()
+    preference_resolver = get_preference_resolver()
+    sent = failed = deferred = 0
+
+    for chunk in _chunks(notification_ids, batch_size):
+        notifications = list(
+            Notification.objects.filter(id__in=chunk).exclude(
+                Q(user__telegram_id__isnull=True) | Q(user__telegram_id='')
+            ).values(
+                'id', 'user_id', 'user__telegram_id', 'notification_type', 'title', 'message', 'priority', 'data'
+            ).order_by('created_at')
+        )
+        if not notifications:
+            continue
+
+        # Cached per user: repeated deliveries to the same recipients cost no query
+        preferences = preference_resolver.resolve(
+            notification['user_id'] for notification in notifications
+        )
+        enabled = [
+            notification for notification in notifications
+            if getattr(preferences.get((notification['user_id'], notification['notification_type'])), 'telegram_enabled', False)
+        ]
+        # Quiet hours and the per-user rate cap hold some back for a digest
+        recipients = digest_service.plan('TELEGRAM', enabled, preferences)
+        deferred += len(enabled) - len(recipients)
+
+        messages = []
+        for notification in recipients:
+            text, disable_notification = telegram_service.format_notification(
+                notification_type=notification['notification_type'],
+                title=notification['title'],
+                message=notification['message'],
+                priority=notification['priority'],
+                data=notification['data']
+            )
+            messages.append(OutgoingMessage(
+                chat_id=notification['user__telegram_id'],
+                text=text,
+                disable_notification=disable_notification
+            ))
+
+        report = dispatcher.deliver(messages)
+        sent += report['sent']
+        failed += report['failed']
+
+    logger.info(f"Sent {sent} Telegram notifications ({failed} failed, {deferred} deferred)")
+    return {'status': 'success' if not failed else 'partial', 'sent': sent, 'failed': failed, 'deferred': deferred}
+
+
+@shared_task(
+    name='apps.notifications.tasks.process_telegram_command',
+    queue='high_priority'
+)
+def process_telegram_command(chat_id: int, text: str, user_info: Dict[str, Any]):
+    """
+    Run a bot command received by the Telegram webhook and send the answer.
+
+    Args:
+        chat_id: Chat the command came from
+        text: Message text (starts with the command)
+        user_info: Telegram ``from`` object of the message
+    """
+    from .telegram_webhook import handle_command
+
+    handle_command(chat_id, text, user_info)
+
+
+@shared_task(
+    name='apps.notifications.tasks.reconcile_unread_counters',
+    queue='batch'
+)
+def reconcile_unread_counters() -> Dict[str, Any]:
+    """
+    Correct unread notification counters that drifted from the actual counts.
+
+    Returns:
+        Dict with the number of corrected counters
+    """
+    from .unread_counter import reconcile
+
+    return {'status': 'success', 'corrected': reconcile()}
+
+
+@shared_task(
+    name='apps.notifications.tasks.release_notification_digests',
+    queue='normal'
+)
+def release_notification_digests() -> Dict[str, Any]:
+    """
+    Send the digests of deferred notifications that are due.
+
+    Returns:
+        Dict with the digests sent, notifications released and kept for retry
+    """
+    return get_digest_service().release()
@@ -0,0 +1,318 @@
+"""
+Rate-limited Telegram delivery.
+
+Telegram allows about one message per second to the same chat, 20 per
+minute to a group and ~30 per second overall per bot; going faster returns
+429 with a ``retry_after``. ``TelegramDispatcher`` delivers a batch of
+messages within those limits:
+
+- messages to the same chat are coalesced into as few messages as fit in
+  Telegram's length limit, so an alert storm to one user costs one or two
+  requests instead of one per alert
+- a per-chat and a global token bucket gate every request; chats wait for
+  their own bucket without holding up the others
+- requests run on a bounded thread pool over the service's pooled session
+- 429 responses delay that chat by ``retry_after``; server and network
+  errors back off exponentially, up to ``TELEGRAM_MAX_RETRIES`` attempts
+
+Limits are per process (see TokenBucket); settings should account for the
+number of delivery workers.
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+from apps.core.rate_limiting import TokenBucket
+
+from .telegram_service import MAX_MESSAGE_LENGTH, TelegramAPIError, TelegramService, get_telegram_service
+
+logger = logging.getLogger(__name__)
+
+# Blank line between coalesced notifications
+COALESCE_SEPARATOR = '\n\n'
+
+
+@dataclass
+class OutgoingMessage:
+    """One message to deliver (or several coalesced ones)"""
+    chat_id: str
+    text: str
+    parse_mode: str = 'HTML'
+    disable_notification: bool = False
+    count: int = 1
+    attempts: int = field(default=0, compare=False)
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> 'OutgoingMessage':
+        return cls(
+            chat_id=str(values['chat_id']),
+            text=values['text'],
+            parse_mode=values.get('parse_mode', 'HTML'),
+            disable_notification=values.get('disable_notification', False),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'chat_id': self.chat_id,
+            'text': self.text,
+            'parse_mode': self.parse_mode,
+            'disable_notification': self.disable_notification,
+        }
+
+
+def coalesce(messages: Iterable[OutgoingMessage], max_length: int = MAX_MESSAGE_LENGTH) -> List[OutgoingMessage]:
+    """
+    Merge consecutive messages to the same chat while they fit in one message.
+
+    Order per chat is preserved; a merged message is silent only if all its
+    parts were.
+    """
+    merged: List[OutgoingMessage] = []
+    last_by_chat: Dict[str, OutgoingMessage] = {}
+    for message in messages:
+        last = last_by_chat.get(message.chat_id)
+        if (
+            last is not None
+            and last.parse_mode == message.parse_mode
+            and len(last.text) + len(COALESCE_SEPARATOR) + len(message.text) <= max_length
+        ):
+            last.text = f"{last.text}{COALESCE_SEPARATOR}{message.text}"
+            last.disable_notification = last.disable_notification and message.disable_notification
+            last.count += message.count
+            continue
+        current = OutgoingMessage(
+            chat_id=message.chat_id,
+            text=message.text,
+            parse_mode=message.parse_mode,
+            disable_notification=message.disable_notification,
+            count=message.count,
+        )
+        merged.append(current)
+        last_by_chat[message.chat_id] = current
+    return merged
+
+
+class TelegramRateLimiter:
+    """
+    Global and per-chat token buckets.
+
+    Group chats (negative IDs) get the lower group rate. Per-chat buckets
+    are kept for the most recent ``max_chats`` chats.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        chat_rate: Optional[float] = None,
+        group_rate: Optional[float] = None,
+        max_chats: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize limiter.
+
+        Args:
+            global_rate: Messages per second for the whole bot
+            chat_rate: Messages per second to one private chat
+            group_rate: Messages per second to one group
+            max_chats: Per-chat buckets kept in memory
+            clock: Monotonic clock (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        self.chat_rate = chat_rate or getattr(settings, 'TELEGRAM_CHAT_MESSAGES_PER_SECOND', 1)
+        self.group_rate = group_rate or getattr(settings, 'TELEGRAM_GROUP_MESSAGES_PER_MINUTE', 20) / 60
+        self.max_chats = max_chats
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(
+            rate=global_rate or getattr(settings, 'TELEGRAM_GLOBAL_MESSAGES_PER_SECOND', 25),
+            clock=clock,
+            sleep=sleep,
+        )
+        self._chats: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                rate = self.group_rate if chat_id.startswith('-') else self.chat_rate
+                bucket = self._chats[chat_id] = TokenBucket(rate=rate, capacity=1, clock=self.clock, sleep=self.sleep)
+                if len(self._chats) > self.max_chats:
+                    self._chats.popitem(last=False)
+            else:
+                self._chats.move_to_end(chat_id)
+            return bucket
+
+    def reserve(self, chat_id: str) -> float:
+        """
+        Take the chat's token and then a global one.
+
+        Returns:
+            0 when the message may be sent now, otherwise seconds until the
+            chat's bucket has a token (nothing is taken in that case)
+        """
+        wait_seconds = self._chat_bucket(chat_id).try_acquire()
+        if wait_seconds:
+            return wait_seconds
+        # The global rate is high: waiting here is short
+        self.global_bucket.acquire()
+        return 0.0
+
+
+class TelegramDispatcher:
+    """
+    Deliver batches of messages within Telegram's rate limits.
+    """
+
+    def __init__(
+        self,
+        service: Optional[TelegramService] = None,
+        limiter: Optional[TelegramRateLimiter] = None,
+        max_workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize dispatcher.
+
+        Args:
+            service: Telegram client (default: process-wide service)
+            limiter: Rate limiter (default: process-wide limiter)
+            max_workers: Concurrent requests
+            max_retries: Attempts per message before giving up
+            clock: Monotonic clock (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        self._service = service
+        self.limiter = limiter or get_rate_limiter()
+        self.max_workers = max_workers or getattr(settings, 'NOTIFICATION_TELEGRAM_MAX_WORKERS', 8)
+        self.max_retries = max_retries or getattr(settings, 'TELEGRAM_MAX_RETRIES', 5)
+        self.clock = clock
+        self.sleep = sleep
+
+    @property
+    def service(self) -> TelegramService:
+        return self._service or get_telegram_service()
+
+    def _send(self, message: OutgoingMessage):
+        return self.service.call('sendMessage', message.to_dict())
+
+    def deliver(self, messages: Iterable[OutgoingMessage], failed_chats: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        Send messages, coalescing per chat and honoring rate limits.
+
+        Args:
+            messages: Messages to send
+            failed_chats: If given, receives the chat IDs of messages that
+                could not be delivered
+
+        Returns:
+            Dict with 'sent'/'failed' message counts, 'requests' made and
+            'rate_limited' (429 responses)
+        """
+        queues: Dict[str, Deque[OutgoingMessage]] = {}
+        for message in coalesce(messages):
+            queues.setdefault(message.chat_id, deque()).append(message)
+
+        report = {'sent': 0, 'failed': 0, 'requests': 0, 'rate_limited': 0}
+        if not queues:
+            return report
+
+        # (ready at, sequence, chat): chats with queued messages and none in flight
+        ready = [(0.0, index, chat_id) for index, chat_id in enumerate(queues)]
+        sequence = len(ready)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='telegram') as executor:
+            while ready or in_flight:
+                now = self.clock()
+
+                done = [future for future in in_flight if future.done()]
+                for future in done:
+                    chat_id = in_flight.pop(future)
+                    message = queues[chat_id].popleft()
+                    delay = self._handle_result(future, message, report)
+                    if failed_chats is not None and delay is None and future.exception() is not None:
+                        failed_chats.add(chat_id)
+                    if delay is not None:
+                        queues[chat_id].appendleft(message)
+                    if queues[chat_id]:
+                        heapq.heappush(ready, (now + (delay or 0.0), sequence, chat_id))
+                        sequence += 1
+
+                if ready and ready[0][0] <= now and len(in_flight) < self.max_workers:
+                    _, _, chat_id = heapq.heappop(ready)
+                    wait_seconds = self.limiter.reserve(chat_id)
+                    if wait_seconds:
+                        heapq.heappush(ready, (now + wait_seconds, sequence, chat_id))
+                        sequence += 1
+                        continue
+                    report['requests'] += 1
+                    in_flight[executor.submit(self._send, queues[chat_id][0])] = chat_id
+                    continue
+
+                # With every worker busy only a completion can make progress
+                timeout = None
+                if ready and len(in_flight) < self.max_workers:
+                    timeout = max(0.0, ready[0][0] - now)
+                if in_flight:
+                    wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+                elif timeout:
+                    self.sleep(timeout)
+
+        if report['failed']:
+            logger.warning(f"Telegram delivery: {report['sent']} sent, {report['failed']} failed")
+        return report
+
+    def _handle_result(self, future, message: OutgoingMessage, report: Dict[str, Any]) -> Optional[float]:
+        """
+        Record a finished request.
+
+        Returns:
+            Seconds to wait before retrying the message, or None when done
+        """
+        try:
+            future.result()
+            report['sent'] += message.count
+            return None
+        except TelegramAPIError as e:
+            error = e
+        except Exception as e:
+            error = TelegramAPIError(str(e), status_code=0)
+
+        message.attempts += 1
+        if error.retry_after is not None:
+            report['rate_limited'] += 1
+        if error.retryable and message.attempts < self.max_retries:
+            delay = float(error.retry_after) if error.retry_after is not None else min(2 ** message.attempts, 30)
+            logger.info(f"Telegram send to {message.chat_id} retried in {delay}s: {str(error)}")
+            return delay
+
+        logger.error(f"Failed to send Telegram message to {message.chat_id}: {str(error)}")
+        report['failed'] += message.count
+        return None
+
+
+# Process-wide limiter: every dispatcher of the process shares the quotas
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TelegramRateLimiter:
+    """Get or create the process-wide TelegramRateLimiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TelegramRateLimiter()
+    return _rate_limiter
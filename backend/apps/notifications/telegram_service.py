@@ -1,13 +1,40 @@
 """
 Telegram Bot Service for Notifications
+
+All Bot API calls go through one ``requests.Session`` per process, so
+messages reuse pooled keep-alive connections instead of a TLS handshake
+each. Bulk delivery (rate limits, retry_after, coalescing) lives in
+telegram_delivery.py.
 """
 import os
 import logging
+import threading
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, List, Tuple
+
+from django.conf import settings
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Maximum length of a Telegram text message
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TelegramAPIError(Exception):
+    """Bot API call that failed; ``retry_after`` is set on 429 responses"""
+    
+    def __init__(self, description: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(description)
+        self.status_code = status_code
+        self.retry_after = retry_after
+    
+    @property
+    def retryable(self) -> bool:
+        """Rate limited, server error or network failure (no status)"""
+        return self.retry_after is not None or self.status_code is None or self.status_code >= 500
+
 
 class TelegramService:
     """Service for sending notifications via Telegram"""
@@ -16,12 +43,69 @@ class TelegramService:
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}" if self.bot_token else ''
         self.client_initialized = bool(self.bot_token)
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
         
         if not self.client_initialized:
             logger.warning("Telegram bot token not set. Telegram notifications disabled.")
         else:
             logger.info("Telegram service initialized")
     
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session with a keep-alive connection pool (one per process)"""
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    pool_size = getattr(settings, 'TELEGRAM_HTTP_POOL_SIZE', 16)
+                    session = requests.Session()
+                    # Retries are handled by the delivery queue (retry_after aware)
+                    session.mount('https://', HTTPAdapter(
+                        pool_connections=1, pool_maxsize=pool_size, max_retries=0
+                    ))
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+    
+    def call(self, method: str, payload: Optional[Dict[str, Any]] = None, http_method: str = 'post') -> Any:
+        """
+        Call a Bot API method.
+        
+        Args:
+            method: API method (sendMessage, getMe...)
+            payload: JSON body
+            http_method: 'post' or 'get'
+            
+        Returns:
+            The ``result`` field of the response
+            
+        Raises:
+            TelegramAPIError: On network errors and unsuccessful responses
+        """
+        if not self.client_initialized:
+            raise TelegramAPIError("Telegram service not initialized", status_code=0)
+        
+        timeout = getattr(settings, 'TELEGRAM_HTTP_TIMEOUT_SECONDS', 10)
+        try:
+            response = self.session.request(http_method, f"{self.api_url}/{method}", json=payload, timeout=timeout)
+        except requests.RequestException as e:
+            raise TelegramAPIError(str(e))
+        
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.ok and body.get('ok'):
+            return body.get('result')
+        
+        parameters = body.get('parameters') or {}
+        raise TelegramAPIError(
+            body.get('description') or f"HTTP {response.status_code}",
+            status_code=response.status_code,
+            retry_after=parameters.get('retry_after'),
+        )
+    
     def send_message(
         self,
         chat_id: str,
@@ -45,8 +129,6 @@ class TelegramService:
             logger.warning("Telegram service not initialized")
             return None
         
-        url = f"{self.api_url}/sendMessage"
-        
         payload = {
             'chat_id': chat_id,
             'text': text,
@@ -55,19 +137,10 @@ class TelegramService:
         }
         
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if result.get('ok'):
-                logger.info(f"Telegram message sent to {chat_id}")
-                return result.get('result')
-            else:
-                logger.error(f"Telegram API error: {result.get('description')}")
-                return None
-                
-        except Exception as e:
+            result = self.call('sendMessage', payload)
+            logger.info(f"Telegram message sent to {chat_id}")
+            return result
+        except TelegramAPIError as e:
             logger.error(f"Failed to send Telegram message: {str(e)}")
             return None
 
@@ -94,7 +167,31 @@ class TelegramService:
         Returns:
             Response dict or None if failed
         """
-        # Format message with HTML
+        text, disable_notification = self.format_notification(
+            notification_type, title, message, priority, data
+        )
+        
+        return self.send_message(
+            chat_id=chat_id,
+            text=text,
+            parse_mode='HTML',
+            disable_notification=disable_notification
+        )
+    
+    def format_notification(
+        self,
+        notification_type: str,
+        title: str,
+        message: str,
+        priority: str = 'MEDIUM',
+        data: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, bool]:
+        """
+        HTML text of a notification and whether to send it silently
+        
+        Returns:
+            Tuple of (text, disable_notification)
+        """
         priority_emoji = {
             'CRITICAL': '🔴',
             'HIGH': '🟠',
@@ -121,35 +218,49 @@ class TelegramService:
                 formatted_text += f"\n📦 Activo: {data['asset_name']}"
         
         # Send silently for LOW priority
-        disable_notification = (priority == 'LOW')
+        return formatted_text.strip(), priority == 'LOW'
+    
+    def format_digest(self, items: List[Dict[str, Any]]) -> str:
+        """
+        HTML text grouping several notifications in one message
         
-        return self.send_message(
-            chat_id=chat_id,
-            text=formatted_text.strip(),
-            parse_mode='HTML',
-            disable_notification=disable_notification
-        )
+        Args:
+            items: Dicts with title, priority and created_at, oldest first
+            
+        Returns:
+            Digest text, shortened to fit one Telegram message
+        """
+        priority_emoji = {
+            'CRITICAL': '🔴',
+            'HIGH': '🟠',
+            'MEDIUM': '🟡',
+            'LOW': '🔵'
+        }
+        
+        header = f"🗂 <b>Resumen de notificaciones ({len(items)})</b>\n"
+        lines = [
+            f"{priority_emoji.get(item['priority'], 'ℹ️')} {timezone.localtime(item['created_at']).strftime('%d/%m %H:%M')} "
+            f"<b>{item['title']}</b>"
+            for item in items
+        ]
+        
+        text = header
+        for index, line in enumerate(lines):
+            # Leave room for the "and N more" line
+            if len(text) + len(line) + 40 > MAX_MESSAGE_LENGTH:
+                text += f"\n<i>... y {len(lines) - index} más en la aplicación</i>"
+                break
+            text += f"\n{line}"
+        return text
     
     def get_bot_info(self) -> Optional[Dict[str, Any]]:
         """Get information about the bot"""
         if not self.client_initialized:
             return None
         
-        url = f"{self.api_url}/getMe"
-        
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if result.get('ok'):
-                return result.get('result')
-            else:
-                logger.error(f"Telegram API error: {result.get('description')}")
-                return None
-                
-        except Exception as e:
+            return self.call('getMe', http_method='get')
+        except TelegramAPIError as e:
             logger.error(f"Failed to get bot info: {str(e)}")
             return None
     
@@ -166,26 +277,11 @@ class TelegramService:
         if not self.client_initialized:
             return False
         
-        url = f"{self.api_url}/setWebhook"
-        
-        payload = {
-            'url': webhook_url
-        }
-        
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if result.get('ok'):
-                logger.info(f"Webhook set to {webhook_url}")
-                return True
-            else:
-                logger.error(f"Failed to set webhook: {result.get('description')}")
-                return False
-                
-        except Exception as e:
+            self.call('setWebhook', {'url': webhook_url})
+            logger.info(f"Webhook set to {webhook_url}")
+            return True
+        except TelegramAPIError as e:
             logger.error(f"Failed to set webhook: {str(e)}")
             return False
     
@@ -194,22 +290,11 @@ class TelegramService:
         if not self.client_initialized:
             return False
         
-        url = f"{self.api_url}/deleteWebhook"
-        
         try:
-            response = requests.post(url, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if result.get('ok'):
-                logger.info("Webhook deleted")
-                return True
-            else:
-                logger.error(f"Failed to delete webhook: {result.get('description')}")
-                return False
-                
-        except Exception as e:
+            self.call('deleteWebhook')
+            logger.info("Webhook deleted")
+            return True
+        except TelegramAPIError as e:
             logger.error(f"Failed to delete webhook: {str(e)}")
             return False
 
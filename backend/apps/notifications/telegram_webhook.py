@@ -1,8 +1,18 @@
 """
 Telegram Webhook Handler for Somacorbot
+
+The webhook only acknowledges updates: each one is deduplicated by
+``update_id`` (Telegram re-sends updates it considers unanswered) and its
+command is run by the ``process_telegram_command`` Celery task. Answers
+that are the same for every user (/kpis, /equipos) are built from cached
+snapshots that live ``TELEGRAM_COMMAND_CACHE_SECONDS``.
 """
 import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.auth import get_user_model
@@ -13,12 +23,16 @@ from .telegram_service import get_telegram_service
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+UPDATE_CACHE_KEY = 'telegram:update:{}'
+KPI_SNAPSHOT_CACHE_KEY = 'telegram:snapshot:kpis'
+ASSET_SNAPSHOT_CACHE_KEY = 'telegram:snapshot:equipos'
+
 
 def require_linked_user(func):
     """Decorator to require linked user for command"""
     @wraps(func)
     def wrapper(chat_id, user_info, telegram_service, *args, **kwargs):
-        user = User.objects.filter(telegram_chat_id=str(chat_id)).first()
+        user = User.objects.filter(telegram_id=str(chat_id)).first()
         if not user:
             telegram_service.send_message(
                 chat_id=str(chat_id),
@@ -35,7 +49,7 @@ def require_role(allowed_roles):
     def decorator(func):
         @wraps(func)
         def wrapper(chat_id, user_info, telegram_service, user, *args, **kwargs):
-            if not hasattr(user, 'role') or user.role not in allowed_roles:
+            if getattr(user.role, 'name', None) not in allowed_roles:
                 telegram_service.send_message(
                     chat_id=str(chat_id),
                     text="🚫 <b>Acceso Denegado</b>\n\nNo tienes permisos para usar este comando.",
@@ -51,33 +65,94 @@ def require_role(allowed_roles):
 @require_POST
 def telegram_webhook(request):
     """
-    Handle incoming updates from Telegram
+    Acknowledge an update from Telegram and queue its command
     """
+    from .tasks import process_telegram_command
+    
     try:
         update = json.loads(request.body.decode('utf-8'))
-        
-        # Extract message
-        message = update.get('message')
-        if not message:
-            return JsonResponse({'ok': True})
-        
-        chat_id = message.get('chat', {}).get('id')
-        text = message.get('text', '')
-        user_info = message.get('from', {})
-        
-        if not chat_id:
-            return JsonResponse({'ok': True})
-        
-        # Handle commands
-        if text.startswith('/'):
-            handle_command(chat_id, text, user_info)
-        
+    except ValueError as e:
+        logger.error(f"Invalid Telegram update: {str(e)}")
+        return JsonResponse({'ok': False, 'error': 'Invalid JSON'}, status=400)
+    
+    # Extract message
+    message = update.get('message')
+    if not message:
         return JsonResponse({'ok': True})
-        
+    
+    chat_id = message.get('chat', {}).get('id')
+    text = message.get('text', '')
+    user_info = message.get('from', {})
+    
+    if not chat_id or not text.startswith('/'):
+        return JsonResponse({'ok': True})
+    
+    # Telegram retries updates it considers unanswered: queue each one once
+    update_key = None
+    if update.get('update_id') is not None:
+        update_key = UPDATE_CACHE_KEY.format(update['update_id'])
+        if not cache.add(update_key, True, getattr(settings, 'TELEGRAM_UPDATE_DEDUPE_SECONDS', 3600)):
+            return JsonResponse({'ok': True})
+    
+    try:
+        process_telegram_command.delay(chat_id, text, user_info)
     except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
+        # Let Telegram retry the update
+        logger.error(f"Error queueing Telegram command: {str(e)}")
+        if update_key:
+            cache.delete(update_key)
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
+    
+    return JsonResponse({'ok': True})
+
 
+def _snapshot(cache_key, build):
+    """Command data shared by all users, rebuilt at most every TELEGRAM_COMMAND_CACHE_SECONDS"""
+    return cache.get_or_set(cache_key, build, getattr(settings, 'TELEGRAM_COMMAND_CACHE_SECONDS', 60))
+
+
+def _asset_snapshot():
+    """Active assets shown by /equipos (first 10 and total)"""
+    from apps.assets.models import Asset
+    
+    assets = Asset.objects.filter(is_active=True)
+    return {
+        'total': assets.count(),
+        'assets': [
+            {
+                'vehicle_type': asset.vehicle_type,
+                'vehicle_type_display': asset.get_vehicle_type_display(),
+                'name': asset.name,
+                'asset_code': asset.asset_code,
+            }
+            for asset in assets.order_by('vehicle_type', 'name').only('vehicle_type', 'name', 'asset_code')[:10]
+        ],
+    }
+
+
+def _kpi_snapshot():
+    """Counters shown by /kpis, one aggregate query per model"""
+    from apps.work_orders.models import WorkOrder
+    from apps.assets.models import Asset
+    from apps.predictions.models import FailurePrediction
+    from datetime import timedelta
+    
+    now = timezone.now()
+    recent = Q(created_at__gte=now - timedelta(days=30))
+    work_orders = WorkOrder.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='PENDING')),
+        in_progress=Count('id', filter=Q(status='IN_PROGRESS')),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+        recent=Count('id', filter=recent),
+        recent_completed=Count('id', filter=recent & Q(status='COMPLETED')),
+    )
+    return {
+        'work_orders': work_orders,
+        'assets': Asset.objects.filter(is_active=True).count(),
+        'high_risk': FailurePrediction.objects.filter(risk_level__in=['HIGH', 'CRITICAL']).count(),
+        'updated_at': now,
+    }
 
 
 def handle_command(chat_id, text, user_info):
@@ -235,7 +310,7 @@ def handle_status(chat_id, telegram_service):
     """Handle /status command"""
     # Check if user is linked
     try:
-        user = User.objects.filter(telegram_chat_id=str(chat_id)).first()
+        user = User.objects.filter(telegram_id=str(chat_id)).first()
         
         if user:
             message = f"""
@@ -280,7 +355,7 @@ No tienes una cuenta vinculada al sistema CMMS.
 def handle_test(chat_id, telegram_service):
     """Handle /test command"""
     try:
-        user = User.objects.filter(telegram_chat_id=str(chat_id)).first()
+        user = User.objects.filter(telegram_id=str(chat_id)).first()
         
         if user:
             telegram_service.send_notification(
@@ -317,11 +392,11 @@ Para enviar notificaciones de prueba, primero debes vincular tu cuenta.
 def handle_unlink(chat_id, telegram_service):
     """Handle /unlink command"""
     try:
-        user = User.objects.filter(telegram_chat_id=str(chat_id)).first()
+        user = User.objects.filter(telegram_id=str(chat_id)).first()
         
         if user:
-            user.telegram_chat_id = None
-            user.save(update_fields=['telegram_chat_id'])
+            user.telegram_id = None
+            user.save(update_fields=['telegram_id'])
             
             message = """
 ✅ <b>Cuenta Desvinculada</b>
@@ -359,12 +434,10 @@ No tienes ninguna cuenta vinculada a este chat.
 @require_linked_user
 def handle_equipos(chat_id, user_info, telegram_service, user):
     """Handle /equipos command - List assets"""
-    from apps.assets.models import Asset
-    
     try:
-        assets = Asset.objects.filter(status='ACTIVE').order_by('vehicle_type', 'name')[:10]
+        snapshot = _snapshot(ASSET_SNAPSHOT_CACHE_KEY, _asset_snapshot)
         
-        if not assets:
+        if not snapshot['assets']:
             message = """
 📦 <b>Equipos</b>
 
@@ -374,15 +447,15 @@ No hay equipos activos registrados.
             message = "📦 <b>Equipos Activos</b>\n\n"
             
             current_type = None
-            for asset in assets:
-                if asset.vehicle_type != current_type:
-                    current_type = asset.vehicle_type
-                    message += f"\n<b>{asset.get_vehicle_type_display()}:</b>\n"
+            for asset in snapshot['assets']:
+                if asset['vehicle_type'] != current_type:
+                    current_type = asset['vehicle_type']
+                    message += f"\n<b>{asset['vehicle_type_display']}:</b>\n"
                 
-                message += f"• {asset.name} ({asset.asset_code})\n"
+                message += f"• {asset['name']} ({asset['asset_code']})\n"
             
-            if Asset.objects.filter(status='ACTIVE').count() > 10:
-                message += f"\n<i>Mostrando 10 de {Asset.objects.filter(status='ACTIVE').count()} equipos</i>"
+            if snapshot['total'] > 10:
+                message += f"\n<i>Mostrando 10 de {snapshot['total']} equipos</i>"
         
         telegram_service.send_message(
             chat_id=str(chat_id),
@@ -408,7 +481,7 @@ def handle_ordenes(chat_id, user_info, telegram_service, user):
             assigned_to=user
         ).exclude(
             status='COMPLETED'
-        ).order_by('-created_at')[:5]
+        ).select_related('asset').order_by('-created_at')[:5]
         
         if not work_orders:
             message = """
@@ -458,20 +531,13 @@ def handle_pendientes(chat_id, user_info, telegram_service, user):
     from apps.work_orders.models import WorkOrder
     
     try:
-        pending_count = WorkOrder.objects.filter(
-            assigned_to=user,
-            status__in=['PENDING', 'IN_PROGRESS']
-        ).count()
-        
-        in_progress = WorkOrder.objects.filter(
-            assigned_to=user,
-            status='IN_PROGRESS'
-        ).count()
-        
-        pending = WorkOrder.objects.filter(
-            assigned_to=user,
-            status='PENDING'
-        ).count()
+        counts = WorkOrder.objects.filter(assigned_to=user).aggregate(
+            in_progress=Count('id', filter=Q(status='IN_PROGRESS')),
+            pending=Count('id', filter=Q(status='PENDING')),
+        )
+        in_progress = counts['in_progress']
+        pending = counts['pending']
+        pending_count = in_progress + pending
         
         message = f"""
 📊 <b>Órdenes Pendientes</b>
@@ -545,35 +611,22 @@ No tienes alertas de alta prioridad.
 
 
 @require_linked_user
-@require_role(['ADMIN', 'MANAGER'])
+@require_role(['ADMIN', 'SUPERVISOR'])
 def handle_kpis(chat_id, user_info, telegram_service, user):
     """Handle /kpis command - Key metrics"""
-    from apps.work_orders.models import WorkOrder
-    from apps.assets.models import Asset
-    from apps.predictions.models import FailurePrediction
-    from django.db.models import Count, Avg
-    from datetime import datetime, timedelta
-    
     try:
-        # Work Orders stats
-        total_wo = WorkOrder.objects.count()
-        pending_wo = WorkOrder.objects.filter(status='PENDING').count()
-        in_progress_wo = WorkOrder.objects.filter(status='IN_PROGRESS').count()
-        completed_wo = WorkOrder.objects.filter(status='COMPLETED').count()
-        
-        # Assets stats
-        total_assets = Asset.objects.filter(status='ACTIVE').count()
-        
-        # Predictions stats
-        high_risk = FailurePrediction.objects.filter(
-            risk_level__in=['HIGH', 'CRITICAL']
-        ).count()
+        snapshot = _snapshot(KPI_SNAPSHOT_CACHE_KEY, _kpi_snapshot)
+        work_orders = snapshot['work_orders']
+        total_wo = work_orders['total']
+        pending_wo = work_orders['pending']
+        in_progress_wo = work_orders['in_progress']
+        completed_wo = work_orders['completed']
+        total_assets = snapshot['assets']
+        high_risk = snapshot['high_risk']
         
         # Recent completion rate
-        last_30_days = datetime.now() - timedelta(days=30)
-        recent_wo = WorkOrder.objects.filter(created_at__gte=last_30_days)
-        recent_completed = recent_wo.filter(status='COMPLETED').count()
-        completion_rate = (recent_completed / recent_wo.count() * 100) if recent_wo.count() > 0 else 0
+        recent = work_orders['recent']
+        completion_rate = (work_orders['recent_completed'] / recent * 100) if recent > 0 else 0
         
         message = f"""
 📊 <b>KPIs del Sistema</b>
@@ -593,7 +646,7 @@ Activos: {total_assets}
 <b>📈 Últimos 30 días:</b>
 Tasa de Completitud: {completion_rate:.1f}%
 
-<i>Actualizado: {datetime.now().strftime('%d/%m/%Y %H:%M')}</i>
+<i>Actualizado: {timezone.localtime(snapshot['updated_at']).strftime('%d/%m/%Y %H:%M')}</i>
 """
         
         telegram_service.send_message(
@@ -0,0 +1,150 @@
+"""
+Per-user unread notification counters.
+
+``unread_count`` reads a counter instead of counting a user's unread rows:
+first the cache (Redis when configured), then the user's
+``UnreadNotificationCounter`` row, which is created from a COUNT the first
+time it is needed. Counters are adjusted with ``F()`` updates in the same
+transaction that creates notifications or marks them read, and the cached
+value is dropped once that transaction commits.
+
+Deleting unread notifications (e.g. cascades from work orders) does not
+adjust counters, so queryset deletes keep Django's fast path;
+``reconcile_unread_counters`` corrects any drift periodically.
+"""
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Notification, UnreadNotificationCounter
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'notifications:unread:{}'
+
+
+def _invalidate(user_ids: Iterable):
+    keys = [CACHE_KEY.format(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def adjust_unread(deltas: Dict[Any, int]):
+    """
+    Add ``deltas[user_id]`` to each user's counter.
+
+    Users with the same delta share one UPDATE, so a fan-out to many
+    recipients costs a single query. Users without a counter row are
+    skipped: their row is built from a COUNT on first read.
+
+    Args:
+        deltas: Change of the unread count per user ID
+    """
+    users_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            users_by_delta[delta].append(user_id)
+    if not users_by_delta:
+        return
+
+    now = timezone.now()
+    for delta, user_ids in users_by_delta.items():
+        UnreadNotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread=F('unread') + delta,
+            updated_at=now
+        )
+    _invalidate(deltas)
+
+
+def unread_count(user_id) -> int:
+    """
+    Number of unread notifications of a user.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Unread count (one cache read in the common case)
+    """
+    key = CACHE_KEY.format(user_id)
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    count = UnreadNotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        UnreadNotificationCounter.objects.get_or_create(
+            user_id=user_id,
+            defaults={'unread': count, 'updated_at': timezone.now()}
+        )
+    count = max(count, 0)
+    cache.set(key, count, getattr(settings, 'NOTIFICATION_UNREAD_CACHE_SECONDS', 60))
+    return count
+
+
+def mark_read(user_id, notification_ids: Optional[List] = None, now=None) -> int:
+    """
+    Mark a user's unread notifications as read with a single UPDATE.
+
+    Only rows that were unread are updated, so the returned number is
+    exactly what the counter must drop by, even with concurrent requests.
+
+    Args:
+        user_id: Owner of the notifications
+        notification_ids: Notifications to mark (default: all unread)
+        now: Read timestamp (default: now)
+
+    Returns:
+        Number of notifications marked as read
+    """
+    notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+    if notification_ids is not None:
+        notifications = notifications.filter(id__in=notification_ids)
+
+    with transaction.atomic():
+        updated = notifications.update(is_read=True, read_at=now or timezone.now())
+        if updated:
+            adjust_unread({user_id: -updated})
+    return updated
+
+
+def reconcile() -> int:
+    """
+    Correct counters that drifted from the actual unread counts.
+
+    Counters changed after the counts were taken are left alone; the next
+    run checks them again.
+
+    Returns:
+        Number of counters corrected
+    """
+    started_at = timezone.now()
+    actual = dict(
+        Notification.objects.filter(is_read=False).order_by().values('user_id').annotate(
+            unread=Count('id')
+        ).values_list('user_id', 'unread')
+    )
+
+    corrected = []
+    counters = UnreadNotificationCounter.objects.filter(updated_at__lt=started_at).values_list('user_id', 'unread')
+    for user_id, unread in counters.iterator():
+        expected = actual.get(user_id, 0)
+        if unread == expected:
+            continue
+        if UnreadNotificationCounter.objects.filter(user_id=user_id, updated_at__lt=started_at).update(
+            unread=expected,
+            updated_at=timezone.now()
+        ):
+            corrected.append(user_id)
+
+    if corrected:
+        cache.delete_many([CACHE_KEY.format(user_id) for user_id in corrected])
+        logger.warning(f"Corrected {len(corrected)} unread notification counters")
+    return len(corrected)
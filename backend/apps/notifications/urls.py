@@ -10,5 +10,7 @@ router.register(r'', views.NotificationViewSet, basename='notification')
 router.register(r'preferences', views.NotificationPreferenceViewSet, basename='preference')
 
 urlpatterns = [
+    # Before the router, whose detail route would match 'stream/'
+    path('stream/', views.NotificationStreamView.as_view(), name='notification-stream'),
     path('', include(router.urls)),
 ]
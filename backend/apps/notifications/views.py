@@ -5,22 +5,38 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from .models import Notification, NotificationPreference
 from .serializers import (
     NotificationSerializer,
     NotificationCreateSerializer,
     NotificationPreferenceSerializer,
-    BulkNotificationSerializer
+    BulkNotificationSerializer,
+    BulkMarkReadSerializer
 )
-from .pubsub_service import get_pubsub_service
+from .event_stream import EventStream, stream_limiter
+from .fanout_service import get_fanout_service
+from .preference_resolver import get_preference_resolver
+from .unread_counter import adjust_unread, mark_read, unread_count
 from .telegram_service import get_telegram_service
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Fields written by NotificationPreferenceViewSet.update_bulk
+PREFERENCE_UPDATE_FIELDS = [
+    'in_app_enabled', 'email_enabled', 'push_enabled', 'telegram_enabled',
+    'quiet_hours_enabled', 'quiet_hours_start', 'quiet_hours_end', 'updated_at',
+]
+
 
 class NotificationViewSet(viewsets.ModelViewSet):
     """
@@ -43,6 +59,19 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return NotificationCreateSerializer
         return NotificationSerializer
+    
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        with transaction.atomic():
+            notification = serializer.save()
+            if notification.is_read != was_read:
+                adjust_unread({notification.user_id: 1 if was_read else -1})
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            if not instance.is_read:
+                adjust_unread({instance.user_id: -1})
 
     @action(detail=False, methods=['get'])
     def unread(self, request):
@@ -53,9 +82,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        """Get count of unread notifications"""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        """Get count of unread notifications (from the user's counter)"""
+        return Response({'count': unread_count(request.user.id)})
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -68,10 +96,15 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        updated = self.get_queryset().filter(is_read=False).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        return Response({'marked_read': mark_read(request.user.id)})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_mark_read(self, request):
+        """Mark the given notifications as read with a single UPDATE"""
+        serializer = BulkMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        updated = mark_read(request.user.id, serializer.validated_data['ids'])
         return Response({'marked_read': updated})
     
     @action(detail=False, methods=['delete'])
@@ -82,68 +115,72 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        """Create notifications for multiple users"""
+        """
+        Create notifications for multiple users.
+        
+        Notifications are inserted in bulk; Pub/Sub and Telegram delivery
+        run in background tasks once the transaction commits.
+        """
         serializer = BulkNotificationSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         data = serializer.validated_data
-        user_ids = data['user_ids']
-        
-        notifications = []
-        pubsub_service = get_pubsub_service()
-        telegram_service = get_telegram_service()
-        
-        for user_id in user_ids:
-            notification = Notification.objects.create(
-                user_id=user_id,
-                notification_type=data['notification_type'],
-                priority=data['priority'],
-                title=data['title'],
-                message=data['message'],
-                data=data.get('data', {})
-            )
-            notifications.append(notification)
-            
-            # Publish to Pub/Sub
-            if pubsub_service.client_initialized:
-                message_id = pubsub_service.publish_notification(
-                    user_id=user_id,
-                    notification_type=data['notification_type'],
-                    title=data['title'],
-                    message=data['message'],
-                    priority=data['priority'],
-                    data=data.get('data')
-                )
-                if message_id:
-                    notification.pubsub_message_id = message_id
-                    notification.save(update_fields=['pubsub_message_id'])
-            
-            # Send via Telegram if user has telegram_chat_id and preference enabled
-            try:
-                user = notification.user
-                if hasattr(user, 'telegram_chat_id') and user.telegram_chat_id:
-                    # Check preference
-                    preference = NotificationPreference.objects.filter(
-                        user=user,
-                        notification_type=data['notification_type']
-                    ).first()
-                    
-                    if preference and preference.telegram_enabled:
-                        telegram_service.send_notification(
-                            chat_id=user.telegram_chat_id,
-                            notification_type=data['notification_type'],
-                            title=data['title'],
-                            message=data['message'],
-                            priority=data['priority'],
-                            data=data.get('data')
-                        )
-            except Exception as e:
-                logger.error(f"Failed to send Telegram notification: {str(e)}")
+        notifications = get_fanout_service().fan_out(
+            user_ids=data['user_ids'],
+            notification_type=data['notification_type'],
+            title=data['title'],
+            message=data['message'],
+            priority=data['priority'],
+            data=data.get('data')
+        )
         
         serializer = NotificationSerializer(notifications, many=True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients ask for text/event-stream; errors are rendered as JSON"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8')
+
+
+class NotificationStreamView(APIView):
+    """
+    Server-sent events with the user's new notifications, alerts and asset
+    status changes (see event_stream.py).
+    
+    Resumes after the ``Last-Event-ID`` header (or ``last_event_id`` query
+    parameter). Each stream holds a gunicorn thread, so at most
+    ``SSE_MAX_STREAMS_PER_PROCESS`` (half of ``GUNICORN_THREADS`` by
+    default) are open per worker; beyond that the client gets 503 with
+    Retry-After and should keep polling.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+    
+    def get(self, request):
+        if not stream_limiter.acquire():
+            response = Response(
+                {'error': 'Too many open event streams, retry later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = str(getattr(settings, 'SSE_MAX_STREAM_SECONDS', 300))
+            return response
+        
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        response = StreamingHttpResponse(
+            EventStream(request.user, last_event_id),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Disable proxy buffering (nginx)
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class NotificationPreferenceViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing notification preferences
@@ -162,20 +199,7 @@ class NotificationPreferenceViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def defaults(self, request):
         """Get or create default preferences for all notification types"""
-        preferences = []
-        
-        for notification_type, _ in Notification.NOTIFICATION_TYPES:
-            pref, created = NotificationPreference.objects.get_or_create(
-                user=request.user,
-                notification_type=notification_type,
-                defaults={
-                    'in_app_enabled': True,
-                    'email_enabled': True,
-                    'push_enabled': False,
-                    'telegram_enabled': False
-                }
-            )
-            preferences.append(pref)
+        preferences = get_preference_resolver().for_user(request.user.id)
         
         serializer = self.get_serializer(preferences, many=True)
         return Response(serializer.data)
@@ -184,28 +208,32 @@ class NotificationPreferenceViewSet(viewsets.ModelViewSet):
     def update_bulk(self, request):
         """Update multiple preferences at once"""
         preferences_data = request.data.get('preferences', [])
+        resolver = get_preference_resolver()
+        # Missing rows are created with defaults, then updated in one query
+        preferences = resolver.resolve([request.user.id], create_missing=True)
+        now = timezone.now()
         
         updated = []
         for pref_data in preferences_data:
             notification_type = pref_data.get('notification_type')
-            if not notification_type:
+            pref = preferences.get((request.user.id, notification_type))
+            if pref is None:
                 continue
             
-            pref, created = NotificationPreference.objects.update_or_create(
-                user=request.user,
-                notification_type=notification_type,
-                defaults={
-                    'in_app_enabled': pref_data.get('in_app_enabled', True),
-                    'email_enabled': pref_data.get('email_enabled', True),
-                    'push_enabled': pref_data.get('push_enabled', False),
-                    'telegram_enabled': pref_data.get('telegram_enabled', False),
-                    'quiet_hours_enabled': pref_data.get('quiet_hours_enabled', False),
-                    'quiet_hours_start': pref_data.get('quiet_hours_start'),
-                    'quiet_hours_end': pref_data.get('quiet_hours_end'),
-                }
-            )
+            pref.in_app_enabled = pref_data.get('in_app_enabled', True)
+            pref.email_enabled = pref_data.get('email_enabled', True)
+            pref.push_enabled = pref_data.get('push_enabled', False)
+            pref.telegram_enabled = pref_data.get('telegram_enabled', False)
+            pref.quiet_hours_enabled = pref_data.get('quiet_hours_enabled', False)
+            pref.quiet_hours_start = pref_data.get('quiet_hours_start')
+            pref.quiet_hours_end = pref_data.get('quiet_hours_end')
+            pref.updated_at = now
             updated.append(pref)
         
+        if updated:
+            NotificationPreference.objects.bulk_update(updated, PREFERENCE_UPDATE_FIELDS)
+            resolver.invalidate([request.user.id])
+        
         serializer = self.get_serializer(updated, many=True)
         return Response(serializer.data)
 
@@ -342,7 +370,6 @@ class TelegramViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def webhook_info(self, request):
         """Get webhook information"""
-        import requests
         telegram_service = get_telegram_service()
         
         if not telegram_service.client_initialized:
@@ -354,7 +381,7 @@ class TelegramViewSet(viewsets.ViewSet):
         url = f"{telegram_service.api_url}/getWebhookInfo"
         
         try:
-            response = requests.get(url, timeout=10)
+            response = telegram_service.session.get(url, timeout=10)
             response.raise_for_status()
             return Response(response.json())
         except Exception as e:
@@ -23,18 +23,31 @@ app.conf.task_routes = {
     # High priority - Critical image analysis
     'apps.images.tasks.process_inspection_photo': {'queue': 'high_priority'},
     'apps.images.tasks.analyze_critical_anomaly': {'queue': 'high_priority'},
+    'apps.notifications.tasks.process_telegram_command': {'queue': 'high_priority'},
     
     # Normal priority - Standard processing
     'apps.images.tasks.analyze_anomalies': {'queue': 'normal'},
     'apps.images.tasks.extract_text_ocr': {'queue': 'normal'},
     'apps.images.tasks.classify_damage': {'queue': 'normal'},
     'apps.images.tasks.generate_image_report': {'queue': 'normal'},
+    'apps.notifications.tasks.publish_notifications': {'queue': 'normal'},
+    'apps.notifications.tasks.send_telegram_notifications': {'queue': 'normal'},
+    'apps.notifications.tasks.release_notification_digests': {'queue': 'normal'},
+    'apps.core.tasks.dispatch_webhook_event': {'queue': 'normal'},
+    'apps.core.tasks.retry_webhook_deliveries': {'queue': 'normal'},
     
     # Batch processing - Non-urgent bulk operations
     'apps.images.tasks.batch_process_images': {'queue': 'batch'},
+    'apps.images.tasks.process_image_chunk': {'queue': 'batch'},
+    'apps.images.tasks.finalize_image_batch': {'queue': 'batch'},
+    'apps.images.tasks.fail_image_batch': {'queue': 'batch'},
+    'apps.images.tasks.score_meter_readings': {'queue': 'batch'},
     'apps.images.tasks.generate_comparison_report': {'queue': 'batch'},
     'apps.images.tasks.archive_old_messages': {'queue': 'batch'},
     'apps.images.tasks.cleanup_old_images': {'queue': 'batch'},
+    'apps.images.tasks.refresh_image_analytics': {'queue': 'batch'},
+    'apps.core.tasks.maintain_partitions': {'queue': 'batch'},
+    'apps.notifications.tasks.reconcile_unread_counters': {'queue': 'batch'},
     
     # ML training - Long-running model training
     'apps.images.tasks.retrain_anomaly_model': {'queue': 'ml_training'},
@@ -49,11 +62,41 @@ app.conf.beat_schedule = {
         'task': 'apps.images.tasks.archive_old_messages',
         'schedule': crontab(hour=2, minute=0),
     },
-    # Cleanup old cached images weekly on Sunday at 3 AM
+    # Create/retire monthly partitions of history tables daily at 1:30 AM
+    'maintain-partitions': {
+        'task': 'apps.core.tasks.maintain_partitions',
+        'schedule': crontab(hour=1, minute=30),
+    },
+    # Score meter readings of the whole fleet daily at 2:30 AM
+    'score-meter-readings': {
+        'task': 'apps.images.tasks.score_meter_readings',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    # Cleanup expired cached results and photos weekly on Sunday at 3 AM
     'cleanup-old-images': {
         'task': 'apps.images.tasks.cleanup_old_images',
         'schedule': crontab(hour=3, minute=0, day_of_week=0),
     },
+    # Refresh image analytics rollup every 30 minutes
+    'refresh-image-analytics': {
+        'task': 'apps.images.tasks.refresh_image_analytics',
+        'schedule': crontab(minute='*/30'),
+    },
+    # Send due quiet-hours/rate-cap digests every 5 minutes
+    'release-notification-digests': {
+        'task': 'apps.notifications.tasks.release_notification_digests',
+        'schedule': crontab(minute='*/5'),
+    },
+    # Retry due webhook deliveries every minute
+    'retry-webhook-deliveries': {
+        'task': 'apps.core.tasks.retry_webhook_deliveries',
+        'schedule': crontab(minute='*'),
+    },
+    # Correct drifted unread notification counters every 15 minutes
+    'reconcile-unread-counters': {
+        'task': 'apps.notifications.tasks.reconcile_unread_counters',
+        'schedule': crontab(minute='*/15'),
+    },
     # Generate daily analytics report at 6 AM
     'generate-daily-analytics': {
         'task': 'apps.images.tasks.generate_daily_analytics',
@@ -44,9 +44,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.metrics.PrometheusMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'apps.core.middleware.RequestIDMiddleware',
+    'apps.core.middleware.QueryProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -256,6 +258,15 @@ CSRF_COOKIE_HTTPONLY = True
 CSRF_COOKIE_SAMESITE = 'Lax'
 CSRF_USE_SESSIONS = False
 
+# Input Sanitization (apps.core.middleware.InputSanitizationMiddleware)
+# Cuerpos mayores a este tamaño no se inspeccionan (se registran y se dejan pasar)
+INPUT_SANITIZATION_MAX_BODY_BYTES = int(os.getenv('INPUT_SANITIZATION_MAX_BODY_BYTES', str(1024 * 1024)))
+# Campos que nunca se inspeccionan (credenciales, tokens, firmas)
+INPUT_SANITIZATION_SKIP_FIELDS = [
+    'password', 'password_confirm', 'old_password', 'new_password',
+    'token', 'access', 'refresh', 'secret', 'signature',
+]
+
 # Password Validation - Enhanced
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -275,6 +286,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Query profiling (apps.core.middleware.QueryProfilingMiddleware)
+# Siempre activo con DEBUG; en otros entornos solo agrega los headers X-DB-*
+QUERY_PROFILING_ENABLED = os.getenv('QUERY_PROFILING_ENABLED', 'False') == 'True'
+QUERY_PROFILING_MAX_QUERIES = int(os.getenv('QUERY_PROFILING_MAX_QUERIES', '20'))
+QUERY_PROFILING_MAX_DUPLICATES = int(os.getenv('QUERY_PROFILING_MAX_DUPLICATES', '2'))
+
+# Audit Log buffering (apps.core.audit_sink)
+# Las entradas de AuditLog se escriben en lotes fuera del ciclo del request
+AUDIT_BUFFER_ENABLED = os.getenv('AUDIT_BUFFER_ENABLED', 'True') == 'True'
+AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', '100'))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv('AUDIT_FLUSH_INTERVAL_SECONDS', '2'))
+AUDIT_SPOOL_PATH = os.getenv('AUDIT_SPOOL_PATH', str(BASE_DIR / 'logs' / 'audit_spool.jsonl'))
+
+# Publicador Pub/Sub no bloqueante
+PUBSUB_PUBLISHER_BACKEND = os.getenv('PUBSUB_PUBLISHER_BACKEND', 'google')  # 'google' o 'memory' (pruebas/desarrollo)
+PUBSUB_BATCH_MAX_MESSAGES = 100  # Mensajes por solicitud de publicación
+PUBSUB_BATCH_MAX_BYTES = 1024 * 1024
+PUBSUB_BATCH_MAX_LATENCY_SECONDS = 0.05  # Espera máxima para completar un lote
+PUBSUB_FLOW_CONTROL_MAX_MESSAGES = 2000  # Límite del cliente; por sobre PUBSUB_MAX_PENDING_MESSAGES
+PUBSUB_FLOW_CONTROL_MAX_BYTES = 20 * 1024 * 1024
+PUBSUB_MAX_PENDING_MESSAGES = int(os.getenv('PUBSUB_MAX_PENDING_MESSAGES', '1000'))  # Mensajes sin confirmar por proceso
+PUBSUB_PUBLISH_TIMEOUT_SECONDS = 30
+PUBSUB_SPOOL_PATH = os.getenv('PUBSUB_SPOOL_PATH', str(BASE_DIR / 'logs' / 'pubsub_spool.jsonl'))  # Desbordes y fallos
+PUBSUB_SPOOL_REPLAY_INTERVAL_SECONDS = 30
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -385,6 +421,43 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_CACHE_ALIAS = 'default'
 
 
+# ============================================================================
+# PROMETHEUS METRICS (apps.core.metrics)
+# ============================================================================
+
+# Con varios workers de gunicorn definir PROMETHEUS_MULTIPROC_DIR (ver gunicorn.conf.py)
+PROMETHEUS_METRICS_ENABLED = os.getenv('PROMETHEUS_METRICS_ENABLED', 'True') == 'True'
+# Si se define, /metrics exige 'Authorization: Bearer <token>'
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+# Sin token, /metrics solo responde a estas redes (CIDR separadas por coma; vacío = cerrado)
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.getenv('METRICS_ALLOWED_NETWORKS', '').split(',') if network.strip()
+]
+# Workers de Celery: exportan sus métricas en este puerto (0 = desactivado, ver start-celery-worker.sh)
+PROMETHEUS_WORKER_PORT = int(os.getenv('PROMETHEUS_WORKER_PORT', '0'))
+PROMETHEUS_WORKER_ADDR = os.getenv('PROMETHEUS_WORKER_ADDR', '0.0.0.0')
+
+# ============================================================================
+# HISTORY TABLE PARTITIONING (apps.core.partitioning)
+# ============================================================================
+
+# Particiones mensuales creadas por adelantado (PostgreSQL)
+PARTITION_MONTHS_AHEAD = 3
+# Meses que permanecen en la tabla principal en backends sin particiones nativas
+PARTITION_HOT_MONTHS = 3
+PARTITION_ARCHIVE_CHUNK_SIZE = 5000
+# Modelos archivados fuera de la tabla principal (SQLite/MySQL). Las vistas solo
+# leen la tabla principal: agregar un modelo solo cuando sus lectores consulten
+# también los archivos (ArchiveTableManager.archived_querysets)
+PARTITION_ARCHIVE_MODELS = []
+# Retención por tabla: las particiones completas más antiguas se eliminan
+PARTITION_RETENTION_MONTHS = {
+    'config.AuditLog': 24,
+    'machine_status.AssetStatusHistory': 36,
+    'core.WebhookDelivery': 6,
+}
+
+
 # ============================================================================
 # CELERY CONFIGURATION
 # ============================================================================
@@ -440,6 +513,8 @@ FIREBASE_TOKEN_CACHE_TTL = int(os.getenv('FIREBASE_TOKEN_CACHE_TTL', '300'))  #
 # Vision AI settings
 VISION_AI_ENABLED = os.getenv('VISION_AI_ENABLED', 'True').lower() == 'true'
 VISION_AI_MAX_RESULTS = int(os.getenv('VISION_AI_MAX_RESULTS', '10'))
+VISION_AI_BATCH_CONCURRENCY = int(os.getenv('VISION_AI_BATCH_CONCURRENCY', '4'))  # Solicitudes batch simultáneas
+VISION_AI_IMAGES_PER_MINUTE = int(os.getenv('VISION_AI_IMAGES_PER_MINUTE', '1800'))  # Cuota por proceso
 
 # ============================================================================
 # IMAGE PROCESSING CONFIGURATION
@@ -450,6 +525,18 @@ MAX_IMAGE_SIZE_MB = 10  # Maximum upload size
 MAX_IMAGE_SIZE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024
 COMPRESSED_IMAGE_SIZE_MB = 2  # Target compression size
 COMPRESSED_IMAGE_SIZE_BYTES = COMPRESSED_IMAGE_SIZE_MB * 1024 * 1024
+# Lado mayor máximo (px) de la imagen almacenada; los JPEG se reducen al decodificar
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '1920'))
+
+# Almacenamiento de variantes: 'gcs' (Cloud Storage) o 'local' (desarrollo/pruebas sin red)
+IMAGE_STORAGE_BACKEND = os.getenv('IMAGE_STORAGE_BACKEND', 'gcs' if GCP_STORAGE_BUCKET_NAME else 'local')
+IMAGE_LOCAL_STORAGE_ROOT = os.getenv('IMAGE_LOCAL_STORAGE_ROOT', str(BASE_DIR / 'media' / 'inspection_photos'))
+IMAGE_UPLOAD_MAX_WORKERS = int(os.getenv('IMAGE_UPLOAD_MAX_WORKERS', '4'))  # Subidas concurrentes por proceso
+IMAGE_STAGING_PREFIX = 'staging'  # Cargas originales pendientes de process_inspection_photo
+IMAGE_STAGING_MAX_AGE_HOURS = int(os.getenv('IMAGE_STAGING_MAX_AGE_HOURS', '24'))  # Staging huérfano que borra la limpieza
+# Variantes responsivas (WebP/AVIF/JPEG) generadas al primer pedido
+IMAGE_VARIANT_WIDTHS = [320, 640, 1280]
+IMAGE_SIGNED_URL_EXPIRATION_SECONDS = 3600
 
 # Supported image formats
 ALLOWED_IMAGE_FORMATS = ['JPEG', 'PNG', 'WEBP']
@@ -501,12 +588,84 @@ MONTHLY_BUDGET_LIMIT_USD = int(os.getenv('MONTHLY_BUDGET_LIMIT_USD', '1000'))
 BUDGET_WARNING_THRESHOLD = 0.80  # Alert at 80%
 BUDGET_THROTTLE_THRESHOLD = 0.90  # Throttle at 90%
 
+VISION_AI_COST_PER_IMAGE_USD = 0.0015  # $1.50 por 1000 imágenes (analítica diaria)
+
 # Caching settings
 VISION_AI_CACHE_DAYS = 30
+# Reutilizar análisis de fotos casi idénticas del mismo activo (bits distintos de dHash, máx. 3)
+VISION_AI_CACHE_HAMMING_DISTANCE = 3
+VISION_AI_CACHE_CANDIDATES = 50  # Candidatos por búsqueda de bandas
 IMAGE_RESULT_CACHE_HOURS = 24
 
 # Batch processing
 BATCH_SIZE_IMAGES = 10
+IMAGE_BATCH_CHUNK_SIZE = 20  # Fotos por tarea del chord (limita memoria por worker)
 BATCH_PROCESSING_ENABLED = True
 OFF_PEAK_HOURS_START = 22  # 10 PM
 OFF_PEAK_HOURS_END = 6  # 6 AM
+
+# Limpieza de imágenes (por lotes, reanudable)
+# Desactivado por defecto (0 = conservar fotos indefinidamente): borrar fotos antiguas también borra
+# sus hallazgos y análisis, así que habilitarlo es una decisión explícita. Las fotos con lecturas de
+# medidores o evidencia de órdenes de trabajo se conservan siempre.
+IMAGE_RETENTION_DAYS = int(os.getenv('IMAGE_RETENTION_DAYS', '0'))
+IMAGE_CLEANUP_BATCH_SIZE = 500  # Filas eliminadas por transacción
+IMAGE_CLEANUP_ROWS_PER_SECOND = 1000  # Límite de borrado sobre la base de datos principal
+IMAGE_CLEANUP_TIME_BUDGET_SECONDS = 240  # Al agotarse se guarda el cursor y la tarea se reencola
+IMAGE_CLEANUP_REQUEUE_DELAY_SECONDS = 30
+
+# Meter reading anomaly detection (mediana/MAD móvil)
+METER_ANOMALY_WINDOW = 10  # Lecturas anteriores consideradas
+METER_ANOMALY_MIN_HISTORY = 3  # Lecturas mínimas antes de evaluar
+METER_ANOMALY_Z_THRESHOLD = 3.5  # Z-score robusto para marcar atípicos
+
+# Envío masivo de notificaciones (una tarea por canal)
+NOTIFICATION_FANOUT_BATCH_SIZE = 500  # Notificaciones por consulta/inserción
+NOTIFICATION_TELEGRAM_MAX_WORKERS = int(os.getenv('NOTIFICATION_TELEGRAM_MAX_WORKERS', '8'))  # Envíos concurrentes a Telegram
+NOTIFICATION_UNREAD_CACHE_SECONDS = 60  # Vigencia en caché del contador de no leídas
+NOTIFICATION_PREFERENCE_CACHE_SECONDS = 300  # Preferencias por usuario (se invalidan al modificarlas)
+# Resúmenes: mensajes en horario de silencio o sobre el límite se agrupan
+NOTIFICATION_RATE_CAP = 10  # Mensajes por usuario y canal en cada ventana (0 = sin límite)
+NOTIFICATION_RATE_WINDOW_SECONDS = 900
+NOTIFICATION_DIGEST_BYPASS_PRIORITIES = ['CRITICAL']  # Siempre se envían de inmediato
+NOTIFICATION_DIGEST_RETRY_SECONDS = 900  # Resúmenes no entregados se reintentan tras este plazo
+
+# Eventos en tiempo real (SSE) de notificaciones, alertas y estados de activos
+# Los eventos se publican desde todos los workers de gunicorn y de Celery: con un broker configurado
+# se usa Redis; 'memory' solo ve los eventos del mismo proceso (desarrollo y pruebas)
+EVENT_BUS_BACKEND = os.getenv(
+    'EVENT_BUS_BACKEND', 'redis' if os.getenv('EVENT_BUS_REDIS_URL') or os.getenv('CELERY_BROKER_URL') else 'memory'
+)
+EVENT_BUS_REDIS_URL = os.getenv('EVENT_BUS_REDIS_URL', CELERY_BROKER_URL)
+EVENT_BUS_BUFFER_SIZE = 10000  # Eventos disponibles para reanudar con Last-Event-ID
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = 300  # Luego el cliente se reconecta y libera el hilo
+SSE_RETRY_MILLISECONDS = 3000
+# Cada stream ocupa un hilo de gunicorn mientras está abierto. Por defecto la mitad de los hilos de cada
+# worker (GUNICORN_THREADS, ver gunicorn.conf.py); el resto atiende la API. Capacidad total: workers × este
+# valor; los clientes que exceden reciben 503 con Retry-After y siguen consultando por polling
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '8'))
+SSE_MAX_STREAMS_PER_PROCESS = int(os.getenv('SSE_MAX_STREAMS_PER_PROCESS', str(GUNICORN_THREADS // 2)))
+
+# Webhooks salientes (envío concurrente desde Celery)
+WEBHOOK_MAX_WORKERS = int(os.getenv('WEBHOOK_MAX_WORKERS', '8'))  # Envíos concurrentes por tarea
+WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT = 2  # Solicitudes simultáneas a una misma URL (y conexiones por host)
+WEBHOOK_CONNECT_TIMEOUT_SECONDS = 3
+WEBHOOK_READ_TIMEOUT_SECONDS = 10
+WEBHOOK_CIRCUIT_FAILURE_THRESHOLD = 5  # Fallos seguidos (red o 5xx) que abren el circuito
+WEBHOOK_CIRCUIT_RESET_SECONDS = 300  # Tiempo abierto antes de una solicitud de prueba
+WEBHOOK_RETRY_MAX_DELAY_SECONDS = 3600  # Tope del backoff exponencial entre reintentos
+WEBHOOK_RETRY_BATCH_SIZE = 500  # Entregas reintentadas por ejecución
+WEBHOOK_DELIVERY_BATCH_SIZE = 500  # Filas del registro de entregas por inserción/actualización
+
+# Cliente de Telegram (sesión con conexiones persistentes por proceso)
+TELEGRAM_HTTP_POOL_SIZE = 16  # Conexiones keep-alive hacia api.telegram.org
+TELEGRAM_HTTP_TIMEOUT_SECONDS = 10
+# Límites de la Bot API, aplicados por proceso (repartir entre workers)
+TELEGRAM_GLOBAL_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_GLOBAL_MESSAGES_PER_SECOND', '25'))
+TELEGRAM_CHAT_MESSAGES_PER_SECOND = 1  # Mismo chat privado
+TELEGRAM_GROUP_MESSAGES_PER_MINUTE = 20  # Mismo grupo
+TELEGRAM_MAX_RETRIES = 5  # Intentos por mensaje (429, 5xx y errores de red)
+# Webhook del bot: los comandos se procesan en Celery
+TELEGRAM_UPDATE_DEDUPE_SECONDS = 3600  # Ventana para ignorar reintentos del mismo update_id
+TELEGRAM_COMMAND_CACHE_SECONDS = 60  # Vigencia de las respuestas compartidas (/kpis, /equipos)
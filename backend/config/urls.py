@@ -1,6 +1,7 @@
 """URL Configuration"""
 from django.contrib import admin
 from django.urls import path, include
+from apps.core.metrics import metrics_view
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -10,6 +11,9 @@ from drf_spectacular.views import (
 urlpatterns = [
     path('admin/', admin.site.urls),
     
+    # Prometheus metrics
+    path('metrics', metrics_view, name='prometheus-metrics'),
+    
     # API Documentation
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
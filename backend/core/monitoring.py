@@ -5,6 +5,10 @@ import logging
 import json
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
+from apps.core.metrics import PROMETHEUS_AVAILABLE
+
+if PROMETHEUS_AVAILABLE:
+    from apps.core.metrics import WORK_ORDERS_CREATED
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +17,10 @@ class WorkOrderMonitoringMiddleware(MiddlewareMixin):
     """
     Middleware to monitor work order creation and track asset assignment metrics.
     Logs warnings when work orders are created without assets and tracks patterns.
+    
+    Creations are counted in the Prometheus counter
+    ``cmms_work_orders_created_total{has_asset}``, which is aggregated across
+    workers; the threshold alert below only sees this process' share.
     """
     
     def __init__(self, get_response):
@@ -45,9 +53,12 @@ class WorkOrderMonitoringMiddleware(MiddlewareMixin):
             
             # Track work order creation
             self.total_work_orders_count += 1
+            has_asset = bool(data.get('asset'))
+            if PROMETHEUS_AVAILABLE:
+                WORK_ORDERS_CREATED.labels(has_asset=str(has_asset).lower()).inc()
             
             # Check if asset is assigned
-            if not data.get('asset'):
+            if not has_asset:
                 self.work_orders_without_asset_count += 1
                 
                 # Log warning
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration shared by all deployment targets.
+
+Command-line flags (--workers, --bind...) still take precedence. Workers
+are threaded: each open event stream (/api/v1/notifications/stream/) holds
+one thread, and ``SSE_MAX_STREAMS_PER_PROCESS`` is derived from the same
+``GUNICORN_THREADS`` so streams never take every thread of a worker. The
+Prometheus multiprocess hooks make /metrics aggregate every worker.
+"""
+import os
+import shutil
+
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+
+def on_starting(server):
+    """Start each deployment with an empty metrics directory"""
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Discard live gauges of workers that exited"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,20 @@
+#!/bin/bash
+set -e
+
+# Worker de Celery con métricas Prometheus propias.
+# Uso: ./start-celery-worker.sh [colas] (por defecto todas las colas de config/celery.py)
+
+QUEUES=${1:-${CELERY_QUEUES:-high_priority,normal,batch,ml_training}}
+
+# Los procesos hijos (prefork) escriben sus valores aquí; el proceso principal los
+# agrega y los sirve en PROMETHEUS_WORKER_PORT (ver apps/core/metrics.py).
+# Directorio propio del worker, distinto del de gunicorn, y vacío en cada inicio.
+export PROMETHEUS_MULTIPROC_DIR=${CELERY_PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc_celery}
+export PROMETHEUS_WORKER_PORT=${PROMETHEUS_WORKER_PORT:-9808}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+echo "🚀 Iniciando worker de Celery (colas: $QUEUES, métricas en :$PROMETHEUS_WORKER_PORT)..."
+exec celery -A config worker \
+    --queues "$QUEUES" \
+    --loglevel info
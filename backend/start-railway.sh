@@ -25,7 +25,10 @@ python manage.py collectstatic --noinput --clear
 
 echo "✅ Archivos estáticos recolectados"
 
-# Iniciar Gunicorn
+# Métricas Prometheus compartidas entre workers (ver gunicorn.conf.py)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}
+
+# Iniciar Gunicorn (hilos por worker: GUNICORN_THREADS, ver gunicorn.conf.py)
 echo "🚀 Iniciando Gunicorn..."
 exec gunicorn config.wsgi:application \
     --bind 0.0.0.0:$PORT \
@@ -0,0 +1,196 @@
+"""
+Microbenchmarks for InputSanitizationMiddleware on large payloads
+"""
+import json
+import re
+import time
+
+import pytest
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core.middleware import InputSanitizationMiddleware, scan_suspicious_input
+
+
+LEGACY_SQL_PATTERNS = [
+    r"(\bUNION\b.*\bSELECT\b)",
+    r"(\bDROP\b.*\bTABLE\b)",
+    r"(\bINSERT\b.*\bINTO\b)",
+    r"(\bDELETE\b.*\bFROM\b)",
+    r"(--)",
+    r"(;.*--)",
+]
+
+LEGACY_XSS_PATTERNS = [
+    r"(<script[^>]*>.*?</script>)",
+    r"(javascript:)",
+    r"(onerror\s*=)",
+    r"(onload\s*=)",
+]
+
+
+def legacy_extract_strings(obj):
+    """Recursive string extraction used by the previous middleware"""
+    strings = []
+    if isinstance(obj, dict):
+        for value in obj.values():
+            strings.extend(legacy_extract_strings(value))
+    elif isinstance(obj, list):
+        for item in obj:
+            strings.extend(legacy_extract_strings(item))
+    elif isinstance(obj, str):
+        strings.append(obj)
+    return strings
+
+
+def legacy_scan(body):
+    """Previous implementation: parse, flatten, then one regex at a time"""
+    found = set()
+    for data in legacy_extract_strings(json.loads(body)):
+        for pattern in LEGACY_SQL_PATTERNS:
+            if re.search(pattern, data, re.IGNORECASE):
+                found.add('sql')
+        for pattern in LEGACY_XSS_PATTERNS:
+            if re.search(pattern, data, re.IGNORECASE):
+                found.add('xss')
+    return found
+
+
+def build_checklist_payload(items=2000):
+    """Large checklist submission similar to what the mobile app sends"""
+    return {
+        'template': 'F-PR-020-CH01',
+        'asset': 'a3c1f7e2-0000-4000-8000-000000000001',
+        'responses': [
+            {
+                'item_order': i,
+                'section': f'Sección {i // 25}',
+                'response': 'yes' if i % 3 else 'no',
+                'notes': 'Nivel de aceite correcto, sin fugas visibles en mangueras hidráulicas.',
+                'evidence': {'photos': [f'inspections/{i}/front.jpg', f'inspections/{i}/rear.jpg']},
+            }
+            for i in range(items)
+        ],
+        'observations': 'Equipo operativo. Revisar desgaste de neumáticos en la próxima mantención.',
+    }
+
+
+def best_of(func, arg, repeat=5):
+    """Return the best wall time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class InputSanitizationBehaviourTest(SimpleTestCase):
+    """Test detection, whitelisting and skipped bodies"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = InputSanitizationMiddleware(lambda request: None)
+    
+    def _post_json(self, payload):
+        return self.factory.post('/api/v1/checklists/', json.dumps(payload),
+                                 content_type='application/json')
+    
+    def test_detects_same_inputs_as_legacy_patterns(self):
+        """Test: Combined pattern matches what the separate regexes matched"""
+        samples = [
+            "1 UNION ALL SELECT password FROM users",
+            "drop table assets",
+            "name'; --",
+            "<script>alert(1)</script>",
+            "<img src=x onerror = alert(1)>",
+            "javascript:alert(1)",
+            "UNION <script>x</script> SELECT",
+            "Cambio de aceite y filtro",
+            "Union de mangueras seleccionadas",
+        ]
+        for sample in samples:
+            body = json.dumps({'notes': sample})
+            self.assertEqual(scan_suspicious_input(json.loads(body)), legacy_scan(body), sample)
+    
+    def test_repetitive_input_is_scanned_in_linear_time(self):
+        """Test: A body of repeated matches near the size cap is not rescanned per match"""
+        start = time.perf_counter()
+        found = scan_suspicious_input({'notes': 'union select ' * 40000})
+        elapsed = time.perf_counter() - start
+        
+        self.assertEqual(found, {'sql'})
+        # Quadratic rescanning took seconds on this input
+        self.assertLess(elapsed, 0.5)
+    
+    def test_logs_detection_without_blocking(self):
+        """Test: Suspicious input is logged but the request continues"""
+        request = self._post_json({'items': [{'notes': "x' UNION SELECT 1 --"}]})
+        with self.assertLogs('security', level='WARNING') as logs:
+            self.assertIsNone(self.middleware.process_request(request))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('SQL injection', logs.output[0])
+    
+    def test_query_parameters_are_scanned(self):
+        """Test: Every value of repeated query parameters is checked"""
+        request = self.factory.get('/api/v1/assets/?search=a&search=javascript:alert(1)')
+        with self.assertLogs('security', level='WARNING') as logs:
+            self.middleware.process_request(request)
+        self.assertIn('XSS', logs.output[0])
+    
+    def test_whitelisted_fields_are_skipped(self):
+        """Test: Password-like fields are never inspected"""
+        request = self._post_json({'email': 'a@b.cl', 'password': 'p--<script>x</script>'})
+        with self.assertNoLogs('security', level='WARNING'):
+            self.middleware.process_request(request)
+    
+    def test_multipart_bodies_are_skipped(self):
+        """Test: Multipart uploads are not read by the middleware"""
+        request = self.factory.post('/api/v1/images/photos/upload/', {'notes': 'x -- y'})
+        with self.assertNoLogs('security', level='WARNING'):
+            self.middleware.process_request(request)
+        self.assertFalse(hasattr(request, '_body'))
+    
+    @override_settings(INPUT_SANITIZATION_MAX_BODY_BYTES=64)
+    def test_oversized_body_is_not_parsed(self):
+        """Test: Size cap is enforced before the body is read"""
+        middleware = InputSanitizationMiddleware(lambda request: None)
+        request = self._post_json({'notes': 'DROP TABLE users ' + 'x' * 100})
+        with self.assertNoLogs('security', level='WARNING'):
+            middleware.process_request(request)
+        self.assertFalse(hasattr(request, '_body'))
+
+
+@pytest.mark.slow
+class InputSanitizationBenchmarkTest(SimpleTestCase):
+    """Compare per-request overhead against the previous implementation"""
+    
+    def test_large_clean_payload_is_faster(self):
+        """Benchmark: Clean 2000-item checklist submission"""
+        body = json.dumps(build_checklist_payload()).encode()
+        
+        legacy = best_of(legacy_scan, body)
+        current = best_of(lambda raw: scan_suspicious_input(json.loads(raw)), body)
+        
+        print(f"\nclean payload ({len(body)} bytes): legacy={legacy * 1000:.2f}ms "
+              f"single-pass={current * 1000:.2f}ms ({legacy / current:.1f}x)")
+        self.assertLess(current, legacy)
+    
+    def test_large_payload_through_middleware(self):
+        """Benchmark: Full middleware path on a large JSON request"""
+        payload = build_checklist_payload()
+        payload['responses'][-1]['notes'] = "<script>alert('x')</script>"
+        body = json.dumps(payload)
+        factory = RequestFactory()
+        middleware = InputSanitizationMiddleware(lambda request: None)
+        
+        def run(_):
+            request = factory.post('/api/v1/checklists/', body, content_type='application/json')
+            middleware.process_request(request)
+        
+        legacy = best_of(legacy_scan, body.encode())
+        with self.assertLogs('security', level='WARNING'):
+            current = best_of(run, None)
+        
+        print(f"\nmiddleware ({len(body)} bytes): legacy={legacy * 1000:.2f}ms "
+              f"single-pass={current * 1000:.2f}ms ({legacy / current:.1f}x)")
+        self.assertLess(current, legacy)
@@ -0,0 +1,143 @@
+"""
+Query budgets for the main API viewsets
+
+Budgets are measured with several rows per endpoint, so an N+1 introduced
+in a serializer or queryset pushes the count over the budget.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.assets.models import Asset, Location
+from apps.assets.views import AssetViewSet, LocationViewSet
+from apps.authentication.models import User, Role
+from apps.core.testing import QueryBudgetMixin
+from apps.inventory.models import SparePart
+from apps.inventory.views import SparePartViewSet
+from apps.maintenance.models import MaintenancePlan
+from apps.maintenance.views import MaintenancePlanViewSet
+from apps.notifications.models import Notification
+from apps.notifications.views import NotificationViewSet
+from apps.predictions.models import Alert
+from apps.predictions.views import AlertViewSet
+from apps.work_orders.models import WorkOrder
+from apps.work_orders.views import WorkOrderViewSet
+
+ROWS = 5
+
+
+class MainViewSetQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Baseline query budgets for list endpoints"""
+    
+    # Count + page query for paginated lists. Locations (asset_count) and
+    # spare parts (compatible assets) still issue one query per row; their
+    # budgets pin today's value so it can only go down.
+    query_budgets = {
+        'assets-list': 2,
+        'locations-list': 2 + ROWS,
+        'work-orders-list': 2,
+        'spare-parts-list': 2 + 2 * ROWS,
+        'maintenance-plans-list': 2,
+        'notifications-list': 2,
+        'alerts-list': 2,
+    }
+    
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='budget@test.com',
+            password='SecurePass123!',
+            first_name='Budget',
+            last_name='User',
+            role=role,
+            rut='44444444-4'
+        )
+        for i in range(ROWS):
+            location = Location.objects.create(name=f'Faena {i}')
+            asset = Asset.objects.create(
+                name=f'Camioneta {i}',
+                asset_code=f'CAM-{i:03d}',
+                vehicle_type=Asset.VEHICLE_TYPE_CHOICES[0][0],
+                location=location,
+                serial_number=f'SN-{i:05d}',
+                created_by=cls.user,
+            )
+            work_order = WorkOrder.objects.create(
+                title=f'Cambio de aceite {i}',
+                description='Mantención programada',
+                asset=asset,
+                work_order_type=WorkOrder.TYPE_CHOICES[0][0],
+                assigned_to=cls.user,
+                created_by=cls.user,
+            )
+            spare_part = SparePart.objects.create(
+                part_number=f'FIL-{i:04d}',
+                name=f'Filtro {i}',
+                category='Filtros',
+                unit_cost=Decimal('12500.00'),
+                location='Bodega A',
+            )
+            spare_part.compatible_assets.add(asset)
+            MaintenancePlan.objects.create(
+                name=f'Plan {i}',
+                asset=asset,
+                plan_type=MaintenancePlan.TYPE_CHOICES[0][0],
+                recurrence_type=MaintenancePlan.RECURRENCE_CHOICES[0][0],
+                next_due_date=date.today() + timedelta(days=i),
+                estimated_duration=60,
+                created_by=cls.user,
+            )
+            Notification.objects.create(
+                user=cls.user,
+                notification_type='SYSTEM',
+                title=f'Aviso {i}',
+                message='Mensaje',
+                work_order=work_order,
+                asset=asset,
+            )
+            Alert.objects.create(
+                alert_type='SYSTEM',
+                severity='WARNING',
+                title=f'Alerta {i}',
+                message='Revisar',
+                asset=asset,
+                work_order=work_order,
+            )
+    
+    def setUp(self):
+        self.factory = APIRequestFactory()
+    
+    def _list(self, name, viewset):
+        view = viewset.as_view({'get': 'list'})
+        request = self.factory.get('/')
+        force_authenticate(request, user=self.user)
+        with self.assertQueryBudget(name):
+            response = view(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), ROWS)
+        return response
+    
+    def test_assets_list(self):
+        self._list('assets-list', AssetViewSet)
+    
+    def test_locations_list(self):
+        self._list('locations-list', LocationViewSet)
+    
+    def test_work_orders_list(self):
+        self._list('work-orders-list', WorkOrderViewSet)
+    
+    def test_spare_parts_list(self):
+        self._list('spare-parts-list', SparePartViewSet)
+    
+    def test_maintenance_plans_list(self):
+        self._list('maintenance-plans-list', MaintenancePlanViewSet)
+    
+    def test_notifications_list(self):
+        self._list('notifications-list', NotificationViewSet)
+    
+    def test_alerts_list(self):
+        self._list('alerts-list', AlertViewSet)
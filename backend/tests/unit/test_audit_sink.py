@@ -0,0 +1,137 @@
+"""
+Unit tests for the buffered audit sink
+"""
+import atexit
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.test import TestCase
+
+from apps.authentication.models import User, Role
+from apps.core.audit_sink import AuditSink
+from apps.notifications.models import Notification
+
+
+class AuditSinkTest(TestCase):
+    """Test batching, spooling and replay of buffered rows"""
+    
+    def setUp(self):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        self.user = User.objects.create_user(
+            email='audit@test.com',
+            password='SecurePass123!',
+            first_name='Audit',
+            last_name='User',
+            role=role,
+            rut='22222222-2'
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.sink = AuditSink(
+            'notifications.Notification',
+            batch_size=50,
+            spool_path=str(Path(self.tmpdir.name) / 'spool.jsonl'),
+            start_thread=False,
+        )
+        self.addCleanup(atexit.unregister, self.sink.flush)
+    
+    def _row(self, i):
+        return Notification(
+            user=self.user,
+            notification_type='SYSTEM',
+            title=f'Evento {i}',
+            message='Cambio registrado',
+        )
+    
+    def test_rows_are_buffered_until_flush(self):
+        """Test: Enqueued rows are only written on flush, in one batch"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(10):
+                self.sink.enqueue(self._row(i))
+        
+        self.assertEqual(self.sink.pending(), 10)
+        self.assertEqual(Notification.objects.count(), 0)
+        
+        with self.assertNumQueries(1):
+            written = self.sink.flush()
+        
+        self.assertEqual(written, 10)
+        self.assertEqual(self.sink.pending(), 0)
+        self.assertEqual(Notification.objects.count(), 10)
+    
+    def test_rolled_back_rows_are_not_queued(self):
+        """Test: Rows enqueued in a rolled-back transaction are dropped"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.sink.enqueue(self._row(0))
+                    raise RuntimeError('request failed')
+            except RuntimeError:
+                pass
+            self.assertEqual(self.sink.pending(), 0)
+            
+            with transaction.atomic():
+                self.sink.enqueue(self._row(1))
+        
+        self.assertEqual(self.sink.pending(), 1)
+    
+    def test_unexpected_error_spools_the_batch(self):
+        """Test: Non-database exceptions during flush do not drop rows"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sink.enqueue(self._row(0))
+        
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=ValueError('bad value')):
+            self.assertEqual(self.sink.flush(), 0)
+        
+        self.assertTrue(self.sink.spool_path.exists())
+        self.assertEqual(self.sink.replay_spool(), 1)
+        self.assertEqual(Notification.objects.count(), 1)
+    
+    def test_poison_row_is_quarantined(self):
+        """Test: A row the database rejects does not block the rest of the spool"""
+        poison = self._row(1)
+        poison.priority = 'X' * 500  # Too long for the column on strict backends
+        self.sink._spool([self._row(0), poison, self._row(2)])
+        real_bulk_create = Notification.objects.bulk_create
+        
+        def bulk_create(rows, **kwargs):
+            if any(row.priority == poison.priority for row in rows):
+                raise IntegrityError('value too long')
+            return real_bulk_create(rows, **kwargs)
+        
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=bulk_create):
+            self.assertEqual(self.sink.replay_spool(), 2)
+        
+        self.assertFalse(self.sink.spool_path.exists())
+        self.assertEqual(
+            sorted(Notification.objects.values_list('title', flat=True)),
+            ['Evento 0', 'Evento 2']
+        )
+        self.assertEqual(len(self.sink.quarantine_path.read_text().splitlines()), 1)
+    
+    def test_database_failure_spools_and_replays(self):
+        """Test: Rows survive a DB outage through the spool file"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self.sink.enqueue(self._row(i))
+        
+        with mock.patch.object(Notification.objects, 'bulk_create',
+                               side_effect=OperationalError('database is down')):
+            self.assertEqual(self.sink.flush(), 0)
+        
+        self.assertTrue(self.sink.spool_path.exists())
+        self.assertEqual(Notification.objects.count(), 0)
+        
+        # Next successful flush replays the spool
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sink.enqueue(self._row(3))
+        self.sink.flush()
+        
+        self.assertFalse(self.sink.spool_path.exists())
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('title', flat=True)),
+            ['Evento 0', 'Evento 1', 'Evento 2', 'Evento 3']
+        )
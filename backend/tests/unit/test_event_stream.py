@@ -0,0 +1,128 @@
+"""
+Unit tests for the event bus and the server-sent events endpoint
+"""
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User, Role
+from apps.core import event_bus
+from apps.core.event_bus import RESYNC_EVENT, MemoryEventBus, RedisEventBus
+from apps.notifications import event_stream
+from apps.notifications.models import Notification
+from apps.notifications.views import NotificationStreamView
+from apps.predictions.models import Alert
+
+
+class MemoryEventBusTest(SimpleTestCase):
+    """Test channel filtering, resume and resync"""
+
+    def test_read_resumes_after_cursor(self):
+        bus = MemoryEventBus(buffer_size=10)
+        start = bus.latest_id()
+        first = bus.publish('user:1', 'notification', {'n': 1})
+        bus.publish('user:2', 'notification', {'n': 2})
+        bus.publish('alerts', 'alert_created', {'n': 3})
+
+        events, cursor = bus.read(['user:1', 'alerts'], start, timeout=0)
+        self.assertEqual([event.data['n'] for event in events], [1, 3])
+
+        events, _ = bus.read(['user:1', 'alerts'], first, timeout=0)
+        self.assertEqual([event.data['n'] for event in events], [3])
+
+        # Nothing new: waits for the timeout and keeps the cursor
+        self.assertEqual(bus.read(['user:1'], cursor, timeout=0.01), ([], cursor))
+
+    def test_lost_events_trigger_resync(self):
+        bus = MemoryEventBus(buffer_size=2)
+        start = bus.latest_id()
+        for index in range(3):
+            bus.publish('alerts', 'alert_created', {'n': index})
+
+        for cursor in (start, 'other-epoch-1', 'garbage'):
+            events, new_cursor = bus.read(['alerts'], cursor, timeout=0)
+            self.assertEqual([event.type for event in events], [RESYNC_EVENT])
+            self.assertEqual(new_cursor, bus.latest_id())
+
+
+@override_settings(SSE_HEARTBEAT_SECONDS=0.01, SSE_MAX_STREAM_SECONDS=0.05, SSE_MAX_STREAMS_PER_PROCESS=1)
+class NotificationStreamViewTest(TestCase):
+    """Test the SSE endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='stream@test.com',
+            password='SecurePass123!',
+            first_name='Stream',
+            last_name='User',
+            role=role,
+            rut='16161616-6'
+        )
+
+    def setUp(self):
+        self.bus = MemoryEventBus()
+        patcher = mock.patch.object(event_stream, 'get_event_bus', return_value=self.bus)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _open(self, **headers):
+        request = APIRequestFactory().get(
+            '/api/v1/notifications/stream/', HTTP_ACCEPT='text/event-stream', **headers
+        )
+        force_authenticate(request, user=self.user)
+        return NotificationStreamView.as_view()(request)
+
+    def test_stream_replays_events_after_last_event_id(self):
+        last_event_id = self.bus.latest_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(
+                user=self.user, notification_type='SYSTEM', title='Aviso', message='M'
+            )
+            Alert.objects.create(alert_type='SYSTEM', severity='CRITICAL', title='Alerta', message='M')
+
+        response = self._open(HTTP_LAST_EVENT_ID=last_event_id)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        # Only one stream per process in this test
+        self.assertEqual(self._open().status_code, 503)
+
+        body = b''.join(response.streaming_content).decode()
+        response.close()
+
+        self.assertTrue(body.startswith('retry: 3000\n\n'))
+        self.assertIn('event: notification\n', body)
+        self.assertIn(str(notification.id), body)
+        self.assertIn('event: alert_created\n', body)
+        self.assertIn(': ping\n\n', body)
+        # Closing the response frees the slot
+        self.assertEqual(event_stream.stream_limiter.open, 0)
+        self._open().close()
+
+
+class EventBusBackendTest(SimpleTestCase):
+    """Test backend selection"""
+
+    def setUp(self):
+        patcher = mock.patch.object(event_bus, '_event_bus', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(EVENT_BUS_BACKEND='redis', EVENT_BUS_REDIS_URL='redis://broker:6379/0')
+    def test_redis_backend_is_shared_through_the_broker(self):
+        bus = event_bus.get_event_bus()
+
+        self.assertIsInstance(bus, RedisEventBus)
+        self.assertEqual(bus.url, 'redis://broker:6379/0')
+
+    @override_settings(EVENT_BUS_BACKEND='memory', DEBUG=False)
+    def test_memory_backend_warns_outside_debug(self):
+        with self.assertLogs('apps.core.event_bus', level='WARNING'):
+            self.assertIsInstance(event_bus.get_event_bus(), MemoryEventBus)
+
+    def test_streams_leave_gunicorn_threads_for_requests(self):
+        self.assertGreater(settings.SSE_MAX_STREAMS_PER_PROCESS, 0)
+        self.assertLess(settings.SSE_MAX_STREAMS_PER_PROCESS, settings.GUNICORN_THREADS)
@@ -0,0 +1,185 @@
+"""
+Unit tests for the Prometheus metrics exporter
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import textwrap
+from pathlib import Path
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import ResolverMatch
+from prometheus_client import REGISTRY
+
+from apps.core.metrics import PrometheusMetricsMiddleware, metrics_view
+from apps.core.middleware import QueryProfilingMiddleware
+from apps.core.monitoring import MetricsCollector
+from apps.authentication.models import Role
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class PrometheusMetricsMiddlewareTest(TestCase):
+    """Test request latency and query count histograms"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+    
+    def _view(self, request):
+        request.resolver_match = ResolverMatch(
+            lambda r: None, (), {}, url_name='asset-list', route='api/v1/assets/'
+        )
+        list(Role.objects.all())
+        list(Role.objects.all())
+        return HttpResponse('ok')
+    
+    def test_records_latency_and_queries_per_view(self):
+        """Test: One latency observation and the SQL count per request"""
+        labels = {'method': 'GET', 'view': 'asset-list', 'status': '2xx'}
+        before = _sample('cmms_http_request_duration_seconds_count', labels)
+        queries_before = _sample('cmms_http_db_queries_sum', {'view': 'asset-list'})
+        
+        middleware = PrometheusMetricsMiddleware(self._view)
+        middleware(self.factory.get('/api/v1/assets/'))
+        
+        self.assertEqual(_sample('cmms_http_request_duration_seconds_count', labels), before + 1)
+        self.assertEqual(_sample('cmms_http_db_queries_sum', {'view': 'asset-list'}), queries_before + 2)
+    
+    @override_settings(METRICS_ALLOWED_NETWORKS=['127.0.0.1/32'])
+    def test_metrics_endpoint_exposes_histograms(self):
+        """Test: /metrics returns the Prometheus text format"""
+        PrometheusMetricsMiddleware(self._view)(self.factory.get('/api/v1/assets/'))
+        
+        response = metrics_view(self.factory.get('/metrics'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'cmms_http_request_duration_seconds_bucket', response.content)
+    
+    @override_settings(METRICS_AUTH_TOKEN='scrape-token')
+    def test_metrics_endpoint_requires_token_when_configured(self):
+        """Test: Scraper must send the bearer token"""
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 401)
+        response = metrics_view(
+            self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        )
+        self.assertEqual(response.status_code, 200)
+    
+    @override_settings(METRICS_AUTH_TOKEN='', METRICS_ALLOWED_NETWORKS=[])
+    def test_metrics_endpoint_is_closed_without_configuration(self):
+        """Test: No token and no allowed networks denies every scraper"""
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 401)
+    
+    @override_settings(METRICS_AUTH_TOKEN='', METRICS_ALLOWED_NETWORKS=['10.0.0.0/8'])
+    def test_metrics_endpoint_allows_internal_networks(self):
+        """Test: Without a token only clients in the allowed networks get metrics"""
+        internal = self.factory.get('/metrics', REMOTE_ADDR='10.1.2.3')
+        external = self.factory.get('/metrics', REMOTE_ADDR='203.0.113.7')
+        
+        self.assertEqual(metrics_view(internal).status_code, 200)
+        self.assertEqual(metrics_view(external).status_code, 401)
+    
+    @override_settings(DEBUG=False, QUERY_PROFILING_ENABLED=True)
+    def test_metrics_and_profiling_share_one_execute_wrapper(self):
+        """Test: Both middlewares read the same per-request profiler"""
+        wrappers = []
+        
+        def view(request):
+            wrappers.append(list(connection.execute_wrappers))
+            return self._view(request)
+        
+        middleware = PrometheusMetricsMiddleware(QueryProfilingMiddleware(view))
+        response = middleware(self.factory.get('/api/v1/assets/'))
+        
+        self.assertEqual(len(wrappers[0]), 1)
+        self.assertEqual(response['X-DB-Query-Count'], '2')
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class MetricsCollectorExportTest(TestCase):
+    """Test MetricsCollector delegation to Prometheus"""
+    
+    def test_increment_updates_prometheus_counter(self):
+        """Test: Counters are exported with their tags as labels"""
+        collector = MetricsCollector()
+        labels = {'channel': 'telegram'}
+        before = _sample('cmms_notifications_sent_total', labels)
+        
+        collector.increment('notifications_sent', tags=labels)
+        collector.increment('notifications_sent', value=2, tags=labels)
+        
+        self.assertEqual(_sample('cmms_notifications_sent_total', labels), before + 3)
+    
+    def test_timing_records_histogram(self):
+        """Test: Timings are exported in seconds"""
+        collector = MetricsCollector()
+        before = _sample('cmms_report_render_seconds_sum', {})
+        
+        collector.timing('report_render', 250)
+        
+        self.assertAlmostEqual(_sample('cmms_report_render_seconds_sum', {}), before + 0.25)
+
+
+# Run in a fresh interpreter: the multiprocess mode of prometheus-client is
+# chosen when it is imported
+WORKER_SCRIPT = textwrap.dedent("""
+    import multiprocessing
+    import sys
+    import urllib.request
+
+    import django
+    django.setup()
+
+    from celery import shared_task
+    from celery.signals import task_postrun, task_prerun, worker_init
+
+    @shared_task(name='apps.tests.metrics_probe')
+    def probe():
+        pass
+
+    def run_task():
+        task_prerun.send(sender=probe, task_id='probe-1', task=probe)
+        task_postrun.send(sender=probe, task_id='probe-1', task=probe, state='SUCCESS')
+
+    # Worker main process starts the exporter, then a prefork child runs the task
+    worker_init.send(sender=None)
+    child = multiprocessing.get_context('fork').Process(target=run_task)
+    child.start()
+    child.join()
+
+    sys.stdout.write(urllib.request.urlopen(f'http://127.0.0.1:{sys.argv[1]}/').read().decode())
+""")
+
+
+class WorkerExporterTest(SimpleTestCase):
+    """Test that task durations recorded in worker children are scraped"""
+
+    def test_prefork_task_durations_are_exported(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        with tempfile.TemporaryDirectory() as multiproc_dir:
+            env = dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE='config.settings.development',
+                PROMETHEUS_MULTIPROC_DIR=multiproc_dir,
+                PROMETHEUS_WORKER_PORT=str(port),
+                PROMETHEUS_WORKER_ADDR='127.0.0.1',
+            )
+            result = subprocess.run(
+                [sys.executable, '-c', WORKER_SCRIPT, str(port)],
+                cwd=Path(__file__).resolve().parents[2], env=env,
+                capture_output=True, text=True, timeout=120,
+            )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn(
+            'cmms_celery_task_duration_seconds_count{state="SUCCESS",task="apps.tests.metrics_probe"} 1.0',
+            result.stdout
+        )
@@ -0,0 +1,165 @@
+"""
+Unit tests for quiet-hours and rate-cap digests
+"""
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.authentication.models import User, Role
+from apps.notifications import telegram_service as telegram_module
+from apps.notifications.digest_service import NotificationDigestService
+from apps.notifications.models import DeferredNotification, Notification, NotificationPreference
+from apps.notifications.telegram_service import TelegramAPIError, TelegramService
+
+
+@override_settings(NOTIFICATION_RATE_CAP=2, NOTIFICATION_RATE_WINDOW_SECONDS=900)
+class NotificationDigestTest(TestCase):
+    """Test deferral during quiet hours and over the rate cap, and digest release"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='digest@test.com',
+            password='SecurePass123!',
+            first_name='Digest',
+            last_name='User',
+            role=role,
+            rut='17171717-7',
+            telegram_id='800017'
+        )
+        cls.other = User.objects.create_user(
+            email='digest-other@test.com',
+            password='SecurePass123!',
+            first_name='Digest',
+            last_name='Other',
+            role=role,
+            rut='19191919-9',
+            telegram_id='800019'
+        )
+        cls.preference = NotificationPreference.objects.create(
+            user=cls.user,
+            notification_type='SYSTEM',
+            telegram_enabled=True,
+            quiet_hours_enabled=True,
+            quiet_hours_start=time(22, 0),
+            quiet_hours_end=time(7, 0)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.service = NotificationDigestService()
+
+    def _recipients(self, count, priority='MEDIUM', user=None):
+        user = user or self.user
+        return [
+            {
+                'id': Notification.objects.create(
+                    user=user, notification_type='SYSTEM', priority=priority, title=f'Aviso {index}', message='M'
+                ).id,
+                'user_id': user.id,
+                'notification_type': 'SYSTEM',
+                'priority': priority,
+            }
+            for index in range(count)
+        ]
+
+    def _at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 3, 10, hour, minute))
+
+    def test_quiet_hours_defer_until_their_end(self):
+        night = self._at(23, 30)
+        preferences = {(self.user.id, 'SYSTEM'): self.preference}
+
+        immediate = self.service.plan('TELEGRAM', self._recipients(2), preferences, now=night)
+        critical = self.service.plan('TELEGRAM', self._recipients(1, priority='CRITICAL'), preferences, now=night)
+
+        self.assertEqual(immediate, [])
+        self.assertEqual(len(critical), 1)
+        deferrals = DeferredNotification.objects.all()
+        self.assertEqual(
+            {(deferral.reason, deferral.release_at) for deferral in deferrals},
+            {(DeferredNotification.REASON_QUIET_HOURS, self._at(7) + timedelta(days=1))}
+        )
+        self.assertEqual(deferrals.count(), 2)
+
+    def test_rate_cap_defers_to_the_window_end(self):
+        noon = self._at(12, 5)
+        preferences = {(self.user.id, 'SYSTEM'): self.preference}
+
+        first = self.service.plan('TELEGRAM', self._recipients(3), preferences, now=noon)
+        second = self.service.plan('TELEGRAM', self._recipients(1), preferences, now=noon)
+
+        self.assertEqual((len(first), len(second)), (2, 0))
+        self.assertEqual(
+            list(DeferredNotification.objects.values_list('reason', 'release_at')),
+            [(DeferredNotification.REASON_RATE_CAP, self._at(12, 15))] * 2
+        )
+
+    def test_release_sends_one_digest_per_user(self):
+        preferences = {(self.user.id, 'SYSTEM'): self.preference}
+        self.service.plan('TELEGRAM', self._recipients(3), preferences, now=self._at(23))
+        telegram = TelegramService()
+        telegram.client_initialized = True
+
+        with mock.patch.object(telegram_module, 'get_telegram_service', return_value=telegram), \
+                mock.patch.object(telegram, 'call', return_value={'message_id': 1}) as call:
+            self.assertEqual(self.service.release(now=self._at(6))['notifications'], 0)
+            # Due rows + delete
+            with self.assertNumQueries(2):
+                result = self.service.release(now=self._at(7) + timedelta(days=1))
+
+        self.assertEqual((result['digests'], result['notifications']), (1, 3))
+        call.assert_called_once()
+        payload = call.call_args[0][1]
+        self.assertEqual(payload['chat_id'], '800017')
+        self.assertIn('Resumen de notificaciones (3)', payload['text'])
+        self.assertFalse(DeferredNotification.objects.exists())
+
+    def _defer_for_both_users(self):
+        night = self._at(23)
+        preference = NotificationPreference(
+            user=self.other, notification_type='SYSTEM', quiet_hours_enabled=True,
+            quiet_hours_start=time(22, 0), quiet_hours_end=time(7, 0)
+        )
+        self.service.plan('TELEGRAM', self._recipients(2), {(self.user.id, 'SYSTEM'): self.preference}, now=night)
+        self.service.plan(
+            'TELEGRAM', self._recipients(1, user=self.other), {(self.other.id, 'SYSTEM'): preference}, now=night
+        )
+        return self._at(7) + timedelta(days=1)
+
+    @override_settings(NOTIFICATION_DIGEST_RETRY_SECONDS=600)
+    def test_undelivered_digests_are_kept_for_a_later_run(self):
+        due = self._defer_for_both_users()
+        telegram = TelegramService()
+        telegram.client_initialized = True
+
+        def call(method, payload=None, http_method='post'):
+            if payload['chat_id'] == '800019':
+                raise TelegramAPIError('Forbidden: bot was blocked by the user', status_code=403)
+            return {'message_id': 1}
+
+        with mock.patch.object(telegram_module, 'get_telegram_service', return_value=telegram), \
+                mock.patch.object(telegram, 'call', side_effect=call):
+            result = self.service.release(now=due)
+
+        self.assertEqual(result, {'status': 'partial', 'digests': 1, 'notifications': 2, 'kept': 1})
+        self.assertEqual(
+            list(DeferredNotification.objects.values_list('user_id', 'release_at')),
+            [(self.other.id, due + timedelta(seconds=600))]
+        )
+
+    def test_digests_are_kept_while_the_bot_is_not_configured(self):
+        due = self._defer_for_both_users()
+        telegram = TelegramService()
+        telegram.client_initialized = False
+
+        with mock.patch.object(telegram_module, 'get_telegram_service', return_value=telegram):
+            result = self.service.release(now=due)
+
+        self.assertEqual((result['digests'], result['kept']), (0, 3))
+        self.assertEqual(DeferredNotification.objects.filter(release_at__gt=due).count(), 3)
@@ -0,0 +1,114 @@
+"""
+Unit tests for bulk notification fan-out and the per-channel delivery tasks
+"""
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User, Role
+from apps.notifications import tasks
+from apps.notifications.models import Notification, NotificationPreference
+from apps.notifications.telegram_service import TelegramService
+from apps.notifications.views import NotificationViewSet
+
+
+class NotificationFanoutTest(TestCase):
+    """Test bulk creation, task enqueueing and batched delivery"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.users = [
+            User.objects.create_user(
+                email=f'fanout{i}@test.com',
+                password='SecurePass123!',
+                first_name='Fanout',
+                last_name=f'User {i}',
+                role=role,
+                rut=f'3030303{i}-{i}',
+                telegram_id=f'70000{i}' if i % 2 == 0 else None
+            )
+            for i in range(6)
+        ]
+        for user in cls.users[:4]:
+            NotificationPreference.objects.create(
+                user=user,
+                notification_type='SYSTEM',
+                telegram_enabled=True
+            )
+
+    def _bulk_create(self):
+        view = NotificationViewSet.as_view({'post': 'bulk_create'})
+        request = APIRequestFactory().post('/api/v1/notifications/bulk_create/', {
+            'user_ids': [str(user.id) for user in self.users],
+            'notification_type': 'SYSTEM',
+            'priority': 'HIGH',
+            'title': 'Mantención programada',
+            'message': 'El sistema estará fuera de servicio a las 22:00',
+        }, format='json')
+        force_authenticate(request, user=self.users[0])
+        return view(request)
+
+    def test_bulk_create_inserts_once_and_enqueues_one_task_per_channel(self):
+        with mock.patch.object(tasks.publish_notifications, 'delay') as publish, \
+                mock.patch.object(tasks.send_telegram_notifications, 'delay') as telegram, \
+                self.captureOnCommitCallbacks(execute=True):
+            # Savepoint + bulk insert + unread counters + release, independent of recipients
+            with self.assertNumQueries(4):
+                response = self._bulk_create()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(Notification.objects.count(), 6)
+        ids = sorted(str(notification_id) for notification_id in Notification.objects.values_list('id', flat=True))
+        publish.assert_called_once()
+        telegram.assert_called_once()
+        self.assertEqual(sorted(publish.call_args[0][0]), ids)
+        self.assertEqual(sorted(telegram.call_args[0][0]), ids)
+
+    def test_publish_task_records_message_ids_and_retries_failures(self):
+        with mock.patch.object(tasks.publish_notifications, 'delay'), \
+                mock.patch.object(tasks.send_telegram_notifications, 'delay'):
+            self._bulk_create()
+        ids = [str(notification_id) for notification_id in Notification.objects.values_list('id', flat=True)]
+        pubsub = mock.Mock(client_initialized=True)
+        pubsub.publish_many.side_effect = lambda notifications: [
+            f'msg-{index}' if index else None for index in range(len(notifications))
+        ]
+
+        with mock.patch.object(tasks, 'get_pubsub_service', return_value=pubsub), \
+                mock.patch.object(tasks.publish_notifications, 'retry', side_effect=RuntimeError('retry')):
+            with self.assertRaisesMessage(RuntimeError, 'retry'):
+                tasks.publish_notifications(ids)
+
+        pubsub.publish_many.assert_called_once()
+        self.assertEqual(Notification.objects.filter(pubsub_message_id__isnull=False).count(), 5)
+
+        # The retry only publishes the notification that failed
+        pubsub.publish_many.side_effect = lambda notifications: ['msg-retry'] * len(notifications)
+        with mock.patch.object(tasks, 'get_pubsub_service', return_value=pubsub):
+            result = tasks.publish_notifications(ids)
+        self.assertEqual((result['published'], result['failed']), (1, 0))
+        self.assertFalse(Notification.objects.filter(pubsub_message_id__isnull=True).exists())
+
+    def test_telegram_task_sends_to_linked_users_with_preference(self):
+        with mock.patch.object(tasks.publish_notifications, 'delay'), \
+                mock.patch.object(tasks.send_telegram_notifications, 'delay'):
+            self._bulk_create()
+        ids = [str(notification_id) for notification_id in Notification.objects.values_list('id', flat=True)]
+        telegram = TelegramService()
+        telegram.client_initialized = True
+
+        with mock.patch.object(tasks, 'get_telegram_service', return_value=telegram), \
+                mock.patch.object(telegram, 'call', return_value={'message_id': 1}) as call:
+            with self.assertNumQueries(2):  # notifications with chat IDs + preferences
+                result = tasks.send_telegram_notifications(ids)
+
+        # Users 0 and 2 have a chat linked and Telegram enabled; user 4 has no preference
+        self.assertEqual(result['sent'], 2)
+        self.assertEqual(
+            sorted(call_args[0][1]['chat_id'] for call_args in call.call_args_list),
+            ['700000', '700002']
+        )
+        self.assertIn('Mantención programada', call.call_args[0][1]['text'])
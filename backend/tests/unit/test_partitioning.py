@@ -0,0 +1,228 @@
+"""
+Unit tests for monthly archive tables on backends without native partitions
+"""
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from apps.authentication.models import User, Role
+from apps.core.models import Webhook, WebhookDelivery
+from apps.core.partitioning import (
+    ArchiveTableManager,
+    PostgresPartitionManager,
+    add_months,
+    check_horizon,
+    current_month,
+    maintain_partitions,
+    month_datetime,
+    month_range,
+    month_start,
+    partitioned_unique_statements,
+)
+
+
+class MonthHelpersTest(SimpleTestCase):
+    """Test month arithmetic used to name partitions"""
+    
+    def test_add_months_crosses_years(self):
+        """Test: Month shifts wrap around year boundaries"""
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+    
+    def test_month_range_is_inclusive(self):
+        """Test: Range includes both ends"""
+        self.assertEqual(
+            month_range(date(2024, 11, 15), date(2025, 1, 1)),
+            [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)]
+        )
+
+
+class PartitionedUniqueKeysTest(SimpleTestCase):
+    """Test how unique keys are rebuilt on a partitioned table"""
+    
+    def test_partition_key_is_appended_once(self):
+        """Test: Constraints stay constraints and gain the partition column"""
+        statements = partitioned_unique_statements(
+            'history',
+            [
+                ('history_ref_key', True, ['reference']),
+                ('history_ref_day_uniq', False, ['reference', 'changed_at']),
+            ],
+            'changed_at',
+            lambda name: f'"{name}"'
+        )
+        
+        self.assertEqual(statements, [
+            'ALTER TABLE "history" ADD CONSTRAINT "history_ref_key" UNIQUE ("reference", "changed_at")',
+            'CREATE UNIQUE INDEX "history_ref_day_uniq" ON "history" ("reference", "changed_at")',
+        ])
+
+
+class HorizonCheckTest(SimpleTestCase):
+    """Test the alert on partitions that do not reach far enough ahead"""
+    
+    def test_horizon_closer_than_a_month_is_reported(self):
+        now = month_datetime(date(2026, 3, 1)) + timedelta(days=10)
+        with mock.patch('apps.core.partitioning.prometheus_metrics.set_gauge') as set_gauge:
+            with self.assertLogs('apps.core.partitioning', level='ERROR'):
+                warning = check_horizon(WebhookDelivery, date(2026, 4, 1), now=now)
+            far = check_horizon(WebhookDelivery, date(2026, 6, 1), now=now)
+        
+        self.assertIn('2026-04-01', warning)
+        self.assertIsNone(far)
+        self.assertIsNone(check_horizon(WebhookDelivery, None, now=now))
+        set_gauge.assert_called_with(
+            'partition_horizon_timestamp', month_datetime(date(2026, 6, 1)).timestamp(),
+            {'table': WebhookDelivery._meta.db_table}
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Native partitioning requires PostgreSQL')
+class PostgresConvertTest(TransactionTestCase):
+    """Test that converting a table keeps its constraints and indexes"""
+    
+    def _constraint_set(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT contype, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype <> 'p'",
+                [table]
+            )
+            constraints = set(cursor.fetchall())
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s",
+                [table, '%pkey']
+            )
+            indexes = {row[0] for row in cursor.fetchall()}
+        return constraints, indexes
+    
+    def test_convert_preserves_constraints(self):
+        """Test: FK, CHECK, UNIQUE constraints and indexes survive the conversion"""
+        table = WebhookDelivery._meta.db_table
+        constraints_before, indexes_before = self._constraint_set(table)
+        
+        PostgresPartitionManager().convert(WebhookDelivery, 'created_at', months_ahead=1)
+        
+        constraints_after, indexes_after = self._constraint_set(table)
+        self.assertEqual(
+            {kind for kind, _ in constraints_after}, {kind for kind, _ in constraints_before}
+        )
+        self.assertEqual(
+            {d for kind, d in constraints_before if kind != 'u'},
+            {d for kind, d in constraints_after if kind != 'u'}
+        )
+        self.assertTrue(indexes_before <= indexes_after)
+    
+    def test_rows_past_the_last_partition_go_to_default(self):
+        """Test: Inserts keep working when maintenance falls behind"""
+        manager = PostgresPartitionManager()
+        manager.convert(WebhookDelivery, 'created_at', months_ahead=0)
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        user = User.objects.create_user(
+            email='partitions-default@test.com', password='SecurePass123!', first_name='Part',
+            last_name='Default', role=role, rut='21212121-2'
+        )
+        webhook = Webhook.objects.create(
+            name='ERP', url='https://erp.example.com/hook', secret='s' * 32, created_by=user
+        )
+        later = add_months(current_month(), 2)
+        
+        delivery = WebhookDelivery.objects.create(webhook=webhook, event_type='work_order.created', payload={})
+        WebhookDelivery.objects.filter(pk=delivery.pk).update(created_at=month_datetime(later))
+        self.assertEqual(manager.horizon(WebhookDelivery), add_months(current_month(), 1))
+        
+        created = manager.ensure_partitions(WebhookDelivery, 'created_at', months_ahead=2)
+        
+        self.assertIn(manager.partition_name(WebhookDelivery, later), created)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {manager.default_partition_name(WebhookDelivery)}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(WebhookDelivery.objects.filter(created_at=month_datetime(later)).count(), 1)
+
+
+class ArchiveTableManagerTest(TransactionTestCase):
+    """Test archiving and retention of WebhookDelivery rows"""
+    
+    def setUp(self):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        user = User.objects.create_user(
+            email='partitions@test.com',
+            password='SecurePass123!',
+            first_name='Part',
+            last_name='User',
+            role=role,
+            rut='33333333-3'
+        )
+        self.webhook = Webhook.objects.create(
+            name='ERP', url='https://erp.example.com/hook', secret='s' * 32, created_by=user
+        )
+        self.manager = ArchiveTableManager()
+        self.this_month = current_month()
+    
+    def tearDown(self):
+        for partition in self.manager.list_partitions(WebhookDelivery):
+            with connection.schema_editor() as editor:
+                editor.delete_model(self.manager.archive_model(WebhookDelivery, partition['month']))
+    
+    def _delivery_at(self, month, count=1):
+        for _ in range(count):
+            delivery = WebhookDelivery.objects.create(
+                webhook=self.webhook, event_type='work_order.created', payload={'id': 1}
+            )
+            WebhookDelivery.objects.filter(pk=delivery.pk).update(created_at=month_datetime(month))
+    
+    def test_old_rows_move_to_monthly_archive_tables(self):
+        """Test: Rows older than the hot window leave the live table"""
+        old = add_months(self.this_month, -6)
+        older = add_months(self.this_month, -8)
+        self._delivery_at(old, count=3)
+        self._delivery_at(older, count=2)
+        self._delivery_at(self.this_month, count=4)
+        
+        moved = self.manager.archive_rows(WebhookDelivery, 'created_at', hot_months=3, chunk_size=2)
+        
+        self.assertEqual(moved, 5)
+        self.assertEqual(WebhookDelivery.objects.count(), 4)
+        partitions = {p['month']: p['rows'] for p in self.manager.list_partitions(WebhookDelivery)}
+        self.assertEqual(partitions, {old: 3, older: 2})
+        
+        # Archived rows keep their data and are found by date range
+        querysets = self.manager.archived_querysets(
+            WebhookDelivery, month_datetime(old), month_datetime(add_months(old, 1))
+        )
+        self.assertEqual(len(querysets), 1)
+        archived = querysets[0].get(pk=querysets[0].first().pk)
+        self.assertEqual(archived.webhook_id, self.webhook.id)
+        self.assertEqual(archived.payload, {'id': 1})
+        self.assertEqual(month_start(archived.created_at), old)
+    
+    def test_retention_drops_whole_archive_tables(self):
+        """Test: Expired months are dropped as tables, not deleted row by row"""
+        expired = add_months(self.this_month, -10)
+        kept = add_months(self.this_month, -5)
+        self._delivery_at(expired)
+        self._delivery_at(kept)
+        self.manager.archive_rows(WebhookDelivery, 'created_at', hot_months=3, chunk_size=100)
+        
+        dropped = self.manager.drop_expired(WebhookDelivery, retention_months=6)
+        
+        self.assertEqual(dropped, [self.manager.archive_table_name(WebhookDelivery, expired)])
+        self.assertEqual(
+            [p['month'] for p in self.manager.list_partitions(WebhookDelivery)], [kept]
+        )
+    
+    def test_maintenance_does_not_archive_unless_enabled(self):
+        """Test: Views read the live table only, so archiving is opt-in per model"""
+        self._delivery_at(add_months(self.this_month, -6))
+        
+        with override_settings(PARTITION_ARCHIVE_MODELS=[]):
+            summary = maintain_partitions()
+        self.assertNotIn('archived_rows', summary['core.WebhookDelivery'])
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+        
+        with override_settings(PARTITION_ARCHIVE_MODELS=['core.WebhookDelivery']):
+            summary = maintain_partitions()
+        self.assertEqual(summary['core.WebhookDelivery']['archived_rows'], 1)
+        self.assertEqual(WebhookDelivery.objects.count(), 0)
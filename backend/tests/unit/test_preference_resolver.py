@@ -0,0 +1,87 @@
+"""
+Unit tests for bulk preference resolution and caching
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User, Role
+from apps.notifications.models import NotificationPreference
+from apps.notifications.preference_resolver import NOTIFICATION_TYPES, PreferenceResolver
+from apps.notifications.views import NotificationPreferenceViewSet
+
+
+class PreferenceResolverTest(TestCase):
+    """Test one query per recipient set, default creation and invalidation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.users = [
+            User.objects.create_user(
+                email=f'preferences{i}@test.com',
+                password='SecurePass123!',
+                first_name='Preference',
+                last_name=f'User {i}',
+                role=role,
+                rut=f'4040404{i}-{i}'
+            )
+            for i in range(5)
+        ]
+        NotificationPreference.objects.create(user=cls.users[0], notification_type='SYSTEM', telegram_enabled=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.resolver = PreferenceResolver()
+
+    def test_recipient_set_is_resolved_with_one_query_then_cached(self):
+        user_ids = [user.id for user in self.users]
+
+        with self.assertNumQueries(1):
+            preferences = self.resolver.resolve(user_ids)
+        with self.assertNumQueries(0):
+            cached = self.resolver.resolve(user_ids)
+
+        self.assertEqual(len(preferences), len(user_ids) * len(NOTIFICATION_TYPES))
+        self.assertTrue(cached[(self.users[0].id, 'SYSTEM')].telegram_enabled)
+        # Missing rows resolve to the model defaults without being inserted
+        default = cached[(self.users[1].id, 'SYSTEM')]
+        self.assertEqual((default.in_app_enabled, default.telegram_enabled), (True, False))
+        self.assertEqual(NotificationPreference.objects.count(), 1)
+
+    def test_create_missing_inserts_defaults_in_bulk(self):
+        user_ids = [user.id for user in self.users]
+
+        # Stored rows, one bulk insert, rows as stored
+        with self.assertNumQueries(3):
+            self.resolver.resolve(user_ids, create_missing=True)
+        with self.assertNumQueries(0):
+            self.resolver.resolve(user_ids, create_missing=True)
+
+        self.assertEqual(NotificationPreference.objects.count(), len(user_ids) * len(NOTIFICATION_TYPES))
+        self.assertTrue(NotificationPreference.objects.get(user=self.users[0], notification_type='SYSTEM').telegram_enabled)
+
+    def _call(self, action, method='get', data=None):
+        view = NotificationPreferenceViewSet.as_view({method: action})
+        factory = APIRequestFactory()
+        url = f'/api/v1/notifications/preferences/{action}/'
+        request = factory.post(url, data, format='json') if method == 'post' else factory.get(url)
+        force_authenticate(request, user=self.users[2])
+        return view(request)
+
+    def test_bulk_update_invalidates_cached_preferences(self):
+        self.assertFalse(any(row['telegram_enabled'] for row in self._call('defaults').data))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._call('update_bulk', 'post', {'preferences': [
+                {'notification_type': 'SYSTEM', 'telegram_enabled': True},
+                {'notification_type': 'UNKNOWN', 'telegram_enabled': True},
+            ]})
+        self.assertEqual([row['notification_type'] for row in response.data], ['SYSTEM'])
+
+        with self.assertNumQueries(1):
+            defaults = self._call('defaults').data
+        self.assertEqual(
+            [row['notification_type'] for row in defaults if row['telegram_enabled']], ['SYSTEM']
+        )
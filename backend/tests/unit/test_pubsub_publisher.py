@@ -0,0 +1,124 @@
+"""
+Unit tests for the non-blocking Pub/Sub publisher
+"""
+import json
+import tempfile
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from apps.core.pubsub_publisher import InMemoryPublisherBackend, Publisher, PublisherBackend
+from apps.notifications.pubsub_service import PubSubService
+
+TOPIC = 'projects/test/topics/notifications'
+
+
+class DeferredBackend(PublisherBackend):
+    """Backend whose futures complete only when the test says so"""
+
+    def __init__(self):
+        self.futures = []
+
+    def publish(self, topic_path, data, attributes):
+        future = Future()
+        self.futures.append((future, json.loads(data)))
+        return future
+
+    def complete_all(self):
+        for index, (future, _) in enumerate(self.futures):
+            if not future.done():
+                future.set_result(f'id-{index}')
+
+
+class PublisherTest(SimpleTestCase):
+    """Test callbacks, backpressure and the overflow spool"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.spool_path = Path(self.tmpdir.name) / 'pubsub_spool.jsonl'
+
+    def _publisher(self, backend, **kwargs):
+        publisher = Publisher(backend=backend, spool_path=str(self.spool_path), replay_interval=0, **kwargs)
+        # Release deferred futures first, then drain the publisher
+        self.addCleanup(publisher.close, timeout=1)
+        if isinstance(backend, DeferredBackend):
+            self.addCleanup(backend.complete_all)
+        return publisher
+
+    def _spooled(self):
+        if not self.spool_path.exists():
+            return []
+        return [json.loads(line) for line in self.spool_path.read_text().splitlines()]
+
+    def test_publish_does_not_wait_for_acknowledgement(self):
+        backend = DeferredBackend()
+        publisher = self._publisher(backend, max_pending=10)
+        results = []
+
+        for index in range(3):
+            self.assertTrue(publisher.publish(TOPIC, {'n': index}, callback=lambda *args: results.append(args)))
+
+        self.assertEqual(publisher.pending(), 3)
+        self.assertEqual(results, [])
+        self.assertFalse(publisher.flush(timeout=0.01))
+
+        completer = threading.Thread(target=backend.complete_all)
+        completer.start()
+        self.assertTrue(publisher.flush(timeout=5))
+        completer.join()
+        self.assertEqual(sorted(message_id for message_id, _ in results), ['id-0', 'id-1', 'id-2'])
+        self.assertEqual(publisher.pending(), 0)
+
+    def test_overflow_is_spooled_and_replayed(self):
+        backend = DeferredBackend()
+        publisher = self._publisher(backend, max_pending=2)
+
+        self.assertTrue(publisher.publish(TOPIC, {'n': 0}, kind='a'))
+        self.assertTrue(publisher.publish(TOPIC, {'n': 1}))
+        self.assertFalse(publisher.publish(TOPIC, {'n': 2}, kind='c'))
+        self.assertEqual(
+            self._spooled(),
+            [{'topic': TOPIC, 'message': {'n': 2}, 'attributes': {'kind': 'c'}}]
+        )
+
+        backend.complete_all()
+        self.assertEqual(publisher.replay_spool(), 1)
+        self.assertEqual([data for _, data in backend.futures], [{'n': 0}, {'n': 1}, {'n': 2}])
+        self.assertFalse(self.spool_path.exists())
+
+        backend.complete_all()
+        self.assertTrue(publisher.flush(timeout=1))
+
+    def test_failures_are_spooled_unless_a_callback_owns_them(self):
+        backend = InMemoryPublisherBackend(fail_with=RuntimeError('unavailable'))
+        publisher = self._publisher(backend)
+        errors = []
+
+        publisher.publish(TOPIC, {'n': 0})
+        publisher.publish(TOPIC, {'n': 1}, callback=lambda message_id, error: errors.append(error))
+
+        self.assertEqual([record['message'] for record in self._spooled()], [{'n': 0}])
+        self.assertEqual([str(error) for error in errors], ['unavailable'])
+
+        # Back online: the next publish replays the spool
+        backend.fail_with = None
+        publisher.publish(TOPIC, {'n': 2})
+        self.assertEqual(sorted(message['data']['n'] for message in backend.messages), [0, 2])
+        self.assertFalse(self.spool_path.exists())
+
+    def test_service_publish_many_collects_message_ids_in_order(self):
+        backend = InMemoryPublisherBackend()
+        service = PubSubService(publisher=self._publisher(backend, max_pending=16))
+        notifications = [
+            {'user_id': f'user-{index}', 'notification_type': 'SYSTEM', 'title': 'T', 'message': 'M'}
+            for index in range(100)
+        ]
+
+        message_ids = service.publish_many(notifications)
+
+        self.assertEqual(message_ids, [message['message_id'] for message in backend.messages])
+        self.assertEqual(backend.messages[7]['attributes']['user_id'], 'user-7')
+        self.assertEqual(backend.messages[7]['data']['user_id'], 'user-7')
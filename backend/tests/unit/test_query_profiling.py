@@ -0,0 +1,85 @@
+"""
+Unit tests for SQL profiling middleware and query budget helpers
+"""
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from apps.authentication.models import Role
+from apps.core.middleware import QueryProfilingMiddleware
+from apps.core.query_profiling import fingerprint_sql
+from apps.core.testing import QueryBudgetExceeded, query_budget
+
+
+def n_plus_one_view(request):
+    """View that reads the same table once per role"""
+    for name in (Role.ADMIN, Role.SUPERVISOR, Role.OPERADOR, Role.ADMIN):
+        Role.objects.filter(name=name).first()
+    return HttpResponse('ok')
+
+
+class FingerprintTest(TestCase):
+    """Test SQL normalization"""
+    
+    def test_values_and_in_lists_are_normalized(self):
+        """Test: Queries differing only by values share a fingerprint"""
+        self.assertEqual(
+            fingerprint_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a'"),
+            fingerprint_sql("SELECT * FROM t WHERE id IN (%s) AND name = 'bb'"),
+        )
+        self.assertNotEqual(
+            fingerprint_sql('SELECT * FROM t WHERE id = %s'),
+            fingerprint_sql('SELECT * FROM u WHERE id = %s'),
+        )
+
+
+class QueryProfilingMiddlewareTest(TestCase):
+    """Test profiling headers"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+    
+    def _run(self):
+        middleware = QueryProfilingMiddleware(n_plus_one_view)
+        return middleware(self.factory.get('/api/v1/roles/'))
+    
+    @override_settings(DEBUG=True, QUERY_PROFILING_MAX_DUPLICATES=2)
+    def test_debug_mode_warns_on_duplicates(self):
+        """Test: Repeated fingerprints produce the warning header"""
+        with self.assertLogs('performance', level='WARNING'):
+            response = self._run()
+        
+        self.assertEqual(response['X-DB-Query-Count'], '4')
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '3')
+        self.assertIn('possible N+1', response['X-DB-Query-Warning'])
+    
+    @override_settings(DEBUG=False, QUERY_PROFILING_ENABLED=True)
+    def test_enabled_outside_debug_adds_counts_only(self):
+        """Test: No warning header outside DEBUG"""
+        response = self._run()
+        
+        self.assertEqual(response['X-DB-Query-Count'], '4')
+        self.assertNotIn('X-DB-Query-Warning', response)
+    
+    @override_settings(DEBUG=False, QUERY_PROFILING_ENABLED=False)
+    def test_disabled_by_default_in_production(self):
+        """Test: No headers when profiling is off"""
+        self.assertNotIn('X-DB-Query-Count', self._run())
+
+
+class QueryBudgetHelperTest(TestCase):
+    """Test the query budget context manager"""
+    
+    def test_exceeding_budget_fails_with_fingerprints(self):
+        """Test: Failure message lists the repeated query"""
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            with query_budget('roles-list', max_queries=2):
+                n_plus_one_view(None)
+        
+        self.assertIn('roles-list: 4 > 2', str(ctx.exception))
+        self.assertIn('x4', str(ctx.exception))
+    
+    def test_duplicate_budget(self):
+        """Test: Duplicates can be budgeted separately"""
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget('roles-list', max_queries=10, max_duplicates=0):
+                n_plus_one_view(None)
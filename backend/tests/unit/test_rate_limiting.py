@@ -0,0 +1,74 @@
+"""
+Tests for the in-process token bucket
+"""
+import threading
+
+import pytest
+
+from apps.core.rate_limiting import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_burst_up_to_capacity_then_waits():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=5, clock=clock, sleep=clock.sleep)
+
+    for _ in range(5):
+        assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.1)
+
+    assert bucket.acquire(3)
+    assert clock.now == pytest.approx(0.3)
+
+
+def test_requests_larger_than_capacity_wait_for_full_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=4, clock=clock, sleep=clock.sleep)
+    bucket.acquire(4)
+
+    assert bucket.acquire(10)
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_timeout():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+
+    assert bucket.acquire(timeout=0.5) is False
+    assert clock.now == pytest.approx(0.5)
+
+
+def test_thread_safe_accounting():
+    bucket = TokenBucket(rate=1, capacity=1000)
+    taken = []
+
+    def worker():
+        for _ in range(100):
+            if bucket.try_acquire() == 0:
+                taken.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 800 <= len(taken) <= 801
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
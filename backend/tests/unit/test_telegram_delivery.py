@@ -0,0 +1,150 @@
+"""
+Unit tests for the rate-limited Telegram delivery queue
+"""
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.notifications.telegram_delivery import (
+    OutgoingMessage, TelegramDispatcher, TelegramRateLimiter, coalesce
+)
+from apps.notifications.telegram_service import TelegramAPIError, TelegramService
+
+
+class FakeClock:
+    """Monotonic clock advanced only by sleep()"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+
+class FakeService:
+    """Records sendMessage calls; ``errors`` are raised in order, per chat"""
+
+    def __init__(self, clock, errors=None):
+        self.clock = clock
+        self.errors = errors or {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def call(self, method, payload=None, http_method='post'):
+        with self.lock:
+            self.calls.append((self.clock(), payload))
+            pending = self.errors.get(payload['chat_id'])
+            if pending:
+                raise pending.pop(0)
+        return {'message_id': len(self.calls)}
+
+
+class TelegramDeliveryTest(SimpleTestCase):
+    """Test coalescing, per-chat limits and retry_after handling"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def _dispatcher(self, service, **kwargs):
+        limiter = TelegramRateLimiter(
+            global_rate=30, chat_rate=1, group_rate=20 / 60, clock=self.clock, sleep=self.clock.sleep
+        )
+        return TelegramDispatcher(
+            service=service, limiter=limiter, max_workers=4, clock=self.clock, sleep=self.clock.sleep, **kwargs
+        )
+
+    def test_messages_to_one_chat_are_coalesced(self):
+        messages = [
+            OutgoingMessage(chat_id='1', text='a' * 2000, disable_notification=True),
+            OutgoingMessage(chat_id='2', text='x'),
+            OutgoingMessage(chat_id='1', text='b' * 2000, disable_notification=False),
+            OutgoingMessage(chat_id='1', text='c' * 2000, disable_notification=True),
+        ]
+
+        merged = coalesce(messages)
+
+        self.assertEqual([(message.chat_id, message.count) for message in merged], [('1', 2), ('2', 1), ('1', 1)])
+        self.assertEqual(merged[0].text, 'a' * 2000 + '\n\n' + 'b' * 2000)
+        self.assertFalse(merged[0].disable_notification)
+        self.assertTrue(merged[2].disable_notification)
+
+    def test_alert_storm_is_paced_per_chat(self):
+        service = FakeService(self.clock)
+        # 3 messages too long to coalesce to one chat, 1 each to two others
+        messages = [OutgoingMessage(chat_id='1', text=str(index) * 3000) for index in range(3)]
+        messages += [OutgoingMessage(chat_id='2', text='x'), OutgoingMessage(chat_id='-3', text='y')]
+
+        report = self._dispatcher(service).deliver(messages)
+
+        self.assertEqual(report, {'sent': 5, 'failed': 0, 'requests': 5, 'rate_limited': 0})
+        times = [moment for moment, payload in service.calls if payload['chat_id'] == '1']
+        self.assertEqual(len(times), 3)
+        self.assertTrue(all(later - earlier >= 1 for earlier, later in zip(times, times[1:])))
+        # Other chats are not held up behind chat 1
+        other = [moment for moment, payload in service.calls if payload['chat_id'] != '1']
+        self.assertEqual(other, [0.0, 0.0])
+
+    def test_retry_after_delays_the_chat(self):
+        service = FakeService(self.clock, errors={
+            '1': [TelegramAPIError('Too Many Requests', status_code=429, retry_after=7)],
+            '2': [TelegramAPIError('Forbidden: bot was blocked by the user', status_code=403)],
+        })
+
+        report = self._dispatcher(service).deliver([
+            OutgoingMessage(chat_id='1', text='a'),
+            OutgoingMessage(chat_id='2', text='b'),
+        ])
+
+        self.assertEqual(report, {'sent': 1, 'failed': 1, 'requests': 3, 'rate_limited': 1})
+        times = [moment for moment, payload in service.calls if payload['chat_id'] == '1']
+        self.assertEqual(len(times), 2)
+        self.assertGreaterEqual(times[1] - times[0], 7)
+
+    def test_server_errors_give_up_after_max_retries(self):
+        service = FakeService(self.clock, errors={
+            '1': [TelegramAPIError('Bad Gateway', status_code=502) for _ in range(5)],
+        })
+
+        report = self._dispatcher(service, max_retries=3).deliver([OutgoingMessage(chat_id='1', text='a')])
+
+        self.assertEqual(report, {'sent': 0, 'failed': 1, 'requests': 3, 'rate_limited': 0})
+
+
+@override_settings(TELEGRAM_HTTP_TIMEOUT_SECONDS=5)
+class TelegramServiceSessionTest(SimpleTestCase):
+    """Test the pooled session and error mapping of TelegramService.call"""
+
+    def _service(self):
+        with mock.patch.dict('os.environ', {'TELEGRAM_BOT_TOKEN': 'token'}):
+            return TelegramService()
+
+    def _response(self, status_code, body):
+        response = mock.Mock(status_code=status_code, ok=status_code < 400)
+        response.json.return_value = body
+        return response
+
+    def test_calls_reuse_one_session(self):
+        service = self._service()
+        with mock.patch('requests.Session.request', return_value=self._response(200, {'ok': True, 'result': {}})) as request:
+            service.send_message(chat_id='1', text='a')
+            service.send_message(chat_id='2', text='b')
+
+        self.assertEqual(request.call_count, 2)
+        self.assertIs(service.session, service.session)
+        self.assertEqual(request.call_args.kwargs['timeout'], 5)
+
+    def test_rate_limit_response_carries_retry_after(self):
+        service = self._service()
+        body = {'ok': False, 'description': 'Too Many Requests: retry after 3', 'parameters': {'retry_after': 3}}
+        with mock.patch('requests.Session.request', return_value=self._response(429, body)):
+            with self.assertRaises(TelegramAPIError) as raised:
+                service.call('sendMessage', {'chat_id': '1', 'text': 'a'})
+
+        self.assertEqual((raised.exception.status_code, raised.exception.retry_after), (429, 3))
+        self.assertTrue(raised.exception.retryable)
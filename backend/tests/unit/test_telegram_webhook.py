@@ -0,0 +1,77 @@
+"""
+Unit tests for the asynchronous Telegram webhook
+"""
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from apps.authentication.models import User, Role
+from apps.notifications import tasks, telegram_webhook
+
+
+class TelegramWebhookTest(TestCase):
+    """Test acknowledgement, update deduplication and cached command answers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='bot@test.com',
+            password='SecurePass123!',
+            first_name='Bot',
+            last_name='User',
+            role=role,
+            rut='14141414-4',
+            telegram_id='900001'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _post(self, update):
+        request = RequestFactory().post(
+            '/telegram/webhook/', data=json.dumps(update), content_type='application/json'
+        )
+        return telegram_webhook.telegram_webhook(request)
+
+    def _update(self, update_id, text='/kpis'):
+        return {
+            'update_id': update_id,
+            'message': {'chat': {'id': 900001}, 'text': text, 'from': {'first_name': 'Bot'}},
+        }
+
+    def test_updates_are_queued_once(self):
+        with mock.patch.object(tasks.process_telegram_command, 'delay') as delay:
+            with self.assertNumQueries(0):
+                first = self._post(self._update(1))
+            retry = self._post(self._update(1))
+            other = self._post(self._update(2, text='hola'))
+
+        self.assertEqual([first.status_code, retry.status_code, other.status_code], [200, 200, 200])
+        delay.assert_called_once_with(900001, '/kpis', {'first_name': 'Bot'})
+
+    def test_failed_enqueue_lets_telegram_retry(self):
+        with mock.patch.object(tasks.process_telegram_command, 'delay', side_effect=ConnectionError('broker down')):
+            self.assertEqual(self._post(self._update(3)).status_code, 500)
+
+        with mock.patch.object(tasks.process_telegram_command, 'delay') as delay:
+            self.assertEqual(self._post(self._update(3)).status_code, 200)
+        delay.assert_called_once()
+
+    def test_kpis_are_answered_from_a_cached_snapshot(self):
+        telegram = mock.Mock()
+
+        with mock.patch.object(telegram_webhook, 'get_telegram_service', return_value=telegram):
+            tasks.process_telegram_command(900001, '/kpis', {})
+            # Only the linked user lookup (and its role) hit the database
+            with self.assertNumQueries(2):
+                tasks.process_telegram_command(900001, '/kpis', {})
+
+        self.assertEqual(telegram.send_message.call_count, 2)
+        first, second = (call.kwargs['text'] for call in telegram.send_message.call_args_list)
+        self.assertIn('KPIs del Sistema', first)
+        self.assertEqual(first, second)
@@ -0,0 +1,91 @@
+"""
+Unit tests for the counter-cached unread notification count
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User, Role
+from apps.notifications import unread_counter
+from apps.notifications.models import Notification, UnreadNotificationCounter
+from apps.notifications.views import NotificationViewSet
+
+
+class UnreadCounterTest(TestCase):
+    """Test counter maintenance on create, mark-read and reconciliation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        cls.user = User.objects.create_user(
+            email='unread@test.com',
+            password='SecurePass123!',
+            first_name='Unread',
+            last_name='User',
+            role=role,
+            rut='15151515-5'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _notify(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [
+                Notification.objects.create(
+                    user=self.user, notification_type='SYSTEM', title=f'Aviso {index}', message='M'
+                )
+                for index in range(count)
+            ]
+
+    def _call(self, action, method='get', data=None):
+        view = NotificationViewSet.as_view({method: action})
+        request = getattr(APIRequestFactory(), method)(f'/api/v1/notifications/{action}/', data, format='json')
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return view(request)
+
+    def test_count_is_read_from_the_counter(self):
+        self._notify(3)
+        self.assertEqual(self._call('unread_count').data, {'count': 3})
+        self.assertEqual(UnreadNotificationCounter.objects.get(user=self.user).unread, 3)
+
+        # Cached: no COUNT, no counter read
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_counter.unread_count(self.user.id), 3)
+
+        # New notifications update the counter and drop the cached value
+        self._notify(2)
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_counter.unread_count(self.user.id), 5)
+
+    def test_bulk_mark_read_uses_one_update(self):
+        notifications = self._notify(4)
+        unread_counter.unread_count(self.user.id)
+        ids = [str(notification.id) for notification in notifications[:2]]
+
+        # Savepoint + notifications UPDATE + counter UPDATE + release
+        with self.assertNumQueries(4):
+            response = self._call('bulk_mark_read', 'post', {'ids': ids})
+        self.assertEqual(response.data, {'marked_read': 2})
+
+        # Already read: nothing changes
+        self.assertEqual(self._call('bulk_mark_read', 'post', {'ids': ids}).data, {'marked_read': 0})
+        self.assertEqual(self._call('unread_count').data, {'count': 2})
+
+        self.assertEqual(self._call('mark_all_read', 'post').data, {'marked_read': 2})
+        self.assertEqual(self._call('unread_count').data, {'count': 0})
+
+    def test_reconcile_corrects_drift(self):
+        notifications = self._notify(3)
+        unread_counter.unread_count(self.user.id)
+        # Queryset deletes skip the counters
+        Notification.objects.filter(id=notifications[0].id).delete()
+        UnreadNotificationCounter.objects.filter(user=self.user).update(
+            updated_at=notifications[0].created_at
+        )
+
+        self.assertEqual(unread_counter.reconcile(), 1)
+        self.assertEqual(unread_counter.unread_count(self.user.id), 2)
+        self.assertEqual(unread_counter.reconcile(), 0)
@@ -0,0 +1,199 @@
+"""
+Unit tests for concurrent webhook delivery
+"""
+import json
+import threading
+import time
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, TestCase
+
+from apps.authentication.models import User, Role
+from apps.core import tasks as core_tasks
+from apps.core.models import Webhook, WebhookDelivery
+from apps.core.webhook_dispatcher import CircuitBreaker, WebhookDispatcher, WebhookRequest
+from apps.core.webhook_service import WebhookService
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = 'ok'
+
+
+class FakeSession:
+    """Records concurrency per URL; ``failing`` URLs raise a network error"""
+
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        with self.lock:
+            self.calls.append((url, data, headers))
+            self.active[url] = self.active.get(url, 0) + 1
+            self.peak[url] = max(self.peak.get(url, 0), self.active[url])
+        time.sleep(self.delays.get(url, 0.01))
+        with self.lock:
+            self.active[url] -= 1
+        if url in self.failing:
+            raise requests.exceptions.ConnectionError('connection refused')
+        return FakeResponse(200)
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    """Test open, half-open and close transitions"""
+
+    def test_opens_after_threshold_and_probes_once(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60, clock=lambda: now[0])
+
+        breaker.record('https://a', success=False)
+        self.assertEqual(breaker.allow('https://a'), 0.0)
+        breaker.record('https://a', success=False)
+        self.assertEqual(breaker.allow('https://a'), 60)
+
+        now[0] = 61
+        self.assertEqual(breaker.allow('https://a'), 0.0)
+        # Only one probe while half-open
+        self.assertIsNone(breaker.allow('https://a'))
+        breaker.record('https://a', success=False)
+        self.assertEqual(breaker.allow('https://a'), 60)
+
+        now[0] = 122
+        self.assertEqual(breaker.allow('https://a'), 0.0)
+        breaker.record('https://a', success=True)
+        self.assertFalse(breaker.is_open('https://a'))
+
+
+class WebhookDispatcherTest(SimpleTestCase):
+    """Test concurrency limits and fail-fast on open circuits"""
+
+    def _dispatcher(self, session, **kwargs):
+        kwargs.setdefault('max_per_endpoint', 2)
+        dispatcher = WebhookDispatcher(max_workers=8, **kwargs)
+        dispatcher.session_for = lambda url: session
+        return dispatcher
+
+    def test_slow_endpoint_does_not_delay_others(self):
+        session = FakeSession(delays={'https://slow/hook': 0.2})
+        dispatcher = self._dispatcher(session)
+        batch = [WebhookRequest(url='https://slow/hook', body=b'{}') for _ in range(4)]
+        batch += [WebhookRequest(url=f'https://fast{index}/hook', body=b'{}') for index in range(6)]
+
+        start = time.monotonic()
+        attempts = dispatcher.send_all(batch)
+        elapsed = time.monotonic() - start
+
+        self.assertTrue(all(attempt.status_code == 200 for attempt in attempts))
+        self.assertEqual(session.peak['https://slow/hook'], 2)
+        # Four slow requests, two at a time; the fast ones run alongside
+        self.assertLess(elapsed, 0.6)
+
+    def test_failing_endpoint_trips_circuit(self):
+        session = FakeSession(failing={'https://down/hook'})
+        dispatcher = self._dispatcher(
+            session, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60), max_per_endpoint=1
+        )
+        batch = [WebhookRequest(url='https://down/hook', body=b'{}') for _ in range(5)]
+
+        attempts = dispatcher.send_all(batch)
+
+        sent = [attempt for attempt in attempts if attempt.sent]
+        self.assertEqual(len(sent), 2)
+        self.assertTrue(all(attempt.error for attempt in attempts))
+        self.assertTrue(all(0 < attempt.circuit_open_for <= 60 for attempt in attempts if not attempt.sent))
+        self.assertEqual(len(session.calls), 2)
+
+
+class WebhookServiceTest(TestCase):
+    """Test constant-time emission and delivery recording"""
+
+    @classmethod
+    def setUpTestData(cls):
+        role, _ = Role.objects.get_or_create(name=Role.ADMIN)
+        user = User.objects.create_user(
+            email='webhooks@test.com',
+            password='SecurePass123!',
+            first_name='Webhook',
+            last_name='Owner',
+            role=role,
+            rut='18181818-8'
+        )
+        cls.webhooks = [
+            Webhook.objects.create(
+                name=f'Hook {index}', url=f'https://hooks{index}.example.com/cmms',
+                events=['work_order.created'], secret='s3cret', created_by=user
+            )
+            for index in range(3)
+        ]
+        Webhook.objects.create(
+            name='Other', url='https://other.example.com/cmms', events=['asset.created'], secret='x', created_by=user
+        )
+
+    def setUp(self):
+        self.session = FakeSession(failing={'https://hooks2.example.com/cmms'})
+        dispatcher = WebhookDispatcher(max_workers=4, max_per_endpoint=2)
+        dispatcher.session_for = lambda url: self.session
+        patcher = mock.patch('apps.core.webhook_service.get_webhook_dispatcher', return_value=dispatcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_trigger_event_only_enqueues_after_commit(self):
+        with mock.patch.object(core_tasks.dispatch_webhook_event, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(0):
+                    WebhookService.trigger_event('work_order.created', {'id': 1})
+                delay.assert_not_called()
+
+        delay.assert_called_once_with('work_order.created', {'id': 1})
+
+    def test_dispatch_event_delivers_to_subscribers_and_retries_same_row(self):
+        report = WebhookService.dispatch_event('work_order.created', {'id': 1})
+
+        self.assertEqual(report, {'success': 2, 'failed': 0, 'retrying': 1})
+        self.assertEqual(len(self.session.calls), 3)
+        url, body, headers = self.session.calls[0]
+        # The body is sent exactly as signed
+        self.assertEqual(
+            headers['X-Webhook-Signature'], WebhookService.generate_signature(json.loads(body), 's3cret')
+        )
+
+        retrying = WebhookDelivery.objects.get(status='retrying')
+        WebhookDelivery.objects.filter(id=retrying.id).update(next_retry_at=retrying.created_at)
+        self.assertEqual(WebhookService.retry_failed_deliveries(), {'success': 0, 'failed': 0, 'retrying': 1})
+
+        retrying.refresh_from_db()
+        self.assertEqual(retrying.attempt_count, 2)
+        self.assertEqual(WebhookDelivery.objects.count(), 3)
+
+    def test_results_are_written_in_batches_with_atomic_counters(self):
+        # Subscribers, then one insert and one counter UPDATE per group of
+        # webhooks with the same increments (inside a savepoint)
+        with self.assertNumQueries(6):
+            WebhookService.dispatch_event('work_order.created', {'id': 1})
+        WebhookService.dispatch_event('work_order.created', {'id': 2})
+
+        stats = {
+            webhook.url: (webhook.total_deliveries, webhook.successful_deliveries, webhook.failed_deliveries)
+            for webhook in Webhook.objects.filter(events=['work_order.created'])
+        }
+        self.assertEqual(stats, {
+            'https://hooks0.example.com/cmms': (2, 2, 0),
+            'https://hooks1.example.com/cmms': (2, 2, 0),
+            'https://hooks2.example.com/cmms': (2, 0, 2),
+        })
+
+    def test_retry_delay_backs_off_exponentially_with_jitter(self):
+        webhook = self.webhooks[0]
+        with mock.patch('apps.core.webhook_service.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual(
+                [WebhookService.retry_delay(webhook, attempt) for attempt in (1, 2, 3)], [60, 120, 240]
+            )
+        with mock.patch('apps.core.webhook_service.random.uniform', side_effect=lambda low, high: low):
+            self.assertEqual(WebhookService.retry_delay(webhook, 20), 1800)
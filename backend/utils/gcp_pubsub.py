@@ -1,9 +1,9 @@
 """Google Cloud Pub/Sub utility"""
-from google.cloud import pubsub_v1
 from django.conf import settings
-import json
 import logging
 
+from apps.core.pubsub_publisher import get_publisher, topic_path
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,7 +12,8 @@ class GCPPubSubClient:
     
     def __init__(self):
         self.project_id = settings.GCP_PROJECT_ID
-        self.publisher = pubsub_v1.PublisherClient() if self.project_id else None
+        # Shared non-blocking publisher (batching, backpressure, disk spool)
+        self.publisher = get_publisher() if self.project_id else None
         
         # Topic names
         self.topic_notifications = settings.GCP_PUBSUB_TOPIC_NOTIFICATIONS
@@ -21,11 +22,11 @@ class GCPPubSubClient:
     
     def _get_topic_path(self, topic_name):
         """Get full topic path"""
-        return self.publisher.topic_path(self.project_id, topic_name)
+        return topic_path(self.project_id, topic_name)
     
     def publish_message(self, topic_name, message_data, **attributes):
         """
-        Publish message to topic
+        Publish message to topic without waiting for the acknowledgement
         
         Args:
             topic_name: Topic name
@@ -33,29 +34,18 @@ class GCPPubSubClient:
             **attributes: Additional message attributes
         
         Returns:
-            str: Message ID
+            bool: True if handed to the publisher (False if spooled for retry)
         """
         if not self.publisher:
             logger.warning("Pub/Sub not configured, skipping message publish")
             return None
         
         try:
-            topic_path = self._get_topic_path(topic_name)
-            
-            # Convert message to JSON bytes
-            message_bytes = json.dumps(message_data).encode('utf-8')
-            
-            # Publish message
-            future = self.publisher.publish(
-                topic_path,
-                message_bytes,
+            return self.publisher.publish(
+                self._get_topic_path(topic_name),
+                message_data,
                 **attributes
             )
-            
-            message_id = future.result()
-            logger.info(f"Published message {message_id} to {topic_name}")
-            return message_id
-            
         except Exception as e:
             logger.error(f"Error publishing message to {topic_name}: {e}")
             return None